@@ -0,0 +1,66 @@
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any
+
+from aws_lambda_env_modeler import get_environment_variables, init_environment_variables
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from service.handlers.models.env_vars import CompactionEnvVars
+from service.handlers.utils.compaction import CompactionSettings, PartitionCompactor
+from service.handlers.utils.key_layout import HourPartitionedKeyBuilder
+from service.handlers.utils.observability import logger, metrics, tracer
+from service.handlers.utils.streaming import MIB
+
+DEADLINE_MARGIN_SECONDS = 30  # time left to write the checkpoint of the current part
+
+
+@lru_cache(maxsize=1)
+def get_s3_client() -> Any:
+    from boto3 import client
+    from botocore.config import Config
+
+    # one pooled connection per concurrent read, boto3 defaults to 10
+    env_vars: CompactionEnvVars = get_environment_variables(model=CompactionEnvVars)
+    return client('s3', config=Config(retries={'max_attempts': 5, 'mode': 'adaptive'}, max_pool_connections=max(env_vars.COMPACTION_CONCURRENCY, 10)))
+
+
+def get_partitions(now: datetime, settle_hours: int, lookback_hours: int) -> list[str]:
+    """Hourly partitions closed for at least settle_hours, oldest first, so an unfinished partition is resumed first"""
+    end = now - timedelta(hours=settle_hours + 1)
+    return list(HourPartitionedKeyBuilder().prefixes(end - timedelta(hours=lookback_hours - 1), end))
+
+
+@init_environment_variables(model=CompactionEnvVars)
+@logger.inject_lambda_context
+@metrics.log_metrics
+@tracer.capture_lambda_handler(capture_response=False)
+def lambda_handler(event: dict[str, Any], context: LambdaContext) -> dict[str, Any]:
+    """Compacts the hourly partitions given as event['partitions'], or the closed partitions of the lookback period on schedule"""
+    env_vars: CompactionEnvVars = get_environment_variables(model=CompactionEnvVars)
+    settings = CompactionSettings(
+        file_format=env_vars.COMPACTION_FORMAT,
+        compression=env_vars.COMPACTION_COMPRESSION,
+        concurrency=env_vars.COMPACTION_CONCURRENCY,
+        max_part_bytes=env_vars.COMPACTION_MAX_PART_MB * MIB,
+        tombstone=env_vars.COMPACTION_TOMBSTONE,
+    )
+    compactor = PartitionCompactor(get_s3_client(), env_vars.BUCKET_NAME, settings)
+    deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+    partitions = event.get('partitions') or get_partitions(
+        datetime.now(timezone.utc), env_vars.COMPACTION_SETTLE_HOURS, env_vars.COMPACTION_LOOKBACK_HOURS
+    )
+
+    compacted: list[str] = []
+    incomplete = None
+    for partition in partitions:
+        if compactor.compact(partition, deadline) is None:
+            incomplete = partition  # resumed from its checkpoint by the next invocation
+            break
+        compacted.append(partition)
+
+    metrics.add_metric(name='CompactedRows', unit=MetricUnit.Count, value=compactor.rows_compacted)
+    metrics.add_metric(name='TombstonedObjects', unit=MetricUnit.Count, value=compactor.objects_tombstoned)
+    metrics.add_metric(name='CompactionIncomplete', unit=MetricUnit.Count, value=int(incomplete is not None))
+    return {'compacted': compacted, 'incomplete': incomplete}
@@ -0,0 +1,15 @@
+from service.handlers.utils.cold_start import init_execution_environment
+
+init_execution_environment()
+
+
+def lambda_handler(event, context):
+    """SQS event source entry point.
+
+    Powertools batch, parser, tracer and metrics, the record models and the handler logic are imported by
+    init_execution_environment while pre-warming, or by the first invocation when COLD_START_PREWARM is false.
+    """
+    # deferred import, a dictionary lookup once the module was imported
+    from service.handlers.process_sqs_batch import process_sqs_batch
+
+    return process_sqs_batch(event, context)
@@ -0,0 +1,481 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable, Iterator
+from functools import lru_cache
+from json import dumps as json_dumps
+from os import getenv
+from typing import Any
+
+from aws_lambda_powertools.metrics import MetricUnit
+from pydantic import TypeAdapter
+
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.models.sqs_item import OffloadedBody, Order, OrderSqsRecord, PayloadS3Pointer, RawSqsRecord
+from service.handlers.utils.aggregation import CONTENT_TYPES, FILE_EXTENSIONS, build_aggregated_object, get_batch_id, serialize_index
+from service.handlers.utils.async_runtime import async_runtime
+from service.handlers.utils.backpressure import after_write, before_write
+from service.handlers.utils.batch_processor import raise_if_cancelled
+from service.handlers.utils.body_parser import extract_order_item
+from service.handlers.utils.idempotency import get_content_hash, get_idempotency_store
+from service.handlers.utils.invocation_metrics import invocation_metrics
+from service.handlers.utils.key_layout import get_key_builder
+from service.handlers.utils.observability import logger, tracer
+from service.handlers.utils.order_index import IndexEntry, get_order_index
+from service.handlers.utils.runtime_context import runtime_context
+from service.handlers.utils.streaming import (
+    MIB,
+    PAYLOAD_HEAD_SIZE,
+    READ_CHUNK_SIZE,
+    WrittenObject,
+    copy_object,
+    extract_item_chunks,
+    is_item_only,
+    stream_upload,
+)
+from service.models.exceptions import CircuitOpenException, DeadlineExceededException
+
+_OFFLOADED_BODY_ADAPTER: TypeAdapter[OffloadedBody] = TypeAdapter(OffloadedBody)
+# PutRecordBatch limits, see https://docs.aws.amazon.com/firehose/latest/APIReference/API_PutRecordBatch.html
+MAX_PUT_RECORD_BATCH_RECORDS = 500
+MAX_PUT_RECORD_BATCH_BYTES = 4 * MIB
+MAX_STREAM_RECORD_BYTES = 1000 * 1024
+MAX_PUT_RECORD_BATCH_ATTEMPTS = 3  # records rejected by the stream are throttled, they are put again with a backoff
+# S3 and Firehose requests fail fast: a call and its retry take at most 2 * (1 + 3) seconds plus the retry backoff, within
+# the 10 second function timeout. A record whose write failed is reported as a batch item failure and counted by the
+# circuit breaker instead of timing out the invocation, longer outages are left to the breaker and SQS redelivery
+CLIENT_CONNECT_TIMEOUT_SECONDS = 1
+CLIENT_READ_TIMEOUT_SECONDS = 3
+CLIENT_MAX_ATTEMPTS = 2  # the first attempt and one retry
+
+StreamRecord = tuple[OrderSqsRecord | RawSqsRecord, bytes]
+
+
+def get_s3_client() -> Any:
+    """S3 client shared by all records and warm invocations of the execution environment.
+
+    Built on first use, or during the init phase by service.handlers.utils.cold_start.warm_up,
+    so importing this module does not pay for importing boto3 and loading the S3 service model.
+    """
+    return runtime_context.client('s3', build_config=_build_s3_config)
+
+
+def _build_s3_config() -> Any:
+    # deferred import, see get_s3_client docstring
+    from botocore.config import Config
+
+    return Config(
+        # standard retries with jitter, adaptive retries would delay requests client side beyond the timeouts
+        retries={'max_attempts': CLIENT_MAX_ATTEMPTS, 'mode': 'standard'},
+        read_timeout=CLIENT_READ_TIMEOUT_SECONDS,
+        connect_timeout=CLIENT_CONNECT_TIMEOUT_SECONDS,
+        # one pooled connection per concurrently processed record, see BATCH_CONCURRENCY. boto3 defaults to 10
+        max_pool_connections=max(int(getenv('BATCH_CONCURRENCY', '1')), 10),
+    )
+
+
+def get_firehose_client() -> Any:
+    """Firehose client of the 'delivery_stream' SINK_TYPE, shared by all records and warm invocations of the execution environment"""
+    return runtime_context.client('firehose', build_config=_build_firehose_config)
+
+
+def _build_firehose_config() -> Any:
+    # deferred import, see get_s3_client docstring
+    from botocore.config import Config
+
+    # a single PutRecordBatch call per 500 records, DeliveryStreamSink retries the records the stream rejected
+    return Config(
+        retries={'max_attempts': CLIENT_MAX_ATTEMPTS, 'mode': 'standard'},
+        read_timeout=CLIENT_READ_TIMEOUT_SECONDS,
+        connect_timeout=CLIENT_CONNECT_TIMEOUT_SECONDS,
+    )
+
+
+async def get_async_s3_client() -> Any:
+    """aiobotocore S3 client of the 'async' CONCURRENCY_MODE, shared by all records and warm invocations of the execution environment.
+
+    Built on first use, on the event loop kept by async_runtime. Its connection pool holds a connection per concurrently
+    processed record, see ASYNC_CONCURRENCY.
+    """
+    return await async_runtime.client('s3', build_config=_build_async_s3_config)
+
+
+def _build_async_s3_config() -> Any:
+    # deferred import, aiobotocore is an optional dependency of the 'async' CONCURRENCY_MODE
+    from aiobotocore.config import AioConfig
+
+    return AioConfig(
+        # standard retries, the request rate is bounded by ASYNC_CONCURRENCY
+        retries={'max_attempts': CLIENT_MAX_ATTEMPTS, 'mode': 'standard'},
+        read_timeout=CLIENT_READ_TIMEOUT_SECONDS,
+        connect_timeout=CLIENT_CONNECT_TIMEOUT_SECONDS,
+        max_pool_connections=runtime_context.env_vars(MyHandlerEnvVars).ASYNC_CONCURRENCY,
+    )
+
+
+def serialize_record(record: OrderSqsRecord | RawSqsRecord) -> bytes:
+    """Order item as JSON, also the aggregation mode record handler where the batch is written once by write_aggregated_batch
+
+    Records parsed in 'fast' PARSING_MODE only had their envelope validated, their body is validated and extracted here.
+    Aggregated batches are built in memory, so S3 offloaded payloads are read in full.
+    """
+    if isinstance(record, OrderSqsRecord):
+        if isinstance(record.body, Order):
+            return json_dumps(record.body.item).encode('utf-8')
+        return b''.join(extract_item_chunks(open_offloaded_payload(record.body[1])))
+    pointer = parse_payload_pointer(record.body)
+    if pointer is not None:
+        return b''.join(extract_item_chunks(open_offloaded_payload(pointer)))
+    return extract_order_item(record.body)
+
+
+def get_payload_pointer(record: OrderSqsRecord | RawSqsRecord) -> PayloadS3Pointer | None:
+    """Location of the payload when the body was offloaded to S3 by an SQS extended client library"""
+    if isinstance(record, OrderSqsRecord):
+        return None if isinstance(record.body, Order) else record.body[1]
+    return parse_payload_pointer(record.body)
+
+
+def parse_payload_pointer(body: str) -> PayloadS3Pointer | None:
+    # order bodies are JSON objects, an array can only be a payload pointer
+    if not body.lstrip().startswith('['):
+        return None
+    return _OFFLOADED_BODY_ADAPTER.validate_json(body)[1]
+
+
+def open_offloaded_payload(pointer: PayloadS3Pointer) -> Iterator[bytes]:
+    response = get_s3_client().get_object(Bucket=pointer.s3BucketName, Key=pointer.s3Key)
+    return response['Body'].iter_chunks(READ_CHUNK_SIZE)
+
+
+def write_object(bucket_name: str, object_key: str, body: bytes, content_type: str) -> WrittenObject | None:
+    """Writes the object unless the idempotency store knows it already holds the same content
+
+    Returns
+    -------
+    WrittenObject | None
+        Size and ETag of the object, None when the write was skipped
+    """
+
+    def put_object() -> WrittenObject:
+        response = get_s3_client().put_object(Bucket=bucket_name, Key=object_key, Body=body, ContentType=content_type)
+        return WrittenObject(len(body), response['ETag'])
+
+    return _write_once(object_key, body, put_object)
+
+
+def write_offloaded_payload(bucket_name: str, object_key: str, pointer: PayloadS3Pointer) -> WrittenObject | None:
+    """Writes the item of an S3 offloaded payload, streamed through bounded buffers or copied within S3 (OFFLOADED_PAYLOAD_MODE)
+
+    Only payloads holding the item alone are copied, {"item": ...} envelopes are streamed so the written object is the
+    same in both modes.
+
+    Returns
+    -------
+    WrittenObject | None
+        Size and ETag of the object, None when the write was skipped
+    """
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+
+    def write() -> WrittenObject:
+        if env_vars.OFFLOADED_PAYLOAD_MODE == 'copy' and _is_item_only_payload(pointer):
+            return copy_object(get_s3_client(), pointer.s3BucketName, pointer.s3Key, bucket_name, object_key, 'application/json')
+        chunks = extract_item_chunks(open_offloaded_payload(pointer))
+        return stream_upload(get_s3_client(), bucket_name, object_key, chunks, 'application/json', env_vars.MULTIPART_PART_SIZE_MB * MIB)
+
+    # extended client libraries write every payload to a new key, the pointer identifies the content
+    return _write_once(object_key, f'{env_vars.OFFLOADED_PAYLOAD_MODE}:{pointer.s3BucketName}/{pointer.s3Key}'.encode('utf-8'), write)
+
+
+def _is_item_only_payload(pointer: PayloadS3Pointer) -> bool:
+    response = get_s3_client().get_object(Bucket=pointer.s3BucketName, Key=pointer.s3Key, Range=f'bytes=0-{PAYLOAD_HEAD_SIZE - 1}')
+    return is_item_only(response['Body'].read())
+
+
+async def write_object_async(bucket_name: str, object_key: str, body: bytes, content_type: str) -> WrittenObject | None:
+    """write_object with the async S3 client
+
+    Returns
+    -------
+    WrittenObject | None
+        Size and ETag of the object, None when the write was skipped
+    """
+
+    async def put_object() -> WrittenObject:
+        client = await get_async_s3_client()
+        response = await client.put_object(Bucket=bucket_name, Key=object_key, Body=body, ContentType=content_type)
+        return WrittenObject(len(body), response['ETag'])
+
+    return await _write_once_async(object_key, body, put_object)
+
+
+def _write_once(object_key: str, content: bytes, write: Callable[[], WrittenObject]) -> WrittenObject | None:
+    store = get_idempotency_store()
+    content_hash = get_content_hash(content) if store is not None else ''
+    if store is not None and store.is_duplicate(object_key, content_hash):
+        logger.debug('skipping unchanged object', extra={'object_key': object_key})
+        invocation_metrics.add('SkippedDuplicateWrites', MetricUnit.Count, 1)
+        return None
+
+    before_write()
+    start = time.perf_counter()
+    try:
+        written = write()
+    except BaseException as exc:
+        after_write(exc)
+        raise
+    after_write(None)
+    # the record may have been reported as failed meanwhile, its redelivery must write it again
+    raise_if_cancelled()
+    invocation_metrics.observe_latency('S3WriteLatency', (time.perf_counter() - start) * 1000)
+    invocation_metrics.add('BytesWritten', MetricUnit.Bytes, written.size)
+    if store is not None:
+        store.save(object_key, content_hash)
+    return written
+
+
+async def _write_once_async(object_key: str, content: bytes, write: Callable[[], Awaitable[WrittenObject]]) -> WrittenObject | None:
+    store = get_idempotency_store()
+    content_hash = get_content_hash(content) if store is not None else ''
+    # the dynamodb store calls boto3, keep it off the event loop
+    if store is not None and await asyncio.to_thread(store.is_duplicate, object_key, content_hash):
+        logger.debug('skipping unchanged object', extra={'object_key': object_key})
+        invocation_metrics.add('SkippedDuplicateWrites', MetricUnit.Count, 1)
+        return None
+
+    before_write()
+    start = time.perf_counter()
+    try:
+        written = await write()
+    except BaseException as exc:
+        after_write(exc)
+        raise
+    after_write(None)
+    invocation_metrics.observe_latency('S3WriteLatency', (time.perf_counter() - start) * 1000)
+    invocation_metrics.add('BytesWritten', MetricUnit.Bytes, written.size)
+    if store is not None:
+        await asyncio.to_thread(store.save, object_key, content_hash)
+    return written
+
+
+@tracer.capture_method
+def record_handler(record: OrderSqsRecord | RawSqsRecord):
+    bucket_name = runtime_context.env_vars(MyHandlerEnvVars).BUCKET_NAME
+    object_key = get_key_builder().build(record.messageId, record.attributes.SentTimestamp)
+    pointer = get_payload_pointer(record)
+    if pointer is None:
+        body = serialize_record(record)
+        logger.debug('writing record', extra={'message_id': record.messageId, 'size': len(body)})
+        write_started = time.time()
+        written = write_object(bucket_name=bucket_name, object_key=object_key, body=body, content_type='application/json')
+    else:
+        logger.debug('writing offloaded payload', extra={'message_id': record.messageId, 'source': f'{pointer.s3BucketName}/{pointer.s3Key}'})
+        write_started = time.time()
+        written = write_offloaded_payload(bucket_name=bucket_name, object_key=object_key, pointer=pointer)
+
+    if written:
+        _record_written(record, object_key, written, write_started)
+
+
+@tracer.capture_method
+async def async_record_handler(record: OrderSqsRecord | RawSqsRecord):
+    """record_handler of the 'async' CONCURRENCY_MODE, writes with the async S3 client
+
+    S3 offloaded payloads are rare, they are streamed by record_handler on a worker thread with the boto3 client.
+    """
+    pointer = get_payload_pointer(record)
+    if pointer is not None:
+        return await asyncio.to_thread(record_handler, record)
+
+    bucket_name = runtime_context.env_vars(MyHandlerEnvVars).BUCKET_NAME
+    object_key = get_key_builder().build(record.messageId, record.attributes.SentTimestamp)
+    body = serialize_record(record)
+    logger.debug('writing record', extra={'message_id': record.messageId, 'size': len(body)})
+    write_started = time.time()
+    written = await write_object_async(bucket_name=bucket_name, object_key=object_key, body=body, content_type='application/json')
+    if written:
+        _record_written(record, object_key, written, write_started)
+
+
+def _record_written(record: OrderSqsRecord | RawSqsRecord, object_key: str, written: WrittenObject, write_started: float) -> None:
+    raise_if_cancelled()
+    end_to_end_ms = observe_record_latencies(record, write_started, time.time())
+    invocation_metrics.add('BucketItems', MetricUnit.Count, 1)
+    _add_index_entry(record, object_key, written, end_to_end_ms)
+
+
+def observe_record_latencies(record: OrderSqsRecord | RawSqsRecord, write_started: float, write_finished: float) -> float:
+    """Splits the time from sending a record until its object is durable in S3 into histograms, in milliseconds
+
+    QueueWaitLatency runs from SentTimestamp to ApproximateFirstReceiveTimestamp, ProcessingLatency from there until the
+    write started (batching window, invocation and parsing) and EndToEndLatency from SentTimestamp until the PUT completed.
+    The write itself is S3WriteLatency. Redelivered records (ApproximateReceiveCount > 1) include the failed deliveries
+    and visibility timeouts, they are published under 'Redelivered' names so they don't skew the first delivery latencies.
+    Wall clock times of the function and SQS may be skewed slightly, negative spans are reported as 0.
+
+    Returns
+    -------
+    float
+        The end-to-end latency
+    """
+    sent_at = record.attributes.SentTimestamp.timestamp()
+    first_received_at = record.attributes.ApproximateFirstReceiveTimestamp.timestamp()
+    end_to_end_ms = max(write_finished - sent_at, 0) * 1000
+    prefix = 'Redelivered' if int(record.attributes.ApproximateReceiveCount) > 1 else ''
+    invocation_metrics.observe_histogram(f'{prefix}QueueWaitLatency', max(first_received_at - sent_at, 0) * 1000)
+    invocation_metrics.observe_histogram(f'{prefix}ProcessingLatency', max(write_started - first_received_at, 0) * 1000)
+    invocation_metrics.observe_histogram(f'{prefix}EndToEndLatency', end_to_end_ms)
+    return end_to_end_ms
+
+
+def _add_index_entry(record: OrderSqsRecord | RawSqsRecord, object_key: str, written: WrittenObject, latency_ms: float) -> None:
+    index = get_order_index()
+    if index is None:
+        return
+    entry = IndexEntry(record.messageId, object_key, written.size, written.etag.strip('"'), record.attributes.SentTimestamp, int(latency_ms))
+    index.add(entry)
+
+
+@tracer.capture_method
+def write_aggregated_batch(lines: list[tuple[str, bytes]]) -> None:
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+    compression = env_vars.AGGREGATION_COMPRESSION
+    batch_id = get_batch_id([message_id for message_id, _ in lines])
+    object_key = f'batches/{batch_id}{FILE_EXTENSIONS[compression]}'
+    body, index = build_aggregated_object(object_key, lines, compression)
+    logger.debug('writing aggregated batch', extra={'object_key': object_key, 'records': len(lines), 'size': len(body)})
+
+    written = write_object(env_vars.BUCKET_NAME, object_key, body, CONTENT_TYPES[compression])
+    # the index is written last, readers never see an index pointing to a missing object
+    try:
+        write_object(env_vars.BUCKET_NAME, f'batches/{batch_id}.index.json', serialize_index(index), 'application/json')
+    except Exception:
+        # every record is retried, redelivered in other batches they are written under other batch ids
+        if written:
+            _delete_orphaned_object(env_vars.BUCKET_NAME, object_key)
+        raise
+    if written:
+        invocation_metrics.add('BucketItems', MetricUnit.Count, len(lines))
+
+
+def _delete_orphaned_object(bucket_name: str, object_key: str) -> None:
+    try:
+        get_s3_client().delete_object(Bucket=bucket_name, Key=object_key)
+    except Exception as exc:
+        logger.warning('unable to delete aggregated object without index', extra={'object_key': object_key, 'error': str(exc)})
+        return
+    store = get_idempotency_store()
+    if store is not None:
+        store.save(object_key, '')  # forget its content hash, a redelivery of the same batch writes it again
+
+
+class RecordSink(ABC):
+    """Destination of the records, selected by SINK_TYPE.
+
+    write is called for every record of the batch and its result is kept by the batch processor. A sink that buffers
+    records writes them in flush, called once per batch with the (message id, result) pairs of the successful records.
+    flush returns the message ids it couldn't write with the reason, they are reported as batch item failures.
+    """
+
+    @abstractmethod
+    def write(self, record: OrderSqsRecord | RawSqsRecord) -> Any: ...  # pragma: no cover
+
+    def flush(self, results: list[tuple[str, Any]]) -> dict[str, str]:
+        return {}
+
+
+class ObjectSink(RecordSink):
+    """An S3 object per record, written by record_handler. Nothing is buffered, records may be written concurrently."""
+
+    def write(self, record: OrderSqsRecord | RawSqsRecord) -> None:
+        record_handler(record)
+
+
+class DeliveryStreamSink(RecordSink):
+    """Firehose delivery stream, buffering, compression and the S3 objects are handled by the stream.
+
+    write serializes a record as an NDJSON line, flush puts the lines of the batch with PutRecordBatch in calls of at most
+    500 records and 4 MiB. Records rejected by the stream (FailedPutCount) are put again, those still rejected after
+    MAX_PUT_RECORD_BATCH_ATTEMPTS and records above the 1000 KiB record limit are returned as failures. Every call
+    is checked by the write deadline and the circuit breaker like an S3 write.
+
+    Args:
+        stream_name (str): Delivery stream name.
+    """
+
+    def __init__(self, stream_name: str) -> None:
+        self.stream_name = stream_name
+
+    def write(self, record: OrderSqsRecord | RawSqsRecord) -> StreamRecord:
+        return record, serialize_record(record) + b'\n'
+
+    @tracer.capture_method
+    def flush(self, results: list[tuple[str, StreamRecord]]) -> dict[str, str]:
+        rejected: dict[str, str] = {}
+        batch: list[tuple[str, StreamRecord]] = []
+        batch_bytes = 0
+        for message_id, (record, data) in results:
+            if len(data) > MAX_STREAM_RECORD_BYTES:
+                rejected[message_id] = f'record of {len(data)} bytes exceeds the delivery stream record limit'
+                continue
+            if len(batch) == MAX_PUT_RECORD_BATCH_RECORDS or batch_bytes + len(data) > MAX_PUT_RECORD_BATCH_BYTES:
+                rejected.update(self._put_record_batch(batch))
+                batch, batch_bytes = [], 0
+            batch.append((message_id, (record, data)))
+            batch_bytes += len(data)
+        if batch:
+            rejected.update(self._put_record_batch(batch))
+        if rejected:
+            logger.warning('records rejected by the delivery stream', extra={'stream_name': self.stream_name, 'records': len(rejected)})
+            invocation_metrics.add('RejectedStreamRecords', MetricUnit.Count, len(rejected))
+        return rejected
+
+    def _put_record_batch(self, batch: list[tuple[str, StreamRecord]]) -> dict[str, str]:
+        try:
+            before_write()
+        except (DeadlineExceededException, CircuitOpenException) as exc:
+            return {message_id: str(exc) for message_id, _ in batch}
+
+        write_started = time.time()
+        start = time.perf_counter()
+        pending = batch
+        reasons: dict[str, str] = {}
+        try:
+            for attempt in range(MAX_PUT_RECORD_BATCH_ATTEMPTS):
+                if attempt:
+                    time.sleep(0.05 * 2 ** (attempt - 1))
+                response = get_firehose_client().put_record_batch(
+                    DeliveryStreamName=self.stream_name, Records=[{'Data': data} for _, (_, data) in pending]
+                )
+                if not response['FailedPutCount']:
+                    pending = []
+                    break
+                # responses are in the order of the records
+                failed = [(entry, result) for entry, result in zip(pending, response['RequestResponses'], strict=True) if 'ErrorCode' in result]
+                reasons.update({message_id: f'{result["ErrorCode"]}: {result.get("ErrorMessage", "")}' for (message_id, _), result in failed})
+                pending = [entry for entry, _ in failed]
+        except Exception as exc:
+            after_write(exc)
+            logger.warning('unable to put records to the delivery stream', extra={'stream_name': self.stream_name, 'error': str(exc)})
+            reasons.update({message_id: str(exc) for message_id, _ in pending})
+        else:
+            after_write(None)
+        errors = {message_id: reasons[message_id] for message_id, _ in pending}
+        invocation_metrics.observe_latency('StreamWriteLatency', (time.perf_counter() - start) * 1000)
+
+        write_finished = time.time()
+        delivered = [(record, data) for message_id, (record, data) in batch if message_id not in errors]
+        for record, _ in delivered:
+            observe_record_latencies(record, write_started, write_finished)
+        invocation_metrics.add('StreamRecords', MetricUnit.Count, len(delivered))
+        invocation_metrics.add('BytesWritten', MetricUnit.Bytes, sum(len(data) for _, data in delivered))
+        return errors
+
+
+@lru_cache(maxsize=1)
+def get_record_sink() -> RecordSink:
+    """Sink selected by SINK_TYPE, shared by all warm invocations of the execution environment"""
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+    if env_vars.SINK_TYPE == 'delivery_stream':
+        return DeliveryStreamSink(stream_name=str(env_vars.DELIVERY_STREAM_NAME))
+    return ObjectSink()
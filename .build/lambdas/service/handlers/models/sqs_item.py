@@ -0,0 +1,30 @@
+from typing import Literal
+
+from aws_lambda_powertools.utilities.parser.models import SqsRecordModel
+from pydantic import BaseModel, Field, Json, TypeAdapter
+
+OFFLOADED_PAYLOAD_MARKER = 'software.amazon.payloadoffloading.PayloadS3Pointer'
+
+
+class Order(BaseModel):
+    item: dict
+
+
+class PayloadS3Pointer(BaseModel):
+    s3BucketName: str = Field(min_length=1)
+    s3Key: str = Field(min_length=1)
+
+
+# body sent by the SQS extended client libraries in place of payloads above the SQS message size limit
+OffloadedBody = tuple[Literal['software.amazon.payloadoffloading.PayloadS3Pointer'], PayloadS3Pointer]
+
+# bodies the handler accepts, the DLQ redrive function ships this module to tell malformed bodies apart (see 'make build')
+ORDER_BODY_ADAPTER: TypeAdapter[Order | OffloadedBody] = TypeAdapter(Order | OffloadedBody)
+
+
+class OrderSqsRecord(SqsRecordModel):
+    body: Json[Order | OffloadedBody]  # type: ignore[assignment]  # deserialize order data or the offloaded payload pointer from JSON string
+
+
+class RawSqsRecord(SqsRecordModel):
+    body: str  # envelope validation only, see PARSING_MODE 'fast'
@@ -0,0 +1,89 @@
+import gzip
+from hashlib import sha256
+from json import dumps as json_dumps
+from json import loads as json_loads
+from typing import Any
+
+from service.handlers.models.env_vars import Compression
+
+FILE_EXTENSIONS: dict[str, str] = {'none': '.ndjson', 'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+CONTENT_TYPES: dict[str, str] = {'none': 'application/x-ndjson', 'gzip': 'application/gzip', 'zstd': 'application/zstd'}
+
+
+def _compress(data: bytes, compression: Compression) -> bytes:
+    if compression == 'gzip':
+        return gzip.compress(data, mtime=0)
+    if compression == 'zstd':
+        import zstandard  # optional dependency, only required when zstd compression is enabled
+
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _decompress(data: bytes, compression: Compression) -> bytes:
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    if compression == 'zstd':
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def get_batch_id(message_ids: list[str]) -> str:
+    """Deterministic batch identifier, a redelivered batch with the same messages overwrites its previous objects
+
+    Message ids are sorted, SQS may redeliver the messages of a batch in a different order.
+    """
+    return sha256('\n'.join(sorted(message_ids)).encode('utf-8')).hexdigest()[:32]
+
+
+def build_aggregated_object(object_key: str, lines: list[tuple[str, bytes]], compression: Compression) -> tuple[bytes, dict[str, Any]]:
+    """Packs records into a single NDJSON object and builds its byte offset index
+
+    Every line is compressed as its own gzip member / zstd frame. Concatenated members are still a valid
+    .gz/.zst file for regular readers, while a single record can be fetched and decompressed on its own with a byte-range GET.
+
+    Parameters
+    ----------
+    object_key : str
+        S3 key the aggregated object is written to, recorded in the index
+    lines : list[tuple[str, bytes]]
+        (message id, JSON serialized record) pairs, without a trailing new line
+    compression : Compression
+        'none', 'gzip' or 'zstd'
+
+    Returns
+    -------
+    tuple[bytes, dict[str, Any]]
+        Aggregated object body and its index
+    """
+    chunks: list[bytes] = []
+    records: dict[str, dict[str, int]] = {}
+    offset = 0
+    for message_id, line in lines:
+        chunk = _compress(line + b'\n', compression)
+        records[message_id] = {'offset': offset, 'length': len(chunk)}
+        chunks.append(chunk)
+        offset += len(chunk)
+    index = {'object_key': object_key, 'compression': compression, 'records': records}
+    return b''.join(chunks), index
+
+
+def serialize_index(index: dict[str, Any]) -> bytes:
+    return json_dumps(index, separators=(',', ':')).encode('utf-8')
+
+
+def read_aggregated_record(s3_client: Any, bucket_name: str, index: dict[str, Any], message_id: str) -> dict:
+    """Fetches a single record from an aggregated object with a byte-range GET
+
+    Raises
+    ------
+    KeyError
+        When the message id is not part of the index.
+    """
+    location = index['records'][message_id]
+    start = location['offset']
+    end = start + location['length'] - 1
+    response = s3_client.get_object(Bucket=bucket_name, Key=index['object_key'], Range=f'bytes={start}-{end}')
+    return json_loads(_decompress(response['Body'].read(), index['compression']))
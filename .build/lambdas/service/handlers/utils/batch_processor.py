@@ -0,0 +1,263 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Mapping
+
+from aws_lambda_powertools.utilities.batch import AsyncBatchProcessor, BatchProcessor, EventType
+from aws_lambda_powertools.utilities.batch.exceptions import SQSFifoMessageGroupCircuitBreakerError
+from aws_lambda_powertools.utilities.batch.types import BatchTypeModels
+
+from service.handlers.utils.async_runtime import async_runtime
+from service.models.exceptions import DeadlineExceededException, RecordRejectedException
+
+DEFAULT_DEADLINE_MARGIN_MS = 1000  # time kept aside to build the partial batch response before Lambda times out
+
+_worker = threading.local()  # stop event of the batch whose record the current worker thread processes
+
+
+def raise_if_cancelled() -> None:
+    """Raises DeadlineExceededException in a record handler whose record was already reported as a batch item failure.
+
+    A worker thread still running when the batch response is built can't be interrupted. Record handlers call this
+    before writing and before recording a write, so a late record starts no write and adds no metrics, idempotency
+    or index entries, also when its thread resumes during the next warm invocation.
+    """
+    stopped = getattr(_worker, 'stopped', None)
+    if stopped is not None and stopped.is_set():
+        raise DeadlineExceededException('the batch response was built, the record was reported as failed')
+
+
+class _DeadlineResultsMixin:
+    """Success and failure bookkeeping of records that ran concurrently until the Lambda deadline"""
+
+    event_type: EventType
+    deadline_margin_ms: int
+
+    def _collect_result(self, record: dict, future: Future | asyncio.Future) -> tuple:
+        try:
+            if not future.done() or future.cancelled():
+                raise DeadlineExceededException('record processing did not finish before the lambda deadline')
+            result = future.result()
+        except Exception:
+            # report the raw record so SQS failures are collected by message id, whether the model parsed or not
+            failed_record = self._to_batch_type(record=record, event_type=self.event_type)  # type: ignore[attr-defined]
+            return self.failure_handler(record=failed_record, exception=sys.exc_info())  # type: ignore[attr-defined]
+        return self.success_handler(record=record, result=result)  # type: ignore[attr-defined]
+
+    def _get_time_budget_seconds(self) -> float | None:
+        lambda_context = getattr(self, 'lambda_context', None)
+        if lambda_context is None:
+            return None
+        return max(lambda_context.get_remaining_time_in_millis() - self.deadline_margin_ms, 0) / 1000
+
+
+class ConcurrentBatchProcessor(_DeadlineResultsMixin, BatchProcessor):
+    """Batch processor that runs the record handler on a thread pool with a bounded number of in-flight records.
+
+    Record handler calls run on worker threads, but success and failure bookkeeping happens only on the calling thread.
+    Records that did not finish in time are reported as batch item failures and will be retried by SQS. Records not
+    started yet are cancelled. Running ones can't be interrupted: their worker is signalled to stop, see raise_if_cancelled,
+    so the S3 call in progress completes but nothing is written or recorded after it.
+
+    Args:
+        event_type (EventType): Batch event type, i.e EventType.SQS.
+        model (BatchTypeModels): Pydantic model used to parse every record.
+        max_workers (int): Maximum number of records processed concurrently. 1 processes records one at a time, still bound by the deadline.
+        deadline_margin_ms (int): Milliseconds kept aside before the Lambda timeout for reporting the batch response.
+    """
+
+    def __init__(
+        self,
+        event_type: EventType,
+        model: BatchTypeModels = None,
+        max_workers: int = 1,
+        deadline_margin_ms: int = DEFAULT_DEADLINE_MARGIN_MS,
+    ):
+        super().__init__(event_type=event_type, model=model)
+        self.max_workers = max_workers
+        self.deadline_margin_ms = deadline_margin_ms
+
+    def process(self) -> list[tuple]:
+        time_budget = self._get_time_budget_seconds()
+        if time_budget is None and (self.max_workers <= 1 or len(self.records) <= 1):
+            return super().process()
+
+        stopped = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.records)))
+        futures = [executor.submit(self._call_handler, record, stopped) for record in self.records]
+        wait(futures, timeout=time_budget)
+        # don't block on records that missed the deadline, they are reported as failures below and their workers stop
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        return [self._collect_result(record, future) for record, future in zip(self.records, futures, strict=True)]
+
+    def _call_handler(self, record: dict, stopped: threading.Event) -> Any:
+        # runs on a worker thread, must not mutate processor state
+        _worker.stopped = stopped
+        try:
+            data = self._to_batch_type(record=record, event_type=self.event_type, model=self.model)
+            if self._handler_accepts_lambda_context:
+                return self.handler(record=data, lambda_context=self.lambda_context)
+            return self.handler(record=data)
+        finally:
+            _worker.stopped = None
+
+
+class MessageGroupBatchProcessor(ConcurrentBatchProcessor):
+    """Batch processor of FIFO queues that processes message groups concurrently, keeping the order within a group.
+
+    Records are grouped by their MessageGroupId in batch order. Up to max_workers groups run at once on a thread pool,
+    the records of a group one after another, so throughput scales with the number of distinct groups in the batch.
+    The first failed record of a group stops the group: the records after it are reported as failures without being
+    processed and SQS delivers them again in order. Other groups are not affected. Records without a MessageGroupId,
+    i.e of a standard queue, are a group of their own. Like ConcurrentBatchProcessor, records that did not finish
+    before the Lambda deadline are reported as batch item failures, no record of a group is started after it and the
+    records in progress stop before writing or recording their write.
+
+    Args:
+        event_type (EventType): Batch event type, i.e EventType.SQS.
+        model (BatchTypeModels): Pydantic model used to parse every record.
+        max_workers (int): Maximum number of message groups processed concurrently.
+        deadline_margin_ms (int): Milliseconds kept aside before the Lambda timeout for reporting the batch response.
+    """
+
+    def process(self) -> list[tuple]:
+        groups: dict[str, list[int]] = {}
+        for index, record in enumerate(self.records):
+            group_id = record.get('attributes', {}).get('MessageGroupId') or record['messageId']
+            groups.setdefault(group_id, []).append(index)
+
+        # outcomes are set by the group's worker thread, records that were never started stay pending
+        outcomes: list[Future] = [Future() for _ in self.records]
+        stopped = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(groups)), 1))
+        tasks = [
+            executor.submit(self._process_group, [(self.records[index], outcomes[index]) for index in group], stopped) for group in groups.values()
+        ]
+        wait(tasks, timeout=self._get_time_budget_seconds())
+        stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        return [self._collect_result(record, outcome) for record, outcome in zip(self.records, outcomes, strict=True)]
+
+    def _process_group(self, group: list[tuple[dict, Future]], stopped: threading.Event) -> None:
+        # runs on a worker thread, must not mutate processor state
+        for position, (record, outcome) in enumerate(group):
+            if stopped.is_set():
+                return  # past the deadline, the remaining records are reported as not finished in time
+            try:
+                outcome.set_result(self._call_handler(record, stopped))
+            except Exception as exc:
+                outcome.set_exception(exc)
+                for _, skipped in group[position + 1 :]:
+                    skipped.set_exception(SQSFifoMessageGroupCircuitBreakerError('A previous record from this message group failed processing'))
+                return
+
+
+class ConcurrentAsyncBatchProcessor(_DeadlineResultsMixin, AsyncBatchProcessor):
+    """Async batch processor that awaits the record handler of up to max_concurrency records at once.
+
+    Records run as tasks of the event loop kept by async_runtime, so the async clients built by earlier invocations
+    and their connection pools are reused. Results are reported like ConcurrentBatchProcessor: records that did not
+    finish before the Lambda deadline are cancelled and reported as batch item failures.
+
+    Args:
+        event_type (EventType): Batch event type, i.e EventType.SQS.
+        model (BatchTypeModels): Pydantic model used to parse every record.
+        max_concurrency (int): Maximum number of records processed concurrently.
+        deadline_margin_ms (int): Milliseconds kept aside before the Lambda timeout for reporting the batch response.
+    """
+
+    def __init__(
+        self,
+        event_type: EventType,
+        model: BatchTypeModels = None,
+        max_concurrency: int = 1,
+        deadline_margin_ms: int = DEFAULT_DEADLINE_MARGIN_MS,
+    ):
+        super().__init__(event_type=event_type, model=model)
+        self.max_concurrency = max_concurrency
+        self.deadline_margin_ms = deadline_margin_ms
+
+    def async_process(self) -> list[tuple]:
+        return async_runtime.run(self._process_records())
+
+    async def _process_records(self) -> list[tuple]:
+        if not self.records:
+            return []
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def call_handler(record: dict) -> Any:
+            async with semaphore:
+                data = self._to_batch_type(record=record, event_type=self.event_type, model=self.model)
+                if self._handler_accepts_lambda_context:
+                    return await self.handler(record=data, lambda_context=self.lambda_context)
+                return await self.handler(record=data)
+
+        tasks = [asyncio.ensure_future(call_handler(record)) for record in self.records]
+        _, pending = await asyncio.wait(tasks, timeout=self._get_time_budget_seconds())
+        for task in pending:
+            task.cancel()
+        # let the cancelled records release their connections before the loop is suspended with the execution environment
+        await asyncio.gather(*pending, return_exceptions=True)
+        return [self._collect_result(record, task) for record, task in zip(self.records, tasks, strict=True)]
+
+
+class AggregatingBatchProcessor(BatchProcessor):
+    """Batch processor that hands all successfully processed records to a single flush call.
+
+    The record handler returns the data to aggregate instead of writing it. Once every record was processed,
+    the successful (message id, result) pairs are passed to flush_handler. If the flush fails,
+    every record that was part of it is reported as a batch item failure so SQS retries it. A flush handler
+    whose destination accepts or rejects every record on its own, i.e a delivery stream, returns the message ids
+    it couldn't write with the reason, only those records are reported as failures.
+
+    Args:
+        event_type (EventType): Batch event type, i.e EventType.SQS.
+        flush_handler (Callable[[list[tuple[str, Any]]], Mapping[str, str] | None]): Writes the aggregated results of the batch,
+            returns the rejected message ids and their reason, if any.
+        model (BatchTypeModels): Pydantic model used to parse every record.
+    """
+
+    def __init__(
+        self,
+        event_type: EventType,
+        flush_handler: Callable[[list[tuple[str, Any]]], Mapping[str, str] | None],
+        model: BatchTypeModels = None,
+    ):
+        super().__init__(event_type=event_type, model=model)
+        self.flush_handler = flush_handler
+
+    def process(self) -> list[tuple]:
+        results = super().process()
+        successful = [(record, result) for status, result, record in results if status == 'success']
+        if not successful:
+            return results
+        try:
+            rejected = self.flush_handler([(record['messageId'], result) for record, result in successful])
+        except Exception:
+            return self._fail_flushed_records(results, sys.exc_info())
+        if rejected:
+            return self._fail_rejected_records(results, rejected)
+        return results
+
+    def _fail_flushed_records(self, results: list[tuple], exception: Any) -> list[tuple]:
+        self.success_messages.clear()
+        return [
+            self.failure_handler(record=self._to_batch_type(record=record, event_type=self.event_type), exception=exception)
+            if status == 'success'
+            else (status, result, record)
+            for status, result, record in results
+        ]
+
+    def _fail_rejected_records(self, results: list[tuple], rejected: Mapping[str, str]) -> list[tuple]:
+        self.success_messages[:] = [record for record in self.success_messages if record['messageId'] not in rejected]
+        failed_results = []
+        for status, result, record in results:
+            if status == 'success' and record['messageId'] in rejected:
+                exception = RecordRejectedException(rejected[record['messageId']])
+                failed_record = self._to_batch_type(record=record, event_type=self.event_type)
+                failed_results.append(self.failure_handler(record=failed_record, exception=(RecordRejectedException, exception, None)))
+            else:
+                failed_results.append((status, result, record))
+        return failed_results
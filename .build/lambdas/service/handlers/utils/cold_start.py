@@ -0,0 +1,74 @@
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.runtime_context import runtime_context
+
+# never written anywhere, only used to run the parsing and serialization code paths once
+_WARM_UP_RECORD = {
+    'messageId': '00000000-0000-0000-0000-000000000000',
+    'receiptHandle': 'warm-up',
+    'body': '{"item": {"warm": "up"}}',
+    'attributes': {
+        'ApproximateReceiveCount': '1',
+        'SentTimestamp': '1545082649183',
+        'SenderId': 'warm-up',
+        'ApproximateFirstReceiveTimestamp': '1545082649185',
+    },
+    'messageAttributes': {},
+    'md5OfBody': 'e4e68fb7bd0e697a0ae8f1bb342846b3',
+    'eventSource': 'aws:sqs',
+    'eventSourceARN': 'arn:aws:sqs:us-east-1:123456789012:warm-up',
+    'awsRegion': 'us-east-1',
+}
+
+
+def warm_up() -> None:
+    """Moves one-off costs from the first invocation to the init phase.
+
+    Imports the batch processing modules (Powertools batch, parser, tracer and metrics, the record models and the handler
+    logic), builds the shared S3 client (loads the S3 service model and endpoint rules), and the Firehose client of the
+    'delivery_stream' sink, and runs the record model validation and serialization once, so the first record of the
+    first invocation doesn't pay for them. No network calls are made.
+    """
+    import service.handlers.process_sqs_batch  # noqa: F401
+    from service.handlers.logic import serialize_record
+    from service.handlers.models.sqs_item import OrderSqsRecord, RawSqsRecord
+
+    _build_clients()
+    serialize_record(OrderSqsRecord.model_validate(_WARM_UP_RECORD))
+    serialize_record(RawSqsRecord.model_validate(_WARM_UP_RECORD))  # 'fast' PARSING_MODE
+
+
+def refresh_after_restore() -> None:
+    from service.handlers.utils.async_runtime import async_runtime
+
+    # a SnapStart snapshot may hold connections that are no longer valid, build a fresh client on restore
+    runtime_context.refresh()
+    async_runtime.refresh()
+    _build_clients()
+    runtime_context.logger().debug('refreshed clients after snapshot restore')
+
+
+def _build_clients() -> None:
+    from service.handlers.logic import get_firehose_client, get_s3_client
+
+    # the S3 client also reads S3 offloaded payloads of the 'delivery_stream' sink
+    get_s3_client()
+    if runtime_context.env_vars(MyHandlerEnvVars).SINK_TYPE == 'delivery_stream':
+        get_firehose_client()
+
+
+def init_execution_environment() -> None:
+    """Runs once per execution environment, during the init phase.
+
+    Pre-warming is enabled by default and disabled by setting COLD_START_PREWARM to 'false', the init phase then imports
+    the handler's entry point only and everything else is imported by the first invocation.
+    When running with Lambda SnapStart, the warm state is part of the snapshot and clients are refreshed after restore.
+    """
+    if not runtime_context.env_vars(MyHandlerEnvVars).COLD_START_PREWARM:
+        return
+    warm_up()
+    try:
+        # provided by the Lambda Python runtime when SnapStart is enabled
+        from snapshot_restore_py import register_after_restore
+    except ImportError:
+        return
+    register_after_restore(refresh_after_restore)
@@ -0,0 +1,137 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import md5
+from typing import TYPE_CHECKING, Any
+
+from aws_lambda_env_modeler import get_environment_variables
+from botocore.exceptions import ClientError
+
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.observability import logger
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.client import DynamoDBClient
+
+
+def get_content_hash(body: bytes) -> str:
+    # MD5 hex digest, equals the ETag S3 returns for single part uploads to SSE-S3 encrypted buckets
+    return md5(body, usedforsecurity=False).hexdigest()
+
+
+class IdempotencyStore(ABC):
+    """Remembers the content hash of every object written, so rewriting an unchanged object can be skipped.
+
+    Skipping is safe only because writes are deterministic: an object key always holds the same message.
+    """
+
+    @abstractmethod
+    def get(self, object_key: str) -> str | None:
+        """Returns the content hash last written to the object key, None when unknown or expired"""
+        ...  # pragma: no cover
+
+    @abstractmethod
+    def save(self, object_key: str, content_hash: str) -> None: ...  # pragma: no cover
+
+    def is_duplicate(self, object_key: str, content_hash: str) -> bool:
+        return self.get(object_key) == content_hash
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """LRU store local to the execution environment, catches redeliveries served by the same warm container.
+
+    Args:
+        ttl_seconds (int): Seconds an entry is trusted for.
+        max_entries (int): Least recently used entries are evicted above this size.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 10_000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()  # records may be processed concurrently
+
+    def get(self, object_key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(object_key)
+            if entry is None:
+                return None
+            content_hash, expiration = entry
+            if expiration <= time.monotonic():
+                del self._entries[object_key]
+                return None
+            self._entries.move_to_end(object_key)
+            return content_hash
+
+    def save(self, object_key: str, content_hash: str) -> None:
+        with self._lock:
+            self._entries[object_key] = (content_hash, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(object_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DynamoDBIdempotencyStore(IdempotencyStore):
+    """DynamoDB backed store shared by all execution environments, fronted by an in-memory LRU.
+
+    The table has a string partition key 'pk' and DynamoDB TTL enabled on the numeric 'expiration' attribute.
+    Expired items are ignored on read, as DynamoDB deletes them with a delay. The store is an optimization,
+    DynamoDB errors are logged and the object is written as if it was never seen.
+
+    Args:
+        table_name (str): Table name.
+        ttl_seconds (int): Seconds an entry is trusted for.
+        client (DynamoDBClient | None): boto3 DynamoDB client, created when not provided.
+    """
+
+    def __init__(self, table_name: str, ttl_seconds: int, client: 'DynamoDBClient | None' = None) -> None:
+        if client is None:
+            from boto3 import client as boto3_client
+
+            client = boto3_client('dynamodb')
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self.client = client
+        self.local_cache = InMemoryIdempotencyStore(ttl_seconds=ttl_seconds)
+
+    def get(self, object_key: str) -> str | None:
+        content_hash = self.local_cache.get(object_key)
+        if content_hash is not None:
+            return content_hash
+        try:
+            item: dict[str, Any] = self.client.get_item(TableName=self.table_name, Key={'pk': {'S': object_key}}).get('Item', {})
+        except ClientError as exc:
+            logger.warning('unable to read idempotency record', extra={'object_key': object_key, 'error': str(exc)})
+            return None
+        if not item or int(item['expiration']['N']) <= int(time.time()):
+            return None
+        content_hash = item['content_hash']['S']
+        self.local_cache.save(object_key, content_hash)
+        return content_hash
+
+    def save(self, object_key: str, content_hash: str) -> None:
+        self.local_cache.save(object_key, content_hash)
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    'pk': {'S': object_key},
+                    'content_hash': {'S': content_hash},
+                    'expiration': {'N': str(int(time.time()) + self.ttl_seconds)},
+                },
+            )
+        except ClientError as exc:
+            logger.warning('unable to save idempotency record', extra={'object_key': object_key, 'error': str(exc)})
+
+
+@lru_cache(maxsize=1)
+def get_idempotency_store() -> IdempotencyStore | None:
+    """Store selected by IDEMPOTENCY_STORE, shared by all warm invocations of the execution environment"""
+    env_vars: MyHandlerEnvVars = get_environment_variables(model=MyHandlerEnvVars)
+    if env_vars.IDEMPOTENCY_STORE == 'memory':
+        return InMemoryIdempotencyStore(ttl_seconds=env_vars.IDEMPOTENCY_TTL_SECONDS)
+    if env_vars.IDEMPOTENCY_STORE == 'dynamodb':
+        return DynamoDBIdempotencyStore(table_name=str(env_vars.IDEMPOTENCY_TABLE_NAME), ttl_seconds=env_vars.IDEMPOTENCY_TTL_SECONDS)
+    return None
@@ -0,0 +1,124 @@
+import math
+import random
+import threading
+from collections.abc import Iterator
+from itertools import repeat
+
+from aws_lambda_powertools.metrics import Metrics, MetricUnit
+
+from service.handlers.utils.observability import logger
+
+MAX_METRICS = 100  # metrics per EMF blob
+MAX_DATAPOINTS = 100  # values per metric per EMF blob
+# Powertools publishes a blob early as soon as either limit is reached, stay one below to publish a single blob
+# for the counters and sampled latencies
+_METRICS_LIMIT = MAX_METRICS - 1
+_RESERVOIR_SIZE = MAX_DATAPOINTS - 1
+_BUCKET_GROWTH = math.log(1.02)  # histogram buckets are 2% wide, the error of a reported value
+
+
+class LatencyHistogram:
+    """Exact counts of every observation in log-linear buckets, a few hundred buckets cover 1ms to hours.
+
+    Bucket 0 holds sub-millisecond values, bucket n >= 1 the values from 1.02^(n-1) to 1.02^n milliseconds.
+    """
+
+    def __init__(self) -> None:
+        self.counts: dict[int, int] = {}
+        self.total = 0
+
+    def add(self, milliseconds: float) -> None:
+        bucket = 0 if milliseconds < 1 else int(math.log(milliseconds) / _BUCKET_GROWTH) + 1
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += 1
+
+    def values(self) -> Iterator[float]:
+        """Every observation as the midpoint of its bucket, in ascending order"""
+        for bucket, count in sorted(self.counts.items()):
+            yield from repeat(0.5 if bucket == 0 else math.exp((bucket - 0.5) * _BUCKET_GROWTH), count)
+
+
+class InvocationMetrics:
+    """Aggregates the metrics of a single invocation and flushes them as few EMF blobs as possible.
+
+    Counters are summed into one datapoint each. Latencies are sampled into a reservoir of fewer than MAX_DATAPOINTS
+    values per metric, a uniform sample of the invocation's distribution. Powertools starts a new EMF blob whenever
+    a metric reaches 100 values, aggregating keeps log ingestion flat as batches grow. Histograms count every
+    observation and publish one value per observation, rounded to its bucket. CloudWatch weighs every EMF value the same,
+    so percentiles across invocations only hold when every record contributes one value, and the tail is always
+    reported. Large batches therefore publish a further blob per 100 histogram values.
+    Safe to use from the worker threads of ConcurrentBatchProcessor.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.start(sample_rate=1.0)
+
+    def start(self, sample_rate: float) -> None:
+        """Resets the aggregates, called at the start of every invocation
+
+        Args:
+            sample_rate (float): Probability of a latency observation being considered for the reservoir.
+        """
+        with self._lock:
+            self.sample_rate = sample_rate
+            self.counters: dict[str, tuple[MetricUnit, float]] = {}
+            self.latencies: dict[str, list[float]] = {}
+            self.histograms: dict[str, LatencyHistogram] = {}
+            self._observations: dict[str, int] = {}
+
+    def add(self, name: str, unit: MetricUnit, value: float) -> None:
+        with self._lock:
+            if name not in self.counters and not self._has_room():
+                logger.warning('dropping metric, EMF metric limit reached', extra={'metric': name})
+                return
+            self.counters[name] = (unit, self.counters.get(name, (unit, 0))[1] + value)
+
+    def observe_latency(self, name: str, milliseconds: float) -> None:
+        with self._lock:
+            if self.sample_rate < 1.0 and self._random.random() >= self.sample_rate:
+                return
+            if name not in self.latencies:
+                if not self._has_room():
+                    logger.warning('dropping metric, EMF metric limit reached', extra={'metric': name})
+                    return
+                self.latencies[name] = []
+            seen = self._observations[name] = self._observations.get(name, 0) + 1
+            reservoir = self.latencies[name]
+            if len(reservoir) < _RESERVOIR_SIZE:
+                reservoir.append(milliseconds)
+            else:  # reservoir sampling, every observation ends up in the reservoir with the same probability
+                slot = self._random.randrange(seen)
+                if slot < _RESERVOIR_SIZE:
+                    reservoir[slot] = milliseconds
+
+    def observe_histogram(self, name: str, milliseconds: float) -> None:
+        """Counts a latency, regardless of the sample rate"""
+        with self._lock:
+            if name not in self.histograms:
+                if not self._has_room():
+                    logger.warning('dropping metric, EMF metric limit reached', extra={'metric': name})
+                    return
+                self.histograms[name] = LatencyHistogram()
+            self.histograms[name].add(milliseconds)
+
+    def flush(self, metrics: Metrics) -> None:
+        """Adds the aggregates to the Powertools metrics, published by log_metrics when the invocation ends"""
+        with self._lock:
+            for name, (unit, value) in self.counters.items():
+                metrics.add_metric(name=name, unit=unit, value=value)
+            for name, values in self.latencies.items():
+                for value in values:
+                    metrics.add_metric(name=name, unit=MetricUnit.Milliseconds, value=round(value, 3))
+            for name, histogram in self.histograms.items():
+                for value in histogram.values():
+                    metrics.add_metric(name=name, unit=MetricUnit.Milliseconds, value=round(value, 3))
+            self.counters, self.latencies, self.histograms, self._observations = {}, {}, {}, {}
+
+    def _has_room(self) -> bool:
+        return len(self.counters) + len(self.latencies) + len(self.histograms) < _METRICS_LIMIT
+
+
+# shared by all records of an invocation, see lambda_handler
+invocation_metrics = InvocationMetrics()
@@ -0,0 +1,18 @@
+class InternalServerException(Exception):
+    pass
+
+
+class DynamicConfigurationException(Exception):
+    pass
+
+
+class DeadlineExceededException(Exception):
+    pass
+
+
+class CircuitOpenException(Exception):
+    pass
+
+
+class RecordRejectedException(Exception):
+    pass
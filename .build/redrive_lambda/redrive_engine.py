@@ -0,0 +1,167 @@
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Literal
+
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.metrics import Metrics, MetricUnit
+
+MAX_MOVE_RATE = 500  # MaxNumberOfMessagesPerSecond upper limit
+PAUSED_TAG = 'redrive-paused'  # set on the DLQ while a redrive is paused by backpressure
+THROUGHPUT_WINDOW = timedelta(minutes=5)
+
+Action = Literal['start', 'supervise']
+
+
+def queue_url_from_arn(arn: str) -> str:
+    _, _, _, region, account, name = arn.split(':')
+    return f'https://sqs.{region}.amazonaws.com/{account}/{name}'
+
+
+@dataclass(frozen=True)
+class RedriveSettings:
+    """
+    Args:
+        consumer_capacity (int): Messages per second the main queue consumers are sized for.
+        capacity_share (float): Share of the spare consumer capacity a redrive may use.
+        max_queue_depth (int): Main queue backlog above which a redrive is paused, resumed below half of it.
+    """
+
+    consumer_capacity: int
+    capacity_share: float
+    max_queue_depth: int
+
+
+@dataclass(frozen=True)
+class Observation:
+    dlq_depth: int
+    main_queue_depth: int
+    main_queue_in_flight: int
+    consumer_throughput: float  # messages deleted from the main queue per second
+    arrival_rate: float  # messages sent to the main queue per second
+    task: dict[str, Any] | None  # latest message move task of the DLQ
+    paused: bool
+
+
+class RedriveEngine:
+    """Moves messages from the DLQ back to the main queue at a rate the consumers can absorb.
+
+    Every invocation is a single control step: observe both queues, the consumer throughput and the latest message
+    move task, then start, pause (cancel) or resume a move task. The move rate is a share of the consumers' spare
+    capacity, their sized capacity minus the current load, so a large DLQ doesn't flood the main queue, spike
+    concurrency and turn S3 throttling into new DLQ messages. A task paused by backpressure is marked with a DLQ tag
+    and resumed by a later step once the main queue backlog drops below half the threshold.
+    """
+
+    def __init__(
+        self, sqs_client: Any, cloudwatch_client: Any, dlq_arn: str, sqs_arn: str, settings: RedriveSettings, logger: Logger, metrics: Metrics
+    ) -> None:
+        self.sqs = sqs_client
+        self.cloudwatch = cloudwatch_client
+        self.dlq_arn = dlq_arn
+        self.sqs_arn = sqs_arn
+        self.settings = settings
+        self.logger = logger
+        self.metrics = metrics
+
+    def step(self, action: Action) -> str:
+        """Runs a single control step, returns the decision taken"""
+        observation = self.observe()
+        decision = self._decide(action, observation)
+        self.logger.info('redrive step', extra={'action': action, 'decision': decision, 'observation': observation.__dict__})
+        self._emit_metrics(observation, decision)
+        return decision
+
+    def observe(self) -> Observation:
+        dlq = self._get_attributes(self.dlq_arn)
+        main = self._get_attributes(self.sqs_arn)
+        tasks = self.sqs.list_message_move_tasks(SourceArn=self.dlq_arn, MaxResults=1)['Results']
+        tags = self.sqs.list_queue_tags(QueueUrl=queue_url_from_arn(self.dlq_arn)).get('Tags', {})
+        return Observation(
+            dlq_depth=int(dlq['ApproximateNumberOfMessages']),
+            main_queue_depth=int(main['ApproximateNumberOfMessages']),
+            main_queue_in_flight=int(main['ApproximateNumberOfMessagesNotVisible']),
+            consumer_throughput=self._get_rate('NumberOfMessagesDeleted'),
+            arrival_rate=self._get_rate('NumberOfMessagesSent'),
+            task=tasks[0] if tasks else None,
+            paused=PAUSED_TAG in tags,
+        )
+
+    def move_rate(self, observation: Observation) -> int:
+        load = max(observation.consumer_throughput, observation.arrival_rate)
+        spare = max(self.settings.consumer_capacity - load, 0)
+        return max(1, min(MAX_MOVE_RATE, math.floor(spare * self.settings.capacity_share)))
+
+    def _decide(self, action: Action, observation: Observation) -> str:
+        task = observation.task
+        if task is not None and task['Status'] in ('RUNNING', 'CANCELLING'):
+            return self._supervise_task(task, observation)
+        if task is not None and task['Status'] == 'FAILED':
+            self.logger.warning('last redrive failed', extra={'reason': task.get('FailureReason')})
+        if observation.dlq_depth == 0:
+            if observation.paused:
+                self._set_paused(False)
+            return 'idle'
+        if action == 'supervise' and not observation.paused:
+            return 'idle'  # new redrives start on the redrive schedule only
+
+        backlog = observation.main_queue_depth
+        if backlog > self.settings.max_queue_depth or (observation.paused and backlog > self.settings.max_queue_depth // 2):
+            if not observation.paused:
+                self._set_paused(True)
+            return 'waiting'
+        rate = self.move_rate(observation)
+        self.sqs.start_message_move_task(SourceArn=self.dlq_arn, DestinationArn=self.sqs_arn, MaxNumberOfMessagesPerSecond=rate)
+        if observation.paused:
+            self._set_paused(False)
+        self.metrics.add_metric(name='RedriveRate', unit=MetricUnit.CountPerSecond, value=rate)
+        return 'resumed' if observation.paused else 'started'
+
+    def _supervise_task(self, task: dict[str, Any], observation: Observation) -> str:
+        if task['Status'] == 'CANCELLING':
+            return 'cancelling'  # a new task can only start once the current one is cancelled
+        if observation.main_queue_depth > self.settings.max_queue_depth:
+            self.sqs.cancel_message_move_task(TaskHandle=task['TaskHandle'])
+            self._set_paused(True)
+            return 'paused'
+        return 'running'
+
+    def _emit_metrics(self, observation: Observation, decision: str) -> None:
+        self.metrics.add_metric(name='DlqDepth', unit=MetricUnit.Count, value=observation.dlq_depth)
+        self.metrics.add_metric(name='MainQueueDepth', unit=MetricUnit.Count, value=observation.main_queue_depth)
+        self.metrics.add_metric(name='RedrivePaused', unit=MetricUnit.Count, value=int(decision in ('paused', 'waiting')))
+        if observation.task is not None and observation.task['Status'] == 'RUNNING':
+            self.metrics.add_metric(
+                name='RedriveMessagesMoved', unit=MetricUnit.Count, value=observation.task.get('ApproximateNumberOfMessagesMoved', 0)
+            )
+            started = datetime.fromtimestamp(observation.task['StartedTimestamp'] / 1000, tz=timezone.utc)
+            elapsed = max((datetime.now(timezone.utc) - started).total_seconds(), 1)
+            throughput = observation.task.get('ApproximateNumberOfMessagesMoved', 0) / elapsed
+            self.metrics.add_metric(name='RedriveThroughput', unit=MetricUnit.CountPerSecond, value=round(throughput, 3))
+
+    def _get_attributes(self, queue_arn: str) -> dict[str, str]:
+        return self.sqs.get_queue_attributes(
+            QueueUrl=queue_url_from_arn(queue_arn),
+            AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible'],
+        )['Attributes']
+
+    def _get_rate(self, metric_name: str) -> float:
+        """Per second rate of an SQS metric of the main queue over the last THROUGHPUT_WINDOW"""
+        now = datetime.now(timezone.utc)
+        datapoints = self.cloudwatch.get_metric_statistics(
+            Namespace='AWS/SQS',
+            MetricName=metric_name,
+            Dimensions=[{'Name': 'QueueName', 'Value': self.sqs_arn.split(':')[-1]}],
+            StartTime=now - THROUGHPUT_WINDOW,
+            EndTime=now,
+            Period=int(THROUGHPUT_WINDOW.total_seconds()),
+            Statistics=['Sum'],
+        )['Datapoints']
+        return sum(datapoint['Sum'] for datapoint in datapoints) / THROUGHPUT_WINDOW.total_seconds()
+
+    def _set_paused(self, paused: bool) -> None:
+        queue_url = queue_url_from_arn(self.dlq_arn)
+        if paused:
+            self.sqs.tag_queue(QueueUrl=queue_url, Tags={PAUSED_TAG: datetime.now(timezone.utc).isoformat()})
+        else:
+            self.sqs.untag_queue(QueueUrl=queue_url, TagKeys=[PAUSED_TAG])
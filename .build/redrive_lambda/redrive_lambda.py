@@ -0,0 +1,103 @@
+from dataclasses import asdict
+from typing import Annotated, Any, Dict, Literal
+
+from aws_lambda_env_modeler import init_environment_variables
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.metrics import Metrics, MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from botocore.exceptions import ClientError
+from pydantic import BaseModel, Field, model_validator
+from redrive_engine import RedriveEngine, RedriveSettings, queue_url_from_arn
+from selective_redrive import S3QuarantineStore, SelectiveRedrive, TriageSettings
+
+# shipped next to this module by 'make build', shared with the SQS handler
+from service.handlers.utils.runtime_context import runtime_context
+
+# namespace is set by environment variable "POWERTOOLS_METRICS_NAMESPACE"
+metrics = Metrics()
+
+
+class DlqEnvVars(BaseModel):
+    DLQ_ARN: str
+    SQS_ARN: str
+    POWERTOOLS_SERVICE_NAME: str
+    REDRIVE_CONSUMER_CAPACITY: Annotated[int, Field(ge=1, description='Messages per second the main queue consumers are sized for')] = 100
+    REDRIVE_CAPACITY_SHARE: Annotated[float, Field(gt=0, le=1, description='Share of the spare consumer capacity used by a redrive')] = 0.5
+    REDRIVE_MAX_QUEUE_DEPTH: Annotated[int, Field(ge=1, description='Main queue backlog that pauses a redrive')] = 1000
+    REDRIVE_MODE: Annotated[
+        Literal['move', 'triage'], Field(description="'move' moves the whole DLQ with a message move task, 'triage' redrives retryable messages only")
+    ] = 'move'
+    REDRIVE_WORKERS: Annotated[int, Field(ge=1, le=32, description='Concurrent DLQ receive loops of a triage')] = 4
+    REDRIVE_MAX_DELIVERIES: Annotated[int, Field(ge=1, description='Deliveries over all redrive cycles after which a message is quarantined')] = 10
+    QUARANTINE_BUCKET_NAME: Annotated[str | None, Field(min_length=1, description='Bucket keeping quarantined messages')] = None
+
+    @model_validator(mode='after')
+    def check_quarantine_bucket(self):
+        # without a quarantine store poison messages stay in the DLQ and every scheduled triage receives them again
+        if self.REDRIVE_MODE == 'triage' and not self.QUARANTINE_BUCKET_NAME:
+            raise ValueError("QUARANTINE_BUCKET_NAME is required by the 'triage' redrive mode")
+        return self
+
+
+@init_environment_variables(model=DlqEnvVars)
+@metrics.log_metrics
+def redrive_handler(event: Dict[str, Any], context: LambdaContext) -> Dict[str, Any] | None:
+    # the logger, clients and validated environment variables are reused by warm invocations
+    logger = runtime_context.logger()
+    logger.set_correlation_id(context.aws_request_id)
+    env_vars = runtime_context.env_vars(DlqEnvVars)
+    logger.debug('environment variables', extra=env_vars.model_dump())
+
+    engine = RedriveEngine(
+        sqs_client=runtime_context.client('sqs'),
+        cloudwatch_client=runtime_context.client('cloudwatch'),
+        dlq_arn=env_vars.DLQ_ARN,
+        sqs_arn=env_vars.SQS_ARN,
+        settings=RedriveSettings(
+            consumer_capacity=env_vars.REDRIVE_CONSUMER_CAPACITY,
+            capacity_share=env_vars.REDRIVE_CAPACITY_SHARE,
+            max_queue_depth=env_vars.REDRIVE_MAX_QUEUE_DEPTH,
+        ),
+        logger=logger,
+        metrics=metrics,
+    )
+    # the daily redrive schedule starts a redrive, the supervision schedule pauses and resumes it.
+    # a triage runs on the daily schedule in 'triage' mode, or on demand with {"action": "triage", "dry_run": true}
+    action = event.get('action')
+    try:
+        if action == 'triage' or (action != 'supervise' and env_vars.REDRIVE_MODE == 'triage'):
+            return _triage(engine, env_vars, context, logger, dry_run=bool(event.get('dry_run', False)))
+        engine.step('supervise' if action == 'supervise' else 'start')
+        logger.info('finished handling dlq batch event')
+    except ClientError as exc:
+        logger.exception('unable to redrive dlq batch to sqs', extra={'error': str(exc)})
+    return None
+
+
+def _triage(engine: RedriveEngine, env_vars: DlqEnvVars, context: LambdaContext, logger: Logger, dry_run: bool) -> Dict[str, Any] | None:
+    observation = engine.observe()
+    if not dry_run and observation.main_queue_depth > env_vars.REDRIVE_MAX_QUEUE_DEPTH:
+        logger.info('main queue backlog too large, triage skipped', extra={'main_queue_depth': observation.main_queue_depth})
+        return None
+
+    quarantine_store = None
+    if env_vars.QUARANTINE_BUCKET_NAME:
+        quarantine_store = S3QuarantineStore(bucket_name=env_vars.QUARANTINE_BUCKET_NAME, client=runtime_context.client('s3'))
+    triage = SelectiveRedrive(
+        sqs_client=engine.sqs,
+        dlq_url=queue_url_from_arn(env_vars.DLQ_ARN),
+        queue_url=queue_url_from_arn(env_vars.SQS_ARN),
+        quarantine_store=quarantine_store,
+        settings=TriageSettings(
+            workers=env_vars.REDRIVE_WORKERS, max_deliveries=env_vars.REDRIVE_MAX_DELIVERIES, max_rate=engine.move_rate(observation)
+        ),
+        logger=logger,
+    )
+    # stop receiving early enough to delete and release the received messages
+    report = triage.run(budget_seconds=max(context.get_remaining_time_in_millis() / 1000 - 10, 1), dry_run=dry_run)
+    logger.info('dlq triage report', extra=asdict(report))
+    if not dry_run:
+        metrics.add_metric(name='RedrivenMessages', unit=MetricUnit.Count, value=report.redriven)
+        metrics.add_metric(name='QuarantinedMessages', unit=MetricUnit.Count, value=report.quarantined)
+        metrics.add_metric(name='TriageFailures', unit=MetricUnit.Count, value=report.failed)
+    return asdict(report)
@@ -0,0 +1,353 @@
+import json
+import math
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
+
+from aws_lambda_powertools.logging import Logger
+from botocore.exceptions import ClientError
+from pydantic import ValidationError
+
+# shipped next to this module by 'make build', the bodies the SQS handler accepts
+from service.handlers.models.sqs_item import ORDER_BODY_ADAPTER
+
+DELIVERIES_ATTRIBUTE = 'RedriveDeliveries'  # deliveries of all previous cycles, carried over by every re-send
+DRY_RUNS_TAG = 'redrive-dry-runs'  # start times of dry runs in epoch seconds, set on the DLQ, their receives aren't deliveries
+MAX_TAG_VALUE_LENGTH = 256
+# the maximum SQS retention period, messages received by older dry runs have left the DLQ
+DRY_RUN_HISTORY = timedelta(days=14)
+MAX_BATCH_ENTRIES = 10  # SendMessageBatch, DeleteMessageBatch and ChangeMessageVisibilityBatch limit
+MAX_BATCH_BYTES = 262_144  # SendMessageBatch payload limit, bodies and message attributes of all entries
+SAMPLES_PER_REASON = 5
+
+RETRYABLE = 'retryable'
+MALFORMED_BODY = 'malformed_body'
+MAX_DELIVERIES_EXCEEDED = 'max_deliveries_exceeded'
+
+
+def classify(message: dict[str, Any], max_deliveries: int, dry_runs: Sequence[int] = ()) -> tuple[str, int]:
+    """Failure reason of a DLQ message and its deliveries over all redrive cycles.
+
+    A body the handler rejects fails on every delivery. So does a message delivered max_deliveries times, whatever the
+    cause, i.e a payload whose write always throttles. ApproximateReceiveCount is kept when SQS moves a message to the
+    DLQ, a re-sent message is a new message, so earlier cycles are carried in the RedriveDeliveries attribute.
+    Every dry run (start times in epoch seconds) started after the message was sent may have received it, those receives
+    are subtracted. A message may be counted short, so quarantined a cycle later, but never quarantined early.
+    """
+    attributes = message['Attributes']
+    sent_at = int(attributes.get('SentTimestamp', 0)) / 1000
+    dry_run_receives = sum(1 for started_at in dry_runs if started_at >= sent_at)
+    previous = message.get('MessageAttributes', {}).get(DELIVERIES_ATTRIBUTE, {}).get('StringValue', '0')
+    deliveries = int(previous) + max(int(attributes['ApproximateReceiveCount']) - dry_run_receives, 1)
+    if not _is_valid_body(message['Body']):
+        return MALFORMED_BODY, deliveries
+    if deliveries >= max_deliveries:
+        return MAX_DELIVERIES_EXCEEDED, deliveries
+    return RETRYABLE, deliveries
+
+
+def _is_valid_body(body: str) -> bool:
+    # an object with an 'item' object or an S3 offloaded payload pointer, validated as the handler's OrderSqsRecord does
+    try:
+        ORDER_BODY_ADAPTER.validate_json(body)
+    except ValidationError:
+        return False
+    return True
+
+
+class QuarantineStore(ABC):
+    """Keeps poison messages out of the redrive cycle, for inspection beyond the DLQ retention period"""
+
+    @abstractmethod
+    def put(self, message: dict[str, Any], reason: str, deliveries: int) -> None: ...  # pragma: no cover
+
+
+class S3QuarantineStore(QuarantineStore):
+    """Writes every poison message as a JSON object under '<prefix><reason>/<message id>.json'.
+
+    Args:
+        bucket_name (str): Destination bucket.
+        client (Any): boto3 S3 client.
+        prefix (str): Key prefix of quarantined messages.
+    """
+
+    def __init__(self, bucket_name: str, client: Any, prefix: str = 'quarantine/') -> None:
+        self.bucket_name = bucket_name
+        self.client = client
+        self.prefix = prefix
+
+    def put(self, message: dict[str, Any], reason: str, deliveries: int) -> None:
+        document = {
+            'message_id': message['MessageId'],
+            'reason': reason,
+            'deliveries': deliveries,
+            'quarantined_at': datetime.now(timezone.utc).isoformat(),
+            'body': message['Body'],
+            'attributes': message.get('Attributes', {}),
+            'message_attributes': message.get('MessageAttributes', {}),
+        }
+        self.client.put_object(
+            Bucket=self.bucket_name,
+            Key=f'{self.prefix}{reason}/{message["MessageId"]}.json',
+            Body=json.dumps(document, default=str).encode('utf-8'),
+            ContentType='application/json',
+        )
+
+
+@dataclass
+class TriageReport:
+    """Outcome of a triage run, or with dry_run what a run would do. Messages are counted per failure reason."""
+
+    dry_run: bool
+    received: int = 0
+    redriven: int = 0
+    quarantined: int = 0
+    failed: int = 0  # re-send or quarantine failed, left in the DLQ
+    reasons: dict[str, int] = field(default_factory=dict)
+    samples: dict[str, list[str]] = field(default_factory=dict)  # message ids per reason
+
+    def count(self, message: dict[str, Any], reason: str) -> None:
+        self.received += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        samples = self.samples.setdefault(reason, [])
+        if len(samples) < SAMPLES_PER_REASON:
+            samples.append(message['MessageId'])
+
+    def merge(self, other: 'TriageReport') -> None:
+        self.received += other.received
+        self.redriven += other.redriven
+        self.quarantined += other.quarantined
+        self.failed += other.failed
+        for reason, count in other.reasons.items():
+            self.reasons[reason] = self.reasons.get(reason, 0) + count
+            self.samples[reason] = (self.samples.get(reason, []) + other.samples.get(reason, []))[:SAMPLES_PER_REASON]
+
+
+@dataclass(frozen=True)
+class TriageSettings:
+    """
+    Args:
+        workers (int): Concurrent receive loops, each receives batches of 10 messages.
+        max_deliveries (int): Deliveries over all redrive cycles after which a message is quarantined.
+        max_rate (int | None): Messages per second re-sent by all workers together, unlimited when None.
+    """
+
+    workers: int
+    max_deliveries: int
+    max_rate: int | None = None
+
+
+class SelectiveRedrive:
+    """Drains the DLQ with parallel receive loops, re-sends retryable messages in batches and quarantines poison ones.
+
+    Unlike a message move task, every message is looked at, so poison messages leave the redrive cycle instead of
+    failing every consumer invocation until the retention period expires. Received messages stay invisible for the
+    whole run, so each one is triaged once. Messages that aren't re-sent or quarantined, and all messages of a dry
+    run, are made visible again at the end of the run.
+
+    FIFO queues: messages are re-sent to their message group in the order they were received. A message group whose
+    messages are left in the DLQ stays locked for the rest of the run, so no later message of the group is redriven
+    ahead of them.
+
+    Dry runs increase the ApproximateReceiveCount of the messages they receive. Their start times are kept in the
+    DRY_RUNS_TAG of the DLQ and their receives subtracted by later runs, a dry run that can't be recorded isn't started.
+    """
+
+    def __init__(
+        self, sqs_client: Any, dlq_url: str, queue_url: str, quarantine_store: QuarantineStore | None, settings: TriageSettings, logger: Logger
+    ) -> None:
+        self.sqs = sqs_client
+        self.dlq_url = dlq_url
+        self.queue_url = queue_url
+        self.quarantine_store = quarantine_store
+        self.settings = settings
+        self.logger = logger
+
+    def run(self, budget_seconds: float, dry_run: bool = False) -> TriageReport:
+        """Triages DLQ messages until the DLQ is drained or the budget is spent"""
+        deadline = time.monotonic() + budget_seconds
+        visibility_timeout = math.ceil(budget_seconds) + 30  # longer than the run, no message is received twice
+        # earlier dry runs only, the receive of this run is a delivery in a real run too
+        dry_runs = self._dry_runs()
+        if dry_run and not self._record_dry_run(dry_runs):
+            return TriageReport(dry_run=dry_run)
+        with ThreadPoolExecutor(max_workers=self.settings.workers) as pool:
+            futures = [pool.submit(self._work, deadline, visibility_timeout, dry_run, dry_runs) for _ in range(self.settings.workers)]
+            results = [future.result() for future in futures]
+
+        report = TriageReport(dry_run=dry_run)
+        unhandled: list[dict[str, Any]] = []
+        for worker_report, worker_unhandled in results:
+            report.merge(worker_report)
+            unhandled.extend(worker_unhandled)
+        self._release(unhandled)
+        return report
+
+    def _dry_runs(self) -> list[int]:
+        tags = self.sqs.list_queue_tags(QueueUrl=self.dlq_url).get('Tags', {})
+        return [int(started_at) for started_at in tags.get(DRY_RUNS_TAG, '').split(',') if started_at]
+
+    def _record_dry_run(self, dry_runs: list[int]) -> bool:
+        # rounded up, a message sent within the same second is counted short rather than over
+        now = math.ceil(time.time())
+        recent = [started_at for started_at in dry_runs if started_at > now - DRY_RUN_HISTORY.total_seconds()]
+        value = ','.join(str(started_at) for started_at in [*recent, now])
+        if len(value) > MAX_TAG_VALUE_LENGTH:
+            self.logger.warning('too many recent dry runs, dry run not started', extra={'dry_runs': len(recent)})
+            return False
+        try:
+            self.sqs.tag_queue(QueueUrl=self.dlq_url, Tags={DRY_RUNS_TAG: value})
+        except ClientError as exc:
+            self.logger.warning('unable to record the dry run, dry run not started', extra={'error': str(exc)})
+            return False
+        return True
+
+    def _work(self, deadline: float, visibility_timeout: int, dry_run: bool, dry_runs: list[int]) -> tuple[TriageReport, list[dict[str, Any]]]:
+        report = TriageReport(dry_run=dry_run)
+        unhandled: list[dict[str, Any]] = []
+        started = time.monotonic()
+        # each worker takes an equal share of the rate
+        worker_rate = self.settings.max_rate / self.settings.workers if self.settings.max_rate else None
+        while time.monotonic() < deadline:
+            messages = self.sqs.receive_message(
+                QueueUrl=self.dlq_url,
+                MaxNumberOfMessages=MAX_BATCH_ENTRIES,
+                WaitTimeSeconds=1,  # long polling queries all SQS servers, an empty response means the DLQ is drained
+                VisibilityTimeout=visibility_timeout,
+                AttributeNames=['ApproximateReceiveCount', 'MessageGroupId', 'SentTimestamp'],
+                MessageAttributeNames=['All'],
+            ).get('Messages', [])
+            if not messages:
+                break
+            if dry_run:
+                for message in messages:
+                    report.count(message, classify(message, self.settings.max_deliveries, dry_runs)[0])
+                unhandled.extend(messages)
+                continue
+            unhandled.extend(self._triage(messages, report, dry_runs))
+            if worker_rate:
+                time.sleep(max(0.0, report.redriven / worker_rate - (time.monotonic() - started)))
+        return report, unhandled
+
+    def _triage(self, messages: list[dict[str, Any]], report: TriageReport, dry_runs: list[int]) -> list[dict[str, Any]]:
+        """Re-sends or quarantines a received batch, deletes handled messages and returns the others"""
+        retryable: list[tuple[dict[str, Any], int]] = []
+        handled: list[dict[str, Any]] = []
+        blocked: set[str] = set()  # FIFO message groups with a message left in the DLQ, their later messages are left too
+        for message in messages:
+            reason, deliveries = classify(message, self.settings.max_deliveries, dry_runs)
+            report.count(message, reason)
+            group_id = message['Attributes'].get('MessageGroupId')
+            if group_id in blocked:
+                continue
+            if reason == RETRYABLE:
+                retryable.append((message, deliveries))
+            elif self._quarantine(message, reason, deliveries):
+                report.quarantined += 1
+                handled.append(message)
+            elif group_id is not None:
+                blocked.add(group_id)
+
+        redriven = self._redrive(retryable)
+        report.redriven += len(redriven)
+        handled.extend(redriven)
+        self._delete(handled)
+        report.failed += len(messages) - len(handled)
+        handled_ids = {message['MessageId'] for message in handled}
+        return [message for message in messages if message['MessageId'] not in handled_ids]
+
+    def _redrive(self, retryable: list[tuple[dict[str, Any], int]]) -> list[dict[str, Any]]:
+        redriven: list[dict[str, Any]] = []
+        blocked: set[str] = set()  # FIFO message groups with a failed re-send
+        for batch in _send_batches(retryable):
+            batch = [(message, deliveries) for message, deliveries in batch if message['Attributes'].get('MessageGroupId') not in blocked]
+            if not batch:
+                continue
+            entries = [_send_entry(str(index), message, deliveries) for index, (message, deliveries) in enumerate(batch)]
+            try:
+                response = self.sqs.send_message_batch(QueueUrl=self.queue_url, Entries=entries)
+            except ClientError as exc:
+                self.logger.warning('unable to redrive batch', extra={'error': str(exc)})
+                blocked.update(entry['MessageGroupId'] for entry in entries if 'MessageGroupId' in entry)
+                continue
+            redriven.extend(batch[int(entry['Id'])][0] for entry in response.get('Successful', []))
+            for failure in response.get('Failed', []):
+                message = batch[int(failure['Id'])][0]
+                self.logger.warning('unable to redrive message', extra={'message_id': message['MessageId'], 'error': failure})
+                if 'MessageGroupId' in message['Attributes']:
+                    blocked.add(message['Attributes']['MessageGroupId'])
+        return redriven
+
+    def _quarantine(self, message: dict[str, Any], reason: str, deliveries: int) -> bool:
+        if self.quarantine_store is None:
+            return False  # nowhere to keep it, stays in the DLQ until the retention period expires
+        try:
+            self.quarantine_store.put(message, reason, deliveries)
+        except ClientError as exc:
+            self.logger.warning('unable to quarantine message', extra={'message_id': message['MessageId'], 'error': str(exc)})
+            return False
+        return True
+
+    def _delete(self, messages: list[dict[str, Any]]) -> None:
+        for batch in _chunks(messages, MAX_BATCH_ENTRIES):
+            entries = [{'Id': str(index), 'ReceiptHandle': message['ReceiptHandle']} for index, message in enumerate(batch)]
+            # a failed delete only makes the message visible again, its re-sent copy is a duplicate the handler tolerates
+            try:
+                response = self.sqs.delete_message_batch(QueueUrl=self.dlq_url, Entries=entries)
+            except ClientError as exc:
+                self.logger.warning('unable to delete redriven messages', extra={'error': str(exc)})
+                continue
+            for failure in response.get('Failed', []):
+                self.logger.warning('unable to delete redriven message', extra={'error': failure})
+
+    def _release(self, messages: list[dict[str, Any]]) -> None:
+        for batch in _chunks(messages, MAX_BATCH_ENTRIES):
+            entries = [{'Id': str(index), 'ReceiptHandle': message['ReceiptHandle'], 'VisibilityTimeout': 0} for index, message in enumerate(batch)]
+            try:
+                self.sqs.change_message_visibility_batch(QueueUrl=self.dlq_url, Entries=entries)
+            except ClientError as exc:
+                # the messages become visible once the run's visibility timeout expires
+                self.logger.warning('unable to release messages', extra={'error': str(exc)})
+
+
+def _send_entry(entry_id: str, message: dict[str, Any], deliveries: int) -> dict[str, Any]:
+    attributes = {
+        name: {key: value for key, value in attribute.items() if key in ('DataType', 'StringValue', 'BinaryValue')}
+        for name, attribute in message.get('MessageAttributes', {}).items()
+    }
+    attributes[DELIVERIES_ATTRIBUTE] = {'DataType': 'Number', 'StringValue': str(deliveries)}
+    entry = {'Id': entry_id, 'MessageBody': message['Body'], 'MessageAttributes': attributes}
+    group_id = message.get('Attributes', {}).get('MessageGroupId')
+    if group_id is not None:
+        # FIFO queue: the original deduplication id may still be within its 5 minute interval, every redrive cycle gets its own
+        entry.update(MessageGroupId=group_id, MessageDeduplicationId=f'{message["MessageId"]}-{deliveries}')
+    return entry
+
+
+def _entry_size(message: dict[str, Any]) -> int:
+    attributes = json.dumps(message.get('MessageAttributes', {}), default=str)
+    return len(message['Body'].encode('utf-8')) + len(attributes) + 64  # upper bound, includes the deliveries attribute
+
+
+def _send_batches(retryable: list[tuple[dict[str, Any], int]]) -> Iterator[list[tuple[dict[str, Any], int]]]:
+    """Batches of at most 10 entries within the SendMessageBatch payload limit"""
+    batch: list[tuple[dict[str, Any], int]] = []
+    batch_bytes = 0
+    for item in retryable:
+        size = _entry_size(item[0])
+        if batch and (len(batch) == MAX_BATCH_ENTRIES or batch_bytes + size > MAX_BATCH_BYTES):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(item)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def _chunks(messages: list[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    for start in range(0, len(messages), size):
+        yield messages[start : start + size]
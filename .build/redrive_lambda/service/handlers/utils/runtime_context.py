@@ -0,0 +1,69 @@
+import threading
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from aws_lambda_env_modeler import get_environment_variables
+from aws_lambda_powertools.logging import Logger
+from pydantic import BaseModel
+
+Model = TypeVar('Model', bound=BaseModel)
+
+
+class RuntimeContext:
+    """State reused by the warm invocations of an execution environment: validated environment variables, boto3 clients and loggers.
+
+    Shared by the SQS handler and the DLQ redrive function, which ships a copy of this module (see 'make build'), so it
+    only depends on the packages of the common layer. Everything is built on first use and kept until refresh, i.e after
+    a SnapStart restore or when a test changes the environment.
+    Safe to use from the worker threads of ConcurrentBatchProcessor.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._env_vars: dict[type[BaseModel], BaseModel] = {}
+        self._clients: dict[str, Any] = {}
+        self._loggers: dict[str | None, Logger] = {}
+
+    def env_vars(self, model: type[Model]) -> Model:
+        """Environment variables validated by the model once per execution environment, raises ValueError when invalid"""
+        env_vars = self._env_vars.get(model)
+        if env_vars is None:
+            env_vars = self._env_vars[model] = get_environment_variables(model=model)
+        return env_vars  # type: ignore[return-value]
+
+    def client(self, service_name: str, build_config: Callable[[], Any] | None = None) -> Any:
+        """boto3 client of the service
+
+        Args:
+            service_name (str): i.e 's3' or 'sqs'.
+            build_config (Callable[[], botocore.config.Config] | None): Timeouts, retries and connection pool of the client, called when the client is built.
+        """
+        client = self._clients.get(service_name)
+        if client is None:
+            # boto3 sessions are not thread safe, build clients one at a time
+            with self._lock:
+                client = self._clients.get(service_name)
+                if client is None:
+                    # deferred import, importing boto3 and loading service models is paid on first use only
+                    from boto3 import client as boto3_client
+
+                    config = build_config() if build_config is not None else None
+                    client = self._clients[service_name] = boto3_client(service_name, config=config)
+        return client
+
+    def logger(self, service: str | None = None) -> Logger:
+        """Powertools logger of the service, POWERTOOLS_SERVICE_NAME when not given"""
+        logger = self._loggers.get(service)
+        if logger is None:
+            logger = self._loggers[service] = Logger(service=service)
+        return logger
+
+    def refresh(self) -> None:
+        """Drops the cached environment variables and clients, they are built again on next use. Loggers are kept."""
+        with self._lock:
+            self._env_vars = {}
+            self._clients = {}
+
+
+# module level, so it survives between warm invocations of the execution environment
+runtime_context = RuntimeContext()
@@ -1,16 +1,24 @@
 #!/usr/bin/env python3
+import logging
 import os
+import sys
+import time
 
 from aws_cdk import App, Environment
 from boto3 import client, session
 
+from cdk.blueprint.assets import build_cache
 from cdk.blueprint.service_stack import ServiceStack
 from cdk.blueprint.utils import get_stack_name
 
 account = client('sts').get_caller_identity()['Account']
 region = session.Session().region_name
 environment = os.getenv('ENVIRONMENT', 'dev')
+synth_start = time.perf_counter()
 app = App()
+# cdk synth -c verbose=true reports the build cache hits and misses, on stderr as the CDK CLI reads stdout
+verbose = str(app.node.try_get_context('verbose')).lower() == 'true'
+logging.basicConfig(stream=sys.stderr, level=logging.INFO if verbose else logging.WARNING, format='%(message)s')
 my_stack = ServiceStack(
     scope=app,
     id=get_stack_name(),
@@ -19,3 +27,4 @@ my_stack = ServiceStack(
 )
 
 app.synth()
+logging.getLogger(__name__).info(build_cache.report(time.perf_counter() - synth_start))
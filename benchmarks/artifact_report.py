@@ -0,0 +1,154 @@
+"""Size and import cost report of the deployment artifacts, unoptimized against optimized.
+
+The common layer is installed from its requirements as it was before optimization, then copied and run through
+optimize_artifact with the same settings as the CDK build. Both variants are reported with their unzipped and zipped
+size, the largest top-level packages and the import time of every Lambda entry point, measured in fresh processes with
+'python -X importtime' and PYTHONDONTWRITEBYTECODE set, as on the read-only Lambda file system. The distributions
+pruned from the optimized layer are imported from the interpreter's own site-packages, like Lambda imports them from
+its runtime.
+
+Bytecode is compiled for the running interpreter only, run the report with the Lambda runtime's Python version to
+measure precompiling. Requires the folders written by 'make build':
+
+    make build && python -m benchmarks.artifact_report --runs 20
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import zipfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+from benchmarks.utils import summarize, write_results
+from cdk.blueprint.artifact_optimizer import folder_size, optimize_artifact
+from cdk.blueprint.build_cache import install_requirements
+from cdk.blueprint.constants import BUILD_FOLDER, COMMON_LAYER_BUILD_FOLDER, COMMON_LAYER_PRUNED_DISTRIBUTIONS, REDRIVE_LAMBDA_BUILD_FOLDER
+
+# entry point module to the function code folder it is shipped in
+ENTRY_POINTS = {
+    'service.handlers.handle_sqs_batch': Path(BUILD_FOLDER),
+    'redrive_lambda': Path(REDRIVE_LAMBDA_BUILD_FOLDER),
+}
+_ENVIRONMENT = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'POWERTOOLS_SERVICE_NAME': 'benchmark',
+    'POWERTOOLS_TRACE_DISABLED': 'true',
+    'POWERTOOLS_METRICS_NAMESPACE': 'benchmark',
+    'LOG_LEVEL': 'ERROR',
+    'BUCKET_NAME': 'benchmark-bucket',
+}
+_DRIVER = """
+import importlib
+import sys
+import time
+
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+print((time.perf_counter() - start) * 1000)
+"""
+# import time: self [us] | cumulative | imported package
+_IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def build_variants(folder: Path, python_version: str) -> dict[str, Path]:
+    """Unoptimized and optimized copies of the common layer and the function code"""
+    baseline = folder / 'baseline'
+    install_requirements(Path(COMMON_LAYER_BUILD_FOLDER) / 'requirements.txt', baseline / 'layer', python_version)
+    for sources in ENTRY_POINTS.values():
+        shutil.copytree(sources, baseline / sources.name, ignore=shutil.ignore_patterns('__pycache__', '*.pyc'))
+
+    optimized = folder / 'optimized'
+    shutil.copytree(baseline, optimized)
+    optimize_artifact(optimized / 'layer', python_version, COMMON_LAYER_PRUNED_DISTRIBUTIONS)
+    for sources in ENTRY_POINTS.values():
+        optimize_artifact(optimized / sources.name, python_version)
+    return {'baseline': baseline, 'optimized': optimized}
+
+
+def zipped_size(folder: Path) -> int:
+    with tempfile.TemporaryFile() as archive:
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zipped:
+            for path in sorted(folder.rglob('*')):
+                if path.is_file():
+                    zipped.write(path, path.relative_to(folder))
+        return archive.tell()
+
+
+def package_sizes(folder: Path) -> dict[str, int]:
+    """Size of every top-level package or module, dist-info folders included with their package"""
+    sizes: dict[str, int] = defaultdict(int)
+    for path in folder.iterdir():
+        name = path.name.split('-')[0].removesuffix('.py').lower() if path.suffix != '.libs' else path.name.removesuffix('.libs').lower()
+        sizes[name] += folder_size(path) if path.is_dir() else path.stat().st_size
+    return dict(sizes)
+
+
+def measure_import(variant: Path, module: str, runs: int) -> dict[str, Any]:
+    """Import time of an entry point in fresh processes, with the self time spent in every top-level package"""
+    python_path = os.pathsep.join(str(path) for path in (variant / ENTRY_POINTS[module].name, variant / 'layer'))
+    environment = {**os.environ, **_ENVIRONMENT, 'PYTHONPATH': python_path, 'PYTHONDONTWRITEBYTECODE': '1'}
+    totals: list[float] = []
+    packages: dict[str, list[float]] = defaultdict(list)
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _DRIVER, module], env=environment, check=True, capture_output=True, text=True
+        )
+        totals.append(float(completed.stdout.splitlines()[-1]))
+        for package, self_us in _self_times(completed.stderr).items():
+            packages[package].append(self_us / 1000)
+    return {
+        'import_ms': summarize(totals),
+        'packages_ms': {package: summarize(samples + [0.0] * (runs - len(samples))) for package, samples in packages.items()},
+    }
+
+
+def _self_times(stderr: str) -> dict[str, float]:
+    times: dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            times[match.group(4).split('.')[0]] += int(match.group(1))
+    return dict(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes per entry point and variant')
+    parser.add_argument(
+        '--python-version', default=f'{sys.version_info.major}.{sys.version_info.minor}', help='Python version of the installed wheels'
+    )
+    parser.add_argument('--top', type=int, default=10, help='largest and slowest packages listed per variant')
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/artifact_report-<revision>.json')
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for variant, path in build_variants(Path(folder), args.python_version).items():
+            results[variant] = {
+                'layer_bytes': folder_size(path / 'layer'),
+                'layer_zipped_bytes': zipped_size(path / 'layer'),
+                'packages_bytes': package_sizes(path / 'layer'),
+                'entry_points': {module: measure_import(path, module, args.runs) for module in ENTRY_POINTS},
+            }
+
+    for variant, report in results.items():
+        print(f'{variant}: layer {report["layer_bytes"] / 2**20:.1f} MiB, zipped {report["layer_zipped_bytes"] / 2**20:.1f} MiB')
+        largest = sorted(report['packages_bytes'].items(), key=lambda item: item[1], reverse=True)[: args.top]
+        print('  largest packages: ' + ', '.join(f'{name} {size / 2**20:.1f} MiB' for name, size in largest))
+        for module, imports in report['entry_points'].items():
+            slowest = sorted(imports['packages_ms'].items(), key=lambda item: item[1]['p50'], reverse=True)[: args.top]
+            print(f'  {module}: import p50 {imports["import_ms"]["p50"]:.1f}ms, p95 {imports["import_ms"]["p95"]:.1f}ms')
+            print('    slowest packages (self time p50): ' + ', '.join(f'{name} {times["p50"]:.1f}ms' for name, times in slowest))
+    print(f'results written to {write_results("artifact_report", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Orders validated per second, one Order.model_validate call per item versus BatchValidator on the whole list.
+
+Validates lists of raw order dicts as a backfill would load them, a share of them invalid, and checks both paths
+accept and reject the same items.
+
+    python -m benchmarks.batch_validation --records 10000 1000000 --invalid-share 0.01
+"""
+
+import argparse
+import gc
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+from pydantic import ValidationError
+
+from benchmarks.utils import write_results
+from service.models.batch_validation import order_validator
+from service.models.order import Order
+
+
+def generate_items(records: int, invalid_share: float) -> list[Any]:
+    every = round(1 / invalid_share) if invalid_share else 0
+    return [
+        {'name': f'customer {index % 1000}', 'item_count': 0 if every and index % every == 0 else index % 10 + 1, 'id': str(uuid.uuid4())}
+        for index in range(records)
+    ]
+
+
+def validate_per_item(items: list[Any]) -> list[Order | None]:
+    orders: list[Order | None] = []
+    for item in items:
+        try:
+            orders.append(Order.model_validate(item))
+        except ValidationError:
+            orders.append(None)
+    return orders
+
+
+def measure(items: list[Any]) -> dict[str, Any]:
+    start = time.perf_counter()
+    per_item_accepted = [order is not None for order in validate_per_item(items)]
+    per_item_seconds = time.perf_counter() - start
+    gc.collect()  # don't let the batch path pay for collecting the orders of the per item path
+
+    start = time.perf_counter()
+    batch = order_validator.validate(items)
+    batch_seconds = time.perf_counter() - start
+
+    assert per_item_accepted == [order is not None for order in batch.items], 'the paths disagree'
+    return {
+        'records': len(items),
+        'rejected': len(batch.errors),
+        'per_item_records_per_second': round(len(items) / per_item_seconds),
+        'batch_records_per_second': round(len(items) / batch_seconds),
+        'speedup': round(per_item_seconds / batch_seconds, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', nargs='+', type=int, default=[10_000, 1_000_000])
+    parser.add_argument('--invalid-share', type=float, default=0.01, help='share of rejected items')
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/batch_validation-<revision>.json')
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {}
+    print(f'{"records":>10} {"per item/s":>12} {"batch/s":>12} {"speedup":>8}')
+    for records in args.records:
+        result = results[str(records)] = measure(generate_items(records, args.invalid_share))
+        print(f'{records:>10} {result["per_item_records_per_second"]:>12} {result["batch_records_per_second"]:>12} {result["speedup"]:>7}x')
+    print(f'results written to {write_results("batch_validation", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
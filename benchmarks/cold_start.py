@@ -0,0 +1,147 @@
+"""Cold start benchmark for the SQS batch handler.
+
+Every run starts a fresh Python process and measures the import time of the handler module (the Lambda init phase)
+and the duration of the first and second invocation with a 10 record batch. S3 requests are answered locally,
+so no AWS account is required while client construction, request serialization and signing still run for real.
+
+Compare the working tree with a git revision, i.e the commit before the cold start optimizations:
+
+    python -m benchmarks.cold_start --runs 20 --baseline-ref HEAD~1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from benchmarks.utils import summarize, write_results
+
+_DRIVER = """
+import json
+import sys
+import time
+import uuid
+
+import boto3
+from botocore.awsrequest import AWSResponse
+
+
+class _EmptyBody:
+    def stream(self, **kwargs):
+        yield b''
+
+
+def _answer_locally(request, **kwargs):
+    return AWSResponse(request.url, 200, {'ETag': '"local"'}, _EmptyBody())
+
+
+boto3.setup_default_session()
+boto3.DEFAULT_SESSION.events.register('before-send.s3', _answer_locally)
+
+start = time.perf_counter()
+from service.handlers.handle_sqs_batch import lambda_handler
+import_ms = (time.perf_counter() - start) * 1000
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+
+def _event():
+    record = {
+        'receiptHandle': 'AQEBwJnKyrHigUMZj6rYigCgxlaS3SLy0a',
+        'body': json.dumps({'item': {'laptop': 'amd'}}),
+        'attributes': {
+            'ApproximateReceiveCount': '1',
+            'SentTimestamp': '1545082649183',
+            'SenderId': 'AIDAIENQZJOLO23YVJ4VO',
+            'ApproximateFirstReceiveTimestamp': '1545082649185',
+        },
+        'messageAttributes': {},
+        'md5OfBody': 'e4e68fb7bd0e697a0ae8f1bb342846b3',
+        'eventSource': 'aws:sqs',
+        'eventSourceARN': 'arn:aws:sqs:us-east-1:123456789012:queue',
+        'awsRegion': 'us-east-1',
+    }
+    return {'Records': [{**record, 'messageId': str(uuid.uuid4())} for _ in range(10)]}
+
+
+context = LambdaContext()
+context._aws_request_id = '888888'
+context._function_name = 'benchmark'
+context._memory_limit_in_mb = 128
+context._invoked_function_arn = 'arn:aws:lambda:us-east-1:123456789012:function:benchmark'
+context.get_remaining_time_in_millis = lambda: 10_000
+
+invocations = []
+for _ in range(2):
+    event = _event()
+    start = time.perf_counter()
+    lambda_handler(event, context)
+    invocations.append((time.perf_counter() - start) * 1000)
+
+with open(sys.argv[1], 'w') as output:
+    json.dump({'import_ms': import_ms, 'first_invoke_ms': invocations[0], 'second_invoke_ms': invocations[1]}, output)
+"""
+
+_ENVIRONMENT = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'POWERTOOLS_SERVICE_NAME': 'benchmark',
+    'POWERTOOLS_TRACE_DISABLED': 'true',
+    'POWERTOOLS_METRICS_NAMESPACE': 'benchmark',
+    'LOG_LEVEL': 'ERROR',
+    'BUCKET_NAME': 'benchmark-bucket',
+}
+
+
+def _run_once(tree: Path, extra_environment: dict[str, str]) -> dict[str, float]:
+    with tempfile.NamedTemporaryFile(suffix='.json') as output:
+        environment = {**os.environ, **_ENVIRONMENT, **extra_environment, 'PYTHONPATH': str(tree), 'PYTHONDONTWRITEBYTECODE': '1'}
+        subprocess.run([sys.executable, '-c', _DRIVER, output.name], cwd=tree, env=environment, check=True, stdout=subprocess.DEVNULL)
+        return json.loads(Path(output.name).read_text())
+
+
+def measure(tree: Path, runs: int, extra_environment: dict[str, str] | None = None) -> dict[str, Any]:
+    samples = [_run_once(tree, extra_environment or {}) for _ in range(runs)]
+    report = {metric: summarize([sample[metric] for sample in samples]) for metric in ('import_ms', 'first_invoke_ms', 'second_invoke_ms')}
+    report['init_and_first_invoke_ms'] = summarize([sample['import_ms'] + sample['first_invoke_ms'] for sample in samples])
+    return report
+
+
+def _measure_revision(ref: str, runs: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as worktree:
+        subprocess.run(['git', 'worktree', 'add', '--detach', worktree, ref], check=True, capture_output=True)
+        try:
+            return measure(Path(worktree), runs)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', worktree], check=True, capture_output=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes per scenario')
+    parser.add_argument('--baseline-ref', help='git revision to compare the working tree with')
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/cold_start-<revision>.json')
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {}
+    if args.baseline_ref:
+        results[f'baseline ({args.baseline_ref})'] = _measure_revision(args.baseline_ref, args.runs)
+    results['current, pre-warm disabled'] = measure(Path.cwd(), args.runs, {'COLD_START_PREWARM': 'false'})
+    results['current'] = measure(Path.cwd(), args.runs)
+
+    print(f'{"scenario":<32} {"import p50":>11} {"1st invoke p50":>15} {"2nd invoke p50":>15} {"init+1st p50":>13}')
+    for scenario, report in results.items():
+        print(
+            f'{scenario:<32} {report["import_ms"]["p50"]:>9.1f}ms {report["first_invoke_ms"]["p50"]:>13.1f}ms '
+            f'{report["second_invoke_ms"]["p50"]:>13.1f}ms {report["init_and_first_invoke_ms"]["p50"]:>11.1f}ms'
+        )
+    print(f'results written to {write_results("cold_start", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
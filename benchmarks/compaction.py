@@ -0,0 +1,84 @@
+"""Rows per second and peak memory of compacting an hourly partition into columnar files.
+
+Fills the in-process S3 stand-in with a partition of small JSON objects, then compacts it with every format and
+concurrency. GETs pay the simulated S3 round trip, so throughput is bound by read concurrency until encoding takes
+over. Every scenario runs in a fresh process so peak RSS is measured per scenario. Requires pyarrow
+(poetry install --with compaction).
+
+    python -m benchmarks.compaction --objects 20000 --concurrency 1 16 64 --latency-ms 10
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import resource
+import time
+from pathlib import Path
+from typing import Any
+
+from benchmarks.utils import write_results
+
+BUCKET = 'benchmark-bucket'
+PARTITION = 'dt=2024-01-01/hour=00/'
+
+
+def run_scenario(file_format: str, concurrency: int, objects: int, body_size: int, latency_ms: float, max_part_mb: int) -> dict[str, Any]:
+    """Runs in a child process"""
+    import uuid
+
+    from fakes.s3 import FakeS3Client
+    from service.handlers.utils.compaction import CompactionSettings, PartitionCompactor
+    from service.handlers.utils.streaming import MIB
+
+    s3 = FakeS3Client()
+    for index in range(objects):
+        body = json.dumps({'index': index, 'payload': 'x' * body_size}).encode('utf-8')
+        s3.put_object(Bucket=BUCKET, Key=f'{PARTITION}{uuid.uuid4()}.json', Body=body)
+    json_bytes = sum(len(stored['Body']) for stored in s3.objects.values())
+    s3.latency_seconds = latency_ms / 1000
+    settings = CompactionSettings(file_format=file_format, concurrency=concurrency, max_part_bytes=max_part_mb * MIB)  # type: ignore[arg-type]
+
+    rss_before_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    manifest = PartitionCompactor(s3, BUCKET, settings).compact(PARTITION, deadline=time.monotonic() + 3600)
+    duration = time.perf_counter() - start
+    assert manifest is not None and manifest['rows'] == objects
+    return {
+        'rows': objects,
+        'parts': len(manifest['parts']),
+        'duration_seconds': round(duration, 3),
+        'rows_per_second': round(objects / duration, 1),
+        'compression_ratio': round(json_bytes / sum(part['bytes'] for part in manifest['parts']), 1),
+        'rss_growth_mb': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before_kib) / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--formats', nargs='+', default=['parquet', 'arrow'], choices=['parquet', 'arrow'])
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 16, 64])
+    parser.add_argument('--objects', type=int, default=20_000, help='objects of the partition')
+    parser.add_argument('--body-size', type=int, default=256, help='bytes of payload per object')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='simulated S3 round trip')
+    parser.add_argument('--max-part-mb', type=int, default=64, help='COMPACTION_MAX_PART_MB')
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/compaction-<revision>.json')
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {}
+    spawn = multiprocessing.get_context('spawn')
+    for file_format, concurrency in itertools.product(args.formats, args.concurrency):
+        name = f'{file_format}/concurrency={concurrency}'
+        with spawn.Pool(processes=1) as pool:
+            result = results[name] = pool.apply(
+                run_scenario, (file_format, concurrency, args.objects, args.body_size, args.latency_ms, args.max_part_mb)
+            )
+        print(
+            f'{name:<25} {result["rows_per_second"]:>10.1f} rows/s  {result["parts"]:>3} parts  '
+            f'ratio {result["compression_ratio"]:>5.1f}x  rss +{result["rss_growth_mb"]:>6.1f}MB'
+        )
+    print(f'results written to {write_results("compaction", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
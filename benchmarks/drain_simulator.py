@@ -0,0 +1,126 @@
+"""Backlog drain time and cost simulator for the SQS event source.
+
+Steps a model of the queue, the SQS event source scaling and the handler second by second. Invocations take
+ceil(batch size / BATCH_CONCURRENCY) S3 round trips, with the event source settings of a ThroughputProfile.
+The per record latency is either given or taken from a handler_throughput benchmark scenario, where it's the
+measured time a worker spends per record including parsing and framework overhead.
+
+    python -m benchmarks.drain_simulator --backlog 1000000 --arrival-rate 50 --target-rps 500 --record-latency-ms 50
+    python -m benchmarks.drain_simulator --backlog 1000000 --benchmark .benchmarks/handler_throughput-<revision>.json \\
+        --scenario per-record/batch=100/body=256/concurrency=10
+"""
+
+import argparse
+import json
+import math
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from benchmarks.utils import write_results
+from cdk.blueprint import constants
+from cdk.blueprint.throughput_profile import ThroughputProfile
+
+# SQS event source scaling, see https://docs.aws.amazon.com/lambda/latest/dg/services-sqs-scaling.html
+INITIAL_CONCURRENCY = 5
+SCALE_UP_PER_MINUTE = 300
+
+# us-east-1 on demand prices in USD
+LAMBDA_GB_SECOND = 0.0000166667
+LAMBDA_REQUEST = 0.20 / 1_000_000
+SQS_REQUEST = 0.40 / 1_000_000
+S3_PUT_REQUEST = 0.005 / 1000
+
+
+@dataclass(frozen=True)
+class Simulation:
+    drain_seconds: int | None  # None when the backlog does not drain within the simulated time
+    remaining_records: int
+    processed_records: int
+    invocations: int
+    peak_concurrency: int
+    cost_usd: dict[str, float]
+
+
+def record_latency_from_benchmark(results_path: Path, scenario: str) -> float:
+    """Per record worker time of a handler_throughput scenario, in milliseconds"""
+    result = json.loads(results_path.read_text())['results'][scenario]
+    return 1000 * result['scenario']['concurrency'] / result['records_per_second']
+
+
+def simulate(profile: ThroughputProfile, backlog: int, arrival_rate: float, memory_mb: int, max_seconds: int = 86_400) -> Simulation:
+    batch_size = profile.batch_size
+    invocation_seconds = profile.invocation_duration_ms / 1000
+    records_per_second_per_invocation = batch_size / invocation_seconds
+    queue_depth = float(backlog)
+    processed = 0.0
+    peak_concurrency = 0
+    drain_seconds = None
+    for second in range(max_seconds):
+        queue_depth += arrival_rate
+        scaling_limit = INITIAL_CONCURRENCY + SCALE_UP_PER_MINUTE * second // 60
+        # pollers don't invoke more functions than there are batches in the queue
+        concurrency = min(profile.maximum_concurrency, scaling_limit, math.ceil(queue_depth / batch_size))
+        peak_concurrency = max(peak_concurrency, concurrency)
+        drained = min(queue_depth, concurrency * records_per_second_per_invocation)
+        processed += drained
+        queue_depth -= drained
+        if queue_depth < 1:
+            drain_seconds = second + 1
+            break
+
+    invocations = math.ceil(processed / batch_size)
+    requests_per_batch = 2 * math.ceil(batch_size / 10)  # ReceiveMessage and DeleteMessageBatch, 10 messages per call
+    cost = {
+        'lambda_compute': invocations * invocation_seconds * memory_mb / 1024 * LAMBDA_GB_SECOND,
+        'lambda_requests': invocations * LAMBDA_REQUEST,
+        'sqs_requests': (processed + invocations * requests_per_batch) * SQS_REQUEST,  # SendMessage per record
+        's3_requests': processed * S3_PUT_REQUEST,
+    }
+    cost = {name: round(value, 4) for name, value in cost.items()}
+    cost['total'] = round(sum(cost.values()), 4)
+    return Simulation(drain_seconds, round(max(queue_depth, 0)), round(processed), invocations, peak_concurrency, cost)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backlog', type=int, required=True, help='records in the queue at the start')
+    parser.add_argument('--arrival-rate', type=float, default=0.0, help='records/s sent while the backlog drains')
+    parser.add_argument('--target-rps', type=float, default=constants.API_HANDLER_TARGET_RECORDS_PER_SECOND, help='profile target throughput')
+    parser.add_argument('--record-latency-ms', type=float, default=constants.API_HANDLER_RECORD_LATENCY_MS)
+    parser.add_argument('--benchmark', type=Path, help='handler_throughput results JSON, overrides --record-latency-ms')
+    parser.add_argument('--scenario', help='scenario name within --benchmark results')
+    parser.add_argument('--batch-concurrency', type=int, default=constants.API_HANDLER_BATCH_CONCURRENCY)
+    parser.add_argument('--record-size', type=int, default=1024, help='bytes per message body')
+    parser.add_argument('--memory-mb', type=int, default=constants.API_HANDLER_LAMBDA_MEMORY_SIZE)
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/drain_simulator-<revision>.json')
+    args = parser.parse_args()
+
+    record_latency_ms = args.record_latency_ms
+    if args.benchmark:
+        if not args.scenario:
+            parser.error('--scenario is required with --benchmark')
+        record_latency_ms = record_latency_from_benchmark(args.benchmark, args.scenario)
+    profile = ThroughputProfile(
+        target_records_per_second=args.target_rps,
+        record_latency_ms=record_latency_ms,
+        record_size_bytes=args.record_size,
+        batch_concurrency=args.batch_concurrency,
+    )
+    simulation = simulate(profile, args.backlog, args.arrival_rate, args.memory_mb)
+
+    print(
+        f'profile: batch size {profile.batch_size}, batching window {profile.batching_window_seconds}s, '
+        f'maximum concurrency {profile.maximum_concurrency}, {profile.invocation_duration_ms:.0f}ms per invocation'
+    )
+    if simulation.drain_seconds is None:
+        print(f'backlog does not drain, {simulation.remaining_records} records left after a day')
+    else:
+        print(f'drained in {simulation.drain_seconds}s with peak concurrency {simulation.peak_concurrency}')
+    print(f'{simulation.invocations} invocations, cost {simulation.cost_usd}')
+    results: dict[str, Any] = {'profile': {**asdict(profile), 'batch_size': profile.batch_size}, 'simulation': asdict(simulation)}
+    print(f'results written to {write_results("drain_simulator", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
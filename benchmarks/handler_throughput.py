@@ -0,0 +1,207 @@
+"""Offline throughput and latency benchmark for the SQS batch handler.
+
+Runs the real lambda_handler against the in-process S3 stand-in with synthetic SQS batches. Every scenario runs in
+a fresh process so peak RSS is measured per scenario. Per-record latency is the time from the start of the
+invocation until the write that holds the record completed.
+
+    python -m benchmarks.handler_throughput --batch-sizes 10 100 --body-sizes 256 65536 --concurrency 1 10 --latency-ms 20
+    python -m benchmarks.handler_throughput --compare .benchmarks/handler_throughput-<revision>.json
+    python -m benchmarks.handler_throughput --modes per-record async --batch-sizes 10000 --concurrency 100 --invocations 3
+    python -m benchmarks.handler_throughput --modes per-record stream --batch-sizes 10 1000 --concurrency 10
+
+The 'stream' mode puts the batch to a Firehose delivery stream stand-in with the same round trip as S3, in
+PutRecordBatch calls of up to 500 records.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.utils import summarize, write_results
+
+BENCHMARK_ENVIRONMENT = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'POWERTOOLS_SERVICE_NAME': 'benchmark',
+    'POWERTOOLS_TRACE_DISABLED': 'true',
+    'POWERTOOLS_METRICS_NAMESPACE': 'benchmark',
+    'LOG_LEVEL': 'ERROR',
+    'BUCKET_NAME': 'benchmark-bucket',
+    'COLD_START_PREWARM': 'false',
+}
+
+
+@dataclass(frozen=True)
+class Scenario:
+    mode: str  # 'per-record', 'aggregated', 'async' or 'stream'
+    batch_size: int
+    body_size: int
+    concurrency: int
+    latency_ms: float
+    error_rate: float
+    invocations: int
+
+    @property
+    def name(self) -> str:
+        return f'{self.mode}/batch={self.batch_size}/body={self.body_size}/concurrency={self.concurrency}'
+
+
+def generate_event(batch_size: int, body_size: int) -> dict:
+    from fakes.lambda_events import generate_sqs_event
+
+    return generate_sqs_event([{'item': {'payload': 'x' * body_size}} for _ in range(batch_size)])
+
+
+def _timed(function: Callable, invocation_start: list[float], latencies: list[float], records: Callable[[Any], int]) -> Callable:
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        result = function(*args, **kwargs)
+        # list.extend is atomic, safe from the concurrent processor worker threads
+        latencies.extend([(time.perf_counter() - invocation_start[0]) * 1000] * records(kwargs.get('record', args[0] if args else None)))
+        return result
+
+    return wrapper
+
+
+def _timed_async(function: Callable, invocation_start: list[float], latencies: list[float]) -> Callable:
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        result = await function(*args, **kwargs)
+        latencies.append((time.perf_counter() - invocation_start[0]) * 1000)
+        return result
+
+    return wrapper
+
+
+def run_scenario(scenario: Scenario) -> dict[str, Any]:
+    """Runs in a child process, imports the handler with the scenario configuration"""
+    os.environ.update(BENCHMARK_ENVIRONMENT)
+    os.environ['ASYNC_CONCURRENCY' if scenario.mode == 'async' else 'BATCH_CONCURRENCY'] = str(scenario.concurrency)
+    os.environ['AGGREGATION_MODE'] = str(scenario.mode == 'aggregated').lower()
+    os.environ['CONCURRENCY_MODE'] = 'async' if scenario.mode == 'async' else 'threads'
+    os.environ['SINK_TYPE'] = 'delivery_stream' if scenario.mode == 'stream' else 's3'
+    os.environ['DELIVERY_STREAM_NAME'] = 'benchmark-stream'
+
+    from aws_lambda_powertools.utilities.batch.exceptions import BatchProcessingError
+
+    import service.handlers.logic as logic
+    import service.handlers.process_sqs_batch as handler_module
+    from fakes.firehose import FakeFirehoseClient
+    from fakes.lambda_events import generate_context
+    from fakes.s3 import FakeAsyncS3Client, FakeS3Client
+    from service.handlers.handle_sqs_batch import lambda_handler
+
+    fake_s3 = FakeS3Client(latency_seconds=scenario.latency_ms / 1000, error_rate=scenario.error_rate, store_objects=False)
+    fake_async_s3 = FakeAsyncS3Client(fake_s3)
+    logic.get_s3_client = lambda: fake_s3
+    fake_firehose = FakeFirehoseClient(latency_seconds=scenario.latency_ms / 1000, record_error_rate=scenario.error_rate, store_records=False)
+    logic.get_firehose_client = lambda: fake_firehose
+
+    async def get_async_s3_client() -> FakeAsyncS3Client:
+        return fake_async_s3
+
+    logic.get_async_s3_client = get_async_s3_client
+    invocation_start = [0.0]
+    latencies: list[float] = []
+    # looked up by ObjectSink.write on every call
+    logic.record_handler = _timed(logic.record_handler, invocation_start, latencies, lambda _: 1)
+    stream_sink = logic.DeliveryStreamSink(stream_name='benchmark-stream')
+    stream_sink.flush = _timed(stream_sink.flush, invocation_start, latencies, len)  # type: ignore[method-assign]
+    if scenario.mode == 'stream':
+        handler_module.get_record_sink = lambda: stream_sink  # type: ignore[assignment]
+    handler_module.async_record_handler = _timed_async(handler_module.async_record_handler, invocation_start, latencies)
+    handler_module.write_aggregated_batch = _timed(handler_module.write_aggregated_batch, invocation_start, latencies, len)
+
+    def invoke() -> int:
+        invocation_start[0] = time.perf_counter()
+        try:
+            return len(lambda_handler(generate_event(scenario.batch_size, scenario.body_size), generate_context())['batchItemFailures'])
+        except BatchProcessingError:
+            return scenario.batch_size
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):  # silence EMF metrics output
+        invoke()  # warm up invocation, not measured
+        latencies.clear()
+        rss_before_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        failures = sum(invoke() for _ in range(scenario.invocations))
+        duration = time.perf_counter() - start
+        peak_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        tracemalloc.start()
+        invoke()
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    records = scenario.batch_size * scenario.invocations
+    return {
+        'scenario': asdict(scenario),
+        'records': records,
+        'failed_records': failures,
+        's3_requests': fake_s3.put_calls,
+        'stream_requests': fake_firehose.put_calls,
+        'duration_seconds': round(duration, 3),
+        'records_per_second': round(records / duration, 1),
+        'latency_ms': summarize(latencies),
+        'peak_rss_mb': round(peak_rss_kib / 1024, 1),
+        'rss_growth_mb': round((peak_rss_kib - rss_before_kib) / 1024, 1),
+        'traced_peak_bytes_per_record': round(traced_peak / scenario.batch_size),
+    }
+
+
+def _print_comparison(results: dict[str, Any], previous_path: Path) -> None:
+    previous = json.loads(previous_path.read_text())
+    print(f'\ncompared with {previous_path} ({previous["git_revision"]})')
+    for name, result in results.items():
+        before = previous['results'].get(name)
+        if before is None:
+            continue
+        throughput = (result['records_per_second'] / before['records_per_second'] - 1) * 100
+        p99 = (result['latency_ms']['p99'] / max(before['latency_ms']['p99'], 0.001) - 1) * 100
+        print(f'{name:<55} records/s {throughput:+6.1f}%   p99 {p99:+6.1f}%')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['per-record', 'aggregated'], choices=['per-record', 'aggregated', 'async', 'stream'])
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[10, 100])
+    parser.add_argument('--body-sizes', nargs='+', type=int, default=[256, 65536], help='bytes of payload per record')
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 10], help='BATCH_CONCURRENCY or ASYNC_CONCURRENCY values')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='simulated S3 round trip')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of an injected S3 SlowDown error or rejected stream record')
+    parser.add_argument('--invocations', type=int, default=20)
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/handler_throughput-<revision>.json')
+    parser.add_argument('--compare', type=Path, help='previous results JSON file to compare with')
+    args = parser.parse_args()
+
+    scenarios = [
+        Scenario(
+            mode, batch_size, body_size, concurrency if mode in ('per-record', 'async') else 1, args.latency_ms, args.error_rate, args.invocations
+        )
+        for mode, batch_size, body_size, concurrency in itertools.product(args.modes, args.batch_sizes, args.body_sizes, args.concurrency)
+    ]
+    results: dict[str, Any] = {}
+    spawn = multiprocessing.get_context('spawn')
+    for scenario in dict.fromkeys(scenarios):  # aggregated and stream scenarios don't vary by concurrency
+        with spawn.Pool(processes=1) as pool:
+            results[scenario.name] = pool.apply(run_scenario, (scenario,))
+        result = results[scenario.name]
+        print(
+            f'{scenario.name:<55} {result["records_per_second"]:>9.1f} records/s  p50 {result["latency_ms"]["p50"]:>7.1f}ms  '
+            f'p99 {result["latency_ms"]["p99"]:>7.1f}ms  rss {result["peak_rss_mb"]:>6.1f}MB  '
+            f'{result["traced_peak_bytes_per_record"]:>8} traced peak B/record'
+        )
+
+    print(f'results written to {write_results("handler_throughput", results, args.output)}')
+    if args.compare:
+        _print_comparison(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""LIST and scan cost of the KEY_LAYOUT object key layouts.
+
+Fills the in-process S3 stand-in with records sent over a number of days, keyed by each layout, then measures what a
+downstream job pays to find the records of a single hour: LIST requests and keys listed. Layouts without time in
+the key list the whole bucket. The write spread is the number of distinct key prefixes written to within an hour,
+the more prefixes the more request rate S3 can partition a hot hour over.
+
+    python -m benchmarks.key_layouts --records 100000 --days 7
+"""
+
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+from benchmarks.utils import write_results
+from fakes.s3 import FakeS3Client
+from service.handlers.utils.key_layout import KeyBuilder, create_key_builder
+
+BUCKET = 'benchmark-bucket'
+LAYOUTS = ('flat', 'hashed', 'hourly', 'hourly_hashed')
+
+
+def generate_records(records: int, days: int, seed: int) -> list[tuple[str, datetime]]:
+    generator = random.Random(seed)
+    end = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=days)
+    seconds = days * 24 * 3600
+    return [
+        (str(uuid.UUID(int=generator.getrandbits(128), version=4)), end - timedelta(seconds=generator.uniform(0, seconds))) for _ in range(records)
+    ]
+
+
+def _list(s3: FakeS3Client, prefix: str) -> list[str]:
+    keys: list[str] = []
+    kwargs: dict[str, Any] = {'Bucket': BUCKET, 'Prefix': prefix}
+    while True:
+        response = s3.list_objects_v2(**kwargs)
+        keys.extend(content['Key'] for content in response['Contents'])
+        if not response['IsTruncated']:
+            return keys
+        kwargs['ContinuationToken'] = response['NextContinuationToken']
+
+
+def measure_layout(key_builder: KeyBuilder, records: list[tuple[str, datetime]], window: tuple[datetime, datetime]) -> dict[str, Any]:
+    s3 = FakeS3Client()
+    keys = {}
+    for message_id, sent_at in records:
+        keys[message_id] = key_builder.build(message_id, sent_at)
+        s3.put_object(Bucket=BUCKET, Key=keys[message_id], Body=b'{}')
+    wanted = {keys[message_id] for message_id, sent_at in records if window[0] <= sent_at < window[1]}
+
+    start = time.perf_counter()
+    listed = [key for prefix in key_builder.prefixes(*window) for key in _list(s3, prefix)]
+    duration = time.perf_counter() - start
+    assert wanted <= set(listed), 'the listed prefixes miss records of the window'
+    write_prefixes = {key.rpartition('/')[0] for key in wanted}
+    return {
+        'list_requests': s3.list_calls,
+        'keys_listed': len(listed),
+        'keys_wanted': len(wanted),
+        'listed_per_wanted': round(len(listed) / max(len(wanted), 1), 1),
+        'list_seconds': round(duration, 3),
+        'write_prefixes_per_hour': len(write_prefixes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=7, help='records are sent uniformly over this many days')
+    parser.add_argument('--prefix-length', type=int, default=2, help='KEY_HASH_PREFIX_LENGTH of the hashed layouts')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/key_layouts-<revision>.json')
+    args = parser.parse_args()
+
+    records = generate_records(args.records, args.days, args.seed)
+    window_start = max(sent_at for _, sent_at in records).replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    window = (window_start, window_start + timedelta(hours=1) - timedelta(microseconds=1))
+
+    results: dict[str, Any] = {}
+    print(f'{"layout":<15} {"LIST requests":>13} {"keys listed":>12} {"listed/wanted":>14} {"write prefixes/hour":>20}')
+    for layout in LAYOUTS:
+        result = results[layout] = measure_layout(create_key_builder(layout, args.prefix_length), records, window)
+        print(
+            f'{layout:<15} {result["list_requests"]:>13} {result["keys_listed"]:>12} {result["listed_per_wanted"]:>14} '
+            f'{result["write_prefixes_per_hour"]:>20}'
+        )
+    print(f'results written to {write_results("key_layouts", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
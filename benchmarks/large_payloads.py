@@ -0,0 +1,106 @@
+"""Peak memory of writing S3 offloaded payloads of growing size.
+
+Every scenario runs in a fresh process. The offloaded payload is generated while it's read, so the process only
+holds what the write path buffers: 'stream' runs the handler with an S3 pointer body (bounded part buffers),
+'buffered' reads, decodes and encodes the whole payload before a single put, as records are written otherwise.
+
+    python -m benchmarks.large_payloads --sizes-mb 1 16 64 128
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import resource
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+from benchmarks.handler_throughput import BENCHMARK_ENVIRONMENT
+from benchmarks.utils import write_results
+
+_PREFIX = b'{"item": {"payload": "'
+_SUFFIX = b'"}}'
+
+
+class SyntheticPayload:
+    """Streaming body of an {"item": {"payload": "xx..."}} document of the given size, generated while it's read"""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+
+    def iter_chunks(self, chunk_size: int) -> Iterator[bytes]:
+        yield _PREFIX
+        remaining = self.size - len(_PREFIX) - len(_SUFFIX)
+        while remaining > 0:
+            yield b'x' * min(chunk_size, remaining)
+            remaining -= chunk_size
+        yield _SUFFIX
+
+    def read(self) -> bytes:
+        return b''.join(self.iter_chunks(1024 * 1024))
+
+
+def run_scenario(mode: str, size_mb: int) -> dict[str, Any]:
+    """Runs in a child process"""
+    os.environ.update(BENCHMARK_ENVIRONMENT)
+
+    import service.handlers.logic as logic
+    from fakes.lambda_events import generate_context, generate_sqs_event
+    from fakes.s3 import FakeS3Client
+    from service.handlers.handle_sqs_batch import lambda_handler
+    from service.handlers.models.sqs_item import OFFLOADED_PAYLOAD_MARKER
+
+    size = size_mb * 1024 * 1024
+
+    class SyntheticSourceS3(FakeS3Client):
+        def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+            return {'Body': SyntheticPayload(size), 'ContentLength': size}
+
+    fake_s3 = SyntheticSourceS3(store_objects=False)
+    logic.get_s3_client = lambda: fake_s3
+    pointer_body = json.dumps([OFFLOADED_PAYLOAD_MARKER, {'s3BucketName': 'offload-bucket', 's3Key': 'payload'}])
+    rss_before_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'stream':
+        with open(os.devnull, 'w') as devnull:
+            os.dup2(devnull.fileno(), 1)  # silence EMF metrics output
+            response = lambda_handler(generate_sqs_event([pointer_body]), generate_context())
+        assert not response['batchItemFailures']
+    else:
+        payload = fake_s3.get_object(Bucket='offload-bucket', Key='payload')['Body'].read()
+        body = json.dumps(json.loads(payload)['item']).encode('utf-8')
+        fake_s3.put_object(Bucket='benchmark-bucket', Key='buffered.json', Body=body, ContentType='application/json')
+    duration = time.perf_counter() - start
+    peak_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'mode': mode,
+        'payload_mb': size_mb,
+        'duration_seconds': round(duration, 3),
+        'peak_rss_mb': round(peak_rss_kib / 1024, 1),
+        'rss_growth_mb': round((peak_rss_kib - rss_before_kib) / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mb', nargs='+', type=int, default=[1, 16, 64, 128])
+    parser.add_argument('--modes', nargs='+', default=['stream', 'buffered'], choices=['stream', 'buffered'])
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/large_payloads-<revision>.json')
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {}
+    spawn = multiprocessing.get_context('spawn')
+    for mode, size_mb in itertools.product(args.modes, args.sizes_mb):
+        with spawn.Pool(processes=1) as pool:
+            result = results[f'{mode}/{size_mb}MB'] = pool.apply(run_scenario, (mode, size_mb))
+        print(
+            f'{mode:<9} {size_mb:>5}MB  peak rss {result["peak_rss_mb"]:>7.1f}MB  growth {result["rss_growth_mb"]:>7.1f}MB  {result["duration_seconds"]:>6.2f}s'
+        )
+    print(f'results written to {write_results("large_payloads", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Per-record CPU cost of the 'strict' and 'fast' PARSING_MODE record parsing.
+
+Measures parsing the SQS record and producing the S3 object body, the work done per record before the S3 write,
+for small and large bodies. The fast path is measured with the standard library json module and with orjson when installed.
+
+    python -m benchmarks.parsing --iterations 2000
+"""
+
+import argparse
+import os
+import time
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.utils import write_results
+
+os.environ.setdefault('POWERTOOLS_SERVICE_NAME', 'benchmark')
+os.environ.setdefault('POWERTOOLS_TRACE_DISABLED', 'true')
+
+BODY_SIZES = {'small': 1, 'large': 2000}  # products in the order item
+
+
+def _body(items: int) -> dict:
+    return {'item': {f'product_{index}': {'name': 'laptop', 'price': 1200.5, 'tags': ['amd', 'ryzen']} for index in range(items)}}
+
+
+def _cpu_microseconds(function: Callable[[], Any], iterations: int) -> float:
+    function()  # warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        function()
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/parsing-<revision>.json')
+    args = parser.parse_args()
+
+    from fakes.lambda_events import generate_sqs_record
+    from service.handlers.logic import serialize_record
+    from service.handlers.models.sqs_item import OrderSqsRecord, RawSqsRecord
+    from service.handlers.utils import body_parser
+
+    modes: dict[str, Callable[[dict], bytes]] = {
+        'strict': lambda record: serialize_record(OrderSqsRecord.model_validate(record)),
+        'fast': lambda record: serialize_record(RawSqsRecord.model_validate(record)),
+    }
+    results: dict[str, Any] = {}
+    for size_name, items in BODY_SIZES.items():
+        record = generate_sqs_record(_body(items))
+        for mode, parse in modes.items():
+            json_libraries = ['json', 'orjson'] if mode == 'fast' and body_parser.HAS_ORJSON else ['json']
+            for json_library in json_libraries:
+                has_orjson = body_parser.HAS_ORJSON
+                body_parser.HAS_ORJSON = json_library == 'orjson'
+                cpu_us = _cpu_microseconds(partial(parse, record), args.iterations)
+                body_parser.HAS_ORJSON = has_orjson
+                name = f'{size_name}/{mode}' if mode == 'strict' else f'{size_name}/{mode}-{json_library}'
+                results[name] = {'body_bytes': len(record['body']), 'cpu_us_per_record': round(cpu_us, 2)}
+                print(f'{name:<20} {len(record["body"]):>8} bytes {cpu_us:>10.2f} us/record')
+
+    print(f'results written to {write_results("parsing", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,529 @@
+"""In-process emulator of the SQS -> Lambda -> S3 pipeline, for load and failure testing without an AWS account.
+
+Emulates what RedrivableSQS and SqsLambdaToS3Construct configure, in virtual time: the main queue's visibility timeout
+and redrive policy moving a message to the DLQ after max_receive_count receives, the SQS event source polling batches
+with its batching window, scaling up to its maximum concurrency and deleting the records missing from partial batch
+responses, and the scheduled redrive function. Every invocation runs the real lambda_handler, and every redrive the
+real redrive_handler, against the in-process S3 and SQS stand-ins. An invocation takes as long in virtual time as the
+handler took to run, so S3 latency (--latency-ms) is paid for real. Warm execution environments are reused and keep
+their own idempotency store and circuit breaker, a new one is a cold start.
+
+Faults are injected as S3 throttling (--error-rate), bodies the handler rejects (--malformed-share) and invocations
+lost after they ran (--crash-rate), i.e out of memory, whose batch is delivered again after the visibility timeout.
+Reports the drain time, S3 writes per message (duplicates) and the share of messages moved to the DLQ.
+
+    make emulate-pipeline
+    PYTHONPATH=cdk/blueprint/_redrive_lambda python -m benchmarks.pipeline_emulator --messages 1000000 --error-rate 0.05 \\
+        --crash-rate 0.01 --malformed-share 0.001 --redrive-every 600
+
+The triage redrive doesn't sleep to keep its rate limit, re-sent messages arrive at once.
+"""
+
+import argparse
+import contextlib
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass
+from hashlib import md5
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from benchmarks.drain_simulator import INITIAL_CONCURRENCY, SCALE_UP_PER_MINUTE
+from benchmarks.utils import write_results
+from cdk.blueprint import constants
+from cdk.blueprint.function_sizing import FunctionSizing
+from cdk.blueprint.throughput_profile import ThroughputProfile
+from fakes.dynamodb import FakeDynamoDBClient
+from fakes.lambda_events import generate_context
+from fakes.s3 import FakeS3Client
+from fakes.sqs import EmulatedSQSClient, FakeCloudWatchClient
+
+BENCHMARK_ENVIRONMENT = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'POWERTOOLS_SERVICE_NAME': 'benchmark',
+    'POWERTOOLS_TRACE_DISABLED': 'true',
+    'POWERTOOLS_METRICS_NAMESPACE': 'benchmark',
+    'LOG_LEVEL': 'ERROR',
+    'BUCKET_NAME': 'benchmark-bucket',
+    'COLD_START_PREWARM': 'false',
+}
+QUEUE_ARN = 'arn:aws:sqs:us-east-1:123456789012:queuequeue'
+DLQ_ARN = 'arn:aws:sqs:us-east-1:123456789012:queuedlq'
+INDEX_TABLE_NAME = 'index'
+QUARANTINE_PREFIX = 'quarantine/'  # see selective_redrive.S3QuarantineStore
+MALFORMED_BODY = 'not an order'
+REDRIVE_TIMEOUT_MS = 300_000  # RedrivableSQS function timeout
+CLOUDWATCH_WINDOW_SECONDS = 300  # see redrive_engine.THROUGHPUT_WINDOW
+
+
+@dataclass(frozen=True)
+class PipelineSettings:
+    """Queue, event source and handler settings of the emulated pipeline.
+
+    Args:
+        batch_size (int): Records per invocation.
+        batching_window_seconds (int): Longest a poller waits for a batch to fill up.
+        maximum_concurrency (int): Concurrent invocations of the event source.
+        batch_concurrency (int): BATCH_CONCURRENCY of the handler.
+        function_timeout_seconds (int): Function timeout, a slower invocation counts as an error.
+        visibility_timeout_seconds (int): Visibility timeout of the main queue.
+        max_receive_count (int): Receives after which a message is moved to the DLQ.
+        redrive_mode (str): REDRIVE_MODE of the redrive function, 'triage' or 'move'.
+        redrive_every_seconds (float | None): Interval of the redrive schedule, None disables redrives.
+        supervise_every_seconds (float): Interval of the redrive supervision schedule.
+        consumer_capacity (int): REDRIVE_CONSUMER_CAPACITY of the redrive function.
+        max_queue_depth (int): REDRIVE_MAX_QUEUE_DEPTH of the redrive function.
+    """
+
+    batch_size: int
+    batching_window_seconds: int
+    maximum_concurrency: int
+    batch_concurrency: int
+    function_timeout_seconds: int
+    visibility_timeout_seconds: int
+    max_receive_count: int = constants.API_HANDLER_MAX_RECEIVE_COUNT
+    redrive_mode: str = 'triage'
+    redrive_every_seconds: float | None = None
+    supervise_every_seconds: float = 300
+    consumer_capacity: int = 100
+    max_queue_depth: int = 1000
+
+    @classmethod
+    def from_construct(cls, profile: ThroughputProfile | None = None, sizing: FunctionSizing | None = None, **overrides: Any) -> 'PipelineSettings':
+        """Settings SqsLambdaToS3Construct derives from its throughput profile and function sizing, defaults included"""
+        sizing = sizing or FunctionSizing(
+            memory_mb=constants.API_HANDLER_LAMBDA_MEMORY_SIZE,
+            timeout_seconds=constants.API_HANDLER_LAMBDA_TIMEOUT,
+            visibility_timeout_seconds=constants.API_HANDLER_QUEUE_VISIBILITY_TIMEOUT,
+        )
+        profile = profile or ThroughputProfile(
+            target_records_per_second=constants.API_HANDLER_TARGET_RECORDS_PER_SECOND,
+            record_latency_ms=constants.API_HANDLER_RECORD_LATENCY_MS,
+            function_timeout_seconds=sizing.timeout_seconds,
+        )
+        settings: dict[str, Any] = {
+            'batch_size': profile.batch_size,
+            'batching_window_seconds': profile.batching_window_seconds,
+            'maximum_concurrency': profile.maximum_concurrency,
+            'batch_concurrency': profile.batch_concurrency,
+            'function_timeout_seconds': sizing.timeout_seconds,
+            'visibility_timeout_seconds': sizing.visibility_timeout_seconds,
+            'consumer_capacity': profile.sustained_records_per_second,
+        }
+        return cls(**{**settings, **overrides})
+
+    @property
+    def environment(self) -> dict[str, str]:
+        """Environment variables the constructs set on the handler and the redrive function"""
+        return {
+            'BATCH_CONCURRENCY': str(self.batch_concurrency),
+            'IDEMPOTENCY_STORE': 'memory',
+            'KEY_LAYOUT': 'hourly',
+            'INDEX_TABLE_NAME': INDEX_TABLE_NAME,
+            'SQS_ARN': QUEUE_ARN,
+            'DLQ_ARN': DLQ_ARN,
+            'REDRIVE_MODE': self.redrive_mode,
+            'REDRIVE_CONSUMER_CAPACITY': str(self.consumer_capacity),
+            'REDRIVE_MAX_QUEUE_DEPTH': str(self.max_queue_depth),
+        }
+
+
+@dataclass(frozen=True)
+class Faults:
+    """
+    Args:
+        s3_error_rate (float): Probability of an S3 write failing with SlowDown.
+        s3_latency_ms (float): Latency of every S3 request, slept for real.
+        malformed_share (float): Share of messages with a body the handler rejects on every delivery.
+        crash_rate (float): Probability of an invocation being lost after it ran, its whole batch is delivered again.
+        seed (int): Seed of all injected faults.
+    """
+
+    s3_error_rate: float = 0.0
+    s3_latency_ms: float = 0.0
+    malformed_share: float = 0.0
+    crash_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class EmulationReport:
+    messages: int = 0
+    drain_seconds: float | None = None  # virtual seconds until the queues settled, None when max_seconds passed first
+    invocations: int = 0
+    function_errors: int = 0  # handler raised, timed out or crashed, the whole batch is delivered again
+    cold_starts: int = 0
+    peak_concurrency: int = 0
+    deliveries: int = 0  # records handed to invocations
+    written: int = 0  # messages written to S3 at least once
+    duplicate_writes: int = 0  # S3 writes beyond the first of a message
+    moved_to_dlq: int = 0
+    dlq_rate: float = 0.0  # moved_to_dlq / messages
+    redrive_invocations: int = 0
+    remaining_in_queue: int = 0
+    remaining_in_dlq: int = 0
+    quarantined: int = 0
+    wall_seconds: float = 0.0
+
+
+class CountingS3Client(FakeS3Client):
+    """Counts writes per body, every emulated message has a unique body, so duplicates survive re-sends with new message ids"""
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(store_objects=False, **kwargs)
+        self.writes: Counter[bytes] = Counter()
+        self.quarantined = 0
+
+    def _store_object(self, bucket: str, key: str, body: bytes, kwargs: dict[str, Any]) -> dict:
+        response = super()._store_object(bucket, key, body, kwargs)
+        with self._lock:
+            if key.startswith(QUARANTINE_PREFIX):
+                self.quarantined += 1
+            else:
+                self.writes[body] += 1
+        return response
+
+
+@dataclass
+class _ExecutionEnvironment:
+    idempotency_store: Any
+    circuit_breaker: Any
+
+
+@dataclass
+class _Invocation:
+    receipt_handles: dict[str, str]  # message id to receipt handle
+    failed_ids: set[str] | None  # None when the invocation failed as a whole
+    environment: _ExecutionEnvironment
+
+
+class _SkippedSleeps:
+    """time module of the triage redrive, rate limiting sleeps return at once and advance the sleeping thread's clock"""
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def monotonic(self) -> float:
+        return time.monotonic() + getattr(self._local, 'slept', 0.0)
+
+    def sleep(self, seconds: float) -> None:
+        self._local.slept = getattr(self._local, 'slept', 0.0) + seconds
+
+
+class PipelineEmulator:
+    """Steps the queues, the event source and the redrive schedules in virtual time, see the module docstring.
+
+    Args:
+        settings (PipelineSettings): Queue, event source and handler settings.
+        faults (Faults): Injected faults.
+        tick_seconds (float): Virtual time step, idle periods are skipped.
+    """
+
+    def __init__(self, settings: PipelineSettings, faults: Faults | None = None, tick_seconds: float = 0.1) -> None:
+        self.settings = settings
+        self.faults = faults or Faults()
+        self.tick_seconds = tick_seconds
+        self.now = 0.0
+        self.sqs = EmulatedSQSClient(clock=self.clock)
+        self.sqs.create_queue('queuedlq', visibility_timeout=30)
+        self.sqs.create_queue(
+            'queuequeue',
+            visibility_timeout=settings.visibility_timeout_seconds,
+            dead_letter_queue='queuedlq',
+            max_receive_count=settings.max_receive_count,
+        )
+        self.s3 = CountingS3Client(latency_seconds=self.faults.s3_latency_ms / 1000, error_rate=self.faults.s3_error_rate, seed=self.faults.seed)
+        self.cloudwatch = FakeCloudWatchClient()
+        self.dynamodb = FakeDynamoDBClient()
+        self.messages = 0
+        self._random = random.Random(self.faults.seed)
+        self._arrivals: deque[tuple[float, str]] = deque()  # send time, body
+        self._running: list[tuple[float, int, _Invocation]] = []  # heap of completion time, sequence, invocation
+        self._sequence = itertools.count()
+        self._idle_environments: list[_ExecutionEnvironment] = []
+        self._environment: _ExecutionEnvironment | None = None
+        self._invocation_started: float | None = None
+        self._batch_wait_started: float | None = None
+        self._counts: deque[tuple[float, int, int]] = deque()  # time, sent and deleted messages of the main queue
+        self._report = EmulationReport()
+
+    def clock(self) -> float:
+        """Virtual time, advancing in real time while an invocation runs"""
+        if self._invocation_started is None:
+            return self.now
+        return self.now + time.perf_counter() - self._invocation_started
+
+    def send(self, count: int, arrival_rate: float | None = None) -> None:
+        """Sends count messages from the current time, all at once or at arrival_rate messages per second"""
+        for index in range(count):
+            sequence = self.messages + index
+            body = MALFORMED_BODY if self._random.random() < self.faults.malformed_share else json.dumps({'item': {'sequence': sequence}})
+            self._arrivals.append((self.now + (index / arrival_rate if arrival_rate else 0.0), body))
+        self.messages += count
+
+    def run(self, max_seconds: float = 86_400) -> EmulationReport:
+        """Runs until both queues are settled or max_seconds of virtual time passed"""
+        import redrive_lambda
+        import selective_redrive
+
+        import service.handlers.logic as logic
+        from service.handlers.handle_sqs_batch import lambda_handler
+        from service.handlers.utils import backpressure
+        from service.handlers.utils.runtime_context import runtime_context
+
+        clients = {'s3': self.s3, 'sqs': self.sqs, 'cloudwatch': self.cloudwatch, 'dynamodb': self.dynamodb}
+        runtime_context.refresh()  # environment variables parsed before the run are stale
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(mock.patch.dict(os.environ, {**self.settings.environment, 'QUARANTINE_BUCKET_NAME': os.environ['BUCKET_NAME']}))
+            stack.enter_context(mock.patch.object(runtime_context, 'client', lambda service_name, build_config=None: clients[service_name]))
+            stack.enter_context(mock.patch.object(logic, 'get_idempotency_store', lambda: self._current_environment().idempotency_store))
+            stack.enter_context(mock.patch.object(backpressure, 'get_circuit_breaker', lambda: self._current_environment().circuit_breaker))
+            stack.enter_context(mock.patch.object(selective_redrive, 'time', _SkippedSleeps()))
+            next_redrive = self.settings.redrive_every_seconds
+            next_supervision = self.settings.supervise_every_seconds
+            while self.now <= max_seconds:
+                self._arrive()
+                self._complete_invocations()
+                self.sqs.advance(self.tick_seconds)
+                self._sample_counts()
+                if next_redrive is not None and self.now >= next_redrive:
+                    self._redrive(redrive_lambda.redrive_handler, 'start')
+                    next_redrive += self.settings.redrive_every_seconds or 0
+                if next_redrive is not None and self.now >= next_supervision:
+                    self._redrive(redrive_lambda.redrive_handler, 'supervise')
+                    next_supervision += self.settings.supervise_every_seconds
+                self._poll(lambda_handler)
+                if self._settled():
+                    self._report.drain_seconds = round(self.now, 3)
+                    break
+                self.now = self._next_time(next_redrive, next_supervision)
+        return self._finish(time.perf_counter() - started)
+
+    def _arrive(self) -> None:
+        while self._arrivals and self._arrivals[0][0] <= self.now:
+            self.sqs.send_message(QueueUrl=QUEUE_ARN, MessageBody=self._arrivals.popleft()[1])
+
+    def _poll(self, handler: Any) -> None:
+        """Invokes the handler while there are messages and concurrency, batches wait up to the batching window to fill up"""
+        scaling_limit = INITIAL_CONCURRENCY + SCALE_UP_PER_MINUTE * int(self.now) // 60
+        while len(self._running) < min(self.settings.maximum_concurrency, scaling_limit):
+            visible = int(self.sqs.get_queue_attributes(QUEUE_ARN, [])['Attributes']['ApproximateNumberOfMessages'])
+            if not visible:
+                self._batch_wait_started = None
+                return
+            if visible < self.settings.batch_size and self.settings.batching_window_seconds:
+                if self._batch_wait_started is None:
+                    self._batch_wait_started = self.now
+                if self.now - self._batch_wait_started < self.settings.batching_window_seconds:
+                    return
+            self._batch_wait_started = None
+            messages = self.sqs.receive_message(QueueUrl=QUEUE_ARN, MaxNumberOfMessages=self.settings.batch_size).get('Messages', [])
+            if messages:
+                self._invoke(handler, messages)
+
+    def _invoke(self, handler: Any, messages: list[dict[str, Any]]) -> None:
+        self._environment = self._idle_environments.pop() if self._idle_environments else self._cold_start()
+        event = {'Records': [_event_record(message) for message in messages]}
+        self._invocation_started = time.perf_counter()
+        failed_ids: set[str] | None
+        try:
+            response = handler(event, _context(self.settings.function_timeout_seconds * 1000))
+            failed_ids = {failure['itemIdentifier'] for failure in response['batchItemFailures']}
+        except Exception:
+            failed_ids = None  # i.e BatchProcessingError when all records failed
+        duration = time.perf_counter() - self._invocation_started
+        self._invocation_started = None
+        if duration > self.settings.function_timeout_seconds or self._random.random() < self.faults.crash_rate:
+            failed_ids = None
+
+        invocation = _Invocation({message['MessageId']: message['ReceiptHandle'] for message in messages}, failed_ids, self._environment)
+        heapq.heappush(self._running, (self.now + duration, next(self._sequence), invocation))
+        self._report.invocations += 1
+        self._report.deliveries += len(messages)
+        self._report.peak_concurrency = max(self._report.peak_concurrency, len(self._running))
+
+    def _complete_invocations(self) -> None:
+        while self._running and self._running[0][0] <= self.now:
+            invocation = heapq.heappop(self._running)[2]
+            self._idle_environments.append(invocation.environment)
+            if invocation.failed_ids is None:
+                self._report.function_errors += 1
+                continue  # no record is deleted, the batch becomes visible after the visibility timeout
+            # failed records stay invisible until the visibility timeout expires
+            entries = [
+                {'Id': str(index), 'ReceiptHandle': handle}
+                for index, (message_id, handle) in enumerate(invocation.receipt_handles.items())
+                if message_id not in invocation.failed_ids
+            ]
+            for start in range(0, len(entries), 10):
+                self.sqs.delete_message_batch(QueueUrl=QUEUE_ARN, Entries=entries[start : start + 10])
+
+    def _cold_start(self) -> _ExecutionEnvironment:
+        from service.handlers.models.env_vars import MyHandlerEnvVars
+        from service.handlers.utils.backpressure import CircuitBreaker
+        from service.handlers.utils.idempotency import get_idempotency_store
+        from service.handlers.utils.runtime_context import runtime_context
+
+        self._report.cold_starts += 1
+        runtime_context.refresh()  # environment variables and the caches built from them, runtime_context.client stays patched
+        env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+        breaker = None
+        if env_vars.CIRCUIT_BREAKER_ENABLED:
+            # cooldowns pass in virtual time
+            breaker = CircuitBreaker(
+                failure_rate=env_vars.CIRCUIT_BREAKER_FAILURE_RATE,
+                window=env_vars.CIRCUIT_BREAKER_WINDOW,
+                min_writes=env_vars.CIRCUIT_BREAKER_MIN_WRITES,
+                cooldown_seconds=env_vars.CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+                clock=self.clock,
+            )
+        return _ExecutionEnvironment(get_idempotency_store(), breaker)
+
+    def _current_environment(self) -> _ExecutionEnvironment:
+        if self._environment is None:
+            raise RuntimeError('no invocation is running')
+        return self._environment
+
+    def _redrive(self, handler: Any, action: str) -> None:
+        deleted = self._counts[0][2] if self._counts else 0
+        sent = self._counts[0][1] if self._counts else 0
+        main_queue = self.sqs.queues['queuequeue']
+        self.cloudwatch.rates = {
+            'NumberOfMessagesDeleted': (main_queue.deleted - deleted) / CLOUDWATCH_WINDOW_SECONDS,
+            'NumberOfMessagesSent': (main_queue.sent - sent) / CLOUDWATCH_WINDOW_SECONDS,
+        }
+        handler({'action': action}, _context(REDRIVE_TIMEOUT_MS))
+        self._report.redrive_invocations += 1
+
+    def _sample_counts(self) -> None:
+        main_queue = self.sqs.queues['queuequeue']
+        self._counts.append((self.now, main_queue.sent, main_queue.deleted))
+        while self._counts and self._counts[0][0] < self.now - CLOUDWATCH_WINDOW_SECONDS:
+            self._counts.popleft()
+
+    def _settled(self) -> bool:
+        if self._arrivals or self._running or any(task['Status'] == 'RUNNING' for task in self.sqs.tasks):
+            return False
+        main_queue, dlq = self.sqs.queues['queuequeue'], self.sqs.queues['queuedlq']
+        # without redrives the DLQ keeps its messages, with them the DLQ must be drained
+        return not main_queue.messages and (self.settings.redrive_every_seconds is None or not dlq.messages)
+
+    def _next_time(self, next_redrive: float | None, next_supervision: float) -> float:
+        step = self.now + self.tick_seconds
+        if self._arrivals or self.sqs.queues['queuequeue'].visible or any(task['Status'] == 'RUNNING' for task in self.sqs.tasks):
+            return step
+        # nothing to poll, skip ahead to the next completion, visibility timeout expiry or schedule
+        candidates = [self._arrivals[0][0]] if self._arrivals else []
+        candidates += [self._running[0][0]] if self._running else []
+        candidates += [at for at in (self.sqs.next_visible_at('queuequeue'), next_redrive) if at is not None]
+        if next_redrive is not None:
+            candidates.append(next_supervision)
+        return max(step, min(candidates, default=step))
+
+    def _finish(self, wall_seconds: float) -> EmulationReport:
+        report = self._report
+        main_queue, dlq = self.sqs.queues['queuequeue'], self.sqs.queues['queuedlq']
+        report.messages = self.messages
+        report.written = len(self.s3.writes)
+        report.duplicate_writes = sum(self.s3.writes.values()) - len(self.s3.writes)
+        report.moved_to_dlq = main_queue.moved_to_dead_letter_queue
+        report.dlq_rate = round(report.moved_to_dlq / max(self.messages, 1), 6)
+        report.remaining_in_queue = len(main_queue.messages)
+        report.remaining_in_dlq = len(dlq.messages)
+        report.quarantined = self.s3.quarantined
+        report.wall_seconds = round(wall_seconds, 3)
+        return report
+
+
+def _context(timeout_ms: int) -> LambdaContext:
+    """Lambda context whose remaining time counts down in real time from the function timeout"""
+    deadline = time.perf_counter() + timeout_ms / 1000
+    context = generate_context()
+    context.get_remaining_time_in_millis = lambda: max(int((deadline - time.perf_counter()) * 1000), 0)  # type: ignore[method-assign]
+    return context
+
+
+def _event_record(message: dict[str, Any]) -> dict[str, Any]:
+    """SQS event record of a received message, as the Lambda event source sends it"""
+    attributes = {
+        name: {
+            'stringValue': attribute.get('StringValue'),
+            'binaryValue': attribute.get('BinaryValue'),
+            'stringListValues': [],
+            'binaryListValues': [],
+            'dataType': attribute['DataType'],
+        }
+        for name, attribute in message.get('MessageAttributes', {}).items()
+    }
+    return {
+        'messageId': message['MessageId'],
+        'receiptHandle': message['ReceiptHandle'],
+        'body': message['Body'],
+        'attributes': {
+            'ApproximateReceiveCount': message['Attributes']['ApproximateReceiveCount'],
+            'SentTimestamp': message['Attributes']['SentTimestamp'],
+            'SenderId': 'AIDAIENQZJOLO23YVJ4VO',
+            'ApproximateFirstReceiveTimestamp': message['Attributes']['SentTimestamp'],
+        },
+        'messageAttributes': attributes,
+        'md5OfBody': md5(message['Body'].encode('utf-8'), usedforsecurity=False).hexdigest(),
+        'eventSource': 'aws:sqs',
+        'eventSourceARN': QUEUE_ARN,
+        'awsRegion': 'us-east-1',
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=100_000, help='messages sent')
+    parser.add_argument('--arrival-rate', type=float, help='messages/s sent, all messages are in the queue at the start by default')
+    parser.add_argument('--target-rps', type=float, default=constants.API_HANDLER_TARGET_RECORDS_PER_SECOND, help='profile target throughput')
+    parser.add_argument('--record-latency-ms', type=float, default=constants.API_HANDLER_RECORD_LATENCY_MS, help='profile record latency')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='S3 request latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of an S3 write failing with SlowDown')
+    parser.add_argument('--malformed-share', type=float, default=0.0, help='share of messages the handler rejects')
+    parser.add_argument('--crash-rate', type=float, default=0.0, help='probability of an invocation being lost after it ran')
+    parser.add_argument('--redrive-every', type=float, help='redrive schedule interval in seconds, no redrives by default')
+    parser.add_argument('--redrive-mode', choices=['triage', 'move'], default='triage')
+    parser.add_argument('--max-seconds', type=float, default=86_400, help='virtual time limit')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/pipeline_emulator-<revision>.json')
+    args = parser.parse_args()
+
+    os.environ.update(BENCHMARK_ENVIRONMENT)
+    profile = ThroughputProfile(target_records_per_second=args.target_rps, record_latency_ms=args.record_latency_ms)
+    settings = PipelineSettings.from_construct(profile, redrive_every_seconds=args.redrive_every, redrive_mode=args.redrive_mode)
+    faults = Faults(
+        s3_error_rate=args.error_rate, s3_latency_ms=args.latency_ms, malformed_share=args.malformed_share, crash_rate=args.crash_rate, seed=args.seed
+    )
+    emulator = PipelineEmulator(settings, faults)
+    emulator.send(args.messages, args.arrival_rate)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):  # silence EMF metrics output
+        report = emulator.run(args.max_seconds)
+
+    print(
+        f'settings: batch size {settings.batch_size}, batching window {settings.batching_window_seconds}s, maximum concurrency '
+        f'{settings.maximum_concurrency}, visibility timeout {settings.visibility_timeout_seconds}s, max receive count {settings.max_receive_count}'
+    )
+    drained = f'drained in {report.drain_seconds}s' if report.drain_seconds is not None else f'not drained after {args.max_seconds}s'
+    print(f'{report.messages} messages {drained} ({report.wall_seconds}s wall), {report.invocations} invocations, {report.function_errors} failed')
+    print(
+        f'written {report.written}, duplicate writes {report.duplicate_writes}, moved to the DLQ {report.moved_to_dlq} '
+        f'({report.dlq_rate:.4%}), quarantined {report.quarantined}, left in the DLQ {report.remaining_in_dlq}'
+    )
+    results = {'settings': asdict(settings), 'faults': asdict(faults), 'report': asdict(report)}
+    print(f'results written to {write_results("pipeline_emulator", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Memory and timeout right-sizing for the SQS batch handler.
+
+Runs the real lambda_handler locally against the in-process S3 stand-in and measures the CPU time and the wall
+time of every invocation. Lambda allocates CPU in proportion to memory, a full vCPU at 1769 MB, so the duration
+at a memory tier is estimated as CPU time / CPU share + time spent waiting on S3. The local core is assumed to
+match a Lambda vCPU, and the handler doesn't get faster beyond a full vCPU as it's bound by a single core.
+
+For every tier the estimated duration and cost are reported, the selected tier's memory, timeout and matching
+queue visibility timeout are printed as the FunctionSizing to pass to SqsLambdaToS3Construct.
+
+    python -m benchmarks.power_tuning --batch-size 100 --concurrency 10 --latency-ms 20 --strategy balanced
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from typing import Any
+
+from benchmarks.handler_throughput import BENCHMARK_ENVIRONMENT, generate_event
+from benchmarks.utils import percentile, write_results
+from cdk.blueprint import constants
+from cdk.blueprint.function_sizing import FunctionSizing
+from cdk.blueprint.throughput_profile import TIMEOUT_UTILIZATION, ThroughputProfile
+
+FULL_VCPU_MEMORY_MB = 1769
+MEMORY_TIERS = [128, 256, 512, 1024, 1769, 3008]
+LAMBDA_GB_SECOND = 0.0000166667  # us-east-1, x86
+LAMBDA_REQUEST = 0.20 / 1_000_000
+
+
+def measure_handler(batch_size: int, body_size: int, concurrency: int, latency_ms: float, invocations: int) -> dict[str, list[float]]:
+    """Runs in a child process, returns the CPU and wall time of every invocation in milliseconds"""
+    os.environ.update(BENCHMARK_ENVIRONMENT)
+    os.environ['BATCH_CONCURRENCY'] = str(concurrency)
+
+    import service.handlers.logic as logic
+    from fakes.lambda_events import generate_context
+    from fakes.s3 import FakeS3Client
+    from service.handlers.handle_sqs_batch import lambda_handler
+
+    fake_s3 = FakeS3Client(latency_seconds=latency_ms / 1000, store_objects=False)
+    logic.get_s3_client = lambda: fake_s3
+    samples: dict[str, list[float]] = {'cpu_ms': [], 'wall_ms': []}
+    with open(os.devnull, 'w') as devnull:
+        os.dup2(devnull.fileno(), 1)  # silence EMF metrics output
+        for invocation in range(invocations + 1):
+            event = generate_event(batch_size, body_size)
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            lambda_handler(event, generate_context())
+            if invocation:  # the first invocation warms up and is not measured
+                samples['cpu_ms'].append((time.process_time() - cpu_start) * 1000)
+                samples['wall_ms'].append((time.perf_counter() - wall_start) * 1000)
+    return samples
+
+
+def estimate_tiers(samples: dict[str, list[float]], batch_size: int, tiers: list[int]) -> list[dict[str, Any]]:
+    estimates = []
+    for memory_mb in tiers:
+        cpu_share = min(memory_mb / FULL_VCPU_MEMORY_MB, 1.0)
+        durations = [cpu / cpu_share + max(wall - cpu, 0.0) for cpu, wall in zip(samples['cpu_ms'], samples['wall_ms'], strict=True)]
+        cost = percentile(durations, 50) / 1000 * memory_mb / 1024 * LAMBDA_GB_SECOND + LAMBDA_REQUEST
+        estimates.append(
+            {
+                'memory_mb': memory_mb,
+                'duration_p50_ms': round(percentile(durations, 50), 1),
+                'duration_p99_ms': round(percentile(durations, 99), 1),
+                'cost_per_million_records_usd': round(cost * 1_000_000 / batch_size, 4),
+            }
+        )
+    return estimates
+
+
+def select_tier(estimates: list[dict[str, Any]], strategy: str, max_duration_ms: float | None = None) -> dict[str, Any]:
+    """Cheapest, fastest or best cost times duration product tier within the duration limit"""
+    candidates = [tier for tier in estimates if max_duration_ms is None or tier['duration_p99_ms'] <= max_duration_ms]
+    if not candidates:
+        raise ValueError(f'no memory tier finishes a batch within {max_duration_ms}ms')
+    if strategy == 'cost':
+        return min(candidates, key=lambda tier: (tier['cost_per_million_records_usd'], tier['duration_p99_ms']))
+    if strategy == 'speed':
+        return min(candidates, key=lambda tier: (tier['duration_p99_ms'], tier['cost_per_million_records_usd']))
+    cheapest = min(tier['cost_per_million_records_usd'] for tier in candidates)
+    fastest = min(tier['duration_p99_ms'] for tier in candidates)
+    return min(candidates, key=lambda tier: tier['cost_per_million_records_usd'] / cheapest * tier['duration_p99_ms'] / fastest)
+
+
+def recommend_sizing(tier: dict[str, Any], batching_window_seconds: int) -> FunctionSizing:
+    # batches are sized for TIMEOUT_UTILIZATION of the timeout, see ThroughputProfile
+    timeout_seconds = max(math.ceil(tier['duration_p99_ms'] / 1000 / TIMEOUT_UTILIZATION), 3)
+    return FunctionSizing.for_timeout(tier['memory_mb'], timeout_seconds, batching_window_seconds)
+
+
+def main() -> None:
+    default_profile = ThroughputProfile(constants.API_HANDLER_TARGET_RECORDS_PER_SECOND, constants.API_HANDLER_RECORD_LATENCY_MS)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=default_profile.batch_size, help='defaults to the throughput profile batch size')
+    parser.add_argument('--body-size', type=int, default=1024)
+    parser.add_argument('--concurrency', type=int, default=constants.API_HANDLER_BATCH_CONCURRENCY)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='simulated S3 round trip')
+    parser.add_argument('--invocations', type=int, default=10)
+    parser.add_argument('--tiers', nargs='+', type=int, default=MEMORY_TIERS, help='memory tiers in MB')
+    parser.add_argument('--strategy', choices=['cost', 'speed', 'balanced'], default='balanced')
+    parser.add_argument('--max-duration-ms', type=float, help='ignore tiers with a slower p99 batch duration')
+    args = parser.parse_args()
+
+    with multiprocessing.get_context('spawn').Pool(processes=1) as pool:
+        samples = pool.apply(measure_handler, (args.batch_size, args.body_size, args.concurrency, args.latency_ms, args.invocations))
+    estimates = estimate_tiers(samples, args.batch_size, args.tiers)
+    selected = select_tier(estimates, args.strategy, args.max_duration_ms)
+    sizing = recommend_sizing(selected, default_profile.batching_window_seconds)
+
+    print(f'measured CPU p50 {percentile(samples["cpu_ms"], 50):.1f}ms, wall p50 {percentile(samples["wall_ms"], 50):.1f}ms per batch')
+    print(f'{"memory":>8} {"p50":>10} {"p99":>10} {"$/1M records":>13}')
+    for tier in estimates:
+        marker = '  <' if tier is selected else ''
+        print(
+            f'{tier["memory_mb"]:>6}MB {tier["duration_p50_ms"]:>8.1f}ms {tier["duration_p99_ms"]:>8.1f}ms '
+            f'{tier["cost_per_million_records_usd"]:>13.4f}{marker}'
+        )
+    print(f'\n{sizing}')
+    results = {'samples': samples, 'estimates': estimates, 'strategy': args.strategy, 'sizing': vars(sizing)}
+    print(f'results written to {write_results("power_tuning", results)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+import json
+import math
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+RESULTS_FOLDER = Path('.benchmarks')
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Nearest-rank percentile, values don't have to be sorted"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    return {
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(max(values, default=0.0), 3),
+    }
+
+
+def get_git_revision(path: Path | None = None) -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=path, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def write_results(name: str, results: dict[str, Any], output: Path | None = None) -> Path:
+    """Stores benchmark results as JSON, tagged with the git revision so runs can be compared between commits"""
+    output = output or RESULTS_FOLDER / f'{name}-{get_git_revision()}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        'benchmark': name,
+        'git_revision': get_git_revision(),
+        'python': platform.python_version(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'results': results,
+    }
+    output.write_text(json.dumps(document, indent=2))
+    return output
@@ -0,0 +1,86 @@
+"""Per-invocation setup cost on warm starts, building the logger, boto3 clients and environment variables every time
+versus reusing them from the runtime context (service/handlers/utils/runtime_context.py).
+
+The redrive scenarios run the setup of the DLQ redrive function, the record scenarios the per-record configuration
+lookup of the SQS handler. No requests are sent, clients are only built.
+
+    PYTHONPATH=cdk/blueprint/_redrive_lambda python -m benchmarks.warm_invocation --invocations 200
+"""
+
+import argparse
+import os
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from benchmarks.utils import summarize, write_results
+
+_ENVIRONMENT = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'POWERTOOLS_SERVICE_NAME': 'benchmark',
+    'LOG_LEVEL': 'INFO',
+    'DLQ_ARN': 'arn:aws:sqs:us-east-1:123456789012:queue-dlq',
+    'SQS_ARN': 'arn:aws:sqs:us-east-1:123456789012:queue',
+    'BUCKET_NAME': 'benchmark-bucket',
+}
+
+
+def _scenarios() -> dict[str, Callable[[], Any]]:
+    import boto3
+    from aws_lambda_env_modeler import get_environment_variables
+    from aws_lambda_powertools.logging import Logger
+    from redrive_lambda import DlqEnvVars
+
+    from service.handlers.models.env_vars import MyHandlerEnvVars
+    from service.handlers.utils.runtime_context import runtime_context
+
+    def redrive_per_invocation() -> None:
+        # the redrive handler before the runtime context
+        Logger()
+        boto3.client('sqs')
+        boto3.client('cloudwatch')
+        get_environment_variables(model=DlqEnvVars)
+
+    def redrive_runtime_context() -> None:
+        runtime_context.logger()
+        runtime_context.client('sqs')
+        runtime_context.client('cloudwatch')
+        runtime_context.env_vars(DlqEnvVars)
+
+    return {
+        'redrive/per-invocation': redrive_per_invocation,
+        'redrive/runtime-context': redrive_runtime_context,
+        'record/env-model': lambda: get_environment_variables(model=MyHandlerEnvVars).BUCKET_NAME,
+        'record/runtime-context': lambda: runtime_context.env_vars(MyHandlerEnvVars).BUCKET_NAME,
+    }
+
+
+def measure(setup: Callable[[], Any], invocations: int) -> dict[str, Any]:
+    setup()  # the first invocation pays for imports and service models in both cases
+    durations: list[float] = []
+    for _ in range(invocations):
+        start = time.perf_counter()
+        setup()
+        durations.append((time.perf_counter() - start) * 1_000_000)
+    return {'invocations': invocations, 'microseconds': summarize(durations)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invocations', type=int, default=200, help='warm invocations per scenario')
+    parser.add_argument('--output', type=Path, help='results JSON file, defaults to .benchmarks/warm_invocation-<revision>.json')
+    args = parser.parse_args()
+    for name, value in _ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+
+    results: dict[str, Any] = {}
+    print(f'{"scenario":<25} {"p50 us":>10} {"p99 us":>10}')
+    for name, setup in _scenarios().items():
+        result = results[name] = measure(setup, args.invocations)
+        print(f'{name:<25} {result["microseconds"]["p50"]:>10.1f} {result["microseconds"]["p99"]:>10.1f}')
+    print(f'results written to {write_results("warm_invocation", results, args.output)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+import compileall
+import logging
+import py_compile
+import shutil
+import sys
+from collections.abc import Iterable
+from dataclasses import dataclass
+from importlib.metadata import distributions
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# part of the cache key of optimized assets, bump when the pruning rules change
+OPTIMIZER_VERSION = '1'
+PRUNED_DIRECTORIES = frozenset({'tests', 'test', '__pycache__'})
+# type stubs and C sources, never read at runtime
+PRUNED_SUFFIXES = frozenset({'.pyi', '.pyx', '.pxd', '.c', '.cpp', '.h', '.hpp'})
+# installation metadata pip writes, importlib.metadata reads METADATA and entry_points.txt only
+PRUNED_METADATA_FILES = frozenset({'RECORD', 'INSTALLER', 'REQUESTED', 'WHEEL', 'direct_url.json'})
+
+
+@dataclass
+class OptimizationReport:
+    removed_files: int = 0
+    removed_bytes: int = 0
+    compiled: bool = False
+
+
+def optimize_artifact(folder: Path, python_version: str, pruned_distributions: Iterable[str] = ()) -> OptimizationReport:
+    """Shrinks an installed layer or function folder and precompiles its bytecode, in place
+
+    Removes the given distributions with every file they installed, then tests, type stubs, C sources and installation
+    metadata of every package. Modules are compiled to unchecked hash based .pyc files, which Python loads without
+    comparing source timestamps, deployment packages are zipped with fixed timestamps and Lambda can't write a
+    __pycache__ to the read-only /opt and /var/task. Compiling requires the target Python version.
+
+    Args:
+        folder (Path): Installed packages (the 'python' folder of a layer) or function code.
+        python_version (str): Python version of the Lambda runtime, i.e '3.13'.
+        pruned_distributions (Iterable[str]): Distribution names to remove, i.e packages provided by the Lambda runtime.
+    """
+    report = OptimizationReport()
+    for name in pruned_distributions:
+        _remove_distribution(folder, name, report)
+    for path in sorted(folder.rglob('*'), reverse=True):  # children before their folders
+        if path.is_dir() and path.name in PRUNED_DIRECTORIES:
+            _remove(path, report)
+        elif path.is_file() and (path.suffix in PRUNED_SUFFIXES or _is_installation_metadata(path)):
+            _remove(path, report)
+    report.compiled = precompile(folder, python_version)
+    return report
+
+
+def can_precompile(python_version: str) -> bool:
+    """Bytecode is specific to a Python version, only the target version's interpreter can compile it"""
+    return f'{sys.version_info.major}.{sys.version_info.minor}' == python_version
+
+
+def precompile(folder: Path, python_version: str) -> bool:
+    """Compiles every module of the folder for the running interpreter, False when it is not the target Python version"""
+    if not can_precompile(python_version):
+        logger.warning('skipped precompiling %s, Python %s is required to compile its bytecode', folder, python_version)
+        return False
+    # optimization level 0, Lambda doesn't run Python with -O
+    return compileall.compile_dir(folder, quiet=1, workers=0, invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+
+
+def folder_size(folder: Path) -> int:
+    return sum(path.stat().st_size for path in folder.rglob('*') if path.is_file())
+
+
+def _remove_distribution(folder: Path, name: str, report: OptimizationReport) -> None:
+    for distribution in distributions(path=[str(folder)]):
+        if _normalize(distribution.metadata['Name']) != _normalize(name):
+            continue
+        # scripts are recorded outside the package folder, i.e '../../bin'
+        installed = {path for path in (folder / str(file) for file in distribution.files or []) if path.resolve().is_relative_to(folder.resolve())}
+        for path in installed:
+            if path.is_file():
+                _remove(path, report)
+        # folders left empty by the distribution, its dist-info folder included
+        for parent in sorted({parent for path in installed for parent in path.parents if folder in parent.parents}, reverse=True):
+            if parent.is_dir() and not any(child for child in parent.iterdir() if child.name != '__pycache__'):
+                _remove(parent, report)
+
+
+def _is_installation_metadata(path: Path) -> bool:
+    return path.name in PRUNED_METADATA_FILES and path.parent.suffix == '.dist-info'
+
+
+def _remove(path: Path, report: OptimizationReport) -> None:
+    if path.is_dir():
+        report.removed_files += sum(1 for child in path.rglob('*') if child.is_file())
+        report.removed_bytes += folder_size(path)
+        shutil.rmtree(path)
+        return
+    report.removed_files += 1
+    report.removed_bytes += path.stat().st_size
+    path.unlink()
+
+
+def _normalize(name: str) -> str:
+    # https://packaging.python.org/en/latest/specifications/name-normalization/
+    return name.lower().replace('_', '-').replace('.', '-')
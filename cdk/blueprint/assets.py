@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from aws_cdk import AssetHashType
+from aws_cdk import aws_lambda as _lambda
+
+import cdk.blueprint.constants as constants
+from cdk.blueprint.build_cache import COMPLETE_MARKER, BuildCache, bundle_layer, stage_sources
+
+# shared by all constructs of the app, reports its hits and misses once the app is synthesized
+build_cache = BuildCache(Path(constants.BUILD_CACHE_FOLDER), max_entries=constants.BUILD_CACHE_MAX_ENTRIES)
+
+
+def layer_code(name: str, build_folder: str, runtime: _lambda.Runtime, pruned_distributions: tuple[str, ...] = ()) -> _lambda.Code:
+    """Layer with the requirements.txt of the build folder installed, served from the build cache while poetry.lock and the runtime don't change"""
+    folder = bundle_layer(
+        build_cache,
+        name,
+        Path(build_folder) / 'requirements.txt',
+        Path(constants.LOCK_FILE),
+        _python_version(runtime),
+        pruned_distributions=pruned_distributions,
+    )
+    return _cached_code(folder)
+
+
+def function_code(name: str, build_folder: str, runtime: _lambda.Runtime) -> _lambda.Code:
+    """Precompiled function code of the build folder, served from the build cache while its sources don't change"""
+    return _cached_code(stage_sources(build_cache, name, Path(build_folder), _python_version(runtime)))
+
+
+def _python_version(runtime: _lambda.Runtime) -> str:
+    return runtime.name.removeprefix('python')  # i.e python3.13
+
+
+def _cached_code(folder: Path) -> _lambda.Code:
+    # the entry is named by its content hash, CDK doesn't have to fingerprint it
+    return _lambda.Code.from_asset(str(folder), asset_hash=folder.name, asset_hash_type=AssetHashType.CUSTOM, exclude=[COMPLETE_MARKER])
@@ -0,0 +1,195 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from cdk.blueprint.artifact_optimizer import OPTIMIZER_VERSION, can_precompile, optimize_artifact
+
+COMPLETE_MARKER = '.complete'  # written last, an entry without it was interrupted while building
+IGNORED_NAMES = frozenset({'__pycache__', '.pytest_cache', '.mypy_cache', '.ruff_cache'})
+# manylinux wheels matching the Lambda execution environment, see
+# https://docs.aws.amazon.com/lambda/latest/dg/python-package.html#python-package-native-libraries
+PLATFORMS = {'x86_64': 'manylinux2014_x86_64', 'arm64': 'manylinux2014_aarch64'}
+
+
+def hash_paths(paths: Iterable[Path], *extra: str) -> str:
+    """Content hash of files and folders, stable across machines and checkouts
+
+    Relative paths and contents of every file are hashed in sorted order, caches and bytecode are ignored. The extra
+    values, i.e the runtime name, are part of the hash.
+    """
+    digest = hashlib.sha256()
+    for value in extra:
+        digest.update(f'{value}\0'.encode())
+    for root in paths:
+        for path in sorted(_iter_files(root)):
+            digest.update(f'{path.relative_to(root.parent).as_posix()}\0'.encode())
+            digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()[:32]
+
+
+def _iter_files(root: Path) -> Iterable[Path]:
+    if root.is_file():
+        yield root
+        return
+    for folder, folders, files in os.walk(root):
+        folders[:] = [name for name in folders if name not in IGNORED_NAMES]
+        yield from (Path(folder) / name for name in files if not name.endswith('.pyc'))
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    build_seconds: float = 0.0
+    assets: dict[str, str] = field(default_factory=dict)  # asset name to the key it was served with
+
+
+class BuildCache:
+    """Content-addressed cache of built assets, i.e Lambda layers and function code, reused across builds and synths.
+
+    Every asset is built into '<folder>/<name>/<key>', where the key is a hash of everything the build reads: the lock
+    file, the runtime and the sources. An asset whose inputs did not change is served from the cache without building
+    it again, and CDK is handed the key as the asset hash so it doesn't fingerprint the folder either. The least
+    recently used entries of an asset beyond max_entries are evicted.
+
+    Args:
+        folder (Path): Cache folder, kept between builds, i.e by the CI cache.
+        max_entries (int): Entries kept per asset.
+    """
+
+    def __init__(self, folder: Path, max_entries: int = 3) -> None:
+        self.folder = folder
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+
+    def get_or_build(self, name: str, key: str, build: Callable[[Path], None]) -> Path:
+        """Folder of the asset, built by build(folder) on a cache miss
+
+        Args:
+            name (str): Asset name, i.e 'common_layer'.
+            key (str): Hash of the build inputs, see hash_paths.
+            build (Callable[[Path], None]): Writes the asset into the given empty folder.
+        """
+        entry = self.folder / name / key
+        self.stats.assets[name] = key
+        if (entry / COMPLETE_MARKER).exists():
+            self.stats.hits += 1
+            os.utime(entry)  # most recently used
+            return entry
+
+        self.stats.misses += 1
+        start = time.perf_counter()
+        # built next to the entry and renamed into place, concurrent builds never see a partial asset
+        staging = entry.with_name(f'{key}.{os.getpid()}.tmp')
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        try:
+            build(staging)
+            (staging / COMPLETE_MARKER).touch()
+            shutil.rmtree(entry, ignore_errors=True)
+            staging.rename(entry)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.stats.build_seconds += time.perf_counter() - start
+        self._evict(entry.parent)
+        return entry
+
+    def _evict(self, asset_folder: Path) -> None:
+        entries = sorted(
+            (path for path in asset_folder.iterdir() if path.is_dir() and not path.name.endswith('.tmp')),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+        for stale in entries[self.max_entries :]:
+            shutil.rmtree(stale, ignore_errors=True)
+            self.stats.evictions += 1
+
+    def report(self, synth_seconds: float) -> str:
+        return (
+            f'synth took {synth_seconds:.1f}s, build cache: {self.stats.hits} hits, {self.stats.misses} misses '
+            f'({self.stats.build_seconds:.1f}s building), {self.stats.evictions} evicted'
+        )
+
+
+def bundle_layer(
+    cache: BuildCache,
+    name: str,
+    requirements: Path,
+    lock_file: Path,
+    python_version: str,
+    architecture: str = 'x86_64',
+    pruned_distributions: tuple[str, ...] = (),
+) -> Path:
+    """Layer folder with the requirements installed under 'python/', built once per lock file, runtime and architecture
+
+    Wheels are downloaded for the Lambda platform, so the layer is built locally without a Docker bundling container.
+    The installed packages are optimized by optimize_artifact, pruned_distributions are removed.
+    """
+
+    def build(folder: Path) -> None:
+        install_requirements(requirements, folder / 'python', python_version, architecture)
+        optimize_artifact(folder / 'python', python_version, pruned_distributions)
+
+    key = hash_paths([requirements, lock_file], python_version, architecture, *_optimizer_tags(python_version), *pruned_distributions)
+    return cache.get_or_build(name, key, build)
+
+
+def install_requirements(requirements: Path, target: Path, python_version: str, architecture: str = 'x86_64') -> None:
+    """Installs wheels of the Lambda platform into the target folder
+
+    pip can't build source distributions for another platform, so every requirement must publish a manylinux wheel
+    (or a pure Python one) for the runtime's Python version. A source only requirement fails the build, pin a version
+    that publishes wheels or build that layer in a Docker bundling container instead.
+    """
+    try:
+        subprocess.run(
+            [
+                sys.executable,
+                '-m',
+                'pip',
+                'install',
+                '--quiet',
+                '--no-compile',
+                '--requirement',
+                str(requirements),
+                '--target',
+                str(target),
+                '--platform',
+                PLATFORMS[architecture],
+                '--implementation',
+                'cp',
+                '--python-version',
+                python_version,
+                '--only-binary=:all:',
+            ],
+            check=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        raise RuntimeError(
+            f'installing {requirements} for {PLATFORMS[architecture]} Python {python_version} failed, see the pip error above. '
+            'Requirements without a wheel for the platform can not be installed, pin versions that publish one'
+        ) from exc
+
+
+def stage_sources(cache: BuildCache, name: str, sources: Path, python_version: str | None = None) -> Path:
+    """Copy of a function's code folder, built once per content of its sources. Precompiled when python_version is given."""
+
+    def build(folder: Path) -> None:
+        shutil.copytree(sources, folder, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*IGNORED_NAMES, '*.pyc'))
+        if python_version is not None:
+            optimize_artifact(folder, python_version)
+
+    extra = (python_version, *_optimizer_tags(python_version)) if python_version is not None else ()
+    return cache.get_or_build(name, hash_paths([sources], *extra), build)
+
+
+def _optimizer_tags(python_version: str) -> tuple[str, ...]:
+    # an asset built where its bytecode couldn't be compiled must not be served where it can
+    return OPTIMIZER_VERSION, f'precompiled={can_precompile(python_version)}'
@@ -0,0 +1,117 @@
+from aws_cdk import Duration, RemovalPolicy, aws_events, aws_events_targets
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_lambda as _lambda
+from aws_cdk import aws_s3 as s3
+from constructs import Construct
+
+from cdk.blueprint import constants
+from cdk.blueprint.assets import function_code, layer_code
+
+
+class ParquetCompaction(Construct):
+    """
+    Scheduled function that rolls the hourly partitions of the bucket into compressed columnar files under 'compacted/', see service/handlers/utils/compaction.py.
+
+    Args:
+        scope (Construct): The parent construct that this construct will be a part of.
+        identifier (str): The unique identifier for this construct and all resources within the scope.
+        bucket (s3.Bucket): Bucket written with the 'hourly' KEY_LAYOUT, holding both the objects and the compacted files.
+        common_layer (_lambda.LayerVersion): Layer with the service dependencies.
+        file_format (str): 'parquet' or 'arrow'. Default is 'parquet'.
+        tombstone (bool): Delete compacted objects once their partition's manifest is written. Default is False.
+        schedule (Duration): How often closed partitions are compacted, an unfinished compaction is resumed by the next run. Default is 1 hour.
+        metrics_namespace (str): CloudWatch namespace of the compaction metrics. Default is 'sqs_kpi'.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        identifier: str,
+        bucket: s3.Bucket,
+        common_layer: _lambda.LayerVersion,
+        file_format: str = 'parquet',
+        tombstone: bool = False,
+        schedule: Duration | None = None,
+        metrics_namespace: str = constants.METRICS_NAMESPACE,
+    ) -> None:
+        super().__init__(scope, identifier)
+        # pyarrow only ships with the compaction function, it would double the size of the common layer
+        self.compaction_layer = _lambda.LayerVersion(
+            self,
+            f'{identifier}{constants.COMPACTION_LAYER_NAME}',
+            code=layer_code(constants.COMPACTION_LAYER_NAME, constants.COMPACTION_LAYER_BUILD_FOLDER, _lambda.Runtime.PYTHON_3_13),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_13],
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+        self.function = self._create_function(identifier, bucket, common_layer, file_format, tombstone, metrics_namespace)
+        aws_events.Rule(
+            self,
+            f'{identifier}Schedule',
+            schedule=aws_events.Schedule.rate(schedule or Duration.hours(1)),
+            targets=[aws_events_targets.LambdaFunction(handler=self.function)],
+            rule_name=f'{identifier}Schedule'[-64:],
+        )
+
+    def _create_function(
+        self, identifier: str, bucket: s3.Bucket, common_layer: _lambda.LayerVersion, file_format: str, tombstone: bool, metrics_namespace: str
+    ) -> _lambda.Function:
+        role = iam.Role(
+            self,
+            f'{identifier}Role',
+            assumed_by=iam.ServicePrincipal('lambda.amazonaws.com'),
+            inline_policies={
+                'Bucket': iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            actions=['s3:ListBucket'],
+                            resources=[bucket.bucket_arn],
+                            effect=iam.Effect.ALLOW,
+                        ),
+                        iam.PolicyStatement(
+                            actions=['s3:GetObject', 's3:PutObject', 's3:DeleteObject'],
+                            resources=[f'{bucket.bucket_arn}/*'],
+                            effect=iam.Effect.ALLOW,
+                        ),
+                    ]
+                ),
+                # similar to https://docs.aws.amazon.com/aws-managed-policy/latest/reference/AWSLambdaBasicExecutionRole.html
+                'CloudwatchLogs': iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            actions=[
+                                'logs:CreateLogGroup',
+                                'logs:CreateLogStream',
+                                'logs:PutLogEvents',
+                            ],
+                            resources=['*'],
+                            effect=iam.Effect.ALLOW,
+                        )
+                    ]
+                ),
+            },
+        )
+        return _lambda.Function(
+            self,
+            f'{identifier}Func',
+            runtime=_lambda.Runtime.PYTHON_3_13,
+            code=function_code(constants.FUNCTION_CODE_ASSET_NAME, constants.BUILD_FOLDER, _lambda.Runtime.PYTHON_3_13),
+            handler='service.handlers.handle_compaction.lambda_handler',
+            environment={
+                constants.POWERTOOLS_SERVICE_NAME: 'compaction',
+                constants.POWERTOOLS_METRICS_NAMESPACE: metrics_namespace,
+                constants.POWER_TOOLS_LOG_LEVEL: 'INFO',
+                'BUCKET_NAME': bucket.bucket_name,
+                'COMPACTION_FORMAT': file_format,
+                'COMPACTION_TOMBSTONE': str(tombstone).lower(),
+            },
+            tracing=_lambda.Tracing.ACTIVE,
+            retry_attempts=0,
+            timeout=Duration.minutes(15),
+            # a part of COMPACTION_MAX_PART_MB JSON is held as Python strings and Arrow buffers while it's written
+            memory_size=1024,
+            layers=[common_layer, self.compaction_layer],
+            role=role,
+            logging_format=_lambda.LoggingFormat.JSON,
+            system_log_level_v2=_lambda.SystemLogLevel.INFO,
+            application_log_level_v2=_lambda.ApplicationLogLevel.INFO,
+        )
@@ -4,16 +4,42 @@ CREATE_LAMBDA = 'SQSLambda'
 LAMBDA_LAYER_NAME = 'common'
 API_HANDLER_LAMBDA_MEMORY_SIZE = 128  # MB
 API_HANDLER_LAMBDA_TIMEOUT = 10  # seconds
+API_HANDLER_QUEUE_VISIBILITY_TIMEOUT = 300  # seconds, at least 6 times the timeout plus the batching window, see function_sizing.py
+API_HANDLER_BATCH_CONCURRENCY = 10  # records written to S3 concurrently per invocation
+API_HANDLER_MAX_RECEIVE_COUNT = 3  # deliveries before SQS moves a message to the DLQ
+API_HANDLER_TARGET_RECORDS_PER_SECOND = 100  # sustained throughput the SQS event source is sized for
+API_HANDLER_RECORD_LATENCY_MS = 50  # S3 write p99 of a single record, see benchmarks/handler_throughput.py
 POWERTOOLS_SERVICE_NAME = 'POWERTOOLS_SERVICE_NAME'
 SERVICE_NAME = 'SQSService'
 SERVICE_NAME_TAG = 'service'
 OWNER_TAG = 'owner'
-METRICS_NAMESPACE = 'sqs_kpi'
+METRICS_NAMESPACE = 'sqs_kpi'  # default of the constructs, set on the functions by POWERTOOLS_METRICS_NAMESPACE
+POWERTOOLS_METRICS_NAMESPACE = 'POWERTOOLS_METRICS_NAMESPACE'
 METRICS_DIMENSION_KEY = 'service'
 POWERTOOLS_TRACE_DISABLED = 'POWERTOOLS_TRACE_DISABLED'
 POWER_TOOLS_LOG_LEVEL = 'LOG_LEVEL'
 BUILD_FOLDER = '.build/lambdas/'
 COMMON_LAYER_BUILD_FOLDER = '.build/common_layer'
+COMPACTION_LAYER_NAME = 'compaction'
+COMPACTION_LAYER_BUILD_FOLDER = '.build/compaction_layer'
+ASYNC_LAYER_NAME = 'async'
+ASYNC_LAYER_BUILD_FOLDER = '.build/async_layer'
+REDRIVE_LAMBDA_BUILD_FOLDER = '.build/redrive_lambda'  # cdk/blueprint/_redrive_lambda, the runtime context and record model modules
 BUCKET_NAME = 'SecureBucket'
 ACCESS_LOG_BUCKET_NAME = 'AccessLogBucket'
 MONITORING_TOPIC = 'MonitoringTopic'
+INDEX_TABLE = 'OrderIndex'
+INDEX_TABLE_OUTPUT = 'IndexTableName'
+BUILD_CACHE_FOLDER = '.build/cache'  # built layers and function code by content hash, see build_cache.py
+BUILD_CACHE_MAX_ENTRIES = 3  # per asset
+LOCK_FILE = 'poetry.lock'
+# runtime dependencies the functions don't need in the common layer: boto3 ships with the Lambda runtime (the async
+# layer brings the botocore pinned by aiobotocore), mypy-boto3 stubs are read by type checkers only, email-validator
+# is not imported by any handler
+COMMON_LAYER_PRUNED_DISTRIBUTIONS = ('boto3', 'botocore', 's3transfer', 'jmespath', 'mypy-boto3-dynamodb', 'email-validator', 'dnspython')
+FUNCTION_CODE_ASSET_NAME = 'lambdas'  # build cache asset of BUILD_FOLDER
+REDRIVE_CODE_ASSET_NAME = 'redrive_lambda'  # build cache asset of REDRIVE_LAMBDA_BUILD_FOLDER
+DELIVERY_STREAM = 'DeliveryStream'
+DELIVERY_STREAM_PREFIX = 'stream/'  # Firehose appends the UTC 'YYYY/MM/dd/HH/' of the delivery
+DELIVERY_STREAM_BUFFER_INTERVAL_SECONDS = 60  # a GZIP NDJSON object per interval or buffer size, whichever is reached first
+DELIVERY_STREAM_BUFFER_SIZE_MB = 64
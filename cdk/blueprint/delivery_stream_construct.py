@@ -0,0 +1,81 @@
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_kinesisfirehose as firehose
+from aws_cdk import aws_s3 as s3
+from constructs import Construct
+
+from cdk.blueprint import constants
+
+
+class DeliveryStreamToS3(Construct):
+    """
+    Firehose delivery stream the 'delivery_stream' SINK_TYPE puts records to, see DeliveryStreamSink in service/handlers/logic.py.
+
+    Records are buffered by the stream and written to the bucket as GZIP compressed NDJSON objects under
+    constants.DELIVERY_STREAM_PREFIX, partitioned by the UTC hour of the delivery.
+
+    Args:
+        scope (Construct): The parent construct that this construct will be a part of.
+        identifier (str): The unique identifier for this construct and all resources within the scope.
+        bucket (s3.Bucket): Destination bucket.
+        buffer_interval_seconds (int): Longest time records are buffered before an object is written. Default is 60 seconds.
+        buffer_size_mb (int): Size of buffered records that writes an object before the interval ends. Default is 64 MB.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        identifier: str,
+        bucket: s3.Bucket,
+        buffer_interval_seconds: int = constants.DELIVERY_STREAM_BUFFER_INTERVAL_SECONDS,
+        buffer_size_mb: int = constants.DELIVERY_STREAM_BUFFER_SIZE_MB,
+    ) -> None:
+        super().__init__(scope, identifier)
+        role = iam.Role(
+            self,
+            f'{identifier}Role',
+            assumed_by=iam.ServicePrincipal('firehose.amazonaws.com'),
+            inline_policies={
+                # see https://docs.aws.amazon.com/firehose/latest/dev/controlling-access.html#using-iam-s3
+                'Bucket': iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            actions=[
+                                's3:AbortMultipartUpload',
+                                's3:GetBucketLocation',
+                                's3:GetObject',
+                                's3:ListBucket',
+                                's3:ListBucketMultipartUploads',
+                                's3:PutObject',
+                            ],
+                            resources=[bucket.bucket_arn, f'{bucket.bucket_arn}/*'],
+                            effect=iam.Effect.ALLOW,
+                        ),
+                    ]
+                ),
+            },
+        )
+        self.delivery_stream = firehose.CfnDeliveryStream(
+            self,
+            f'{identifier}{constants.DELIVERY_STREAM}',
+            delivery_stream_type='DirectPut',
+            delivery_stream_encryption_configuration_input=firehose.CfnDeliveryStream.DeliveryStreamEncryptionConfigurationInputProperty(
+                key_type='AWS_OWNED_CMK'
+            ),
+            extended_s3_destination_configuration=firehose.CfnDeliveryStream.ExtendedS3DestinationConfigurationProperty(
+                bucket_arn=bucket.bucket_arn,
+                role_arn=role.role_arn,
+                prefix=constants.DELIVERY_STREAM_PREFIX,
+                error_output_prefix='stream_errors/!{firehose:error-output-type}/!{timestamp:yyyy/MM/dd/HH}/',
+                compression_format='GZIP',
+                buffering_hints=firehose.CfnDeliveryStream.BufferingHintsProperty(
+                    interval_in_seconds=buffer_interval_seconds, size_in_m_bs=buffer_size_mb
+                ),
+            ),
+        )
+        # the role's policy must exist before Firehose checks the destination
+        self.delivery_stream.node.add_dependency(role)
+        self.delivery_stream_name = self.delivery_stream.ref
+        self.delivery_stream_arn = self.delivery_stream.attr_arn
+
+    def grant_put_records(self, grantee: iam.IGrantable) -> iam.Grant:
+        return iam.Grant.add_to_principal(grantee=grantee, actions=['firehose:PutRecordBatch'], resource_arns=[self.delivery_stream_arn])
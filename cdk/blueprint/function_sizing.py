@@ -0,0 +1,63 @@
+import math
+from dataclasses import dataclass
+
+from cdk.blueprint.throughput_profile import ThroughputProfile
+
+MIN_MEMORY_MB = 128
+MAX_MEMORY_MB = 10_240
+MAX_TIMEOUT_SECONDS = 900
+MAX_VISIBILITY_TIMEOUT_SECONDS = 12 * 60 * 60
+# https://docs.aws.amazon.com/lambda/latest/dg/services-sqs-configure.html#events-sqs-queueconfig
+VISIBILITY_TIMEOUT_FACTOR = 6
+
+
+@dataclass(frozen=True)
+class FunctionSizing:
+    """Memory and timeout of the SQS handler and the matching visibility timeout of its queue.
+
+    The queue's visibility timeout must be at least six times the function timeout, plus the batching window,
+    otherwise messages still being processed or retried by throttled invocations become visible again and are
+    processed twice. Impossible combinations raise a ValueError when the stack is synthesized.
+
+    Args:
+        memory_mb (int): Function memory, CPU share grows with it.
+        timeout_seconds (int): Function timeout.
+        visibility_timeout_seconds (int): Visibility timeout of the SQS queue.
+    """
+
+    memory_mb: int
+    timeout_seconds: int
+    visibility_timeout_seconds: int
+
+    def __post_init__(self) -> None:
+        if not MIN_MEMORY_MB <= self.memory_mb <= MAX_MEMORY_MB:
+            raise ValueError(f'memory must be between {MIN_MEMORY_MB} and {MAX_MEMORY_MB} MB')
+        if not 1 <= self.timeout_seconds <= MAX_TIMEOUT_SECONDS:
+            raise ValueError(f'timeout must be between 1 and {MAX_TIMEOUT_SECONDS} seconds')
+        if self.visibility_timeout_seconds > MAX_VISIBILITY_TIMEOUT_SECONDS:
+            raise ValueError(f'visibility timeout must not exceed {MAX_VISIBILITY_TIMEOUT_SECONDS} seconds')
+        self.validate_event_source(batching_window_seconds=0)
+
+    @classmethod
+    def for_timeout(cls, memory_mb: int, timeout_seconds: int, batching_window_seconds: int = 0) -> 'FunctionSizing':
+        """Sizing with the shortest valid visibility timeout"""
+        return cls(memory_mb, timeout_seconds, minimum_visibility_timeout(timeout_seconds, batching_window_seconds))
+
+    def validate_event_source(self, batching_window_seconds: int) -> None:
+        minimum = minimum_visibility_timeout(self.timeout_seconds, batching_window_seconds)
+        if self.visibility_timeout_seconds < minimum:
+            raise ValueError(
+                f'visibility timeout of {self.visibility_timeout_seconds}s is shorter than {VISIBILITY_TIMEOUT_FACTOR} times '
+                f'the {self.timeout_seconds}s function timeout plus the {batching_window_seconds}s batching window ({minimum}s)'
+            )
+
+    def validate_profile(self, profile: ThroughputProfile) -> None:
+        if profile.function_timeout_seconds != self.timeout_seconds:
+            raise ValueError(
+                f'throughput profile is sized for a {profile.function_timeout_seconds}s timeout, the function has {self.timeout_seconds}s'
+            )
+        self.validate_event_source(profile.batching_window_seconds)
+
+
+def minimum_visibility_timeout(timeout_seconds: int, batching_window_seconds: int = 0) -> int:
+    return math.ceil(VISIBILITY_TIMEOUT_FACTOR * timeout_seconds + batching_window_seconds)
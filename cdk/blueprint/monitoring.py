@@ -1,5 +1,6 @@
 import aws_cdk.aws_sns as sns
 from aws_cdk import CfnOutput, Duration, RemovalPolicy, aws_sqs
+from aws_cdk import aws_cloudwatch as cloudwatch
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_kms as kms
 from aws_cdk import aws_lambda as _lambda
@@ -7,6 +8,8 @@ from aws_cdk import aws_s3 as s3
 from cdk_monitoring_constructs import (
     AlarmFactoryDefaults,
     CustomMetricGroup,
+    CustomMetricWithAlarm,
+    CustomThreshold,
     ErrorRateThreshold,
     LatencyThreshold,
     MetricStatistic,
@@ -16,6 +19,7 @@ from cdk_monitoring_constructs import (
 from constructs import Construct
 
 from cdk.blueprint import constants
+from cdk.blueprint.throughput_profile import ThroughputProfile
 
 
 class Monitoring(Construct):
@@ -27,9 +31,13 @@ class Monitoring(Construct):
         queue: aws_sqs.Queue,
         dlq: aws_sqs.Queue,
         functions: list[_lambda.Function],
+        throughput_profile: ThroughputProfile,
+        metrics_namespace: str = constants.METRICS_NAMESPACE,
     ) -> None:
         super().__init__(scope, id_)
         self.id_ = id_
+        self.throughput_profile = throughput_profile
+        self.metrics_namespace = metrics_namespace
         self.notification_topic = self._build_topic()
         self._build_high_level_dashboard(self.notification_topic, bucket, queue, dlq)
         self._build_low_level_dashboard(functions, self.notification_topic)
@@ -79,7 +87,7 @@ class Monitoring(Construct):
         metric_factory = high_level_facade.create_metric_factory()
         create_metric = metric_factory.create_metric(
             metric_name='BucketItems',
-            namespace=constants.METRICS_NAMESPACE,
+            namespace=self.metrics_namespace,
             statistic=MetricStatistic.N,
             dimensions_map={constants.METRICS_DIMENSION_KEY: constants.SERVICE_NAME},
             label='batch objects in bucket',
@@ -88,6 +96,100 @@ class Monitoring(Construct):
 
         group = CustomMetricGroup(metrics=[create_metric], title='Daily Batch Objects')
         high_level_facade.monitor_custom(metric_groups=[group], human_readable_name='Daily KPIs', alarm_friendly_name='KPIs')
+        self._build_batch_processing_widgets(high_level_facade)
+        self._build_end_to_end_latency_widgets(high_level_facade)
+
+    def _build_batch_processing_widgets(self, facade: MonitoringFacade) -> None:
+        # aggregated by the handler per invocation, see service/handlers/utils/invocation_metrics.py
+        metric_factory = facade.create_metric_factory()
+        dimensions = {constants.METRICS_DIMENSION_KEY: constants.SERVICE_NAME}
+
+        def create_metric(metric_name: str, statistic: MetricStatistic, label: str):
+            return metric_factory.create_metric(
+                metric_name=metric_name,
+                namespace=self.metrics_namespace,
+                statistic=statistic,
+                dimensions_map=dimensions,
+                label=label,
+                period=Duration.minutes(5),
+            )
+
+        records_group = CustomMetricGroup(
+            metrics=[
+                create_metric('RecordsProcessed', MetricStatistic.SUM, 'records processed'),
+                create_metric('FailedRecords', MetricStatistic.SUM, 'failed records'),
+                create_metric('SkippedDuplicateWrites', MetricStatistic.SUM, 'skipped duplicate writes'),
+            ],
+            title='Records',
+        )
+        bytes_group = CustomMetricGroup(metrics=[create_metric('BytesWritten', MetricStatistic.SUM, 'bytes written')], title='Bytes Written')
+        latency_group = CustomMetricGroup(
+            metrics=[
+                create_metric('S3WriteLatency', MetricStatistic.P50, 'p50'),
+                create_metric('S3WriteLatency', MetricStatistic.P90, 'p90'),
+                create_metric('S3WriteLatency', MetricStatistic.P99, 'p99'),
+            ],
+            title='S3 Write Latency (ms)',
+        )
+        facade.monitor_custom(
+            metric_groups=[records_group, bytes_group, latency_group],
+            human_readable_name='Batch Processing',
+            alarm_friendly_name='BatchProcessing',
+        )
+
+    def _build_end_to_end_latency_widgets(self, facade: MonitoringFacade) -> None:
+        # per record histograms from SentTimestamp to the completed S3 PUT, see observe_record_latencies in service/handlers/logic.py
+        # first deliveries include the queue wait and the batching window, alarm thresholds follow the throughput profile
+        metric_factory = facade.create_metric_factory()
+        dimensions = {constants.METRICS_DIMENSION_KEY: constants.SERVICE_NAME}
+
+        def create_metric(metric_name: str, statistic: MetricStatistic, label: str):
+            return metric_factory.create_metric(
+                metric_name=metric_name,
+                namespace=self.metrics_namespace,
+                statistic=statistic,
+                dimensions_map=dimensions,
+                label=label,
+                period=Duration.minutes(5),
+            )
+
+        def create_alarm(statistic: MetricStatistic, label: str, threshold_ms: int) -> CustomMetricWithAlarm:
+            return CustomMetricWithAlarm(
+                metric=create_metric('EndToEndLatency', statistic, label),
+                alarm_friendly_name=f'EndToEndLatency{label.upper()}',
+                add_alarm={
+                    'Critical': CustomThreshold(
+                        threshold=threshold_ms,
+                        comparison_operator=cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+                        datapoints_to_alarm=3,
+                        evaluation_periods=3,
+                        treat_missing_data_override=cloudwatch.TreatMissingData.NOT_BREACHING,
+                    )
+                },
+            )
+
+        end_to_end_group = CustomMetricGroup(
+            metrics=[
+                create_alarm(MetricStatistic.P50, 'p50', self.throughput_profile.end_to_end_latency_p50_alarm_ms),
+                create_alarm(MetricStatistic.P99, 'p99', self.throughput_profile.end_to_end_latency_p99_alarm_ms),
+                create_metric('RedeliveredEndToEndLatency', MetricStatistic.P50, 'redelivered p50'),
+                create_metric('RedeliveredEndToEndLatency', MetricStatistic.P99, 'redelivered p99'),
+            ],
+            title='End-to-End Latency (ms)',
+        )
+        breakdown_group = CustomMetricGroup(
+            metrics=[
+                create_metric('QueueWaitLatency', MetricStatistic.P99, 'queue wait p99'),
+                create_metric('ProcessingLatency', MetricStatistic.P99, 'processing p99'),
+                create_metric('S3WriteLatency', MetricStatistic.P99, 'write p99'),
+            ],
+            title='End-to-End Latency Breakdown (ms)',
+        )
+        facade.monitor_custom(
+            metric_groups=[end_to_end_group, breakdown_group],
+            human_readable_name='End-to-End Latency',
+            alarm_friendly_name='EndToEndLatency',
+        )
 
     def _build_low_level_dashboard(self, functions: list[_lambda.Function], topic: sns.Topic):
         low_level_facade = MonitoringFacade(
@@ -26,6 +26,8 @@ class ServiceStack(Stack):
             self.blueprint.redrive_queue.sqs_queue,
             self.blueprint.redrive_queue.dead_letter_queue,
             [self.blueprint.lambda_function],
+            self.blueprint.throughput_profile,
+            metrics_namespace=self.blueprint.metrics_namespace,
         )
 
         # add security check
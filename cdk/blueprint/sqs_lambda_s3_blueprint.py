@@ -1,21 +1,65 @@
-from aws_cdk import Duration, RemovalPolicy, aws_sqs
+from typing import Literal
+
+from aws_cdk import CfnOutput, Duration, RemovalPolicy, aws_sqs
+from aws_cdk import aws_dynamodb as dynamodb
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_lambda as _lambda
 from aws_cdk import aws_lambda_event_sources as lambda_event_sources
 from aws_cdk import aws_s3 as s3
-from aws_cdk.aws_lambda_python_alpha import PythonLayerVersion
 from constructs import Construct
 
 import cdk.blueprint.constants as constants
+from cdk.blueprint.assets import function_code, layer_code
+from cdk.blueprint.compaction_construct import ParquetCompaction
+from cdk.blueprint.delivery_stream_construct import DeliveryStreamToS3
+from cdk.blueprint.function_sizing import FunctionSizing
 from cdk.blueprint.secure_s3_construct import SecureS3Construct
 from cdk.blueprint.sqs_redrive_construct import RedrivableSQS
+from cdk.blueprint.throughput_profile import ThroughputProfile
 
 
 class SqsLambdaToS3Construct(Construct):
-    def __init__(self, scope: Construct, id_: str, is_production_env: bool) -> None:
+    def __init__(
+        self,
+        scope: Construct,
+        id_: str,
+        is_production_env: bool,
+        throughput_profile: ThroughputProfile | None = None,
+        function_sizing: FunctionSizing | None = None,
+        delivery_stream: bool = False,
+        fifo: bool = False,
+        offload_bucket: s3.IBucket | None = None,
+        metrics_namespace: str = constants.METRICS_NAMESPACE,
+        concurrency_mode: Literal['threads', 'async'] = 'threads',
+    ) -> None:
         super().__init__(scope, id_)
         self.id_ = id_
+        # CloudWatch namespace of the metrics of all functions, the dashboards and alarms read it
+        self.metrics_namespace = metrics_namespace
+        if fifo and delivery_stream:
+            raise ValueError('FIFO queues keep their order per object write, not with a delivery stream')
+        self.fifo = fifo
+        if concurrency_mode == 'async' and (fifo or delivery_stream):
+            raise ValueError('async writes apply to unordered object writes only, not to FIFO queues or a delivery stream')
+        self.concurrency_mode = concurrency_mode
+        # see benchmarks/power_tuning.py for measured memory and timeout
+        self.function_sizing = function_sizing or FunctionSizing(
+            memory_mb=constants.API_HANDLER_LAMBDA_MEMORY_SIZE,
+            timeout_seconds=constants.API_HANDLER_LAMBDA_TIMEOUT,
+            visibility_timeout_seconds=constants.API_HANDLER_QUEUE_VISIBILITY_TIMEOUT,
+        )
+        self.throughput_profile = throughput_profile or ThroughputProfile(
+            target_records_per_second=constants.API_HANDLER_TARGET_RECORDS_PER_SECOND,
+            record_latency_ms=constants.API_HANDLER_RECORD_LATENCY_MS,
+            function_timeout_seconds=self.function_sizing.timeout_seconds,
+            fifo=fifo,
+        )
+        if self.throughput_profile.fifo != fifo:
+            raise ValueError('the throughput profile must be sized for the queue type, set its fifo flag accordingly')
+        self.function_sizing.validate_profile(self.throughput_profile)
         self.common_layer = self._build_common_layer()
+        # aiobotocore and the botocore it pins only ship with an async SQS function, the other functions use the runtime's boto3
+        self.async_layer = self._build_async_layer() if concurrency_mode == 'async' else None
         self.SecureBucket = SecureS3Construct(self, 'destination', is_production_env)
         self.bucket = self.SecureBucket.bucket
         self.redrive_queue = RedrivableSQS(
@@ -27,13 +71,48 @@ class SqsLambdaToS3Construct(Construct):
             hour='0',
             month='*',
             week_day='*',
-            max_retry_attempts=3,
+            max_retry_attempts=constants.API_HANDLER_MAX_RECEIVE_COUNT,
+            visibility_timeout=Duration.seconds(self.function_sizing.visibility_timeout_seconds),
+            consumer_capacity=self.throughput_profile.sustained_records_per_second,
+            quarantine_bucket=self.bucket,
+            triage=True,  # poison messages leave the redrive cycle instead of failing every night until retention expires
+            fifo=fifo,
+            metrics_namespace=metrics_namespace,
         )
-        self.lambda_role = self._build_lambda_role(self.bucket)
+        self.index_table = self._build_index_table(is_production_env)
+        # producers using an SQS extended client library offload bodies above the SQS message size limit to this bucket
+        self.lambda_role = self._build_lambda_role(self.bucket, offload_bucket)
+        self.index_table.grant(self.lambda_role, 'dynamodb:BatchWriteItem')
+        # analytics consumers that don't need an object per message: records are put to a Firehose delivery stream instead
+        self.delivery_stream = DeliveryStreamToS3(self, 'stream', self.bucket) if delivery_stream else None
+        if self.delivery_stream is not None:
+            self.delivery_stream.grant_put_records(self.lambda_role)
         self.lambda_function = self._create_lambda_function(self.lambda_role, self.bucket, self.redrive_queue.sqs_queue)
+        # rolls the hourly partitions written by the 'hourly' KEY_LAYOUT into Parquet files
+        self.compaction = ParquetCompaction(self, 'compaction', self.bucket, self.common_layer, metrics_namespace=metrics_namespace)
+
+    def _build_index_table(self, is_production_env: bool) -> dynamodb.TableV2:
+        # see service/handlers/utils/order_index.py for the key schema
+        table = dynamodb.TableV2(
+            self,
+            constants.INDEX_TABLE,
+            partition_key=dynamodb.Attribute(name='pk', type=dynamodb.AttributeType.STRING),
+            global_secondary_indexes=[
+                dynamodb.GlobalSecondaryIndexPropsV2(
+                    index_name='by_hour',
+                    partition_key=dynamodb.Attribute(name='hour', type=dynamodb.AttributeType.STRING),
+                    sort_key=dynamodb.Attribute(name='sent_at', type=dynamodb.AttributeType.NUMBER),
+                )
+            ],
+            billing=dynamodb.Billing.on_demand(),
+            point_in_time_recovery_specification=dynamodb.PointInTimeRecoverySpecification(point_in_time_recovery_enabled=True),
+            removal_policy=RemovalPolicy.RETAIN if is_production_env else RemovalPolicy.DESTROY,
+        )
+        CfnOutput(self, id=constants.INDEX_TABLE_OUTPUT, value=table.table_name).override_logical_id(constants.INDEX_TABLE_OUTPUT)
+        return table
 
-    def _build_lambda_role(self, bucket: s3.Bucket) -> iam.Role:
-        return iam.Role(
+    def _build_lambda_role(self, bucket: s3.Bucket, offload_bucket: s3.IBucket | None) -> iam.Role:
+        role = iam.Role(
             self,
             constants.SERVICE_ROLE_ARN,
             assumed_by=iam.ServicePrincipal('lambda.amazonaws.com'),
@@ -41,7 +120,9 @@ class SqsLambdaToS3Construct(Construct):
                 'Bucket': iam.PolicyDocument(
                     statements=[
                         iam.PolicyStatement(
-                            actions=['s3:PutObject', 's3:PutObjectAcl'],
+                            # streamed writes of S3 offloaded payloads abort their multipart upload when they fail, an aggregated
+                            # batch whose index could not be written is deleted, see write_aggregated_batch
+                            actions=['s3:PutObject', 's3:PutObjectAcl', 's3:AbortMultipartUpload', 's3:DeleteObject'],
                             resources=[bucket.bucket_arn, f'{bucket.bucket_arn}/*'],
                             effect=iam.Effect.ALLOW,
                         ),
@@ -63,12 +144,32 @@ class SqsLambdaToS3Construct(Construct):
                 ),
             },
         )
+        if offload_bucket is not None:
+            # offloaded payloads are read and streamed, see write_offloaded_payload
+            role.add_to_policy(
+                iam.PolicyStatement(actions=['s3:GetObject'], resources=[offload_bucket.arn_for_objects('*')], effect=iam.Effect.ALLOW)
+            )
+        return role
 
-    def _build_common_layer(self) -> PythonLayerVersion:
-        return PythonLayerVersion(
+    def _build_common_layer(self) -> _lambda.LayerVersion:
+        return _lambda.LayerVersion(
             self,
             f'{self.id_}{constants.LAMBDA_LAYER_NAME}',
-            entry=constants.COMMON_LAYER_BUILD_FOLDER,
+            code=layer_code(
+                constants.LAMBDA_LAYER_NAME,
+                constants.COMMON_LAYER_BUILD_FOLDER,
+                _lambda.Runtime.PYTHON_3_13,
+                pruned_distributions=constants.COMMON_LAYER_PRUNED_DISTRIBUTIONS,
+            ),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_13],
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+    def _build_async_layer(self) -> _lambda.LayerVersion:
+        return _lambda.LayerVersion(
+            self,
+            f'{self.id_}{constants.ASYNC_LAYER_NAME}',
+            code=layer_code(constants.ASYNC_LAYER_NAME, constants.ASYNC_LAYER_BUILD_FOLDER, _lambda.Runtime.PYTHON_3_13),
             compatible_runtimes=[_lambda.Runtime.PYTHON_3_13],
             removal_policy=RemovalPolicy.DESTROY,
         )
@@ -79,29 +180,53 @@ class SqsLambdaToS3Construct(Construct):
         bucket: s3.Bucket,
         sqs_queue: aws_sqs.Queue,
     ) -> _lambda.Function:
+        environment = {
+            constants.POWERTOOLS_SERVICE_NAME: constants.SERVICE_NAME,  # for logger, tracer and metrics
+            constants.POWERTOOLS_METRICS_NAMESPACE: self.metrics_namespace,
+            constants.POWER_TOOLS_LOG_LEVEL: 'INFO',  # for logger
+            'BUCKET_NAME': bucket.bucket_name,
+            'BATCH_CONCURRENCY': str(self.throughput_profile.batch_concurrency),
+            'IDEMPOTENCY_STORE': 'memory',  # skip rewrites of redelivered messages served by a warm execution environment
+            'KEY_LAYOUT': 'hourly',  # downstream jobs list the partitions of the hours they process only
+            'INDEX_TABLE_NAME': self.index_table.table_name,  # lookups by message id and time range without listing the bucket
+        }
+        if self.delivery_stream is not None:
+            environment['SINK_TYPE'] = 'delivery_stream'
+            environment['DELIVERY_STREAM_NAME'] = self.delivery_stream.delivery_stream_name
+        if self.fifo:
+            environment['FIFO_MODE'] = 'true'  # message groups are written concurrently, each one in order
+        layers = [self.common_layer]
+        if self.async_layer is not None:
+            environment['CONCURRENCY_MODE'] = 'async'
+            layers.append(self.async_layer)  # extracted after the common layer, its boto3 replaces the runtime's
         lambda_function = _lambda.Function(
             self,
             constants.CREATE_LAMBDA,
             runtime=_lambda.Runtime.PYTHON_3_13,
-            code=_lambda.Code.from_asset(constants.BUILD_FOLDER),
+            code=function_code(constants.FUNCTION_CODE_ASSET_NAME, constants.BUILD_FOLDER, _lambda.Runtime.PYTHON_3_13),
             handler='service.handlers.handle_sqs_batch.lambda_handler',
-            environment={
-                constants.POWERTOOLS_SERVICE_NAME: constants.SERVICE_NAME,  # for logger, tracer and metrics
-                constants.POWER_TOOLS_LOG_LEVEL: 'INFO',  # for logger
-                'BUCKET_NAME': bucket.bucket_name,
-            },
+            environment=environment,
             tracing=_lambda.Tracing.ACTIVE,
             retry_attempts=0,
-            timeout=Duration.seconds(constants.API_HANDLER_LAMBDA_TIMEOUT),
-            memory_size=constants.API_HANDLER_LAMBDA_MEMORY_SIZE,
-            layers=[self.common_layer],
+            timeout=Duration.seconds(self.function_sizing.timeout_seconds),
+            memory_size=self.function_sizing.memory_mb,
+            layers=layers,
             role=role,
             logging_format=_lambda.LoggingFormat.JSON,
             system_log_level_v2=_lambda.SystemLogLevel.INFO,
             application_log_level_v2=_lambda.ApplicationLogLevel.INFO,
         )
 
-        # set sqs queue as event source for the lambda functions
-        lambda_function.add_event_source(lambda_event_sources.SqsEventSource(sqs_queue))
+        # set sqs queue as event source for the lambda functions, sized by the throughput profile
+        profile = self.throughput_profile
+        lambda_function.add_event_source(
+            lambda_event_sources.SqsEventSource(
+                sqs_queue,
+                batch_size=profile.batch_size,
+                max_batching_window=Duration.seconds(profile.batching_window_seconds) if profile.batching_window_seconds else None,
+                max_concurrency=profile.maximum_concurrency,
+                report_batch_item_failures=True,  # the handler returns partial batch responses
+            )
+        )
 
         return lambda_function
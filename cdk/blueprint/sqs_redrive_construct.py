@@ -1,9 +1,13 @@
+from typing import Any
+
 from aws_cdk import CfnOutput, Duration, RemovalPolicy, aws_events, aws_events_targets, aws_sqs
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_lambda as _lambda
+from aws_cdk import aws_s3 as s3
 from constructs import Construct
 
 from cdk.blueprint import constants
+from cdk.blueprint.assets import function_code
 
 
 class RedrivableSQS(Construct):
@@ -21,6 +25,17 @@ class RedrivableSQS(Construct):
         month (str): The month of the year to run the DLQ redrive processing function. Valid values see https://docs.aws.amazon.com/eventbridge/latest/userguide/eb-cron-expressions.html #pylint: disable=line-too-long
         week_day (str): The day of the week to run the DLQ redrive processing function. Valid values see https://docs.aws.amazon.com/eventbridge/latest/userguide/eb-cron-expressions.html #pylint: disable=line-too-long
         max_retry_attempts (int): The maximum number of times to retry processing a message in the SQS before sending it to the DLQ. Default is 3. #pylint: disable=line-too-long
+        visibility_timeout (Duration): The visibility timeout of the main SQS queue, at least 6 times the timeout of the consuming function. Default is 5 minutes.
+        consumer_capacity (int): Messages per second the main queue consumers sustain, redrives use a share of the spare capacity. Default is 100.
+        max_queue_depth (int): Main queue backlog that pauses a running redrive, resumed below half of it. Default is 1000.
+        supervise_every (Duration): How often a running redrive is checked for backpressure and a paused one resumed. Default is 5 minutes.
+        quarantine_bucket (s3.IBucket): Bucket keeping poison messages under 'quarantine/'. Required to schedule triage redrives, enables on demand triages.
+        triage (bool): Redrive retryable messages only and quarantine poison ones instead of moving the whole DLQ. Default is False.
+        triage_workers (int): Concurrent DLQ receive loops of a triage. Default is 4.
+        max_deliveries (int): Deliveries over all redrive cycles after which a triage quarantines a message. Default is 10.
+        fifo (bool): Create FIFO queues, '.fifo' is appended to both queue names. Messages are deduplicated by content unless the
+            producer sets a deduplication id, the throughput limit applies per message group. Default is False.
+        metrics_namespace (str): CloudWatch namespace of the redrive metrics. Default is 'sqs_kpi'.
     """
 
     def __init__(
@@ -34,28 +49,45 @@ class RedrivableSQS(Construct):
         month: str,
         week_day: str,
         max_retry_attempts: int,
+        visibility_timeout: Duration | None = None,
+        consumer_capacity: int = 100,
+        max_queue_depth: int = 1000,
+        supervise_every: Duration | None = None,
+        quarantine_bucket: s3.IBucket | None = None,
+        triage: bool = False,
+        triage_workers: int = 4,
+        max_deliveries: int = 10,
+        fifo: bool = False,
+        metrics_namespace: str = constants.METRICS_NAMESPACE,
     ) -> None:
         super().__init__(scope, identifier)
+        if triage and quarantine_bucket is None:
+            raise ValueError('triage redrives require a quarantine bucket')
 
+        self.fifo = fifo
+        # the DLQ of a FIFO queue must be a FIFO queue, messages keep their message group when moved or redriven
+        suffix = '.fifo' if fifo else ''
         self.dead_letter_queue = aws_sqs.Queue(
             self,
             f'{identifier}dlq',
-            queue_name=f'{identifier}dlq',
+            queue_name=f'{identifier}dlq{suffix}',
             encryption=aws_sqs.QueueEncryption.SQS_MANAGED,
             retention_period=Duration.days(14),
             removal_policy=RemovalPolicy.DESTROY,
             enforce_ssl=True,
+            **self._fifo_properties(fifo),
         )
         self.sqs_queue = aws_sqs.Queue(
             self,
             f'{identifier}queue',
-            queue_name=f'{identifier}queue',
+            queue_name=f'{identifier}queue{suffix}',
             encryption=aws_sqs.QueueEncryption.SQS_MANAGED,
             retention_period=Duration.days(14),
             dead_letter_queue=aws_sqs.DeadLetterQueue(max_receive_count=max_retry_attempts, queue=self.dead_letter_queue),
-            visibility_timeout=Duration.minutes(5),
+            visibility_timeout=visibility_timeout or Duration.minutes(5),
             removal_policy=RemovalPolicy.DESTROY,
             enforce_ssl=True,
+            **self._fifo_properties(fifo),
         )
         CfnOutput(self, 'QueueUrl', value=self.sqs_queue.queue_url).override_logical_id('QueueUrl')
 
@@ -65,11 +97,36 @@ class RedrivableSQS(Construct):
             redrive_lambda_runtime,
             self.sqs_queue,
             self.dead_letter_queue,
+            consumer_capacity,
+            max_queue_depth,
+            metrics_namespace,
         )
+        self._configure_triage(self.dlq_lambda, quarantine_bucket, triage, triage_workers, max_deliveries)
         self._create_scheduler_cron(identifier, self.dlq_lambda, minute, hour, month, week_day)  # pylint: disable=too-many-function-args
+        self._create_supervisor_schedule(identifier, self.dlq_lambda, supervise_every or Duration.minutes(5))
+
+    @staticmethod
+    def _fifo_properties(fifo: bool) -> dict[str, Any]:
+        if not fifo:
+            return {}
+        # high throughput FIFO: deduplication and throughput limits per message group instead of per queue
+        return {
+            'fifo': True,
+            'content_based_deduplication': True,
+            'deduplication_scope': aws_sqs.DeduplicationScope.MESSAGE_GROUP,
+            'fifo_throughput_limit': aws_sqs.FifoThroughputLimit.PER_MESSAGE_GROUP_ID,
+        }
 
     def _create_redrive_function(
-        self, identifier: str, layer: _lambda.LayerVersion, runtime: _lambda.Runtime, main_queue: aws_sqs.Queue, dead_letter_queue: aws_sqs.Queue
+        self,
+        identifier: str,
+        layer: _lambda.LayerVersion,
+        runtime: _lambda.Runtime,
+        main_queue: aws_sqs.Queue,
+        dead_letter_queue: aws_sqs.Queue,
+        consumer_capacity: int,
+        max_queue_depth: int,
+        metrics_namespace: str,
     ) -> _lambda.Function:
         # policy defined by https://docs.aws.amazon.com/AWSSimpleQueueService/latest/SQSDeveloperGuide/sqs-api-permissions-reference.html
         role = iam.Role(
@@ -82,10 +139,16 @@ class RedrivableSQS(Construct):
                         iam.PolicyStatement(
                             actions=[
                                 'sqs:StartMessageMoveTask',
+                                'sqs:ListMessageMoveTasks',
+                                'sqs:CancelMessageMoveTask',
                                 'sqs:ReceiveMessage',
                                 'sqs:DeleteMessage',
+                                'sqs:ChangeMessageVisibility',
                                 'sqs:GetQueueAttributes',
                                 'sqs:SendMessage',
+                                'sqs:ListQueueTags',
+                                'sqs:TagQueue',
+                                'sqs:UntagQueue',
                             ],
                             resources=[dead_letter_queue.queue_arn],
                             effect=iam.Effect.ALLOW,
@@ -97,12 +160,23 @@ class RedrivableSQS(Construct):
                         iam.PolicyStatement(
                             actions=[
                                 'sqs:SendMessage',
+                                'sqs:GetQueueAttributes',
                             ],
                             resources=[main_queue.queue_arn],
                             effect=iam.Effect.ALLOW,
                         )
                     ]
                 ),
+                # consumer throughput of the main queue, CloudWatch metric reads don't support resource level permissions
+                'cloudwatch_policy': iam.PolicyDocument(
+                    statements=[
+                        iam.PolicyStatement(
+                            actions=['cloudwatch:GetMetricStatistics'],
+                            resources=['*'],
+                            effect=iam.Effect.ALLOW,
+                        )
+                    ]
+                ),
                 # similar to https://docs.aws.amazon.com/aws-managed-policy/latest/reference/AWSLambdaBasicExecutionRole.html
                 'CloudwatchLogs': iam.PolicyDocument(
                     statements=[
@@ -126,13 +200,17 @@ class RedrivableSQS(Construct):
             function_name=f'{identifier}DlqFunc'[-64:],
             runtime=runtime,
             handler='redrive_lambda.redrive_handler',
-            code=_lambda.Code.from_asset('cdk/blueprint/_redrive_lambda'),
+            code=function_code(constants.REDRIVE_CODE_ASSET_NAME, constants.REDRIVE_LAMBDA_BUILD_FOLDER, runtime),
             role=role,
             environment={
                 constants.POWERTOOLS_SERVICE_NAME: 'dlq_redrive'.lower(),  # used for logger service name
+                constants.POWERTOOLS_METRICS_NAMESPACE: metrics_namespace,
                 'SQS_ARN': main_queue.queue_arn,
                 'DLQ_ARN': dead_letter_queue.queue_arn,
+                'REDRIVE_CONSUMER_CAPACITY': str(consumer_capacity),
+                'REDRIVE_MAX_QUEUE_DEPTH': str(max_queue_depth),
             },
+            timeout=Duration.minutes(5),  # a triage receives messages until the DLQ is drained or the timeout nears
             tracing=_lambda.Tracing.ACTIVE,
             retry_attempts=0,
             layers=[layer],
@@ -141,6 +219,16 @@ class RedrivableSQS(Construct):
             application_log_level_v2=_lambda.ApplicationLogLevel.INFO,
         )
 
+    def _configure_triage(
+        self, dlq_lambda: _lambda.Function, quarantine_bucket: s3.IBucket | None, triage: bool, triage_workers: int, max_deliveries: int
+    ) -> None:
+        dlq_lambda.add_environment('REDRIVE_MODE', 'triage' if triage else 'move')
+        dlq_lambda.add_environment('REDRIVE_WORKERS', str(triage_workers))
+        dlq_lambda.add_environment('REDRIVE_MAX_DELIVERIES', str(max_deliveries))
+        if quarantine_bucket is not None:
+            dlq_lambda.add_environment('QUARANTINE_BUCKET_NAME', quarantine_bucket.bucket_name)
+            quarantine_bucket.grant_put(dlq_lambda, 'quarantine/*')
+
     def _create_scheduler_cron(
         self, identifier: str, dlq_lambda: _lambda.Function, minute: str, hour: str, month: str, week_day: str
     ) -> aws_events.Rule:
@@ -153,6 +241,15 @@ class RedrivableSQS(Construct):
                 month=month,
                 week_day=week_day,
             ),
-            targets=[aws_events_targets.LambdaFunction(handler=dlq_lambda)],
+            targets=[aws_events_targets.LambdaFunction(handler=dlq_lambda, event=aws_events.RuleTargetInput.from_object({'action': 'start'}))],
             rule_name=f'{identifier}Redrive'[-64:],
         )
+
+    def _create_supervisor_schedule(self, identifier: str, dlq_lambda: _lambda.Function, supervise_every: Duration) -> aws_events.Rule:
+        return aws_events.Rule(
+            self,
+            f'{identifier}RedriveSupervisor',
+            schedule=aws_events.Schedule.rate(supervise_every),
+            targets=[aws_events_targets.LambdaFunction(handler=dlq_lambda, event=aws_events.RuleTargetInput.from_object({'action': 'supervise'}))],
+            rule_name=f'{identifier}RedriveSupervisor'[-64:],
+        )
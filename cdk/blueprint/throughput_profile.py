@@ -0,0 +1,102 @@
+import math
+from dataclasses import dataclass
+
+from cdk.blueprint import constants
+
+# SQS event source limits, see https://docs.aws.amazon.com/lambda/latest/dg/services-sqs-configure.html
+MAX_BATCH_SIZE = 10_000  # standard queues, batches above 10 records require a batching window
+MAX_FIFO_BATCH_SIZE = 10  # FIFO queues, without a batching window
+MAX_BATCHING_WINDOW_SECONDS = 300
+MIN_MAXIMUM_CONCURRENCY = 2
+MAX_MAXIMUM_CONCURRENCY = 1000
+MAX_INVOCATION_PAYLOAD_BYTES = 6 * 1024 * 1024  # synchronous invocation payload, the SQS event is sent as one
+RECORD_ENVELOPE_BYTES = 1024  # attributes, ids and receipt handle of an SQS record in the event
+TIMEOUT_UTILIZATION = 0.5  # share of the function timeout a batch is sized for, slow S3 calls and retries take the rest
+LATENCY_ALARM_HEADROOM = 2  # end-to-end latency alarms fire at this multiple of the latency the profile expects
+
+
+@dataclass(frozen=True)
+class ThroughputProfile:
+    """SQS event source settings derived from the declared target throughput and the measured per record latency.
+
+    A batch is processed in ceil(batch_size / batch_concurrency) rounds of one S3 write each, so the batch is sized
+    to finish within TIMEOUT_UTILIZATION of the function timeout and within the invocation payload limit.
+    Maximum concurrency is the number of such invocations needed to sustain the target throughput.
+
+    Args:
+        target_records_per_second (float): Sustained throughput the event source must keep up with.
+        record_latency_ms (float): Latency of writing a single record, i.e the S3 write p99 from benchmarks/handler_throughput.
+        record_size_bytes (int): Typical message body size.
+        batch_concurrency (int): BATCH_CONCURRENCY of the handler.
+        function_timeout_seconds (int): Function timeout.
+        max_wait_seconds (int): Longest a message may wait for its batch to fill up, caps the batching window.
+        fifo (bool): FIFO queue, batches are capped at 10 records. Rounds assume a batch holds at least batch_concurrency
+            message groups, fewer groups per batch lower the throughput of an invocation accordingly.
+    """
+
+    target_records_per_second: float
+    record_latency_ms: float
+    record_size_bytes: int = 1024
+    batch_concurrency: int = constants.API_HANDLER_BATCH_CONCURRENCY
+    function_timeout_seconds: int = constants.API_HANDLER_LAMBDA_TIMEOUT
+    max_wait_seconds: int = 5
+    fifo: bool = False
+
+    def __post_init__(self) -> None:
+        if self.target_records_per_second <= 0 or self.record_latency_ms <= 0 or self.record_size_bytes <= 0:
+            raise ValueError('target throughput, record latency and record size must be positive')
+        if not 0 <= self.max_wait_seconds <= MAX_BATCHING_WINDOW_SECONDS:
+            raise ValueError(f'max_wait_seconds must be between 0 and {MAX_BATCHING_WINDOW_SECONDS}')
+        if self.record_latency_ms > self.function_timeout_seconds * 1000 * TIMEOUT_UTILIZATION:
+            raise ValueError('a single record does not fit into the function timeout')
+        if self.required_concurrency > MAX_MAXIMUM_CONCURRENCY:
+            raise ValueError(
+                f'{self.target_records_per_second} records/s needs {self.required_concurrency} concurrent invocations, '
+                f'more than the event source maximum of {MAX_MAXIMUM_CONCURRENCY}'
+            )
+
+    @property
+    def batch_size(self) -> int:
+        rounds = math.floor(self.function_timeout_seconds * 1000 * TIMEOUT_UTILIZATION / self.record_latency_ms)
+        by_payload = MAX_INVOCATION_PAYLOAD_BYTES // (self.record_size_bytes + RECORD_ENVELOPE_BYTES)
+        # records arriving within the longest wait, without a batching window batches are capped at 10 records
+        by_wait = max(10, math.ceil(self.target_records_per_second * self.max_wait_seconds))
+        return max(1, min(rounds * self.batch_concurrency, by_payload, by_wait, MAX_FIFO_BATCH_SIZE if self.fifo else MAX_BATCH_SIZE))
+
+    @property
+    def batching_window_seconds(self) -> int:
+        if self.batch_size <= 10:
+            return 0
+        # time it takes the target throughput to fill a batch, at least a second as required above 10 records
+        return max(1, min(self.max_wait_seconds, math.ceil(self.batch_size / self.target_records_per_second)))
+
+    @property
+    def invocation_duration_ms(self) -> float:
+        return math.ceil(self.batch_size / self.batch_concurrency) * self.record_latency_ms
+
+    @property
+    def records_per_second_per_invocation(self) -> float:
+        return self.batch_size / (self.invocation_duration_ms / 1000)
+
+    @property
+    def required_concurrency(self) -> int:
+        return math.ceil(self.target_records_per_second / self.records_per_second_per_invocation)
+
+    @property
+    def maximum_concurrency(self) -> int:
+        return max(MIN_MAXIMUM_CONCURRENCY, self.required_concurrency)
+
+    @property
+    def sustained_records_per_second(self) -> int:
+        """Throughput of the event source at maximum concurrency, the consumer capacity a DLQ redrive shares"""
+        return math.floor(self.maximum_concurrency * self.records_per_second_per_invocation)
+
+    @property
+    def end_to_end_latency_p50_alarm_ms(self) -> int:
+        """A record waits for its batch to fill up and for the invocation that writes it, alarms above that with headroom"""
+        return math.ceil(LATENCY_ALARM_HEADROOM * (self.batching_window_seconds * 1000 + self.invocation_duration_ms))
+
+    @property
+    def end_to_end_latency_p99_alarm_ms(self) -> int:
+        """As the p50 alarm, with invocations that take the whole function timeout"""
+        return LATENCY_ALARM_HEADROOM * (self.batching_window_seconds + self.function_timeout_seconds) * 1000
@@ -0,0 +1,93 @@
+import re
+import threading
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+
+class FakeDynamoDBClient:
+    """In-process stand-in for the low level boto3 DynamoDB client, items are keyed by their 'pk' attribute.
+
+    Args:
+        failing (bool): Every request fails with an InternalServerError ClientError.
+        throttled_batches (int): The first BatchWriteItem requests return half of their items as UnprocessedItems.
+    """
+
+    _KEY_CONDITION = re.compile(r'^(\S+) = (:\w+) AND (\S+) BETWEEN (:\w+) AND (:\w+)$')
+
+    def __init__(self, failing: bool = False, throttled_batches: int = 0) -> None:
+        self.failing = failing
+        self.throttled_batches = throttled_batches
+        self.tables: dict[str, dict[str, dict[str, Any]]] = {}
+        self.calls: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_item(self, TableName: str, Key: dict[str, Any], **kwargs: Any) -> dict:
+        self._record_call('GetItem')
+        item = self.tables.get(TableName, {}).get(Key['pk']['S'])
+        return {'Item': item} if item else {}
+
+    def put_item(self, TableName: str, Item: dict[str, Any], **kwargs: Any) -> dict:
+        self._record_call('PutItem')
+        with self._lock:
+            self.tables.setdefault(TableName, {})[Item['pk']['S']] = Item
+        return {}
+
+    def batch_write_item(self, RequestItems: dict[str, list[dict[str, Any]]], **kwargs: Any) -> dict:
+        self._record_call('BatchWriteItem')
+        if sum(len(requests) for requests in RequestItems.values()) > 25:
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'more than 25 items'}}, 'BatchWriteItem')
+        unprocessed: dict[str, list[dict[str, Any]]] = {}
+        with self._lock:
+            throttled = self.throttled_batches > 0
+            self.throttled_batches -= int(throttled)
+        for table_name, requests in RequestItems.items():
+            accepted = requests[: len(requests) // 2] if throttled else requests
+            for request in accepted:
+                self.put_item(TableName=table_name, Item=request['PutRequest']['Item'])
+            if len(accepted) < len(requests):
+                unprocessed[table_name] = requests[len(accepted) :]
+        return {'UnprocessedItems': unprocessed}
+
+    def query(
+        self,
+        TableName: str,
+        IndexName: str,
+        KeyConditionExpression: str,
+        ExpressionAttributeValues: dict[str, Any],
+        ExpressionAttributeNames: dict[str, str] | None = None,
+        Limit: int = 100,
+        ExclusiveStartKey: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> dict:
+        """Supports '<hash key> = :value AND <sort key> BETWEEN :start AND :end' on numeric sort keys"""
+        self._record_call('Query')
+        match = self._KEY_CONDITION.match(KeyConditionExpression)
+        if match is None:
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': KeyConditionExpression}}, 'Query')
+        names = ExpressionAttributeNames or {}
+        hash_key, sort_key = names.get(match.group(1), match.group(1)), names.get(match.group(3), match.group(3))
+        hash_value = ExpressionAttributeValues[match.group(2)]['S']
+        start, end = (float(ExpressionAttributeValues[match.group(group)]['N']) for group in (4, 5))
+        items = sorted(
+            (
+                item
+                for item in self.tables.get(TableName, {}).values()
+                if item.get(hash_key, {}).get('S') == hash_value and start <= float(item[sort_key]['N']) <= end
+            ),
+            key=lambda item: (float(item[sort_key]['N']), item['pk']['S']),
+        )
+        if ExclusiveStartKey is not None:
+            position = next(index for index, item in enumerate(items) if item['pk'] == ExclusiveStartKey['pk'])
+            items = items[position + 1 :]
+        response: dict[str, Any] = {'Items': items[:Limit], 'Count': len(items[:Limit])}
+        if len(items) > Limit:
+            last = items[Limit - 1]
+            response['LastEvaluatedKey'] = {'pk': last['pk'], hash_key: last[hash_key], sort_key: last[sort_key]}
+        return response
+
+    def _record_call(self, operation_name: str) -> None:
+        with self._lock:
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
+        if self.failing:
+            raise ClientError({'Error': {'Code': 'InternalServerError', 'Message': 'injected failure'}}, operation_name)
@@ -0,0 +1,75 @@
+import random
+import threading
+import time
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+MAX_RECORDS_PER_CALL = 500
+MAX_BYTES_PER_CALL = 4 * 1024 * 1024
+
+
+class FakeFirehoseClient:
+    """In-process stand-in for a boto3 Firehose client, used by unit tests and benchmarks.
+
+    PutRecordBatch calls above the service limits fail with InvalidArgumentException like Firehose does.
+
+    Args:
+        latency_seconds (float): Simulated round trip added to every request.
+        record_error_rate (float): Probability of a single record being rejected with ServiceUnavailableException.
+        failing_records (set[bytes] | None): Record data always rejected with InternalFailure.
+        error_rate (float): Probability of a whole call failing with a ServiceUnavailableException ClientError.
+        store_records (bool): Keep delivered records in memory. Benchmarks disable it to keep memory measurements flat.
+        seed (int): Seed of the error injection, runs with the same seed fail the same requests.
+    """
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.0,
+        record_error_rate: float = 0.0,
+        failing_records: set[bytes] | None = None,
+        error_rate: float = 0.0,
+        store_records: bool = True,
+        seed: int = 0,
+    ) -> None:
+        self.latency_seconds = latency_seconds
+        self.record_error_rate = record_error_rate
+        self.failing_records = failing_records or set()
+        self.error_rate = error_rate
+        self.store_records = store_records
+        self.records: dict[str, list[bytes]] = {}
+        self.put_calls = 0
+        self.delivered = 0
+        self.rejected = 0
+        self.max_records_per_call = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def put_record_batch(self, DeliveryStreamName: str, Records: list[dict[str, bytes]], **kwargs: Any) -> dict:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        with self._lock:
+            self.put_calls += 1
+            self.max_records_per_call = max(self.max_records_per_call, len(Records))
+            if len(Records) > MAX_RECORDS_PER_CALL or sum(len(record['Data']) for record in Records) > MAX_BYTES_PER_CALL:
+                raise _client_error('InvalidArgumentException', 400)
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise _client_error('ServiceUnavailableException', 503)
+            responses = [self._put_record(DeliveryStreamName, record['Data']) for record in Records]
+        return {'FailedPutCount': sum('ErrorCode' in response for response in responses), 'Encrypted': False, 'RequestResponses': responses}
+
+    def _put_record(self, stream_name: str, data: bytes) -> dict:
+        if data in self.failing_records:
+            self.rejected += 1
+            return {'ErrorCode': 'InternalFailure', 'ErrorMessage': 'injected failure'}
+        if self.record_error_rate and self._random.random() < self.record_error_rate:
+            self.rejected += 1
+            return {'ErrorCode': 'ServiceUnavailableException', 'ErrorMessage': 'Slow down.'}
+        self.delivered += 1
+        if self.store_records:
+            self.records.setdefault(stream_name, []).append(data)
+        return {'RecordId': f'record-{self.delivered}'}
+
+
+def _client_error(code: str, status_code: int) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, 'PutRecordBatch')
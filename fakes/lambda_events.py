@@ -0,0 +1,37 @@
+import json
+import uuid
+
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+
+def generate_context(remaining_time_in_millis: int = 10_000) -> LambdaContext:
+    context = LambdaContext()
+    context._aws_request_id = '888888'
+    context._function_name = 'test'
+    context._memory_limit_in_mb = 128
+    context._invoked_function_arn = 'arn:aws:lambda:eu-west-1:123456789012:function:test'
+    context.get_remaining_time_in_millis = lambda: remaining_time_in_millis  # type: ignore[method-assign]
+    return context
+
+
+def generate_sqs_record(body: dict | str, message_id: str | None = None) -> dict:
+    return {
+        'messageId': message_id or str(uuid.uuid4()),
+        'receiptHandle': 'AQEBwJnKyrHigUMZj6rYigCgxlaS3SLy0a',
+        'body': body if isinstance(body, str) else json.dumps(body),
+        'attributes': {
+            'ApproximateReceiveCount': '1',
+            'SentTimestamp': '1545082649183',
+            'SenderId': 'AIDAIENQZJOLO23YVJ4VO',
+            'ApproximateFirstReceiveTimestamp': '1545082649185',
+        },
+        'messageAttributes': {},
+        'md5OfBody': 'e4e68fb7bd0e697a0ae8f1bb342846b3',
+        'eventSource': 'aws:sqs',
+        'eventSourceARN': 'arn:aws:sqs:us-east-2: 123456789012:my-queue',
+        'awsRegion': 'us-east-1',
+    }
+
+
+def generate_sqs_event(bodies: list[dict | str]) -> dict:
+    return {'Records': [generate_sqs_record(body) for body in bodies]}
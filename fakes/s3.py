@@ -0,0 +1,202 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from hashlib import md5
+from io import BytesIO
+from typing import Any
+
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+
+class FakeS3Client:
+    """In-process stand-in for a boto3 S3 client, used by unit tests and benchmarks.
+
+    Args:
+        latency_seconds (float): Simulated round trip added to every request.
+        failing_keys (set[str] | None): Object keys whose writes always fail with an InternalError ClientError, delete_objects reports them as Errors.
+        error_rate (float): Probability of any write failing with a SlowDown ClientError.
+        store_objects (bool): Keep written bodies in memory. Benchmarks disable it to keep memory measurements flat.
+        seed (int): Seed of the error injection, runs with the same seed fail the same requests.
+    """
+
+    def __init__(
+        self,
+        latency_seconds: float = 0.0,
+        failing_keys: set[str] | None = None,
+        error_rate: float = 0.0,
+        store_objects: bool = True,
+        seed: int = 0,
+    ) -> None:
+        self.latency_seconds = latency_seconds
+        self.failing_keys = failing_keys or set()
+        self.error_rate = error_rate
+        self.store_objects = store_objects
+        self.objects: dict[str, dict[str, Any]] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.completed_uploads = 0
+        self.aborted_uploads = 0
+        self.max_part_size = 0
+        self.put_calls = 0
+        self.list_calls = 0
+        self.failed_calls = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs: Any) -> dict:
+        self._enter()
+        try:
+            if self.latency_seconds:
+                time.sleep(self.latency_seconds)
+            return self._store_object(Bucket, Key, Body, kwargs)
+        finally:
+            self._exit()
+
+    def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        stored = self._get_stored(Bucket, Key, 'GetObject')
+        body: bytes = stored['Body']
+        if 'Range' in kwargs:
+            start, end = kwargs['Range'].removeprefix('bytes=').split('-')
+            body = body[int(start) : int(end) + 1]
+        return {**stored, 'Body': StreamingBody(BytesIO(body), len(body)), 'ContentLength': len(body)}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        stored = self._get_stored(Bucket, Key, 'HeadObject')
+        return {'ETag': stored['ETag'], 'ContentLength': len(stored['Body'])}
+
+    def list_objects_v2(
+        self, Bucket: str, Prefix: str = '', MaxKeys: int = 1000, ContinuationToken: str | None = None, StartAfter: str = '', **kwargs: Any
+    ) -> dict:
+        self.list_calls += 1
+        # keys are listed in UTF-8 binary order, the continuation token is the last key of the previous page
+        after = ContinuationToken or (f'{Bucket}/{StartAfter}' if StartAfter else '')
+        keys = sorted(key for key in self.objects if key.startswith(f'{Bucket}/{Prefix}') and key > after)
+        page = keys[:MaxKeys]
+        response: dict[str, Any] = {
+            'Contents': [
+                {'Key': key.removeprefix(f'{Bucket}/'), 'Size': len(self.objects[key]['Body']), 'LastModified': self.objects[key]['LastModified']}
+                for key in page
+            ],
+            'KeyCount': len(page),
+            'IsTruncated': len(keys) > MaxKeys,
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        with self._lock:
+            self.objects.pop(f'{Bucket}/{Key}', None)
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: dict, **kwargs: Any) -> dict:
+        if len(Delete['Objects']) > 1000:
+            raise ClientError({'Error': {'Code': 'MalformedXML', 'Message': 'more than 1000 keys'}}, 'DeleteObjects')
+        # like S3, a key that fails is reported in Errors while the request itself succeeds
+        errors = [
+            {'Key': deleted['Key'], 'Code': 'InternalError', 'Message': 'injected failure'}
+            for deleted in Delete['Objects']
+            if deleted['Key'] in self.failing_keys
+        ]
+        deleted_objects = [deleted for deleted in Delete['Objects'] if deleted['Key'] not in self.failing_keys]
+        for deleted in deleted_objects:
+            self.delete_object(Bucket=Bucket, Key=deleted['Key'])
+        response: dict[str, Any] = {} if Delete.get('Quiet') else {'Deleted': deleted_objects}
+        if errors:
+            response['Errors'] = errors
+        return response
+
+    def create_multipart_upload(self, Bucket: str, Key: str, **kwargs: Any) -> dict:
+        upload_id = f'upload-{len(self.uploads)}'
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes, **kwargs: Any) -> dict:
+        self._enter()
+        try:
+            self._inject_errors(Key, 'UploadPart')
+            self.max_part_size = max(self.max_part_size, len(Body))
+            self.uploads[UploadId][PartNumber] = Body if self.store_objects else b''
+            return {'ETag': f'"{md5(Body).hexdigest()}"'}
+        finally:
+            self._exit()
+
+    def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict, **kwargs: Any) -> dict:
+        parts = self.uploads.pop(UploadId)
+        body = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+        self.completed_uploads += 1
+        if self.store_objects:
+            with self._lock:
+                self.objects[f'{Bucket}/{Key}'] = {
+                    'Body': body,
+                    'ETag': f'"{md5(body).hexdigest()}-{len(parts)}"',
+                    'LastModified': datetime.now(timezone.utc),
+                }
+        return {'ETag': f'"{md5(body).hexdigest()}-{len(parts)}"'}
+
+    def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str, **kwargs: Any) -> dict:
+        self.uploads.pop(UploadId, None)
+        self.aborted_uploads += 1
+        return {}
+
+    def _store_object(self, bucket: str, key: str, body: bytes, kwargs: dict[str, Any]) -> dict:
+        self._inject_errors(key, 'PutObject')
+        etag = f'"{md5(body).hexdigest()}"'
+        if self.store_objects:
+            with self._lock:
+                self.objects[f'{bucket}/{key}'] = {'Body': body, 'ETag': etag, 'LastModified': datetime.now(timezone.utc), **kwargs}
+        return {'ETag': etag}
+
+    def _get_stored(self, bucket: str, key: str, operation_name: str) -> dict[str, Any]:
+        try:
+            return self.objects[f'{bucket}/{key}']
+        except KeyError:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': key}}, operation_name) from None
+
+    def _inject_errors(self, key: str, operation_name: str) -> None:
+        with self._lock:
+            slow_down = self.error_rate > 0 and self._random.random() < self.error_rate
+            if key in self.failing_keys or slow_down:
+                self.failed_calls += 1
+        if key in self.failing_keys:
+            raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'injected failure'}}, operation_name)
+        if slow_down:
+            raise ClientError(
+                {'Error': {'Code': 'SlowDown', 'Message': 'injected throttling'}, 'ResponseMetadata': {'HTTPStatusCode': 503}}, operation_name
+            )
+
+    def _enter(self) -> None:
+        with self._lock:
+            self.put_calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+
+class FakeAsyncS3Client:
+    """In-process stand-in for an aiobotocore S3 client, objects are kept and counted by the wrapped FakeS3Client.
+
+    Args:
+        client (FakeS3Client): Holds the objects, its latency and injected errors apply. The latency is awaited, not slept.
+    """
+
+    def __init__(self, client: FakeS3Client) -> None:
+        self.client = client
+
+    async def put_object(self, Bucket: str, Key: str, Body: bytes, **kwargs: Any) -> dict:
+        self.client._enter()
+        try:
+            if self.client.latency_seconds:
+                await asyncio.sleep(self.client.latency_seconds)
+            return self.client._store_object(Bucket, Key, Body, kwargs)
+        finally:
+            self.client._exit()
@@ -0,0 +1,434 @@
+import hashlib
+import heapq
+import itertools
+import threading
+import uuid
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+
+class FakeSQSClient:
+    """In-process stand-in for the boto3 SQS client, queues are addressed by URL or ARN and created on first use.
+
+    Message move tasks don't run on their own, advance(seconds) moves messages at the task's rate. Queues named
+    '.fifo' require a MessageGroupId, drop messages with an already seen deduplication id and don't return messages of a
+    group with a message in flight. Without a MessageDeduplicationId the SHA-256 of the body is used, as with content
+    based deduplication.
+    """
+
+    def __init__(self) -> None:
+        self.queues: dict[str, list[dict[str, Any]]] = {}
+        self.tags: dict[str, dict[str, str]] = {}
+        self.tasks: list[dict[str, Any]] = []
+        self.calls: dict[str, int] = {}
+        self.deduplication_ids: dict[str, set[str]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def add_messages(
+        self, queue: str, bodies: list[str], receive_count: int = 1, attributes: dict | None = None, group_id: str | None = None
+    ) -> None:
+        for body in bodies:
+            self._queue(queue).append(self._message(body, attributes or {}, receive_count, group_id))
+
+    def get_queue_attributes(self, QueueUrl: str, AttributeNames: list[str], **kwargs: Any) -> dict:
+        messages = self._queue(QueueUrl)
+        in_flight = sum(1 for message in messages if message['in_flight'])
+        return {
+            'Attributes': {
+                'ApproximateNumberOfMessages': str(len(messages) - in_flight),
+                'ApproximateNumberOfMessagesNotVisible': str(in_flight),
+            }
+        }
+
+    def send_message(
+        self,
+        QueueUrl: str,
+        MessageBody: str,
+        MessageAttributes: dict | None = None,
+        MessageGroupId: str | None = None,
+        MessageDeduplicationId: str | None = None,
+        **kwargs: Any,
+    ) -> dict:
+        if self._name(QueueUrl).endswith('.fifo'):
+            if MessageGroupId is None:
+                raise ClientError({'Error': {'Code': 'MissingParameter', 'Message': 'MessageGroupId'}}, 'SendMessage')
+            if MessageDeduplicationId is None:
+                MessageDeduplicationId = hashlib.sha256(MessageBody.encode('utf-8')).hexdigest()
+        message = self._message(MessageBody, MessageAttributes or {}, 0, MessageGroupId)
+        with self._lock:
+            if MessageDeduplicationId is not None:
+                seen = self.deduplication_ids.setdefault(self._name(QueueUrl), set())
+                if MessageDeduplicationId in seen:
+                    return {'MessageId': message['MessageId']}
+                seen.add(MessageDeduplicationId)
+            self._queue(QueueUrl).append(message)
+        return {'MessageId': message['MessageId']}
+
+    def send_message_batch(self, QueueUrl: str, Entries: list[dict[str, Any]], **kwargs: Any) -> dict:
+        self._count('SendMessageBatch')
+        if len(Entries) > 10:
+            raise ClientError({'Error': {'Code': 'TooManyEntriesInBatchRequest', 'Message': str(len(Entries))}}, 'SendMessageBatch')
+        if sum(len(entry['MessageBody'].encode('utf-8')) for entry in Entries) > 262_144:
+            raise ClientError({'Error': {'Code': 'BatchRequestTooLong', 'Message': 'batch payload above 256 KiB'}}, 'SendMessageBatch')
+        successful = []
+        for entry in Entries:
+            self.send_message(
+                QueueUrl=QueueUrl,
+                MessageBody=entry['MessageBody'],
+                MessageAttributes=entry.get('MessageAttributes'),
+                MessageGroupId=entry.get('MessageGroupId'),
+                MessageDeduplicationId=entry.get('MessageDeduplicationId'),
+            )
+            successful.append({'Id': entry['Id']})
+        return {'Successful': successful, 'Failed': []}
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, **kwargs: Any) -> dict:
+        self._count('ReceiveMessage')
+        with self._lock:
+            messages = self._queue(QueueUrl)
+            # messages of a FIFO group are returned once the group has no message in flight
+            locked = {message['Attributes'].get('MessageGroupId') for message in messages if message['in_flight']} - {None}
+            received = [message for message in messages if not message['in_flight'] and message['Attributes'].get('MessageGroupId') not in locked][
+                :MaxNumberOfMessages
+            ]
+            for message in received:
+                message['in_flight'] = True
+                message['Attributes']['ApproximateReceiveCount'] = str(int(message['Attributes']['ApproximateReceiveCount']) + 1)
+        return {'Messages': [self._public(message) for message in received]} if received else {}
+
+    def delete_message_batch(self, QueueUrl: str, Entries: list[dict[str, Any]], **kwargs: Any) -> dict:
+        self._count('DeleteMessageBatch')
+        handles = {entry['ReceiptHandle'] for entry in Entries}
+        with self._lock:
+            self.queues[self._name(QueueUrl)] = [message for message in self._queue(QueueUrl) if message['ReceiptHandle'] not in handles]
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def change_message_visibility_batch(self, QueueUrl: str, Entries: list[dict[str, Any]], **kwargs: Any) -> dict:
+        self._count('ChangeMessageVisibilityBatch')
+        released = {entry['ReceiptHandle'] for entry in Entries if entry['VisibilityTimeout'] == 0}
+        with self._lock:
+            for message in self._queue(QueueUrl):
+                if message['ReceiptHandle'] in released:
+                    message['in_flight'] = False
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def start_message_move_task(self, SourceArn: str, DestinationArn: str | None = None, MaxNumberOfMessagesPerSecond: int | None = None) -> dict:
+        self._count('StartMessageMoveTask')
+        if any(task['SourceArn'] == SourceArn and task['Status'] == 'RUNNING' for task in self.tasks):
+            raise ClientError({'Error': {'Code': 'UnsupportedOperation', 'Message': 'a task is already running'}}, 'StartMessageMoveTask')
+        task = {
+            'TaskHandle': str(uuid.uuid4()),
+            'Status': 'RUNNING',
+            'SourceArn': SourceArn,
+            'DestinationArn': DestinationArn,
+            'MaxNumberOfMessagesPerSecond': MaxNumberOfMessagesPerSecond,
+            'ApproximateNumberOfMessagesMoved': 0,
+            'ApproximateNumberOfMessagesToMove': len(self._queue(SourceArn)),
+            'StartedTimestamp': int(datetime.now(timezone.utc).timestamp() * 1000),
+        }
+        self.tasks.insert(0, task)
+        return {'TaskHandle': task['TaskHandle']}
+
+    def list_message_move_tasks(self, SourceArn: str, MaxResults: int = 1) -> dict:
+        return {'Results': [dict(task) for task in self.tasks if task['SourceArn'] == SourceArn][:MaxResults]}
+
+    def cancel_message_move_task(self, TaskHandle: str) -> dict:
+        self._count('CancelMessageMoveTask')
+        task = next(task for task in self.tasks if task['TaskHandle'] == TaskHandle)
+        task['Status'] = 'CANCELLED'
+        return {'ApproximateNumberOfMessagesMoved': task['ApproximateNumberOfMessagesMoved']}
+
+    def advance(self, seconds: float) -> None:
+        """Moves messages of running tasks as if the given time passed"""
+        for task in self.tasks:
+            if task['Status'] != 'RUNNING':
+                continue
+            source = self._queue(task['SourceArn'])
+            moving = source[: int((task['MaxNumberOfMessagesPerSecond'] or 500) * seconds)]
+            del source[: len(moving)]
+            for message in moving:
+                message['in_flight'] = False
+            self._queue(task['DestinationArn']).extend(moving)
+            task['ApproximateNumberOfMessagesMoved'] += len(moving)
+            if not source:
+                task['Status'] = 'COMPLETED'
+
+    def list_queue_tags(self, QueueUrl: str) -> dict:
+        tags = self.tags.get(self._name(QueueUrl), {})
+        return {'Tags': dict(tags)} if tags else {}
+
+    def tag_queue(self, QueueUrl: str, Tags: dict[str, str]) -> dict:
+        self.tags.setdefault(self._name(QueueUrl), {}).update(Tags)
+        return {}
+
+    def untag_queue(self, QueueUrl: str, TagKeys: list[str]) -> dict:
+        for key in TagKeys:
+            self.tags.get(self._name(QueueUrl), {}).pop(key, None)
+        return {}
+
+    def _message(self, body: str, attributes: dict, receive_count: int, group_id: str | None = None) -> dict[str, Any]:
+        message_id = str(uuid.uuid4())
+        message: dict[str, Any] = {
+            'MessageId': message_id,
+            'ReceiptHandle': f'{message_id}-{next(self._ids)}',
+            'Body': body,
+            'Attributes': {'ApproximateReceiveCount': str(receive_count), 'SentTimestamp': str(int(datetime.now(timezone.utc).timestamp() * 1000))},
+            'MessageAttributes': attributes,
+            'in_flight': False,
+        }
+        if group_id is not None:
+            message['Attributes']['MessageGroupId'] = group_id
+        return message
+
+    def _public(self, message: dict[str, Any]) -> dict[str, Any]:
+        return {key: value for key, value in message.items() if key != 'in_flight'}
+
+    def _queue(self, queue: str) -> list[dict[str, Any]]:
+        return self.queues.setdefault(self._name(queue), [])
+
+    def _count(self, operation_name: str) -> None:
+        with self._lock:
+            self.calls[operation_name] = self.calls.get(operation_name, 0) + 1
+
+    @staticmethod
+    def _name(queue: str) -> str:
+        # the queue name is the last segment of both queue URLs and ARNs
+        return queue.replace(':', '/').rsplit('/', 1)[-1]
+
+
+@dataclass
+class _QueuedMessage:
+    message_id: str
+    body: str
+    message_attributes: dict[str, Any]
+    sent_timestamp: int  # milliseconds since the epoch
+    receive_count: int = 0
+    receipt_handle: str | None = None  # of the current receive, None while visible
+    visible_at: float = 0.0
+
+
+@dataclass
+class _EmulatedQueue:
+    visibility_timeout: float
+    dead_letter_queue: str | None
+    max_receive_count: int | None
+    visible: deque[str] = field(default_factory=deque)
+    messages: dict[str, _QueuedMessage] = field(default_factory=dict)
+    in_flight: list[tuple[float, str]] = field(default_factory=list)  # heap of visible again at, receipt handle
+    handles: dict[str, str] = field(default_factory=dict)  # current receipt handles to message ids
+    sent: int = 0
+    deleted: int = 0
+    moved_to_dead_letter_queue: int = 0
+
+
+class EmulatedSQSClient:
+    """In-process SQS stand-in with visibility timeouts, redrive policies and message move tasks, in virtual time.
+
+    Unlike FakeSQSClient, received messages become visible again once their visibility timeout expires, and a message
+    received more than max_receive_count times is moved to its dead-letter queue instead, keeping its id and receive
+    count. Queues are indexed, so receiving and deleting stay constant time with millions of queued messages.
+    Queues are created with create_queue and addressed by URL, ARN or name.
+
+    Args:
+        clock (Callable[[], float]): Current virtual time in seconds.
+        start_timestamp (float | None): Epoch seconds of virtual time 0, the base of SentTimestamp. Defaults to now.
+    """
+
+    def __init__(self, clock: Callable[[], float], start_timestamp: float | None = None) -> None:
+        self.clock = clock
+        self.start_timestamp = datetime.now(timezone.utc).timestamp() if start_timestamp is None else start_timestamp
+        self.queues: dict[str, _EmulatedQueue] = {}
+        self.tags: dict[str, dict[str, str]] = {}
+        self.tasks: list[dict[str, Any]] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def create_queue(
+        self, name: str, visibility_timeout: float = 30, dead_letter_queue: str | None = None, max_receive_count: int | None = None
+    ) -> None:
+        self.queues[name] = _EmulatedQueue(visibility_timeout, dead_letter_queue, max_receive_count)
+
+    def send_message(self, QueueUrl: str, MessageBody: str, MessageAttributes: dict | None = None, **kwargs: Any) -> dict:
+        message = _QueuedMessage(str(uuid.uuid4()), MessageBody, MessageAttributes or {}, self._timestamp())
+        with self._lock:
+            self._enqueue(self._queue(QueueUrl), message)
+        return {'MessageId': message.message_id}
+
+    def send_message_batch(self, QueueUrl: str, Entries: list[dict[str, Any]], **kwargs: Any) -> dict:
+        if len(Entries) > 10:
+            raise ClientError({'Error': {'Code': 'TooManyEntriesInBatchRequest', 'Message': str(len(Entries))}}, 'SendMessageBatch')
+        for entry in Entries:
+            self.send_message(QueueUrl=QueueUrl, MessageBody=entry['MessageBody'], MessageAttributes=entry.get('MessageAttributes'))
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def receive_message(self, QueueUrl: str, MaxNumberOfMessages: int = 1, VisibilityTimeout: float | None = None, **kwargs: Any) -> dict:
+        """Receives up to MaxNumberOfMessages, the Lambda event source receives whole batches of up to 10,000"""
+        now = self.clock()
+        received: list[dict[str, Any]] = []
+        with self._lock:
+            queue = self._queue(QueueUrl)
+            self._release_expired(queue, now)
+            while queue.visible and len(received) < MaxNumberOfMessages:
+                message = queue.messages[queue.visible.popleft()]
+                message.receive_count += 1
+                if queue.max_receive_count is not None and queue.dead_letter_queue and message.receive_count > queue.max_receive_count:
+                    del queue.messages[message.message_id]
+                    queue.moved_to_dead_letter_queue += 1
+                    message.receive_count -= 1  # the moving receive isn't a delivery
+                    self._enqueue(self.queues[queue.dead_letter_queue], message)
+                    continue
+                message.receipt_handle = f'{message.message_id}-{next(self._ids)}'
+                message.visible_at = now + (queue.visibility_timeout if VisibilityTimeout is None else VisibilityTimeout)
+                queue.handles[message.receipt_handle] = message.message_id
+                heapq.heappush(queue.in_flight, (message.visible_at, message.receipt_handle))
+                received.append(self._public(message))
+        return {'Messages': received} if received else {}
+
+    def delete_message_batch(self, QueueUrl: str, Entries: list[dict[str, Any]], **kwargs: Any) -> dict:
+        successful, failed = [], []
+        with self._lock:
+            queue = self._queue(QueueUrl)
+            for entry in Entries:
+                # a receipt handle is valid until its message is received again
+                message_id = queue.handles.pop(entry['ReceiptHandle'], None)
+                if message_id is None:
+                    failed.append({'Id': entry['Id'], 'Code': 'ReceiptHandleIsInvalid', 'SenderFault': True})
+                    continue
+                del queue.messages[message_id]
+                queue.deleted += 1
+                successful.append({'Id': entry['Id']})
+        return {'Successful': successful, 'Failed': failed}
+
+    def change_message_visibility_batch(self, QueueUrl: str, Entries: list[dict[str, Any]], **kwargs: Any) -> dict:
+        now = self.clock()
+        with self._lock:
+            queue = self._queue(QueueUrl)
+            for entry in Entries:
+                message_id = queue.handles.get(entry['ReceiptHandle'])
+                if message_id is not None:
+                    queue.messages[message_id].visible_at = now + entry['VisibilityTimeout']
+                    heapq.heappush(queue.in_flight, (now + entry['VisibilityTimeout'], entry['ReceiptHandle']))
+            self._release_expired(queue, now)
+        return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+
+    def get_queue_attributes(self, QueueUrl: str, AttributeNames: list[str], **kwargs: Any) -> dict:
+        with self._lock:
+            queue = self._queue(QueueUrl)
+            self._release_expired(queue, self.clock())
+            return {
+                'Attributes': {
+                    'ApproximateNumberOfMessages': str(len(queue.visible)),
+                    'ApproximateNumberOfMessagesNotVisible': str(len(queue.handles)),
+                }
+            }
+
+    def next_visible_at(self, queue: str) -> float | None:
+        """Earliest time an in-flight message may become visible again"""
+        in_flight = self._queue(queue).in_flight
+        return in_flight[0][0] if in_flight else None
+
+    def start_message_move_task(self, SourceArn: str, DestinationArn: str, MaxNumberOfMessagesPerSecond: int | None = None) -> dict:
+        if any(task['SourceArn'] == SourceArn and task['Status'] == 'RUNNING' for task in self.tasks):
+            raise ClientError({'Error': {'Code': 'UnsupportedOperation', 'Message': 'a task is already running'}}, 'StartMessageMoveTask')
+        task = {
+            'TaskHandle': str(uuid.uuid4()),
+            'Status': 'RUNNING',
+            'SourceArn': SourceArn,
+            'DestinationArn': DestinationArn,
+            'MaxNumberOfMessagesPerSecond': MaxNumberOfMessagesPerSecond,
+            'ApproximateNumberOfMessagesMoved': 0,
+            'ApproximateNumberOfMessagesToMove': len(self._queue(SourceArn).messages),
+            'StartedTimestamp': self._timestamp(),
+            'credit': 0.0,
+        }
+        self.tasks.insert(0, task)
+        return {'TaskHandle': task['TaskHandle']}
+
+    def list_message_move_tasks(self, SourceArn: str, MaxResults: int = 1) -> dict:
+        tasks = [task for task in self.tasks if task['SourceArn'] == SourceArn][:MaxResults]
+        return {'Results': [{key: value for key, value in task.items() if key != 'credit'} for task in tasks]}
+
+    def cancel_message_move_task(self, TaskHandle: str) -> dict:
+        task = next(task for task in self.tasks if task['TaskHandle'] == TaskHandle)
+        task['Status'] = 'CANCELLED'
+        return {'ApproximateNumberOfMessagesMoved': task['ApproximateNumberOfMessagesMoved']}
+
+    def advance(self, seconds: float) -> None:
+        """Moves visible messages of running tasks at the task's rate, as if the given time passed"""
+        with self._lock:
+            for task in self.tasks:
+                if task['Status'] != 'RUNNING':
+                    continue
+                source, destination = self._queue(task['SourceArn']), self._queue(task['DestinationArn'])
+                self._release_expired(source, self.clock())
+                task['credit'] += (task['MaxNumberOfMessagesPerSecond'] or 500) * seconds
+                while source.visible and task['credit'] >= 1:
+                    message = source.messages.pop(source.visible.popleft())
+                    # moved messages are new messages of the destination queue
+                    self._enqueue(destination, _QueuedMessage(message.message_id, message.body, message.message_attributes, self._timestamp()))
+                    task['credit'] -= 1
+                    task['ApproximateNumberOfMessagesMoved'] += 1
+                if not source.messages:
+                    task['Status'] = 'COMPLETED'
+
+    def list_queue_tags(self, QueueUrl: str) -> dict:
+        tags = self.tags.get(FakeSQSClient._name(QueueUrl), {})
+        return {'Tags': dict(tags)} if tags else {}
+
+    def tag_queue(self, QueueUrl: str, Tags: dict[str, str]) -> dict:
+        self.tags.setdefault(FakeSQSClient._name(QueueUrl), {}).update(Tags)
+        return {}
+
+    def untag_queue(self, QueueUrl: str, TagKeys: list[str]) -> dict:
+        for key in TagKeys:
+            self.tags.get(FakeSQSClient._name(QueueUrl), {}).pop(key, None)
+        return {}
+
+    def _enqueue(self, queue: _EmulatedQueue, message: _QueuedMessage) -> None:
+        message.receipt_handle = None
+        queue.messages[message.message_id] = message
+        queue.visible.append(message.message_id)
+        queue.sent += 1
+
+    def _release_expired(self, queue: _EmulatedQueue, now: float) -> None:
+        while queue.in_flight and queue.in_flight[0][0] <= now:
+            _, receipt_handle = heapq.heappop(queue.in_flight)
+            message_id = queue.handles.get(receipt_handle)
+            # entries of deleted or released messages and of extended visibility timeouts are stale
+            if message_id is None or queue.messages[message_id].visible_at > now:
+                continue
+            del queue.handles[receipt_handle]
+            queue.messages[message_id].receipt_handle = None
+            queue.visible.append(message_id)
+
+    def _public(self, message: _QueuedMessage) -> dict[str, Any]:
+        return {
+            'MessageId': message.message_id,
+            'ReceiptHandle': message.receipt_handle,
+            'Body': message.body,
+            'Attributes': {'ApproximateReceiveCount': str(message.receive_count), 'SentTimestamp': str(message.sent_timestamp)},
+            'MessageAttributes': message.message_attributes,
+        }
+
+    def _queue(self, queue: str) -> _EmulatedQueue:
+        return self.queues[FakeSQSClient._name(queue)]
+
+    def _timestamp(self) -> int:
+        return int((self.start_timestamp + self.clock()) * 1000)
+
+
+class FakeCloudWatchClient:
+    """Answers get_metric_statistics with a constant per second rate per metric name"""
+
+    def __init__(self, rates: dict[str, float] | None = None) -> None:
+        self.rates = rates or {}
+
+    def get_metric_statistics(self, MetricName: str, Period: int, **kwargs: Any) -> dict:
+        rate = self.rates.get(MetricName)
+        return {'Datapoints': [] if rate is None else [{'Sum': rate * Period}]}
@@ -1,19 +1,15 @@
-from aws_lambda_powertools.utilities.batch import BatchProcessor, EventType, process_partial_response
+from service.handlers.utils.cold_start import init_execution_environment
 
-from service.handlers.logic import record_handler
-from service.handlers.models.sqs_item import OrderSqsRecord
-from service.handlers.utils.observability import logger, metrics, tracer
+init_execution_environment()
 
-processor = BatchProcessor(event_type=EventType.SQS, model=OrderSqsRecord)
 
-
-@logger.inject_lambda_context
-@metrics.log_metrics
-@tracer.capture_lambda_handler(capture_response=False)
 def lambda_handler(event, context):
-    return process_partial_response(
-        event=event,
-        record_handler=record_handler,
-        processor=processor,
-        context=context,
-    )
+    """SQS event source entry point.
+
+    Powertools batch, parser, tracer and metrics, the record models and the handler logic are imported by
+    init_execution_environment while pre-warming, or by the first invocation when COLD_START_PREWARM is false.
+    """
+    # deferred import, a dictionary lookup once the module was imported
+    from service.handlers.process_sqs_batch import process_sqs_batch
+
+    return process_sqs_batch(event, context)
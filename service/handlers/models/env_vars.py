@@ -1,6 +1,16 @@
+from importlib.util import find_spec
 from typing import Annotated, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+Compression = Literal['none', 'gzip', 'zstd']
+ParsingMode = Literal['strict', 'fast']
+IdempotencyStoreType = Literal['none', 'memory', 'dynamodb']
+KeyLayout = Literal['flat', 'hashed', 'hourly', 'hourly_hashed']
+CompactionFormat = Literal['parquet', 'arrow']
+CompactionCompression = Literal['zstd', 'snappy', 'gzip', 'lz4', 'none']
+ConcurrencyMode = Literal['threads', 'async']
+SinkType = Literal['s3', 'delivery_stream']
 
 
 class Observability(BaseModel):
@@ -10,3 +20,109 @@ class Observability(BaseModel):
 
 class MyHandlerEnvVars(Observability):
     BUCKET_NAME: Annotated[str, Field(min_length=1)]
+    SINK_TYPE: Annotated[
+        SinkType, Field(description="'s3' writes an object per record, 'delivery_stream' puts the batch to a Firehose delivery stream")
+    ] = 's3'
+    DELIVERY_STREAM_NAME: Annotated[str | None, Field(min_length=1, description="Required by the 'delivery_stream' sink")] = None
+    BATCH_CONCURRENCY: Annotated[int, Field(ge=1, le=100, description='Maximum number of SQS records written to S3 concurrently')] = 1
+    CONCURRENCY_MODE: Annotated[
+        ConcurrencyMode, Field(description="'threads' writes records on a thread pool, 'async' on an event loop with an async S3 client")
+    ] = 'threads'
+    FIFO_MODE: Annotated[
+        bool, Field(description='Keep the order of records within a MessageGroupId, BATCH_CONCURRENCY message groups are written concurrently')
+    ] = False
+    ASYNC_CONCURRENCY: Annotated[int, Field(ge=1, le=1000, description="Maximum number of SQS records written concurrently in 'async' mode")] = 250
+    PARSING_MODE: Annotated[
+        ParsingMode, Field(description="'strict' parses bodies with the Order model, 'fast' validates the envelope and passes the item through")
+    ] = 'strict'
+    AGGREGATION_MODE: Annotated[bool, Field(description='Write a whole batch as a single NDJSON object with an offset index')] = False
+    AGGREGATION_COMPRESSION: Annotated[Compression, Field(description='Compression of aggregated objects')] = 'none'
+    IDEMPOTENCY_STORE: Annotated[IdempotencyStoreType, Field(description='Where content hashes of written objects are kept')] = 'none'
+    IDEMPOTENCY_TTL_SECONDS: Annotated[int, Field(ge=1, description='Longer than the DLQ redrive interval to catch redriven duplicates')] = 172800
+    IDEMPOTENCY_TABLE_NAME: Annotated[str | None, Field(min_length=1, description="Required by the 'dynamodb' store")] = None
+    MULTIPART_PART_SIZE_MB: Annotated[
+        int, Field(ge=5, le=64, description='Streamed writes above a single part use multipart uploads, smaller parts when memory is short')
+    ] = 8
+    AWS_LAMBDA_FUNCTION_MEMORY_SIZE: Annotated[int, Field(ge=128, description='Set by the Lambda runtime, sizes the buffers of streamed writes')] = (
+        128
+    )
+    KEY_LAYOUT: Annotated[KeyLayout, Field(description='Object keys of records, partitioned by SentTimestamp hour and/or a hash prefix')] = 'flat'
+    KEY_HASH_PREFIX_LENGTH: Annotated[int, Field(ge=1, le=4, description="Hex characters of the hash prefix of the 'hashed' layouts")] = 2
+    INDEX_TABLE_NAME: Annotated[str | None, Field(min_length=1, description='DynamoDB table indexing written objects, disabled when unset')] = None
+    INDEX_SHARDS: Annotated[int, Field(ge=1, le=16, description='Index partitions per hour of the by_hour index')] = 4
+    METRICS_LATENCY_SAMPLE_RATE: Annotated[float, Field(ge=0, le=1, description='Share of S3 write latencies sampled')] = 1.0
+    COLD_START_PREWARM: Annotated[bool, Field(description='Build clients and warm up validation during the init phase')] = True
+    CIRCUIT_BREAKER_ENABLED: Annotated[bool, Field(description='Fail S3 writes fast while S3 throttles or errors')] = True
+    CIRCUIT_BREAKER_FAILURE_RATE: Annotated[float, Field(gt=0, le=1, description='Share of failed writes in the window that opens the breaker')] = 0.5
+    CIRCUIT_BREAKER_WINDOW: Annotated[int, Field(ge=1, le=1000, description='Most recent writes the failure rate is computed over')] = 50
+    CIRCUIT_BREAKER_MIN_WRITES: Annotated[int, Field(ge=1, le=1000, description='Writes in the window before the breaker may open')] = 10
+    CIRCUIT_BREAKER_COOLDOWN_SECONDS: Annotated[float, Field(gt=0, le=300, description='Seconds the breaker stays open before a probe write')] = 5.0
+
+    @field_validator('AGGREGATION_COMPRESSION')
+    @classmethod
+    def check_compression_installed(cls, v):
+        # zstandard is an optional dependency, fail on init instead of failing every batch
+        if v == 'zstd' and find_spec('zstandard') is None:
+            raise ValueError('zstd compression requires the zstandard package')
+        return v
+
+    @field_validator('CONCURRENCY_MODE')
+    @classmethod
+    def check_aiobotocore_installed(cls, v):
+        # aiobotocore is an optional dependency, fail on init instead of failing every batch
+        if v == 'async' and find_spec('aiobotocore') is None:
+            raise ValueError("'async' concurrency mode requires the aiobotocore package")
+        return v
+
+    @model_validator(mode='after')
+    def check_idempotency_table(self):
+        if self.IDEMPOTENCY_STORE == 'dynamodb' and not self.IDEMPOTENCY_TABLE_NAME:
+            raise ValueError("IDEMPOTENCY_TABLE_NAME is required by the 'dynamodb' idempotency store")
+        return self
+
+    @model_validator(mode='after')
+    def check_delivery_stream(self):
+        if self.SINK_TYPE == 'delivery_stream' and not self.DELIVERY_STREAM_NAME:
+            raise ValueError("DELIVERY_STREAM_NAME is required by the 'delivery_stream' sink")
+        if self.SINK_TYPE == 'delivery_stream' and self.AGGREGATION_MODE:
+            raise ValueError("AGGREGATION_MODE writes to S3, it can't be combined with the 'delivery_stream' sink")
+        return self
+
+    @model_validator(mode='after')
+    def check_fifo_mode(self):
+        # records are written one at a time per message group, in order, by the 'threads' object per record path only
+        if self.FIFO_MODE and (self.AGGREGATION_MODE or self.SINK_TYPE != 's3' or self.CONCURRENCY_MODE != 'threads'):
+            raise ValueError("FIFO_MODE requires the 's3' sink and the 'threads' concurrency mode, without AGGREGATION_MODE")
+        return self
+
+    @model_validator(mode='after')
+    def check_circuit_breaker_window(self):
+        if self.CIRCUIT_BREAKER_MIN_WRITES > self.CIRCUIT_BREAKER_WINDOW:
+            raise ValueError('CIRCUIT_BREAKER_MIN_WRITES must not be larger than CIRCUIT_BREAKER_WINDOW')
+        return self
+
+
+class CompactionEnvVars(Observability):
+    BUCKET_NAME: Annotated[str, Field(min_length=1)]
+    # validated when unset too, every format requires pyarrow
+    COMPACTION_FORMAT: Annotated[CompactionFormat, Field(description="'parquet' or 'arrow' (Arrow IPC file)", validate_default=True)] = 'parquet'
+    COMPACTION_COMPRESSION: Annotated[CompactionCompression, Field(description='Codec of the columnar files')] = 'zstd'
+    COMPACTION_CONCURRENCY: Annotated[int, Field(ge=1, le=64, description='Objects read concurrently')] = 16
+    COMPACTION_MAX_PART_MB: Annotated[int, Field(ge=1, le=512, description='JSON buffered before a columnar file is written')] = 64
+    COMPACTION_TOMBSTONE: Annotated[bool, Field(description='Delete compacted objects once the manifest is written')] = False
+    COMPACTION_SETTLE_HOURS: Annotated[int, Field(ge=1, description='Hours after its end a partition is compacted, late records land first')] = 2
+    COMPACTION_LOOKBACK_HOURS: Annotated[int, Field(ge=1, description='Hours of partitions checked for a missing manifest')] = 24
+
+    @field_validator('COMPACTION_FORMAT')
+    @classmethod
+    def check_pyarrow_installed(cls, v):
+        # pyarrow is an optional dependency, shipped in the compaction function's layer only
+        if find_spec('pyarrow') is None:
+            raise ValueError('compaction requires the pyarrow package')
+        return v
+
+    @model_validator(mode='after')
+    def check_arrow_compression(self):
+        if self.COMPACTION_FORMAT == 'arrow' and self.COMPACTION_COMPRESSION not in ('zstd', 'lz4', 'none'):
+            raise ValueError("Arrow IPC files support 'zstd', 'lz4' or 'none' compression only")
+        return self
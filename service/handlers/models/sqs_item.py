@@ -1,10 +1,44 @@
+from datetime import datetime, timezone
+from typing import Literal
+
 from aws_lambda_powertools.utilities.parser.models import SqsRecordModel
-from pydantic import BaseModel, Json
+from pydantic import BaseModel, Field, Json, TypeAdapter
+
+OFFLOADED_PAYLOAD_MARKER = 'software.amazon.payloadoffloading.PayloadS3Pointer'
+# set by the DLQ redrive function on every re-sent message: '<message id>:<SentTimestamp in epoch ms>' of the original message
+REDRIVE_ORIGIN_ATTRIBUTE = 'RedriveOrigin'
 
 
 class Order(BaseModel):
     item: dict
 
 
+class PayloadS3Pointer(BaseModel):
+    s3BucketName: str = Field(min_length=1)
+    s3Key: str = Field(min_length=1)
+
+
+# body sent by the SQS extended client libraries in place of payloads above the SQS message size limit
+OffloadedBody = tuple[Literal['software.amazon.payloadoffloading.PayloadS3Pointer'], PayloadS3Pointer]
+
+# bodies the handler accepts, the DLQ redrive function ships this module to tell malformed bodies apart (see 'make build')
+ORDER_BODY_ADAPTER: TypeAdapter[Order | OffloadedBody] = TypeAdapter(Order | OffloadedBody)
+
+
 class OrderSqsRecord(SqsRecordModel):
-    body: Json[Order]  # deserialize order data from JSON string
+    body: Json[Order | OffloadedBody]  # type: ignore[assignment]  # deserialize order data or the offloaded payload pointer from JSON string
+
+
+class RawSqsRecord(SqsRecordModel):
+    body: str  # envelope validation only, see PARSING_MODE 'fast'
+
+
+def get_record_origin(record: SqsRecordModel) -> tuple[str, datetime]:
+    """Message id and SentTimestamp of the message as first sent, the object key and index entry of a record are built
+    from them. A message re-sent by the DLQ redrive function gets a new id and SentTimestamp, its REDRIVE_ORIGIN_ATTRIBUTE
+    keeps the original ones, so it is written under the same key and found by the idempotency store."""
+    attribute = record.messageAttributes.get(REDRIVE_ORIGIN_ATTRIBUTE)
+    message_id, _, sent_timestamp = (attribute.stringValue or '').rpartition(':') if attribute is not None else ('', '', '')
+    if not message_id or not sent_timestamp.isdigit():
+        return record.messageId, record.attributes.SentTimestamp
+    return message_id, datetime.fromtimestamp(int(sent_timestamp) / 1000, tz=timezone.utc)
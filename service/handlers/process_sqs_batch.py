@@ -0,0 +1,88 @@
+from aws_lambda_env_modeler import init_environment_variables
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.batch import EventType, async_process_partial_response, process_partial_response
+from aws_lambda_powertools.utilities.batch.types import PartialItemFailureResponse
+from aws_lambda_powertools.utilities.typing import LambdaContext
+
+from service.handlers.logic import async_record_handler, get_record_sink, serialize_record, write_aggregated_batch
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.models.sqs_item import OrderSqsRecord, RawSqsRecord
+from service.handlers.utils.backpressure import write_deadline
+from service.handlers.utils.batch_processor import (
+    AggregatingBatchProcessor,
+    ConcurrentAsyncBatchProcessor,
+    ConcurrentBatchProcessor,
+    MessageGroupBatchProcessor,
+)
+from service.handlers.utils.invocation_metrics import invocation_metrics
+from service.handlers.utils.observability import logger, metrics, tracer
+from service.handlers.utils.order_index import get_order_index
+from service.handlers.utils.runtime_context import runtime_context
+
+
+@init_environment_variables(model=MyHandlerEnvVars)
+@logger.inject_lambda_context
+@metrics.log_metrics
+@tracer.capture_lambda_handler(capture_response=False)
+def process_sqs_batch(event, context):
+    # imported by service.handlers.handle_sqs_batch during the init phase or on first use
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+    invocation_metrics.start(sample_rate=env_vars.METRICS_LATENCY_SAMPLE_RATE)
+    write_deadline.start(context)
+    records = len(event.get('Records', []))
+    failed_records = records  # unless the batch was processed, i.e the whole batch failed
+    try:
+        response = _process_batch(event, context, env_vars)
+        failed_records = len(response['batchItemFailures'])
+        return response
+    finally:
+        invocation_metrics.add('RecordsProcessed', MetricUnit.Count, records)
+        invocation_metrics.add('FailedRecords', MetricUnit.Count, failed_records)
+        try:
+            index = get_order_index()
+            if index is not None:
+                # entries of the objects written, also when the batch failed
+                invocation_metrics.add('IndexWriteFailures', MetricUnit.Count, index.flush())
+        finally:
+            # a single EMF blob per invocation, published by log_metrics
+            invocation_metrics.flush(metrics)
+
+
+def _process_batch(event: dict, context: LambdaContext, env_vars: MyHandlerEnvVars) -> PartialItemFailureResponse:
+    # fast parsing validates the envelope only, the body is checked while it's extracted by the record handler
+    model = OrderSqsRecord if env_vars.PARSING_MODE == 'strict' else RawSqsRecord
+    if env_vars.AGGREGATION_MODE:
+        return process_partial_response(
+            event=event,
+            record_handler=serialize_record,
+            processor=AggregatingBatchProcessor(event_type=EventType.SQS, flush_handler=write_aggregated_batch, model=model),
+            context=context,
+        )
+
+    sink = get_record_sink()
+    if env_vars.SINK_TYPE == 'delivery_stream':
+        # records are serialized one by one and put to the stream together, the stream's responses fail single records
+        return process_partial_response(
+            event=event,
+            record_handler=sink.write,
+            processor=AggregatingBatchProcessor(event_type=EventType.SQS, flush_handler=sink.flush, model=model),
+            context=context,
+        )
+
+    if env_vars.CONCURRENCY_MODE == 'async':
+        return async_process_partial_response(
+            event=event,
+            record_handler=async_record_handler,
+            processor=ConcurrentAsyncBatchProcessor(event_type=EventType.SQS, model=model, max_concurrency=env_vars.ASYNC_CONCURRENCY),
+            context=context,
+        )
+
+    # FIFO queues: message groups are written concurrently, the records of a group in order
+    processor_class = MessageGroupBatchProcessor if env_vars.FIFO_MODE else ConcurrentBatchProcessor
+    processor = processor_class(event_type=EventType.SQS, model=model, max_workers=env_vars.BATCH_CONCURRENCY)
+    return process_partial_response(
+        event=event,
+        record_handler=sink.write,
+        processor=processor,
+        context=context,
+    )
@@ -0,0 +1,104 @@
+import gzip
+from hashlib import sha256
+from json import dumps as json_dumps
+from json import loads as json_loads
+from typing import Any
+
+from service.handlers.models.env_vars import Compression
+
+FILE_EXTENSIONS: dict[str, str] = {'none': '.ndjson', 'gzip': '.ndjson.gz', 'zstd': '.ndjson.zst'}
+CONTENT_TYPES: dict[str, str] = {'none': 'application/x-ndjson', 'gzip': 'application/gzip', 'zstd': 'application/zstd'}
+BLOCK_SIZE = 64 * 1024  # uncompressed bytes per gzip member / zstd frame, a record read fetches its whole block
+
+
+def _compress(data: bytes, compression: Compression) -> bytes:
+    if compression == 'gzip':
+        return gzip.compress(data, mtime=0)
+    if compression == 'zstd':
+        import zstandard  # optional dependency, only required when zstd compression is enabled
+
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def _decompress(data: bytes, compression: Compression) -> bytes:
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    if compression == 'zstd':
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def get_batch_id(message_ids: list[str]) -> str:
+    """Deterministic batch identifier, a redelivered batch with the same messages overwrites its previous objects
+
+    Message ids are sorted, SQS may redeliver the messages of a batch in a different order.
+    """
+    return sha256('\n'.join(sorted(message_ids)).encode('utf-8')).hexdigest()[:32]
+
+
+def build_aggregated_object(object_key: str, lines: list[tuple[str, bytes]], compression: Compression) -> tuple[bytes, dict[str, Any]]:
+    """Packs records into a single NDJSON object and builds its byte offset index
+
+    Compressed lines are packed into blocks of about BLOCK_SIZE bytes, each compressed as its own gzip member / zstd
+    frame. Concatenated members are still a valid .gz/.zst file for regular readers, while a single record is fetched
+    with a byte-range GET of its block. Uncompressed lines are ranges of their own.
+
+    The index holds the range of every record ('offset' and 'length') and the record's line within the decompressed
+    range ('line_offset' and 'line_length').
+
+    Parameters
+    ----------
+    object_key : str
+        S3 key the aggregated object is written to, recorded in the index
+    lines : list[tuple[str, bytes]]
+        (message id, JSON serialized record) pairs, without a trailing new line
+    compression : Compression
+        'none', 'gzip' or 'zstd'
+
+    Returns
+    -------
+    tuple[bytes, dict[str, Any]]
+        Aggregated object body and its index
+    """
+    body = bytearray()
+    records: dict[str, dict[str, int]] = {}
+    block = bytearray()
+    block_message_ids: list[str] = []
+    for position, (message_id, line) in enumerate(lines):
+        records[message_id] = {'line_offset': len(block), 'line_length': len(line) + 1}
+        block += line + b'\n'
+        block_message_ids.append(message_id)
+        if compression == 'none' or len(block) >= BLOCK_SIZE or position == len(lines) - 1:
+            chunk = _compress(bytes(block), compression)
+            for block_message_id in block_message_ids:
+                records[block_message_id].update(offset=len(body), length=len(chunk))
+            body += chunk
+            block.clear()
+            block_message_ids.clear()
+    index = {'object_key': object_key, 'compression': compression, 'records': records}
+    return bytes(body), index
+
+
+def serialize_index(index: dict[str, Any]) -> bytes:
+    return json_dumps(index, separators=(',', ':')).encode('utf-8')
+
+
+def read_aggregated_record(s3_client: Any, bucket_name: str, index: dict[str, Any], message_id: str) -> dict:
+    """Fetches a single record from an aggregated object with a byte-range GET
+
+    Raises
+    ------
+    KeyError
+        When the message id is not part of the index.
+    """
+    location = index['records'][message_id]
+    start = location['offset']
+    end = start + location['length'] - 1
+    response = s3_client.get_object(Bucket=bucket_name, Key=index['object_key'], Range=f'bytes={start}-{end}')
+    data = _decompress(response['Body'].read(), index['compression'])
+    # indexes written before blocks were introduced have a range per record
+    line_offset = location.get('line_offset', 0)
+    return json_loads(data[line_offset : line_offset + location.get('line_length', len(data))])
@@ -0,0 +1,70 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from contextlib import AsyncExitStack
+from typing import Any, TypeVar
+
+from service.handlers.utils.observability import logger
+
+Result = TypeVar('Result')
+
+
+class AsyncRuntime:
+    """Event loop and aiobotocore clients reused by the warm invocations of an execution environment.
+
+    asyncio.run would close the loop, and with it the connection pool of every client, at the end of each invocation.
+    The loop is kept open instead, Lambda freezes it between invocations. Clients are built on first use, on the loop,
+    and kept until refresh, i.e after a SnapStart restore. aiobotocore is an optional dependency, imported when the
+    first client is built.
+    """
+
+    def __init__(self) -> None:
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._clients: dict[str, asyncio.Future] = {}
+        self._exit_stack = AsyncExitStack()
+
+    def run(self, coroutine: Coroutine[Any, Any, Result]) -> Result:
+        """Runs the coroutine to completion on the event loop of the execution environment"""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            self._clients = {}
+            self._exit_stack = AsyncExitStack()
+        return self._loop.run_until_complete(coroutine)
+
+    async def client(self, service_name: str, build_config: Callable[[], Any] | None = None) -> Any:
+        """aiobotocore client of the service, must be awaited on the loop of run
+
+        Args:
+            service_name (str): i.e 's3'.
+            build_config (Callable[[], aiobotocore.config.AioConfig] | None): Timeouts, retries and connection pool of the client, called when the client is built.
+        """
+        client = self._clients.get(service_name)
+        if client is None:
+            # records awaiting the client while it's built share a single future, and a single connection pool
+            client = self._clients[service_name] = asyncio.ensure_future(self._build_client(service_name, build_config))
+        try:
+            return await asyncio.shield(client)
+        except Exception:
+            self._clients.pop(service_name, None)
+            raise
+
+    async def _build_client(self, service_name: str, build_config: Callable[[], Any] | None) -> Any:
+        # deferred import, see class docstring
+        from aiobotocore.session import get_session
+
+        config = build_config() if build_config is not None else None
+        return await self._exit_stack.enter_async_context(get_session().create_client(service_name, config=config))
+
+    def refresh(self) -> None:
+        """Closes the clients, they are built again on next use. The loop is kept."""
+        if self._loop is not None and not self._loop.is_closed() and self._clients:
+            try:
+                self._loop.run_until_complete(self._exit_stack.aclose())
+            except Exception:
+                # the connections may no longer be valid, i.e after a snapshot restore
+                logger.exception('failed to close async clients')
+        self._clients = {}
+        self._exit_stack = AsyncExitStack()
+
+
+# module level, so it survives between warm invocations of the execution environment
+async_runtime = AsyncRuntime()
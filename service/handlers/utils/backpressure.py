@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from functools import lru_cache
+from typing import Literal
+
+from aws_lambda_powertools.metrics import MetricUnit
+from aws_lambda_powertools.utilities.typing import LambdaContext
+from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.batch_processor import DEFAULT_DEADLINE_MARGIN_MS, raise_if_cancelled
+from service.handlers.utils.invocation_metrics import invocation_metrics
+from service.handlers.utils.observability import logger
+from service.handlers.utils.runtime_context import runtime_context
+from service.models.exceptions import CircuitOpenException, DeadlineExceededException
+
+CircuitState = Literal['closed', 'open', 'half_open']
+
+# S3 or the delivery stream is throttling or failing, retrying the write later may succeed. Other errors, i.e AccessDenied, are answers
+DEGRADATION_ERROR_CODES = frozenset(
+    {
+        'SlowDown',
+        'Throttling',
+        'ThrottlingException',
+        'RequestLimitExceeded',
+        'RequestTimeout',
+        'InternalError',
+        'ServiceUnavailable',
+        'ServiceUnavailableException',  # Firehose throttling
+    }
+)
+
+
+def is_degradation_error(exc: BaseException) -> bool:
+    """Throttling, 5xx and connection errors of boto3 or aiobotocore, after the client's own retries"""
+    if isinstance(exc, ClientError):
+        status_code = exc.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+        return exc.response.get('Error', {}).get('Code') in DEGRADATION_ERROR_CODES or status_code >= 500
+    # connection and read timeouts, endpoint connection errors
+    return isinstance(exc, (ConnectionError, HTTPClientError))
+
+
+class CircuitBreaker:
+    """Fails S3 writes fast while S3 is degraded, instead of letting every record run the client's retries.
+
+    Closed: the outcome of the last `window` writes is kept. Once at least `min_writes` were seen and the share of
+    degradation errors reaches `failure_rate`, the breaker opens.
+    Open: writes are rejected with CircuitOpenException without calling S3, the records are reported as batch item
+    failures and retried by SQS. After `cooldown_seconds` the breaker is half open.
+    Half open: a single probe write is let through, its success closes the breaker and its failure opens it again.
+    Safe to use from the worker threads of ConcurrentBatchProcessor.
+
+    Args:
+        failure_rate (float): Share of failed writes in the window that opens the breaker.
+        window (int): Most recent writes the failure rate is computed over.
+        min_writes (int): Writes in the window before the breaker may open.
+        cooldown_seconds (float): Seconds the breaker stays open.
+        clock (Callable[[], float]): Monotonic clock in seconds.
+    """
+
+    def __init__(
+        self,
+        failure_rate: float,
+        window: int,
+        min_writes: int,
+        cooldown_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_rate = failure_rate
+        self.min_writes = min_writes
+        self.cooldown_seconds = cooldown_seconds
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=window)  # True for a failed write
+        self._state: CircuitState = 'closed'
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            if self._state == 'open' and self._clock() >= self._opened_at + self.cooldown_seconds:
+                return 'half_open'
+            return self._state
+
+    def before_write(self) -> None:
+        """Raises CircuitOpenException when the write must not be attempted"""
+        with self._lock:
+            if self._state == 'open':
+                if self._clock() < self._opened_at + self.cooldown_seconds:
+                    raise CircuitOpenException('S3 writes are failing, the circuit breaker is open')
+                self._state = 'half_open'
+                self._probing = False
+            if self._state == 'half_open':
+                if self._probing:
+                    raise CircuitOpenException('S3 writes are failing, waiting for the circuit breaker probe')
+                self._probing = True
+
+    def record(self, failed: bool) -> None:
+        """Outcome of a write allowed by before_write"""
+        with self._lock:
+            if self._state == 'half_open':
+                self._probing = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = 'closed'
+                    self._outcomes.clear()
+                    logger.info('circuit breaker closed')
+                return
+            if self._state == 'open':
+                return  # a write that started before the breaker opened
+            self._outcomes.append(failed)
+            failures = sum(self._outcomes)
+            if failed and len(self._outcomes) >= self.min_writes and failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def _open(self) -> None:
+        logger.warning('circuit breaker opened', extra={'failed_writes': sum(self._outcomes), 'writes': len(self._outcomes)})
+        self._state = 'open'
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+
+
+@lru_cache(maxsize=1)
+def get_circuit_breaker() -> CircuitBreaker | None:
+    """Breaker of the S3 writes, shared by all warm invocations of the execution environment. None when CIRCUIT_BREAKER_ENABLED is false."""
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+    if not env_vars.CIRCUIT_BREAKER_ENABLED:
+        return None
+    return CircuitBreaker(
+        failure_rate=env_vars.CIRCUIT_BREAKER_FAILURE_RATE,
+        window=env_vars.CIRCUIT_BREAKER_WINDOW,
+        min_writes=env_vars.CIRCUIT_BREAKER_MIN_WRITES,
+        cooldown_seconds=env_vars.CIRCUIT_BREAKER_COOLDOWN_SECONDS,
+    )
+
+
+runtime_context.on_refresh(get_circuit_breaker.cache_clear)
+
+
+class WriteDeadline:
+    """Time after which no S3 write of the invocation is started, margin_ms before the Lambda timeout.
+
+    A write started too late would be cut off by the timeout along with the partial batch response, failing every record
+    of the batch. Rejected records are reported as batch item failures instead.
+    """
+
+    def __init__(self) -> None:
+        self._deadline: float | None = None
+
+    def start(self, context: LambdaContext | None, margin_ms: int = DEFAULT_DEADLINE_MARGIN_MS) -> None:
+        """Called at the start of every invocation"""
+        if context is None:
+            self._deadline = None
+            return
+        self._deadline = time.monotonic() + (context.get_remaining_time_in_millis() - margin_ms) / 1000
+
+    def check(self) -> None:
+        """Raises DeadlineExceededException when the deadline passed"""
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            raise DeadlineExceededException('not enough time left to write before the lambda deadline')
+
+
+# module level, set by every invocation of the handler
+write_deadline = WriteDeadline()
+
+
+def before_write() -> None:
+    """Raises when a write must not be started: DeadlineExceededException past the write deadline or once its record was
+    reported, CircuitOpenException while the breaker is open"""
+    try:
+        raise_if_cancelled()
+        write_deadline.check()
+        breaker = get_circuit_breaker()
+        if breaker is not None:
+            breaker.before_write()
+    except (DeadlineExceededException, CircuitOpenException) as exc:
+        invocation_metrics.add('RejectedWrites', MetricUnit.Count, 1)
+        logger.debug('write rejected', extra={'reason': type(exc).__name__})
+        raise
+
+
+def after_write(exc: BaseException | None) -> None:
+    """Outcome of a write allowed by before_write, exc is None when it succeeded"""
+    breaker = get_circuit_breaker()
+    if breaker is not None:
+        breaker.record(failed=exc is not None and is_degradation_error(exc))
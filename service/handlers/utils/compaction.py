@@ -0,0 +1,269 @@
+import json
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Literal
+
+from botocore.exceptions import ClientError
+
+from service.handlers.utils.observability import logger
+from service.handlers.utils.streaming import MIB
+
+FileFormat = Literal['parquet', 'arrow']
+
+COMPACTED_PREFIX = 'compacted/'
+FILE_EXTENSIONS: dict[str, str] = {'parquet': '.parquet', 'arrow': '.arrow'}
+CONTENT_TYPES: dict[str, str] = {'parquet': 'application/vnd.apache.parquet', 'arrow': 'application/vnd.apache.arrow.file'}
+MAX_DELETE_KEYS = 1000  # DeleteObjects limit
+LISTING_CLOCK_SKEW_SECONDS = 300  # LastModified is set by S3, allow for the function's clock to be ahead of it
+
+
+@dataclass(frozen=True)
+class CompactionSettings:
+    """
+    Args:
+        file_format (FileFormat): 'parquet' or 'arrow' (Arrow IPC file).
+        compression (str): Codec of the columnar files, 'zstd', 'snappy', 'gzip', 'lz4' or 'none'. Arrow IPC files support 'zstd' and 'lz4' only.
+        concurrency (int): Objects read concurrently.
+        max_part_bytes (int): JSON bytes buffered before a columnar file is written, bounds the memory used.
+        tombstone (bool): Delete the compacted objects once the partition's manifest is written.
+    """
+
+    file_format: FileFormat = 'parquet'
+    compression: str = 'zstd'
+    concurrency: int = 16
+    max_part_bytes: int = 64 * MIB
+    tombstone: bool = False
+
+
+@dataclass
+class _Buffer:
+    message_ids: list[str] = field(default_factory=list)
+    object_keys: list[str] = field(default_factory=list)
+    items: list[str] = field(default_factory=list)
+    size: int = 0
+
+    def add(self, object_key: str, body: bytes) -> None:
+        self.message_ids.append(object_key.rsplit('/', 1)[-1].removesuffix('.json'))
+        self.object_keys.append(object_key)
+        self.items.append(body.decode('utf-8'))
+        self.size += len(body)
+
+
+class PartitionCompactor:
+    """Rolls the small JSON objects of a key prefix into compressed columnar files with a manifest.
+
+    Objects are listed in key order and read with bounded concurrency. Whenever max_part_bytes of JSON is buffered,
+    or the deadline nears, the buffer is written as 'compacted/<partition>part-<n>' with the columns message_id,
+    object_key and item (the object's JSON text), and a checkpoint records the last compacted key. A restarted
+    compaction continues after the checkpoint, part names are deterministic so a part written before a crash is
+    overwritten. The manifest is written last and marks the partition as compacted, it records when the listing
+    started. Objects written to a compacted partition after that are appended as further parts on the next run.
+    Originals are only deleted (tombstoned, a delete marker in a versioned bucket) after the manifest, only the keys a
+    part holds, and a part counts as tombstoned once DeleteObjects reported no errors for any of its keys.
+
+    Args:
+        s3_client (Any): boto3 S3 client.
+        bucket_name (str): Bucket holding both the objects and the compacted files.
+        settings (CompactionSettings): Format, concurrency and memory bound.
+    """
+
+    def __init__(self, s3_client: Any, bucket_name: str, settings: CompactionSettings) -> None:
+        self.s3 = s3_client
+        self.bucket_name = bucket_name
+        self.settings = settings
+        self.rows_compacted = 0
+        self.objects_tombstoned = 0
+
+    def compact(self, partition: str, deadline: float) -> dict[str, Any] | None:
+        """Compacts the partition, i.e 'dt=2024-03-09/hour=23/', until done or the time.monotonic() deadline passed
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The partition's manifest, None when the deadline passed first and the compaction has to be resumed
+        """
+        manifest = self._read_json(f'{COMPACTED_PREFIX}{partition}manifest.json')
+        if manifest is None:
+            manifest = self._compact_objects(partition, deadline)
+            if manifest is None:
+                return None
+        elif time.monotonic() < deadline and not self._append_late_objects(partition, manifest, deadline):
+            return None
+        if self.settings.tombstone and not manifest['tombstoned']:
+            self._tombstone(partition, manifest)
+        return manifest
+
+    def _compact_objects(self, partition: str, deadline: float) -> dict[str, Any] | None:
+        checkpoint_key = f'{COMPACTED_PREFIX}{partition}_checkpoint.json'
+        checkpoint = self._read_json(checkpoint_key) or {'parts': [], 'last_key': '', 'listed_at': time.time()}
+        buffer = _Buffer()
+        with ThreadPoolExecutor(max_workers=self.settings.concurrency) as pool:
+            for keys in _chunks(self._list_keys(partition, start_after=checkpoint['last_key']), self.settings.concurrency):
+                for object_key, body in zip(keys, pool.map(self._get_body, keys), strict=True):
+                    buffer.add(object_key, body)
+                out_of_time = time.monotonic() >= deadline
+                if buffer.size >= self.settings.max_part_bytes or (out_of_time and buffer.message_ids):
+                    checkpoint['parts'].append(self._write_part(partition, len(checkpoint['parts']), buffer))
+                    checkpoint['last_key'] = buffer.object_keys[-1]
+                    self._write_json(checkpoint_key, checkpoint)
+                    buffer = _Buffer()
+                if out_of_time:
+                    logger.info('compaction deadline reached', extra={'partition': partition, 'last_key': checkpoint['last_key']})
+                    return None
+        if buffer.message_ids:
+            checkpoint['parts'].append(self._write_part(partition, len(checkpoint['parts']), buffer))
+
+        manifest = {
+            'partition': partition,
+            'format': self.settings.file_format,
+            'compression': self.settings.compression,
+            'rows': sum(part['rows'] for part in checkpoint['parts']),
+            'parts': checkpoint['parts'],
+            'compacted_at': datetime.now(timezone.utc).isoformat(),
+            'listed_at': checkpoint.get('listed_at', 0.0),
+            'tombstoned': False,
+        }
+        self._write_json(f'{COMPACTED_PREFIX}{partition}manifest.json', manifest)
+        self.s3.delete_object(Bucket=self.bucket_name, Key=checkpoint_key)
+        return manifest
+
+    def _append_late_objects(self, partition: str, manifest: dict[str, Any], deadline: float) -> bool:
+        """Appends the objects written after the partition's listing started as further parts
+
+        Returns
+        -------
+        bool
+            False when the deadline passed first, the parts written so far are kept in the manifest and the listing
+            time is not advanced, so the next run appends the remaining objects
+        """
+        listed_at = time.time()
+        since = manifest.get('listed_at', 0.0) - LISTING_CLOCK_SKEW_SECONDS
+        recent_keys = [key for key, last_modified in self._list_objects(partition) if last_modified.timestamp() >= since]
+        if not recent_keys:
+            return True
+        compacted_keys = {key for part in manifest['parts'] for key in self._read_part_keys(part, manifest['format'])}
+        late_keys = [key for key in recent_keys if key not in compacted_keys]
+        buffer = _Buffer()
+        appended = 0
+        out_of_time = False
+        with ThreadPoolExecutor(max_workers=self.settings.concurrency) as pool:
+            for keys in _chunks(iter(late_keys), self.settings.concurrency):
+                for object_key, body in zip(keys, pool.map(self._get_body, keys), strict=True):
+                    buffer.add(object_key, body)
+                appended += len(keys)
+                out_of_time = time.monotonic() >= deadline
+                if buffer.size >= self.settings.max_part_bytes or (out_of_time and buffer.message_ids):
+                    manifest['parts'].append(self._write_part(partition, len(manifest['parts']), buffer))
+                    buffer = _Buffer()
+                if out_of_time:
+                    logger.info('compaction deadline reached', extra={'partition': partition, 'late_objects': len(late_keys) - appended})
+                    break
+        if buffer.message_ids:
+            manifest['parts'].append(self._write_part(partition, len(manifest['parts']), buffer))
+        if appended:
+            logger.info('appended late objects to compacted partition', extra={'partition': partition, 'objects': appended})
+            manifest['rows'] = sum(part['rows'] for part in manifest['parts'])
+            manifest['tombstoned'] = False
+        if not out_of_time:
+            manifest['listed_at'] = listed_at
+        self._write_json(f'{COMPACTED_PREFIX}{partition}manifest.json', manifest)
+        return not out_of_time
+
+    def _write_part(self, partition: str, index: int, buffer: _Buffer) -> dict[str, Any]:
+        part_key = f'{COMPACTED_PREFIX}{partition}part-{index:05d}{FILE_EXTENSIONS[self.settings.file_format]}'
+        body = write_columnar(buffer.message_ids, buffer.object_keys, buffer.items, self.settings.file_format, self.settings.compression)
+        self.s3.put_object(Bucket=self.bucket_name, Key=part_key, Body=body, ContentType=CONTENT_TYPES[self.settings.file_format])
+        self.rows_compacted += len(buffer.message_ids)
+        logger.debug('wrote compacted part', extra={'part_key': part_key, 'rows': len(buffer.message_ids), 'size': len(body)})
+        return {'key': part_key, 'rows': len(buffer.message_ids), 'json_bytes': buffer.size, 'bytes': len(body), 'last_key': buffer.object_keys[-1]}
+
+    def _tombstone(self, partition: str, manifest: dict[str, Any]) -> None:
+        for part in manifest['parts']:
+            if part.get('tombstoned'):
+                continue
+            object_keys = self._read_part_keys(part, manifest['format'])
+            failed = 0
+            for start in range(0, len(object_keys), MAX_DELETE_KEYS):
+                keys = object_keys[start : start + MAX_DELETE_KEYS]
+                response = self.s3.delete_objects(Bucket=self.bucket_name, Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True})
+                errors = response.get('Errors', [])
+                if errors:
+                    logger.warning(
+                        'failed to tombstone compacted objects', extra={'part_key': part['key'], 'errors': errors[:10], 'failed': len(errors)}
+                    )
+                failed += len(errors)
+                self.objects_tombstoned += len(keys) - len(errors)
+            # a part with failed keys is tombstoned again by the next run, deleting a deleted key succeeds
+            part['tombstoned'] = failed == 0
+        manifest['tombstoned'] = all(part['tombstoned'] for part in manifest['parts'])
+        self._write_json(f'{COMPACTED_PREFIX}{partition}manifest.json', manifest)
+
+    def _read_part_keys(self, part: dict[str, Any], file_format: FileFormat) -> list[str]:
+        response = self.s3.get_object(Bucket=self.bucket_name, Key=part['key'])
+        return read_object_keys(response['Body'].read(), file_format)
+
+    def _list_objects(self, partition: str, start_after: str = '') -> Iterator[tuple[str, datetime]]:
+        """Keys of the partition in key order, with their LastModified"""
+        kwargs: dict[str, Any] = {'Bucket': self.bucket_name, 'Prefix': partition}
+        if start_after:
+            kwargs['StartAfter'] = start_after
+        while True:
+            response = self.s3.list_objects_v2(**kwargs)
+            for content in response.get('Contents', []):
+                yield content['Key'], content['LastModified']
+            if not response.get('IsTruncated'):
+                return
+            kwargs = {'Bucket': self.bucket_name, 'Prefix': partition, 'ContinuationToken': response['NextContinuationToken']}
+
+    def _list_keys(self, partition: str, start_after: str) -> Iterator[str]:
+        return (key for key, _ in self._list_objects(partition, start_after))
+
+    def _get_body(self, object_key: str) -> bytes:
+        return self.s3.get_object(Bucket=self.bucket_name, Key=object_key)['Body'].read()
+
+    def _read_json(self, object_key: str) -> dict[str, Any] | None:
+        try:
+            return json.loads(self.s3.get_object(Bucket=self.bucket_name, Key=object_key)['Body'].read())
+        except ClientError as exc:
+            if exc.response['Error']['Code'] == 'NoSuchKey':
+                return None
+            raise
+
+    def _write_json(self, object_key: str, document: dict[str, Any]) -> None:
+        self.s3.put_object(Bucket=self.bucket_name, Key=object_key, Body=json.dumps(document).encode('utf-8'), ContentType='application/json')
+
+
+def _chunks(keys: Iterator[str], size: int) -> Iterator[list[str]]:
+    while chunk := list(islice(keys, size)):
+        yield chunk
+
+
+def write_columnar(message_ids: list[str], object_keys: list[str], items: list[str], file_format: FileFormat, compression: str) -> bytes:
+    """Columnar file with the string columns message_id, object_key and item"""
+    import pyarrow as pa  # optional dependency, only required by the compaction function
+
+    table = pa.table({'message_id': message_ids, 'object_key': object_keys, 'item': items})
+    sink = pa.BufferOutputStream()
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        pq.write_table(table, sink, compression=compression)
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=None if compression == 'none' else compression)
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_object_keys(body: bytes, file_format: FileFormat) -> list[str]:
+    import pyarrow as pa
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        return pq.read_table(pa.BufferReader(body), columns=['object_key']).column('object_key').to_pylist()
+    return pa.ipc.open_file(pa.BufferReader(body)).read_all().column('object_key').to_pylist()
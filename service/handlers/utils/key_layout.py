@@ -0,0 +1,104 @@
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from hashlib import md5
+
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.runtime_context import runtime_context
+
+
+class KeyBuilder(ABC):
+    """Builds the S3 object key of a record, and the key prefixes a reader lists to find the records sent in a time range.
+
+    Keys must be deterministic, a redelivered record overwrites its own object.
+    """
+
+    @abstractmethod
+    def build(self, message_id: str, sent_at: datetime) -> str: ...  # pragma: no cover
+
+    @abstractmethod
+    def prefixes(self, start: datetime, end: datetime) -> Iterator[str]:
+        """Prefixes holding every record sent between start and end, possibly more"""
+        ...  # pragma: no cover
+
+
+class FlatKeyBuilder(KeyBuilder):
+    """'<message id>.json' at the bucket root, readers list the whole bucket"""
+
+    def build(self, message_id: str, sent_at: datetime) -> str:
+        return f'{message_id}.json'
+
+    def prefixes(self, start: datetime, end: datetime) -> Iterator[str]:
+        yield ''
+
+
+class HashedKeyBuilder(KeyBuilder):
+    """'<hash>/<message id>.json', spreads the request rate over 16^prefix_length prefixes.
+
+    Args:
+        prefix_length (int): Hex characters of the message id hash used as prefix.
+    """
+
+    def __init__(self, prefix_length: int = 2) -> None:
+        self.prefix_length = prefix_length
+
+    def build(self, message_id: str, sent_at: datetime) -> str:
+        return f'{_hash_prefix(message_id, self.prefix_length)}/{message_id}.json'
+
+    def prefixes(self, start: datetime, end: datetime) -> Iterator[str]:
+        yield ''  # the hash holds no time, readers list every prefix
+
+
+class HourPartitionedKeyBuilder(KeyBuilder):
+    """Hive style 'dt=<date>/hour=<hour>/<message id>.json' partitions of the SentTimestamp in UTC.
+
+    Readers list the partitions of a time range only. With a prefix_length, a hash prefix follows the hour,
+    'dt=<date>/hour=<hour>/<hash>/<message id>.json', so writes within the current hour spread over 16^prefix_length prefixes.
+
+    Args:
+        prefix_length (int): Hex characters of the message id hash following the hour, none when 0.
+    """
+
+    def __init__(self, prefix_length: int = 0) -> None:
+        self.prefix_length = prefix_length
+
+    def build(self, message_id: str, sent_at: datetime) -> str:
+        partition = _hour_partition(sent_at)
+        if self.prefix_length:
+            return f'{partition}{_hash_prefix(message_id, self.prefix_length)}/{message_id}.json'
+        return f'{partition}{message_id}.json'
+
+    def prefixes(self, start: datetime, end: datetime) -> Iterator[str]:
+        hour = start.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        while hour <= end:
+            yield _hour_partition(hour)
+            hour += timedelta(hours=1)
+
+
+def _hash_prefix(message_id: str, prefix_length: int) -> str:
+    return md5(message_id.encode('utf-8'), usedforsecurity=False).hexdigest()[:prefix_length]
+
+
+def _hour_partition(sent_at: datetime) -> str:
+    return sent_at.astimezone(timezone.utc).strftime('dt=%Y-%m-%d/hour=%H/')
+
+
+def create_key_builder(key_layout: str, prefix_length: int) -> KeyBuilder:
+    if key_layout == 'hashed':
+        return HashedKeyBuilder(prefix_length)
+    if key_layout == 'hourly':
+        return HourPartitionedKeyBuilder()
+    if key_layout == 'hourly_hashed':
+        return HourPartitionedKeyBuilder(prefix_length)
+    return FlatKeyBuilder()
+
+
+@lru_cache(maxsize=1)
+def get_key_builder() -> KeyBuilder:
+    """Key builder selected by KEY_LAYOUT, shared by all warm invocations of the execution environment"""
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+    return create_key_builder(env_vars.KEY_LAYOUT, env_vars.KEY_HASH_PREFIX_LENGTH)
+
+
+runtime_context.on_refresh(get_key_builder.cache_clear)
@@ -0,0 +1,166 @@
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from hashlib import md5
+from typing import TYPE_CHECKING, Any
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.backpressure import write_deadline
+from service.handlers.utils.observability import logger
+from service.handlers.utils.runtime_context import build_fail_fast_config, runtime_context
+from service.models.exceptions import DeadlineExceededException
+
+if TYPE_CHECKING:
+    from mypy_boto3_dynamodb.client import DynamoDBClient
+
+TIME_INDEX_NAME = 'by_hour'
+MAX_BATCH_WRITE_ITEMS = 25  # BatchWriteItem limit
+MAX_BATCH_WRITE_ATTEMPTS = 5
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    message_id: str
+    object_key: str
+    size: int
+    etag: str
+    sent_at: datetime
+    latency_ms: int  # from SentTimestamp until the object was written
+
+
+class OrderIndex:
+    """DynamoDB index of written objects, looked up by message id or by SentTimestamp range without listing the bucket.
+
+    The table has a string partition key 'pk' (the message id) and a global secondary index 'by_hour' with the string
+    partition key 'hour' ('<UTC date and hour>#<shard>') and the numeric sort key 'sent_at' (epoch milliseconds).
+    Entries of an hour are spread over shards, so a busy hour doesn't exceed the write throughput of a single index
+    partition. A range query runs one Query per hour and shard.
+
+    Entries are buffered and written with BatchWriteItem by flush, at the end of the invocation. The index is written
+    after the objects, an object can exist before its entry and a failed flush only loses entries, never objects.
+    Writes are bounded by the write deadline of the invocation, entries left when it passed are lost too.
+
+    Args:
+        table_name (str): Table name.
+        shards (int): Index partitions per hour.
+        client (DynamoDBClient | None): boto3 DynamoDB client, the fail fast client of the runtime context when not provided.
+    """
+
+    def __init__(self, table_name: str, shards: int = 4, client: 'DynamoDBClient | None' = None) -> None:
+        self.table_name = table_name
+        self.shards = shards
+        self._client = client
+        self._pending: list[dict[str, Any]] = []
+        self._lock = threading.Lock()  # records may be processed concurrently
+
+    @property
+    def client(self) -> 'DynamoDBClient':
+        if self._client is not None:
+            return self._client
+        return runtime_context.client('dynamodb', build_config=build_fail_fast_config)
+
+    def add(self, entry: IndexEntry) -> None:
+        with self._lock:
+            self._pending.append(self._to_item(entry))
+
+    def flush(self) -> int:
+        """Writes the buffered entries, returns the number of entries that could not be written"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        failed = 0
+        for start in range(0, len(pending), MAX_BATCH_WRITE_ITEMS):
+            failed += self._batch_write(pending[start : start + MAX_BATCH_WRITE_ITEMS])
+        return failed
+
+    def get(self, message_id: str) -> IndexEntry | None:
+        item = self.client.get_item(TableName=self.table_name, Key={'pk': {'S': message_id}}).get('Item')
+        return self._from_item(item) if item else None
+
+    def query(self, start: datetime, end: datetime) -> Iterator[IndexEntry]:
+        """Entries sent between start and end (inclusive), ordered by SentTimestamp within an hour and shard"""
+        hour = start.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        while hour <= end:
+            for shard in range(self.shards):
+                yield from self._query_partition(f'{hour:%Y-%m-%dT%H}#{shard}', start, end)
+            hour += timedelta(hours=1)
+
+    def _query_partition(self, partition: str, start: datetime, end: datetime) -> Iterator[IndexEntry]:
+        kwargs: dict[str, Any] = {
+            'TableName': self.table_name,
+            'IndexName': TIME_INDEX_NAME,
+            'KeyConditionExpression': '#hour = :hour AND sent_at BETWEEN :start AND :end',
+            'ExpressionAttributeNames': {'#hour': 'hour'},  # reserved word
+            'ExpressionAttributeValues': {
+                ':hour': {'S': partition},
+                ':start': {'N': str(_epoch_ms(start))},
+                ':end': {'N': str(_epoch_ms(end))},
+            },
+        }
+        while True:
+            response = self.client.query(**kwargs)
+            for item in response.get('Items', []):
+                yield self._from_item(item)
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def _batch_write(self, items: list[dict[str, Any]]) -> int:
+        request: Any = {self.table_name: [{'PutRequest': {'Item': item}} for item in items]}
+        for attempt in range(MAX_BATCH_WRITE_ATTEMPTS):
+            try:
+                write_deadline.check()
+                request = self.client.batch_write_item(RequestItems=request).get('UnprocessedItems', {})
+            except (ClientError, BotoCoreError, DeadlineExceededException) as exc:
+                unprocessed = len(request[self.table_name])
+                logger.warning('unable to write index entries', extra={'entries': unprocessed, 'error': str(exc)})
+                return unprocessed
+            if not request:
+                return 0
+            time.sleep(0.05 * 2**attempt)  # unprocessed items are throttled writes, back off before retrying them
+        unprocessed = len(request.get(self.table_name, []))
+        logger.warning('unable to write index entries', extra={'entries': unprocessed, 'error': 'throttled'})
+        return unprocessed
+
+    def _to_item(self, entry: IndexEntry) -> dict[str, Any]:
+        shard = int(md5(entry.message_id.encode('utf-8'), usedforsecurity=False).hexdigest(), 16) % self.shards
+        return {
+            'pk': {'S': entry.message_id},
+            'object_key': {'S': entry.object_key},
+            'size': {'N': str(entry.size)},
+            'etag': {'S': entry.etag},
+            'sent_at': {'N': str(_epoch_ms(entry.sent_at))},
+            'latency_ms': {'N': str(entry.latency_ms)},
+            'hour': {'S': f'{entry.sent_at.astimezone(timezone.utc):%Y-%m-%dT%H}#{shard}'},
+        }
+
+    @staticmethod
+    def _from_item(item: dict[str, Any]) -> IndexEntry:
+        return IndexEntry(
+            message_id=item['pk']['S'],
+            object_key=item['object_key']['S'],
+            size=int(item['size']['N']),
+            etag=item['etag']['S'],
+            sent_at=datetime.fromtimestamp(int(item['sent_at']['N']) / 1000, tz=timezone.utc),
+            latency_ms=int(item['latency_ms']['N']),
+        )
+
+
+def _epoch_ms(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+
+@lru_cache(maxsize=1)
+def get_order_index() -> OrderIndex | None:
+    """Index selected by INDEX_TABLE_NAME, shared by all warm invocations of the execution environment"""
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+    if env_vars.INDEX_TABLE_NAME is None:
+        return None
+    return OrderIndex(table_name=env_vars.INDEX_TABLE_NAME, shards=env_vars.INDEX_SHARDS)
+
+
+runtime_context.on_refresh(get_order_index.cache_clear)
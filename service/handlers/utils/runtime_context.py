@@ -0,0 +1,99 @@
+import threading
+from collections.abc import Callable
+from os import getenv
+from typing import Any, TypeVar
+
+from aws_lambda_env_modeler import get_environment_variables
+from aws_lambda_powertools.logging import Logger
+from pydantic import BaseModel
+
+Model = TypeVar('Model', bound=BaseModel)
+# S3, Firehose and DynamoDB requests fail fast: a call and its retry take at most 2 * (1 + 3) seconds plus the retry backoff,
+# within the 10 second function timeout. A record whose write failed is reported as a batch item failure and counted by
+# the circuit breaker instead of timing out the invocation, longer outages are left to the breaker and SQS redelivery
+CLIENT_CONNECT_TIMEOUT_SECONDS = 1
+CLIENT_READ_TIMEOUT_SECONDS = 3
+CLIENT_MAX_ATTEMPTS = 2  # the first attempt and one retry
+
+
+def build_fail_fast_config() -> Any:
+    """botocore Config of the clients used while records are processed, see CLIENT_MAX_ATTEMPTS"""
+    # deferred import, see RuntimeContext.client
+    from botocore.config import Config
+
+    return Config(
+        # standard retries with jitter, adaptive retries would delay requests client side beyond the timeouts
+        retries={'total_max_attempts': CLIENT_MAX_ATTEMPTS, 'mode': 'standard'},
+        read_timeout=CLIENT_READ_TIMEOUT_SECONDS,
+        connect_timeout=CLIENT_CONNECT_TIMEOUT_SECONDS,
+        # one pooled connection per concurrently processed record, see BATCH_CONCURRENCY. boto3 defaults to 10
+        max_pool_connections=max(int(getenv('BATCH_CONCURRENCY', '1')), 10),
+    )
+
+
+class RuntimeContext:
+    """State reused by the warm invocations of an execution environment: validated environment variables, boto3 clients and loggers.
+
+    Shared by the SQS handler and the DLQ redrive function, which ships a copy of this module (see 'make build'), so it
+    only depends on the packages of the common layer. Everything is built on first use and kept until refresh, i.e after
+    a SnapStart restore or when a test changes the environment.
+    Safe to use from the worker threads of ConcurrentBatchProcessor.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._env_vars: dict[type[BaseModel], BaseModel] = {}
+        self._clients: dict[str, Any] = {}
+        self._loggers: dict[str | None, Logger] = {}
+        self._refresh_callbacks: list[Callable[[], None]] = []
+
+    def env_vars(self, model: type[Model]) -> Model:
+        """Environment variables validated by the model once per execution environment, raises ValueError when invalid"""
+        env_vars = self._env_vars.get(model)
+        if env_vars is None:
+            env_vars = self._env_vars[model] = get_environment_variables(model=model)
+        return env_vars  # type: ignore[return-value]
+
+    def client(self, service_name: str, build_config: Callable[[], Any] | None = None) -> Any:
+        """boto3 client of the service
+
+        Args:
+            service_name (str): i.e 's3' or 'sqs'.
+            build_config (Callable[[], botocore.config.Config] | None): Timeouts, retries and connection pool of the client, called when the client is built.
+        """
+        client = self._clients.get(service_name)
+        if client is None:
+            # boto3 sessions are not thread safe, build clients one at a time
+            with self._lock:
+                client = self._clients.get(service_name)
+                if client is None:
+                    # deferred import, importing boto3 and loading service models is paid on first use only
+                    from boto3 import client as boto3_client
+
+                    config = build_config() if build_config is not None else None
+                    client = self._clients[service_name] = boto3_client(service_name, config=config)
+        return client
+
+    def logger(self, service: str | None = None) -> Logger:
+        """Powertools logger of the service, POWERTOOLS_SERVICE_NAME when not given"""
+        logger = self._loggers.get(service)
+        if logger is None:
+            logger = self._loggers[service] = Logger(service=service)
+        return logger
+
+    def on_refresh(self, callback: Callable[[], None]) -> None:
+        """Registers a callback run by refresh, i.e the cache_clear of an lru_cache built from the environment variables"""
+        self._refresh_callbacks.append(callback)
+
+    def refresh(self) -> None:
+        """Drops the cached environment variables and clients, they are built again on next use, and runs the refresh
+        callbacks. Loggers are kept."""
+        with self._lock:
+            self._env_vars = {}
+            self._clients = {}
+        for callback in self._refresh_callbacks:
+            callback()
+
+
+# module level, so it survives between warm invocations of the execution environment
+runtime_context = RuntimeContext()
@@ -0,0 +1,163 @@
+import re
+from collections.abc import Iterable, Iterator
+from typing import Any, NamedTuple
+
+MIB = 1024 * 1024
+MIN_PART_SIZE = 5 * MIB  # S3 parts are at least 5 MiB, except the last one
+READ_CHUNK_SIZE = 256 * 1024
+PAYLOAD_HEAD_SIZE = 1024  # the {"item": ...} envelope prefix is found within the first bytes
+STREAM_MEMORY_SHARE = 0.5  # of the function memory, the rest is left to the runtime, the clients and the batch
+
+
+class WrittenObject(NamedTuple):
+    size: int  # bytes written
+    etag: str
+
+
+class StreamBuffers(NamedTuple):
+    part_size: int
+    max_streams: int  # streamed writes running at once
+
+
+def size_stream_buffers(memory_mb: int, concurrency: int, max_part_size: int) -> StreamBuffers:
+    """Part size and number of concurrent streamed writes that fit in STREAM_MEMORY_SHARE of the function memory
+
+    A stream holds up to two parts, the one filling up and the copy being uploaded. The part size shrinks from
+    max_part_size down to MIN_PART_SIZE so concurrency streams fit, when even those don't fit fewer streams run at once.
+    """
+    budget = int(memory_mb * MIB * STREAM_MEMORY_SHARE)
+    part_size = max(MIN_PART_SIZE, min(max_part_size, budget // (2 * concurrency) // MIB * MIB))
+    return StreamBuffers(part_size, max(1, min(concurrency, budget // (2 * part_size))))
+
+
+_ITEM_PREFIX = re.compile(rb'\s*\{\s*"item"\s*:\s*(?=\S)')
+_STRUCTURAL = re.compile(rb'[\\"{}\[\]]')
+_CLOSING = re.compile(rb'\s*\}\s*')
+
+
+class _ItemExtractor:
+    """Strips the {"item": ...} envelope from a JSON document streamed in chunks, yielding the item's raw JSON text.
+
+    Tracks string and nesting state over structural characters only, so the item's end is found without decoding
+    the document. The item must be an object and nothing but whitespace may follow it, as in the fast parsing mode's
+    item-only bodies. Values within the item are passed through, not validated.
+    """
+
+    def __init__(self) -> None:
+        self.head = b''
+        self.started = False
+        self.finished = False
+        self.tail = b''
+        self.depth = 0
+        self.in_string = False
+        self.escaped_at = -1  # position in the current chunk of a character escaped by a backslash
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self.finished:
+            self.tail += chunk
+            if len(self.tail) > PAYLOAD_HEAD_SIZE:
+                raise ValueError('message body must be a JSON object with an "item" object and nothing else')
+            return b''
+        if not self.started:
+            self.head += chunk
+            match = _ITEM_PREFIX.match(self.head)
+            if match is None:
+                if len(self.head) > PAYLOAD_HEAD_SIZE:
+                    raise ValueError('message body must be a JSON object with an "item" object')
+                return b''  # the prefix may continue in the next chunk
+            chunk, self.head, self.started = self.head[match.end() :], b'', True
+            if not chunk.startswith(b'{'):
+                raise ValueError('message body must be a JSON object with an "item" object')
+        end = self._scan(chunk)
+        if end is None:
+            return chunk
+        self.finished = True
+        self.tail = chunk[end:]
+        return chunk[:end]
+
+    def close(self) -> None:
+        if not self.finished or not _CLOSING.fullmatch(self.tail):
+            raise ValueError('message body must be a JSON object with an "item" object and nothing else')
+
+    def _scan(self, chunk: bytes) -> int | None:
+        """Position after the item's closing brace, None when the item continues in the next chunk"""
+        for match in _STRUCTURAL.finditer(chunk):
+            position = match.start()
+            if position == self.escaped_at:
+                continue
+            character = chunk[position : position + 1]
+            if character == b'\\':
+                self.escaped_at = position + 1
+            elif character == b'"':
+                self.in_string = not self.in_string
+            elif not self.in_string:
+                self.depth += 1 if character in (b'{', b'[') else -1
+                if self.depth == 0:
+                    self.escaped_at = -1
+                    return position + 1
+        # an escape on the last byte applies to the first byte of the next chunk
+        self.escaped_at = 0 if self.escaped_at == len(chunk) else -1
+        return None
+
+
+def extract_item_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Yields the raw JSON text of the item of a streamed {"item": {...}} document
+
+    Raises
+    ------
+    ValueError
+        When the document is not a JSON object holding nothing but an 'item' object.
+    """
+    extractor = _ItemExtractor()
+    for chunk in chunks:
+        extracted = extractor.feed(chunk)
+        if extracted:
+            yield extracted
+    extractor.close()
+
+
+def stream_upload(s3_client: Any, bucket_name: str, object_key: str, chunks: Iterable[bytes], content_type: str, part_size: int) -> WrittenObject:
+    """Uploads a stream holding at most a single part in memory, with a multipart upload when it exceeds one part
+
+    Returns
+    -------
+    WrittenObject
+        Bytes written and the ETag of the object
+    """
+    buffer = bytearray()
+    iterator = iter(chunks)
+    for chunk in iterator:
+        buffer += chunk
+        if len(buffer) >= part_size:
+            return _multipart_upload(s3_client, bucket_name, object_key, buffer, iterator, content_type, part_size)
+    response = s3_client.put_object(Bucket=bucket_name, Key=object_key, Body=bytes(buffer), ContentType=content_type)
+    return WrittenObject(len(buffer), response['ETag'])
+
+
+def _multipart_upload(
+    s3_client: Any, bucket_name: str, object_key: str, buffer: bytearray, chunks: Iterator[bytes], content_type: str, part_size: int
+) -> WrittenObject:
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket_name, Key=object_key, ContentType=content_type)['UploadId']
+    parts: list[dict] = []
+    written = 0
+    try:
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= part_size:
+                written += _upload_part(s3_client, bucket_name, object_key, upload_id, parts, bytes(memoryview(buffer)[:part_size]))
+                del buffer[:part_size]
+        if buffer or not parts:
+            written += _upload_part(s3_client, bucket_name, object_key, upload_id, parts, bytes(buffer))
+        response = s3_client.complete_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id, MultipartUpload={'Parts': parts})
+    except Exception:
+        # parts of an incomplete upload are billed until aborted
+        s3_client.abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        raise
+    return WrittenObject(written, response['ETag'])
+
+
+def _upload_part(s3_client: Any, bucket_name: str, object_key: str, upload_id: str, parts: list[dict], body: bytes) -> int:
+    part_number = len(parts) + 1
+    response = s3_client.upload_part(Bucket=bucket_name, Key=object_key, UploadId=upload_id, PartNumber=part_number, Body=body)
+    parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+    return len(body)
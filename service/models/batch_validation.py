@@ -0,0 +1,137 @@
+import gc
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Annotated, Any, Generic, TypeVar
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from pydantic_core import ErrorDetails
+from typing_extensions import TypedDict
+
+from service.models.input import CreateOrderRequest
+from service.models.order import Order
+
+Model = TypeVar('Model', bound=BaseModel)
+
+# canonical UUID text, what UUID() parses in validate_product_id for nearly every real id. The model does not check
+# the version (UUID(version=4) overrides it), so neither does the pattern
+UUID_PATTERN = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+CHUNK_SIZE = 1000
+_object_setattr = object.__setattr__  # bypasses BaseModel.__setattr__, as model_construct does
+
+
+class _FastOrder(TypedDict):
+    """Order constraints pydantic-core checks without calling Python validators, accepts a subset of what Order accepts"""
+
+    name: Annotated[str, Field(min_length=1, max_length=20)]
+    item_count: Annotated[int, Field(strict=True, gt=0)]
+    id: Annotated[str, Field(pattern=UUID_PATTERN.pattern)]
+
+
+class _FastCreateOrderRequest(TypedDict):
+    customer_name: Annotated[str, Field(min_length=1, max_length=20)]
+    order_item_count: Annotated[int, Field(strict=True, gt=0)]
+
+
+@dataclass
+class BatchValidation(Generic[Model]):
+    """
+    Args:
+        items (list[Model | None]): Validated models in input order, None where the input was rejected.
+        errors (dict[int, list[ErrorDetails]]): The model's errors per rejected input index.
+    """
+
+    items: list[Model | None] = field(default_factory=list)
+    errors: dict[int, list[ErrorDetails]] = field(default_factory=dict)
+
+
+class BatchValidator(Generic[Model]):
+    """Validates lists of raw dicts in bulk, accepting and rejecting the same items with the same errors as the model.
+
+    Every chunk of the list is validated by a single TypeAdapter call against a fast schema: the model's constraints
+    expressed as pydantic-core constraints (a compiled UUID pattern instead of parsing a UUID, gt=0 instead of a field
+    validator), so the loop runs without calling Python per item. The fast schema accepts a subset of what the model
+    accepts, accepted items become models without validating them again. The few items it rejects are validated by the
+    model itself, which decides and reports their errors, so unusual but valid input (i.e an upper case UUID in braces)
+    is still accepted. The fast schema is a TypedDict, its validated dicts become the models' fields directly, as
+    model_construct sets them without its handling of defaults, extra fields and private attributes, which the models
+    don't have. The cyclic garbage collector is paused during the call, the models hold no reference cycles and
+    collections triggered by allocating millions of them cost more than the validation.
+
+    Args:
+        model (type[Model]): Model whose behaviour is kept, without private attributes, extra fields or model_post_init.
+        fast_schema (type): TypedDict with the model's fields, all required, accepting a subset of what the model accepts.
+    """
+
+    def __init__(self, model: type[Model], fast_schema: type, chunk_size: int = CHUNK_SIZE) -> None:
+        if model.__private_attributes__ or model.model_config.get('extra') == 'allow' or model.__pydantic_post_init__:
+            raise ValueError(f'{model.__name__} has private attributes, extra fields or model_post_init, validate it per item')
+        self.model = model
+        self.fast_schema = fast_schema
+        self.chunk_size = chunk_size
+        self._adapter: TypeAdapter[list[dict[str, Any]]] = TypeAdapter(list[fast_schema])  # type: ignore[valid-type]
+
+    def validate(self, items: list[Any]) -> BatchValidation[Model]:
+        result: BatchValidation[Model] = BatchValidation()
+        with _garbage_collection_paused:
+            for start in range(0, len(items), self.chunk_size):
+                validated, errors = self._validate_chunk(items[start : start + self.chunk_size])
+                result.items.extend(validated)
+                result.errors.update((start + index, item_errors) for index, item_errors in errors.items())
+        return result
+
+    def _validate_chunk(self, chunk: list[Any]) -> tuple[list[Model | None], dict[int, list[ErrorDetails]]]:
+        try:
+            return [self._to_model(fields) for fields in self._adapter.validate_python(chunk)], {}
+        except ValidationError as exc:
+            rejected = {int(error['loc'][0]) for error in exc.errors(include_url=False)}
+
+        validated: list[Model | None] = [None] * len(chunk)
+        errors: dict[int, list[ErrorDetails]] = {}
+        accepted = [index for index in range(len(chunk)) if index not in rejected]
+        for index, fields in zip(accepted, self._adapter.validate_python([chunk[index] for index in accepted]), strict=True):
+            validated[index] = self._to_model(fields)
+        for index in rejected:
+            try:
+                validated[index] = self.model.model_validate(chunk[index])
+            except ValidationError as exc:
+                errors[index] = exc.errors()
+        return validated, errors
+
+    def _to_model(self, fields: dict[str, Any]) -> Model:
+        # the fast schema enforced every constraint of the model and required every field
+        model = self.model.__new__(self.model)
+        _object_setattr(model, '__dict__', fields)
+        _object_setattr(model, '__pydantic_fields_set__', set(fields))
+        _object_setattr(model, '__pydantic_extra__', None)
+        _object_setattr(model, '__pydantic_private__', None)
+        return model
+
+
+class _GarbageCollectionPause:
+    """Pauses the cyclic garbage collector while any caller, of any thread, is inside, restores it when the last leaves"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._depth = 0
+        self._was_enabled = False
+
+    def __enter__(self) -> None:
+        with self._lock:
+            if self._depth == 0:
+                self._was_enabled = gc.isenabled()
+                gc.disable()
+            self._depth += 1
+
+    def __exit__(self, *exc_info: object) -> None:
+        with self._lock:
+            self._depth -= 1
+            if self._depth == 0 and self._was_enabled:
+                gc.enable()
+
+
+_garbage_collection_paused = _GarbageCollectionPause()
+
+
+order_validator: BatchValidator[Order] = BatchValidator(Order, _FastOrder)
+create_order_request_validator: BatchValidator[CreateOrderRequest] = BatchValidator(CreateOrderRequest, _FastCreateOrderRequest)
@@ -4,3 +4,15 @@ class InternalServerException(Exception):
 
 class DynamicConfigurationException(Exception):
     pass
+
+
+class DeadlineExceededException(Exception):
+    pass
+
+
+class CircuitOpenException(Exception):
+    pass
+
+
+class RecordRejectedException(Exception):
+    pass
@@ -4,6 +4,7 @@ import time
 import boto3
 import pytest
 
+from service.handlers.utils.order_index import OrderIndex
 from tests.utils import generate_random_string, get_stack_output
 
 
@@ -12,6 +13,11 @@ def queue_url():
     return get_stack_output('QueueUrl')
 
 
+@pytest.fixture
+def order_index():
+    return OrderIndex(get_stack_output('IndexTableName'))
+
+
 @pytest.fixture
 def bucket_name():
     bucket_name = get_stack_output('BucketName')
@@ -21,7 +27,7 @@ def bucket_name():
     bucket.objects.all().delete()
 
 
-def test_insert_message_to_sqs(queue_url: str, bucket_name: str):
+def test_insert_message_to_sqs(queue_url: str, bucket_name: str, order_index: OrderIndex):
     sqs_client = boto3.client('sqs')
     message_body = {'item': {'laptop': generate_random_string(length=5)}}
     response = sqs_client.send_message(QueueUrl=queue_url, MessageBody=json.dumps(message_body))
@@ -29,11 +35,9 @@ def test_insert_message_to_sqs(queue_url: str, bucket_name: str):
     # fetch item from s3 bucket and compare contents to message body
     # add a retry mechanism to wait for the message to be processed
     time.sleep(10)  # todo replace with proper retry mechanism like tenacity
-    s3 = boto3.resource('s3')
-    bucket = s3.Bucket(bucket_name)
-    for obj in bucket.objects.all():
-        if obj.key == f'{response["MessageId"]}.json':
-            obj_body = json.loads(obj.get()['Body'].read().decode('utf-8'))
-            assert obj_body == message_body['item']
-            return
-    raise AssertionError('Message not found in S3 bucket')
+    # the index points at the written object, no need to list the bucket
+    entry = order_index.get(response['MessageId'])
+    assert entry is not None, 'Message not found in the index'
+    obj = boto3.client('s3').get_object(Bucket=bucket_name, Key=entry.object_key)
+    assert json.loads(obj['Body'].read().decode('utf-8')) == message_body['item']
+    assert obj['ETag'].strip('"') == entry.etag
@@ -1,17 +1,16 @@
 import os
 
-import pytest
-
 from cdk.blueprint.constants import (
+    METRICS_NAMESPACE,
     POWER_TOOLS_LOG_LEVEL,
+    POWERTOOLS_METRICS_NAMESPACE,
     POWERTOOLS_SERVICE_NAME,
     SERVICE_NAME,
 )
 from tests.utils import get_stack_output
 
-
-@pytest.fixture(scope='module', autouse=True)
-def init():
-    os.environ[POWERTOOLS_SERVICE_NAME] = SERVICE_NAME
-    os.environ[POWER_TOOLS_LOG_LEVEL] = 'DEBUG'
-    os.environ['BUCKET_NAME'] = get_stack_output('BucketName')
+# set before the test modules import the handler, which reads its environment variables while pre-warming
+os.environ[POWERTOOLS_SERVICE_NAME] = SERVICE_NAME
+os.environ[POWERTOOLS_METRICS_NAMESPACE] = METRICS_NAMESPACE
+os.environ[POWER_TOOLS_LOG_LEVEL] = 'DEBUG'
+os.environ['BUCKET_NAME'] = get_stack_output('BucketName')
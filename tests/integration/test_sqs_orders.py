@@ -1,7 +1,7 @@
 import uuid
 
+from fakes.lambda_events import generate_context
 from service.handlers.handle_sqs_batch import lambda_handler
-from tests.utils import generate_context
 
 
 def test_handler_ok():
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from cdk.blueprint.constants import (
+    METRICS_NAMESPACE,
+    POWER_TOOLS_LOG_LEVEL,
+    POWERTOOLS_METRICS_NAMESPACE,
+    POWERTOOLS_SERVICE_NAME,
+    POWERTOOLS_TRACE_DISABLED,
+    SERVICE_NAME,
+)
+
+BUCKET_NAME = 'test-bucket'
+
+# set before the handler modules are imported, Powertools reads the service name and the metrics namespace at import time
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ[POWERTOOLS_SERVICE_NAME] = SERVICE_NAME
+os.environ[POWERTOOLS_METRICS_NAMESPACE] = METRICS_NAMESPACE
+os.environ[POWER_TOOLS_LOG_LEVEL] = 'DEBUG'
+os.environ[POWERTOOLS_TRACE_DISABLED] = 'true'
+os.environ['BUCKET_NAME'] = BUCKET_NAME
+# environment variables change between tests, don't cache the parsed models
+os.environ['LAMBDA_ENV_MODELER_DISABLE_CACHE'] = 'true'
+
+from fakes.s3 import FakeS3Client  # noqa: E402
+from service.handlers import process_sqs_batch  # noqa: E402, F401  registers the caches cleared by runtime_context.refresh
+from service.handlers.utils.async_runtime import async_runtime  # noqa: E402
+from service.handlers.utils.runtime_context import runtime_context  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clear_execution_environment_caches():
+    # every test starts as a new execution environment
+    runtime_context.refresh()
+    async_runtime.refresh()
+
+
+@pytest.fixture
+def s3_client(mocker) -> FakeS3Client:
+    fake_client = FakeS3Client()
+    mocker.patch('service.handlers.logic.get_s3_client', return_value=fake_client)
+    return fake_client
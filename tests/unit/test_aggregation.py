@@ -0,0 +1,100 @@
+import gzip
+import json
+import math
+
+import pytest
+from aws_lambda_powertools.utilities.batch.exceptions import BatchProcessingError
+
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.models.env_vars import Compression
+from service.handlers.utils.aggregation import BLOCK_SIZE, build_aggregated_object, get_batch_id, read_aggregated_record
+from tests.unit.conftest import BUCKET_NAME
+
+
+@pytest.fixture(autouse=True)
+def aggregation_mode(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('AGGREGATION_MODE', 'true')
+
+
+def _batch_key(event: dict, extension: str) -> str:
+    return f'batches/{get_batch_id([record["messageId"] for record in event["Records"]])}{extension}'
+
+
+@pytest.mark.parametrize('compression, extension', [('none', '.ndjson'), ('gzip', '.ndjson.gz'), ('zstd', '.ndjson.zst')])
+def test_batch_is_written_as_single_object(s3_client, monkeypatch: pytest.MonkeyPatch, compression: str, extension: str):
+    monkeypatch.setenv('AGGREGATION_COMPRESSION', compression)
+    items = [{'laptop': str(index)} for index in range(5)]
+    event = generate_sqs_event([{'item': item} for item in items])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert s3_client.put_calls == 2  # aggregated object and its index
+    index = json.loads(s3_client.get_object(Bucket=BUCKET_NAME, Key=_batch_key(event, '.index.json'))['Body'].read())
+    assert index['object_key'] == _batch_key(event, extension)
+    for record, item in zip(event['Records'], items, strict=True):
+        assert read_aggregated_record(s3_client, BUCKET_NAME, index, record['messageId']) == item
+
+
+def test_gzip_object_is_readable_as_a_whole(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('AGGREGATION_COMPRESSION', 'gzip')
+    items = [{'laptop': 'amd'}, {'keyboard': 'classic'}]
+    event = generate_sqs_event([{'item': item} for item in items])
+
+    lambda_handler(event, generate_context())
+
+    body = s3_client.get_object(Bucket=BUCKET_NAME, Key=_batch_key(event, '.ndjson.gz'))['Body'].read()
+    assert [json.loads(line) for line in gzip.decompress(body).splitlines()] == items
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_records_are_compressed_in_blocks(s3_client, compression: Compression):
+    lines = [(f'message-{index}', json.dumps({'laptop': str(index), 'specs': {}}).encode()) for index in range(5000)]
+
+    body, index = build_aggregated_object('batches/blocks', lines, compression)
+    s3_client.put_object(Bucket=BUCKET_NAME, Key='batches/blocks', Body=body)
+
+    raw_size = sum(len(line) + 1 for _, line in lines)
+    assert len(body) < raw_size / 4
+    assert len({location['offset'] for location in index['records'].values()}) == math.ceil(raw_size / BLOCK_SIZE)
+    for message_id in ('message-0', 'message-2500', 'message-4999'):
+        assert read_aggregated_record(s3_client, BUCKET_NAME, index, message_id) == {'laptop': message_id.split('-')[1], 'specs': {}}
+
+
+def test_invalid_records_are_left_out_of_the_object(s3_client):
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, 'not json'])
+    valid_event = {'Records': event['Records'][:1]}
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': event['Records'][1]['messageId']}]}
+    index = json.loads(s3_client.get_object(Bucket=BUCKET_NAME, Key=_batch_key(valid_event, '.index.json'))['Body'].read())
+    assert list(index['records']) == [event['Records'][0]['messageId']]
+
+
+def test_failed_flush_reports_every_aggregated_record(s3_client):
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'item': {'keyboard': 'classic'}}, 'not json'])
+    valid_event = {'Records': event['Records'][:2]}
+    s3_client.failing_keys = {_batch_key(valid_event, '.ndjson')}
+
+    # every record failed, the whole batch is handed back to SQS
+    with pytest.raises(BatchProcessingError):
+        lambda_handler(event, generate_context())
+    assert not s3_client.objects
+
+
+def test_object_without_index_is_deleted_and_written_again_by_the_retry(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('IDEMPOTENCY_STORE', 'memory')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'item': {'keyboard': 'classic'}}])
+    s3_client.failing_keys = {_batch_key(event, '.index.json')}
+
+    with pytest.raises(BatchProcessingError):
+        lambda_handler(event, generate_context())
+    assert not s3_client.objects
+
+    # redelivered in another order, the batch keeps its id
+    s3_client.failing_keys = set()
+    redelivered = {'Records': event['Records'][::-1]}
+    assert lambda_handler(redelivered, generate_context()) == {'batchItemFailures': []}
+    assert sorted(s3_client.objects) == sorted(f'{BUCKET_NAME}/{_batch_key(event, extension)}' for extension in ('.ndjson', '.index.json'))
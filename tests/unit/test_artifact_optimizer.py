@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+from cdk.blueprint.artifact_optimizer import can_precompile, optimize_artifact
+
+HOST_VERSION = f'{sys.version_info.major}.{sys.version_info.minor}'
+
+
+def _install(site_packages: Path, distribution: str, package: str, files: dict[str, str]) -> None:
+    dist_info = site_packages / f'{package}-1.0.dist-info'
+    dist_info.mkdir(parents=True)
+    (dist_info / 'METADATA').write_text(f'Metadata-Version: 2.1\nName: {distribution}\nVersion: 1.0\n')
+    (dist_info / 'WHEEL').write_text('Wheel-Version: 1.0\n')
+    for name, content in files.items():
+        (site_packages / name).parent.mkdir(parents=True, exist_ok=True)
+        (site_packages / name).write_text(content)
+    recorded = [*files, f'{dist_info.name}/METADATA', f'{dist_info.name}/WHEEL', f'{dist_info.name}/RECORD', '../../bin/script']
+    (dist_info / 'RECORD').write_text(''.join(f'{path},,\n' for path in recorded))
+
+
+@pytest.fixture
+def site_packages(tmp_path: Path) -> Path:
+    folder = tmp_path / 'python'
+    _install(folder, 'boto3', 'boto3', {'boto3/__init__.py': 'VERSION = 1', 'boto3/session.py': ''})
+    _install(
+        folder,
+        'aws-lambda-powertools',
+        'aws_lambda_powertools',
+        {
+            'aws_lambda_powertools/__init__.py': 'VERSION = 1',
+            'aws_lambda_powertools/__init__.pyi': 'VERSION: int',
+            'aws_lambda_powertools/tests/test_logger.py': '',
+        },
+    )
+    return folder
+
+
+def test_pruned_distributions_are_removed_with_their_files(site_packages: Path):
+    report = optimize_artifact(site_packages, '2.7', pruned_distributions=['Boto3'])
+
+    assert not (site_packages / 'boto3').exists()
+    assert not (site_packages / 'boto3-1.0.dist-info').exists()
+    assert (site_packages / 'aws_lambda_powertools' / '__init__.py').exists()
+    assert report.removed_files > 0 and report.removed_bytes > 0
+
+
+def test_tests_stubs_and_installation_metadata_are_pruned(site_packages: Path):
+    optimize_artifact(site_packages, '2.7')
+
+    assert not (site_packages / 'aws_lambda_powertools' / 'tests').exists()
+    assert not (site_packages / 'aws_lambda_powertools' / '__init__.pyi').exists()
+    # importlib.metadata still finds the version
+    assert sorted(path.name for path in (site_packages / 'aws_lambda_powertools-1.0.dist-info').iterdir()) == ['METADATA']
+
+
+def test_modules_are_precompiled_for_the_target_version_only(site_packages: Path):
+    skipped = optimize_artifact(site_packages, '2.7')
+    assert not skipped.compiled
+    assert not list(site_packages.rglob('*.pyc'))
+
+    compiled = optimize_artifact(site_packages, HOST_VERSION)
+
+    assert compiled.compiled and can_precompile(HOST_VERSION)
+    assert (site_packages / 'boto3' / '__pycache__' / f'session.{sys.implementation.cache_tag}.pyc').exists()
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from fakes.lambda_events import generate_context, generate_sqs_event
+from fakes.s3 import FakeAsyncS3Client, FakeS3Client
+from service.handlers.handle_sqs_batch import lambda_handler
+from tests.unit.conftest import BUCKET_NAME
+
+pytest.importorskip('aiobotocore')
+
+
+@pytest.fixture
+def async_s3_client(s3_client: FakeS3Client, mocker, monkeypatch: pytest.MonkeyPatch) -> FakeS3Client:
+    monkeypatch.setenv('CONCURRENCY_MODE', 'async')
+    mocker.patch('service.handlers.logic.get_async_s3_client', return_value=FakeAsyncS3Client(s3_client))
+    return s3_client
+
+
+def test_async_batch_writes_all_records(async_s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('ASYNC_CONCURRENCY', '50')
+    async_s3_client.latency_seconds = 0.05
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(200)])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert async_s3_client.max_in_flight == 50
+    for record in event['Records']:
+        stored = async_s3_client.get_object(Bucket=BUCKET_NAME, Key=f'{record["messageId"]}.json')
+        assert stored['Body'].read() == json.dumps(json.loads(record['body'])['item']).encode()
+
+
+@pytest.mark.parametrize('mode', ['threads', 'async'])
+def test_failed_records_are_reported_as_by_the_sync_handler(async_s3_client, monkeypatch: pytest.MonkeyPatch, mode: str):
+    monkeypatch.setenv('CONCURRENCY_MODE', mode)
+    monkeypatch.setenv('BATCH_CONCURRENCY', '4')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, 'not json', {'item': {'keyboard': 'classic'}}, {'items': {}}])
+    failed_id = event['Records'][2]['messageId']
+    async_s3_client.failing_keys = {f'{failed_id}.json'}
+
+    response = lambda_handler(event, generate_context())
+
+    failed_ids = [event['Records'][1]['messageId'], failed_id, event['Records'][3]['messageId']]
+    assert response == {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+
+
+def test_records_past_deadline_are_reported(async_s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('ASYNC_CONCURRENCY', '2')
+    async_s3_client.latency_seconds = 0.3
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(4)])
+
+    # 1.4 seconds left, 1 second kept aside for the response: 0.4 seconds of budget. The first two records are written
+    # concurrently by 0.3 seconds, the last two would finish at 0.6 seconds, past the deadline
+    response = lambda_handler(event, generate_context(remaining_time_in_millis=1400))
+
+    late_ids = [record['messageId'] for record in event['Records'][2:]]
+    assert response == {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in late_ids]}
@@ -0,0 +1,112 @@
+import pytest
+from aws_lambda_powertools.utilities.batch.exceptions import BatchProcessingError
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+from cdk.blueprint.constants import API_HANDLER_LAMBDA_TIMEOUT
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.utils.backpressure import CircuitBreaker, is_degradation_error
+from service.handlers.utils.runtime_context import build_fail_fast_config
+from service.models.exceptions import CircuitOpenException
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_once_the_failure_rate_is_reached():
+    breaker = CircuitBreaker(failure_rate=0.5, window=10, min_writes=4, cooldown_seconds=5, clock=FakeClock())
+
+    for failed in (True, False, True):
+        breaker.before_write()
+        breaker.record(failed)
+    assert breaker.state == 'closed'  # 2 of 3 failed, below min_writes
+
+    breaker.before_write()
+    breaker.record(False)
+    assert breaker.state == 'closed'  # 2 of 4 failed, the last write succeeded
+
+    breaker.before_write()
+    breaker.record(True)
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenException):
+        breaker.before_write()
+
+
+@pytest.mark.parametrize('probe_failed, state', [(False, 'closed'), (True, 'open')])
+def test_breaker_lets_a_single_probe_through_after_the_cooldown(probe_failed: bool, state: str):
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_rate=1, window=1, min_writes=1, cooldown_seconds=5, clock=clock)
+    breaker.before_write()
+    breaker.record(True)
+
+    clock.now = 5
+    assert breaker.state == 'half_open'
+    breaker.before_write()
+    with pytest.raises(CircuitOpenException):
+        breaker.before_write()  # the probe is in flight
+    breaker.record(probe_failed)
+
+    assert breaker.state == state
+
+
+def test_only_throttling_server_and_connection_errors_count_as_failures():
+    def client_error(code: str, status_code: int) -> ClientError:
+        return ClientError({'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, 'PutObject')
+
+    assert is_degradation_error(client_error('SlowDown', 503))
+    assert is_degradation_error(client_error('InternalError', 500))
+    assert is_degradation_error(ReadTimeoutError(endpoint_url='https://s3.amazonaws.com'))
+    assert not is_degradation_error(client_error('AccessDenied', 403))
+    assert not is_degradation_error(ValueError('not an order'))
+
+
+def test_open_breaker_fails_remaining_records_without_calling_s3(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('CIRCUIT_BREAKER_WINDOW', '10')
+    monkeypatch.setenv('CIRCUIT_BREAKER_MIN_WRITES', '4')
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(10)])
+    message_ids = [record['messageId'] for record in event['Records']]
+    s3_client.failing_keys = {f'{message_id}.json' for message_id in message_ids[2:4]}
+
+    response = lambda_handler(event, generate_context())
+
+    # 2 of the first 4 writes failed, the breaker opened and the 6 remaining records were handed back to SQS
+    assert response == {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in message_ids[2:]]}
+    assert s3_client.put_calls == 4
+
+
+def test_breaker_stays_open_across_warm_invocations(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('CIRCUIT_BREAKER_MIN_WRITES', '5')
+    s3_client.error_rate = 1
+
+    with pytest.raises(BatchProcessingError):
+        lambda_handler(generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(20)]), generate_context())
+    s3_client.error_rate = 0
+    with pytest.raises(BatchProcessingError):
+        lambda_handler(generate_sqs_event([{'item': {'laptop': 'amd'}}]), generate_context())
+
+    assert s3_client.put_calls == 5
+
+
+def test_records_past_deadline_are_reported_when_processed_one_at_a_time(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('BATCH_CONCURRENCY', '1')
+    s3_client.latency_seconds = 0.3
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(4)])
+
+    # 0.4 seconds to write: the first record finishes, the second is still writing at the deadline
+    response = lambda_handler(event, generate_context(remaining_time_in_millis=1400))
+
+    late_ids = [record['messageId'] for record in event['Records'][1:]]
+    assert response == {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in late_ids]}
+    assert s3_client.put_calls == 2
+
+
+def test_client_calls_fail_within_the_function_timeout():
+    config = build_fail_fast_config()
+
+    worst_case_seconds = config.retries['total_max_attempts'] * (config.connect_timeout + config.read_timeout)
+    assert config.retries['mode'] == 'standard' and worst_case_seconds < API_HANDLER_LAMBDA_TIMEOUT
@@ -0,0 +1,94 @@
+import gc
+import uuid
+
+import pytest
+from pydantic import BaseModel, PrivateAttr, ValidationError
+
+from service.models.batch_validation import BatchValidator, _garbage_collection_paused, create_order_request_validator, order_validator
+from service.models.input import CreateOrderRequest
+from service.models.order import Order
+
+ORDER_ID = str(uuid.uuid4())
+ORDERS = [
+    {'name': 'ran', 'item_count': 3, 'id': ORDER_ID},
+    {'name': 'ran', 'item_count': 3, 'id': ORDER_ID.upper(), 'extra': 1},
+    {'name': 'ran', 'item_count': 3, 'id': str(uuid.uuid1())},  # the model doesn't check the version
+    {'name': 'ran', 'item_count': 3, 'id': '+' + ORDER_ID[1:]},  # accepted by UUID(), not by the pattern
+    {'name': 'ran', 'item_count': 3, 'id': '{' + ORDER_ID.replace('-', '') + '}' + '--'},
+    {'name': 'ran', 'item_count': 3, 'id': ORDER_ID[:-1] + 'g'},
+    {'name': 'ran', 'item_count': 3, 'id': ORDER_ID + '0'},
+    {'name': 'ran', 'item_count': 3, 'id': ORDER_ID.replace('-', '')},
+    {'name': 'ran', 'item_count': 0, 'id': ORDER_ID},
+    {'name': 'ran', 'item_count': -1, 'id': ORDER_ID},
+    {'name': 'ran', 'item_count': '3', 'id': ORDER_ID},
+    {'name': 'ran', 'item_count': 3.0, 'id': ORDER_ID},
+    {'name': 'ran', 'item_count': True, 'id': ORDER_ID},
+    {'name': '', 'item_count': 3, 'id': ORDER_ID},
+    {'name': 'r' * 21, 'item_count': 3, 'id': ORDER_ID},
+    {'name': 7, 'item_count': 3, 'id': ORDER_ID},
+    {'item_count': 3, 'id': ORDER_ID},
+    {'name': 'ran', 'item_count': 3, 'id': None},
+    Order(name='ran', item_count=3, id=ORDER_ID),
+    'order',
+    None,
+]
+REQUESTS = [
+    {'customer_name': 'ran', 'order_item_count': 3},
+    {'customer_name': 'ran', 'order_item_count': 0},
+    {'customer_name': 'ran', 'order_item_count': '3'},
+    {'customer_name': '', 'order_item_count': 3},
+    {'customer_name': 'ran'},
+    [],
+]
+
+
+def _validate_one(model: type[BaseModel], item: object) -> tuple[BaseModel | None, list]:
+    try:
+        return model.model_validate(item), []
+    except ValidationError as exc:
+        return None, _comparable(exc.errors())
+
+
+def _comparable(errors: list) -> list:
+    return [(error['type'], error['loc'], error['msg']) for error in errors]
+
+
+@pytest.mark.parametrize(('validator', 'items'), [(order_validator, ORDERS), (create_order_request_validator, REQUESTS)])
+def test_same_items_are_accepted_and_rejected_with_the_same_errors_as_by_the_model(validator, items):
+    small_chunks = BatchValidator(validator.model, validator.fast_schema, chunk_size=4)
+
+    for validation in (validator.validate(items * 3), small_chunks.validate(items * 3)):
+        assert len(validation.items) == len(items) * 3
+        for index, item in enumerate(items * 3):
+            expected, errors = _validate_one(validator.model, item)
+            assert validation.items[index] == expected
+            assert _comparable(validation.errors.get(index, [])) == errors
+
+
+def test_valid_batch_has_no_errors():
+    orders = [{'name': f'customer {index}', 'item_count': index + 1, 'id': str(uuid.uuid4())} for index in range(2500)]
+
+    result = order_validator.validate(orders)
+
+    assert not result.errors
+    assert [order.model_dump() for order in result.items if order] == orders
+    assert isinstance(result.items[0], Order) and isinstance(create_order_request_validator.validate(REQUESTS[:1]).items[0], CreateOrderRequest)
+
+
+def test_models_with_private_attributes_are_rejected():
+    class TracedOrder(Order):
+        _trace_id: str = PrivateAttr(default='')
+
+    with pytest.raises(ValueError):
+        BatchValidator(TracedOrder, order_validator.fast_schema)
+
+
+def test_garbage_collector_is_restored_when_the_last_validation_ends():
+    assert gc.isenabled()
+    with pytest.raises(RuntimeError), _garbage_collection_paused:
+        with _garbage_collection_paused:  # i.e a validation of another thread
+            assert not gc.isenabled()
+        assert not gc.isenabled()
+        raise RuntimeError
+
+    assert gc.isenabled()
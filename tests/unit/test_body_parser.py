@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.models.sqs_item import Order
+from service.handlers.utils.body_parser import extract_order_item
+from tests.unit.conftest import BUCKET_NAME
+
+BODIES = [
+    '{"item": {"laptop": "amd"}}',
+    '  {\n "item" : {"laptop": "amd", "nested": {"item": 1}}\n}  ',
+    '{"item": {}, "customer": "ran"}',
+    '{"item": {"big": 123456789012345678901234567890}}',
+    '{"item": {"name": "\\u05e8\\u05df"}}',
+    '{"item": {"a": 1}, "item": {"b": 2}}',
+    '{"item": []}',
+    '{"item": null}',
+    '{"order": {"laptop": "amd"}}',
+    '[{"item": {}}]',
+    '"item"',
+    'not json',
+    '',
+]
+
+
+@pytest.mark.parametrize('body', BODIES)
+def test_fast_path_matches_strict_model(body: str):
+    try:
+        expected = Order.model_validate_json(body).item
+    except ValidationError:
+        with pytest.raises(ValueError):
+            extract_order_item(body)
+        return
+    assert json.loads(extract_order_item(body)) == expected
+
+
+def test_item_only_body_is_passed_through():
+    assert extract_order_item('{"item": {"laptop":  "amd"}}') == b'{"laptop":  "amd"}'
+
+
+def test_fast_parsing_mode_writes_and_reports_failures(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('PARSING_MODE', 'fast')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'order': 'no item'}])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': event['Records'][1]['messageId']}]}
+    stored = s3_client.get_object(Bucket=BUCKET_NAME, Key=f'{event["Records"][0]["messageId"]}.json')
+    assert json.loads(stored['Body'].read()) == {'laptop': 'amd'}
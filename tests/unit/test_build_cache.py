@@ -0,0 +1,78 @@
+import os
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from cdk.blueprint.build_cache import COMPLETE_MARKER, BuildCache, hash_paths, install_requirements, stage_sources
+
+
+@pytest.fixture
+def sources(tmp_path: Path) -> Path:
+    folder = tmp_path / 'lambdas' / 'service'
+    folder.mkdir(parents=True)
+    (folder / 'handler.py').write_text('def handler(event, context): ...')
+    return folder.parent
+
+
+def test_unchanged_sources_are_served_from_the_cache(tmp_path: Path, sources: Path):
+    cache = BuildCache(tmp_path / 'cache')
+
+    first = stage_sources(cache, 'lambdas', sources)
+    (sources / 'service' / '__pycache__').mkdir()
+    (sources / 'service' / '__pycache__' / 'handler.cpython-313.pyc').write_bytes(b'bytecode')
+    second = stage_sources(cache, 'lambdas', sources)
+
+    assert first == second
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert (second / 'service' / 'handler.py').read_text() == 'def handler(event, context): ...'
+    assert not (second / 'service' / '__pycache__').exists()
+
+
+def test_changed_sources_are_built_again(tmp_path: Path, sources: Path):
+    cache = BuildCache(tmp_path / 'cache')
+
+    first = stage_sources(cache, 'lambdas', sources)
+    (sources / 'service' / 'handler.py').write_text('def handler(event, context): return {}')
+    second = stage_sources(cache, 'lambdas', sources)
+
+    assert first != second
+    assert cache.stats.misses == 2
+
+
+def test_runtime_is_part_of_the_key(sources: Path):
+    assert hash_paths([sources], 'python3.13') != hash_paths([sources], 'python3.12')
+    assert hash_paths([sources], 'python3.13') == hash_paths([sources], 'python3.13')
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path):
+    cache = BuildCache(tmp_path / 'cache', max_entries=2)
+    for age, key in enumerate(('a', 'b')):
+        os.utime(cache.get_or_build('layer', key, lambda folder: (folder / 'requirements.txt').touch()), (age, age))
+
+    cache.get_or_build('layer', 'a', lambda folder: pytest.fail('a is cached'))
+    cache.get_or_build('layer', 'c', lambda folder: (folder / 'requirements.txt').touch())
+
+    assert sorted(path.name for path in (tmp_path / 'cache' / 'layer').iterdir()) == ['a', 'c']
+    assert cache.stats.evictions == 1
+
+
+def test_failed_build_leaves_no_entry(tmp_path: Path):
+    cache = BuildCache(tmp_path / 'cache')
+
+    def fail(folder: Path) -> None:
+        (folder / 'partial').touch()
+        raise RuntimeError('pip failed')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_build('layer', 'a', fail)
+    entry = cache.get_or_build('layer', 'a', lambda folder: (folder / 'complete').touch())
+
+    assert sorted(path.name for path in entry.iterdir()) == [COMPLETE_MARKER, 'complete']
+
+
+def test_requirements_without_platform_wheels_fail_the_build(tmp_path: Path, mocker):
+    mocker.patch('subprocess.run', side_effect=subprocess.CalledProcessError(1, ['pip']))
+
+    with pytest.raises(RuntimeError, match='manylinux2014_x86_64 Python 3.13'):
+        install_requirements(tmp_path / 'requirements.txt', tmp_path / 'python', '3.13')
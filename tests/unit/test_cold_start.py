@@ -0,0 +1,65 @@
+import sys
+from types import ModuleType
+
+import pytest
+
+from service.handlers.utils import cold_start
+from service.handlers.utils.runtime_context import runtime_context
+
+
+@pytest.fixture
+def clients(mocker) -> dict[str, object]:
+    built: dict[str, object] = {}
+    mocker.patch('service.handlers.logic.get_s3_client', side_effect=lambda: built.setdefault('s3', object()))
+    mocker.patch('service.handlers.logic.get_firehose_client', side_effect=lambda: built.setdefault('firehose', object()))
+    return built
+
+
+def test_warm_up_builds_the_s3_client_and_imports_the_handler(clients: dict, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delitem(sys.modules, 'service.handlers.process_sqs_batch', raising=False)
+
+    cold_start.warm_up()
+
+    assert list(clients) == ['s3']
+    assert 'service.handlers.process_sqs_batch' in sys.modules
+
+
+def test_warm_up_builds_the_firehose_client_of_the_delivery_stream_sink(clients: dict, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('SINK_TYPE', 'delivery_stream')
+    monkeypatch.setenv('DELIVERY_STREAM_NAME', 'orders-stream')
+
+    cold_start.warm_up()
+
+    assert sorted(clients) == ['firehose', 's3']
+
+
+def test_refresh_after_restore_builds_new_clients(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('SINK_TYPE', 'delivery_stream')
+    monkeypatch.setenv('DELIVERY_STREAM_NAME', 'orders-stream')
+    cold_start.warm_up()
+    s3_client, firehose_client = runtime_context.client('s3'), runtime_context.client('firehose')
+
+    cold_start.refresh_after_restore()
+
+    assert runtime_context.client('s3') is not s3_client
+    assert runtime_context.client('firehose') is not firehose_client
+
+
+def test_disabled_prewarm_skips_warm_up(clients: dict, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('COLD_START_PREWARM', 'false')
+
+    cold_start.init_execution_environment()
+
+    assert not clients
+
+
+def test_snapstart_restore_hook_is_registered(clients: dict, monkeypatch: pytest.MonkeyPatch):
+    hooks: list[object] = []
+    snapshot_restore_py = ModuleType('snapshot_restore_py')
+    snapshot_restore_py.register_after_restore = hooks.append  # type: ignore[attr-defined]
+    monkeypatch.setitem(sys.modules, 'snapshot_restore_py', snapshot_restore_py)
+
+    cold_start.init_execution_environment()
+
+    assert list(clients) == ['s3']
+    assert hooks == [cold_start.refresh_after_restore]
@@ -0,0 +1,145 @@
+import json
+import time
+from datetime import datetime, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from fakes.lambda_events import generate_context
+from fakes.s3 import FakeS3Client
+from service.handlers.models.env_vars import CompactionEnvVars
+from service.handlers.utils.compaction import COMPACTED_PREFIX, CompactionSettings, PartitionCompactor
+from tests.unit.conftest import BUCKET_NAME
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+PARTITION = 'dt=2024-03-09/hour=23/'
+
+
+@pytest.fixture
+def s3() -> FakeS3Client:
+    client = FakeS3Client()
+    for index in range(250):
+        client.put_object(Bucket=BUCKET_NAME, Key=f'{PARTITION}{index:04d}.json', Body=json.dumps({'index': index, 'laptop': 'amd'}).encode())
+    client.put_object(Bucket=BUCKET_NAME, Key='dt=2024-03-10/hour=00/late.json', Body=b'{}')
+    return client
+
+
+def _read_parts(s3: FakeS3Client, manifest: dict) -> list[dict]:
+    tables = [pq.read_table(pa.BufferReader(s3.objects[f'{BUCKET_NAME}/{part["key"]}']['Body'])) for part in manifest['parts']]
+    return pa.concat_tables(tables).to_pylist()
+
+
+def test_partition_is_compacted_into_parts_with_a_manifest(s3: FakeS3Client):
+    compactor = PartitionCompactor(s3, BUCKET_NAME, CompactionSettings(concurrency=8, max_part_bytes=4096))
+
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+
+    assert manifest is not None and manifest['rows'] == 250
+    assert len(manifest['parts']) > 1 and all(part['json_bytes'] < 4096 + 8 * 40 for part in manifest['parts'])
+    rows = _read_parts(s3, manifest)
+    assert [row['message_id'] for row in rows] == [f'{index:04d}' for index in range(250)]
+    assert json.loads(rows[7]['item']) == {'index': 7, 'laptop': 'amd'}
+    assert f'{BUCKET_NAME}/{COMPACTED_PREFIX}{PARTITION}_checkpoint.json' not in s3.objects
+    assert f'{BUCKET_NAME}/{PARTITION}0007.json' in s3.objects  # kept unless tombstoned
+
+
+def test_compaction_resumes_from_its_checkpoint(s3: FakeS3Client):
+    compactor = PartitionCompactor(s3, BUCKET_NAME, CompactionSettings(concurrency=8, max_part_bytes=4096))
+
+    assert compactor.compact(PARTITION, deadline=time.monotonic()) is None  # out of time after the first read
+    checkpoint = json.loads(s3.objects[f'{BUCKET_NAME}/{COMPACTED_PREFIX}{PARTITION}_checkpoint.json']['Body'])
+    assert checkpoint['last_key'] == f'{PARTITION}0007.json'
+
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+    assert manifest is not None
+    assert [row['message_id'] for row in _read_parts(s3, manifest)] == [f'{index:04d}' for index in range(250)]
+    assert compactor.rows_compacted == 250
+
+
+def test_compacted_originals_are_tombstoned(s3: FakeS3Client):
+    s3.put_object(Bucket=BUCKET_NAME, Key=f'{PARTITION}zzzz.json', Body=b'{}')
+    compactor = PartitionCompactor(s3, BUCKET_NAME, CompactionSettings(file_format='arrow', tombstone=True))
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+    assert manifest is not None and manifest['tombstoned'] and compactor.objects_tombstoned == 251
+    s3.put_object(Bucket=BUCKET_NAME, Key=f'{PARTITION}0100-late.json', Body=b'{"late": true}')  # arrived after the compaction
+
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+
+    assert manifest is not None and manifest['tombstoned'] and manifest['rows'] == 252
+    assert manifest['parts'][-1]['last_key'] == f'{PARTITION}0100-late.json'
+    assert compactor.objects_tombstoned == 252
+    assert sorted(key for key in s3.objects if '.json' in key and COMPACTED_PREFIX not in key) == [f'{BUCKET_NAME}/dt=2024-03-10/hour=00/late.json']
+
+
+def test_late_objects_are_appended_once(s3: FakeS3Client):
+    compactor = PartitionCompactor(s3, BUCKET_NAME, CompactionSettings(max_part_bytes=4096))
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+    assert manifest is not None
+    parts = len(manifest['parts'])
+    s3.put_object(Bucket=BUCKET_NAME, Key=f'{PARTITION}0100-late.json', Body=b'{"late": true}')
+
+    compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+
+    assert manifest is not None and manifest['rows'] == 251 and len(manifest['parts']) == parts + 1
+    assert sorted(row['message_id'] for row in _read_parts(s3, manifest)) == sorted([f'{index:04d}' for index in range(250)] + ['0100-late'])
+    assert compactor.rows_compacted == 251
+
+
+def test_late_objects_are_appended_until_the_deadline(s3: FakeS3Client, mocker):
+    compactor = PartitionCompactor(s3, BUCKET_NAME, CompactionSettings(concurrency=8))
+    assert compactor.compact(PARTITION, deadline=time.monotonic() + 60) is not None
+    for index in range(20):
+        s3.put_object(Bucket=BUCKET_NAME, Key=f'{PARTITION}{index:04d}-late.json', Body=b'{"late": true}')
+    clock = mocker.patch('service.handlers.utils.compaction.time', wraps=time)
+    clock.monotonic.side_effect = [0.0, 100.0]  # out of time after the first chunk of late objects
+
+    assert compactor.compact(PARTITION, deadline=10.0) is None
+    manifest = json.loads(s3.objects[f'{BUCKET_NAME}/{COMPACTED_PREFIX}{PARTITION}manifest.json']['Body'])
+    assert manifest['rows'] == 258
+
+    clock.monotonic.side_effect = None
+    clock.monotonic.return_value = 0.0
+    manifest = compactor.compact(PARTITION, deadline=10.0)
+    assert manifest is not None and manifest['rows'] == 270
+    assert len({row['object_key'] for row in _read_parts(s3, manifest)}) == 270
+
+
+def test_failed_tombstones_are_retried(s3: FakeS3Client):
+    s3.failing_keys.add(f'{PARTITION}0042.json')
+    compactor = PartitionCompactor(s3, BUCKET_NAME, CompactionSettings(tombstone=True))
+
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+
+    assert manifest is not None and not manifest['tombstoned']
+    assert compactor.objects_tombstoned == 249
+    assert f'{BUCKET_NAME}/{PARTITION}0042.json' in s3.objects
+
+    s3.failing_keys.clear()
+    manifest = compactor.compact(PARTITION, deadline=time.monotonic() + 60)
+
+    assert manifest is not None and manifest['tombstoned']
+    assert f'{BUCKET_NAME}/{PARTITION}0042.json' not in s3.objects
+
+
+def test_compaction_requires_pyarrow_with_the_default_format(mocker):
+    mocker.patch('service.handlers.models.env_vars.find_spec', return_value=None)
+
+    with pytest.raises(ValidationError, match='pyarrow'):
+        CompactionEnvVars.model_validate({'POWERTOOLS_SERVICE_NAME': 'service', 'LOG_LEVEL': 'INFO', 'BUCKET_NAME': BUCKET_NAME})
+
+
+def test_handler_compacts_closed_partitions(s3: FakeS3Client, mocker, monkeypatch: pytest.MonkeyPatch):
+    from service.handlers import handle_compaction
+
+    mocker.patch.object(handle_compaction, 'get_s3_client', return_value=s3)
+    now = datetime(2024, 3, 10, 2, 30, tzinfo=timezone.utc)
+    partitions = handle_compaction.get_partitions(now, settle_hours=2, lookback_hours=3)
+    assert partitions == ['dt=2024-03-09/hour=21/', 'dt=2024-03-09/hour=22/', 'dt=2024-03-09/hour=23/']
+
+    response = handle_compaction.lambda_handler({'partitions': partitions}, generate_context(remaining_time_in_millis=60_000))
+
+    assert response == {'compacted': partitions, 'incomplete': None}
+    assert len([key for key in s3.objects if key.endswith('manifest.json')]) == 3
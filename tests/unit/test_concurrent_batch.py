@@ -0,0 +1,67 @@
+import json
+import time
+
+import pytest
+
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.utils.idempotency import get_idempotency_store
+from tests.unit.conftest import BUCKET_NAME
+
+
+def test_concurrent_batch_writes_all_records(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('BATCH_CONCURRENCY', '10')
+    s3_client.latency_seconds = 0.05
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(10)])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert s3_client.max_in_flight > 1
+    for record in event['Records']:
+        stored = s3_client.get_object(Bucket=BUCKET_NAME, Key=f'{record["messageId"]}.json')
+        assert stored['Body'].read() == json.dumps(json.loads(record['body'])['item']).encode()
+
+
+@pytest.mark.parametrize('concurrency', ['1', '4'])
+def test_failed_records_are_reported(s3_client, monkeypatch: pytest.MonkeyPatch, concurrency: str):
+    monkeypatch.setenv('BATCH_CONCURRENCY', concurrency)
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, 'not json', {'item': {'keyboard': 'classic'}}])
+    failed_id = event['Records'][2]['messageId']
+    s3_client.failing_keys = {f'{failed_id}.json'}
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': event['Records'][1]['messageId']}, {'itemIdentifier': failed_id}]}
+
+
+def test_records_past_deadline_are_reported(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('BATCH_CONCURRENCY', '2')
+    s3_client.latency_seconds = 0.3
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(4)])
+
+    # 1.4 seconds left, 1 second kept aside for the response: 0.4 seconds of budget. The first two records are written
+    # in parallel by 0.3 seconds, the last two would finish at 0.6 seconds, past the deadline
+    response = lambda_handler(event, generate_context(remaining_time_in_millis=1400))
+
+    late_ids = [record['messageId'] for record in event['Records'][2:]]
+    assert response == {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in late_ids]}
+
+
+def test_records_past_deadline_record_nothing_after_their_write(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('BATCH_CONCURRENCY', '1')
+    monkeypatch.setenv('IDEMPOTENCY_STORE', 'memory')
+    s3_client.latency_seconds = 0.3
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(3)])
+
+    # 0.4 seconds of budget: the second write is in progress at the deadline, the third one never starts
+    response = lambda_handler(event, generate_context(remaining_time_in_millis=1400))
+    time.sleep(0.4)  # the worker's S3 call completes
+
+    late_ids = [record['messageId'] for record in event['Records'][1:]]
+    assert response == {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in late_ids]}
+    assert s3_client.put_calls == 2
+    # the late write isn't remembered, its redelivery writes the object again
+    store = get_idempotency_store()
+    assert store is not None and store.get(f'{late_ids[0]}.json') is None
+    assert store.get(f'{event["Records"][0]["messageId"]}.json') is not None
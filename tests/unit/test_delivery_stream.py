@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from aws_lambda_powertools.utilities.batch.exceptions import BatchProcessingError
+from pydantic import ValidationError
+
+from fakes.firehose import FakeFirehoseClient
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.backpressure import is_degradation_error
+
+STREAM_NAME = 'orders-stream'
+
+
+@pytest.fixture
+def firehose_client(monkeypatch: pytest.MonkeyPatch, mocker) -> FakeFirehoseClient:
+    monkeypatch.setenv('SINK_TYPE', 'delivery_stream')
+    monkeypatch.setenv('DELIVERY_STREAM_NAME', STREAM_NAME)
+    mocker.patch('service.handlers.logic.time.sleep')  # backoff between attempts
+    fake_client = FakeFirehoseClient()
+    mocker.patch('service.handlers.logic.get_firehose_client', return_value=fake_client)
+    return fake_client
+
+
+def test_records_are_put_as_ndjson_lines(firehose_client: FakeFirehoseClient, s3_client):
+    items = [{'laptop': str(index)} for index in range(5)]
+
+    response = lambda_handler(generate_sqs_event([{'item': item} for item in items]), generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert firehose_client.put_calls == 1
+    assert [json.loads(line) for line in firehose_client.records[STREAM_NAME]] == items
+    assert all(line.endswith(b'\n') for line in firehose_client.records[STREAM_NAME])
+    assert s3_client.put_calls == 0
+
+
+def test_calls_are_split_by_record_count_and_size(firehose_client: FakeFirehoseClient):
+    small = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(1200)])
+    assert lambda_handler(small, generate_context()) == {'batchItemFailures': []}
+    assert (firehose_client.put_calls, firehose_client.max_records_per_call) == (3, 500)
+
+    large = generate_sqs_event([{'item': {'payload': 'x' * 900_000}} for _ in range(10)])
+    assert lambda_handler(large, generate_context()) == {'batchItemFailures': []}
+    # four 900 KB records per 4 MiB call
+    assert firehose_client.put_calls == 3 + 3
+    assert firehose_client.delivered == 1210
+
+
+def test_rejected_records_are_reported_as_batch_item_failures(firehose_client: FakeFirehoseClient):
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, 'not json', {'item': {'keyboard': 'classic'}}, {'item': {'x': 'y' * 1_100_000}}])
+    firehose_client.failing_records = {b'{"keyboard": "classic"}\n'}
+
+    response = lambda_handler(event, generate_context())
+
+    failed_ids = [event['Records'][index]['messageId'] for index in (1, 2, 3)]
+    assert response == {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+    assert firehose_client.records[STREAM_NAME] == [b'{"laptop": "amd"}\n']
+
+
+def test_throttled_records_are_put_again(firehose_client: FakeFirehoseClient):
+    firehose_client.record_error_rate = 0.1
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(100)])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert firehose_client.put_calls > 1 and firehose_client.rejected > 0
+    assert sorted(json.loads(line)['laptop'] for line in firehose_client.records[STREAM_NAME]) == sorted(str(index) for index in range(100))
+
+
+def test_throttled_records_after_the_last_attempt_count_as_failed_write(firehose_client: FakeFirehoseClient, mocker):
+    firehose_client.record_error_rate = 1.0
+    after_write = mocker.patch('service.handlers.logic.after_write')
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(10)])
+
+    with pytest.raises(BatchProcessingError):
+        lambda_handler(event, generate_context())
+
+    (exc,), _ = after_write.call_args
+    assert exc.response['Error']['Code'] == 'ServiceUnavailableException'
+    assert is_degradation_error(exc)
+
+
+def test_failed_call_fails_its_records_only(firehose_client: FakeFirehoseClient, mocker):
+    calls = []
+
+    def put_record_batch(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2:
+            raise ConnectionResetError('connection reset')
+        return {'FailedPutCount': 0, 'RequestResponses': [{'RecordId': str(index)} for index in range(len(kwargs['Records']))]}
+
+    mocker.patch.object(firehose_client, 'put_record_batch', side_effect=put_record_batch)
+    event = generate_sqs_event([{'item': {'laptop': str(index)}} for index in range(600)])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': record['messageId']} for record in event['Records'][500:]]}
+
+
+def test_delivery_stream_name_is_required():
+    with pytest.raises(ValidationError, match='DELIVERY_STREAM_NAME'):
+        MyHandlerEnvVars.model_validate(
+            {'POWERTOOLS_SERVICE_NAME': 'test', 'LOG_LEVEL': 'INFO', 'BUCKET_NAME': 'bucket', 'SINK_TYPE': 'delivery_stream'}
+        )
@@ -0,0 +1,71 @@
+import pytest
+
+from fakes.lambda_events import generate_context, generate_sqs_record
+from fakes.s3 import FakeS3Client
+from service.handlers.handle_sqs_batch import lambda_handler
+
+
+@pytest.fixture(autouse=True)
+def fifo_mode(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('FIFO_MODE', 'true')
+    monkeypatch.setenv('BATCH_CONCURRENCY', '4')
+
+
+def _fifo_event(groups: dict[str, list[dict | str]]) -> dict:
+    """Records of every group interleaved, as SQS delivers a FIFO batch with several message groups"""
+    records: list[dict] = []
+    for position in range(max(len(bodies) for bodies in groups.values())):
+        for group_id, bodies in groups.items():
+            if position < len(bodies):
+                record = generate_sqs_record(bodies[position])
+                record['attributes'].update({'MessageGroupId': group_id, 'SequenceNumber': str(len(records))})
+                records.append(record)
+    return {'Records': records}
+
+
+def _written_order(s3_client: FakeS3Client, event: dict, group_id: str) -> list[str]:
+    group = {f'{record["messageId"]}.json' for record in event['Records'] if record['attributes']['MessageGroupId'] == group_id}
+    return [key.split('/', 1)[1] for key in s3_client.objects if key.split('/', 1)[1] in group]
+
+
+def test_groups_are_written_concurrently_in_order(s3_client: FakeS3Client):
+    s3_client.latency_seconds = 0.02
+    event = _fifo_event({group_id: [{'item': {'step': str(step)}} for step in range(3)] for group_id in ('a', 'b', 'c', 'd')})
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert s3_client.max_in_flight == 4
+    for group_id in ('a', 'b', 'c', 'd'):
+        expected = [f'{record["messageId"]}.json' for record in event['Records'] if record['attributes']['MessageGroupId'] == group_id]
+        assert _written_order(s3_client, event, group_id) == expected
+
+
+def test_a_single_group_is_written_one_record_at_a_time(s3_client: FakeS3Client):
+    s3_client.latency_seconds = 0.01
+    event = _fifo_event({'a': [{'item': {'step': str(step)}} for step in range(5)]})
+
+    assert lambda_handler(event, generate_context()) == {'batchItemFailures': []}
+    assert s3_client.max_in_flight == 1
+
+
+def test_first_failure_stops_its_group_only(s3_client: FakeS3Client):
+    event = _fifo_event({'a': [{'item': {'step': '0'}}, 'not json', {'item': {'step': '2'}}], 'b': [{'item': {'step': '0'}}] * 3})
+    group_a = [record for record in event['Records'] if record['attributes']['MessageGroupId'] == 'a']
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': record['messageId']} for record in group_a[1:]]}
+    assert _written_order(s3_client, event, 'a') == [f'{group_a[0]["messageId"]}.json']
+    assert len(_written_order(s3_client, event, 'b')) == 3
+
+
+def test_records_not_started_before_the_deadline_are_reported(s3_client: FakeS3Client):
+    s3_client.latency_seconds = 0.3
+    event = _fifo_event({'a': [{'item': {'step': str(step)}} for step in range(4)], 'b': [{'item': {'step': '0'}}]})
+    group_a = [record for record in event['Records'] if record['attributes']['MessageGroupId'] == 'a']
+
+    # 0.5 seconds of budget once the deadline margin is kept aside
+    response = lambda_handler(event, generate_context(remaining_time_in_millis=1500))
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': record['messageId']} for record in group_a[1:]]}
@@ -0,0 +1,41 @@
+import pytest
+
+from benchmarks.power_tuning import estimate_tiers, recommend_sizing, select_tier
+from cdk.blueprint.function_sizing import FunctionSizing
+from cdk.blueprint.throughput_profile import ThroughputProfile
+
+
+def test_visibility_timeout_shorter_than_six_timeouts_is_rejected():
+    with pytest.raises(ValueError, match='visibility timeout'):
+        FunctionSizing(memory_mb=128, timeout_seconds=60, visibility_timeout_seconds=300)
+
+
+@pytest.mark.parametrize(('memory_mb', 'timeout_seconds'), [(64, 10), (20_000, 10), (128, 0), (128, 901)])
+def test_out_of_range_sizing_is_rejected(memory_mb: int, timeout_seconds: int):
+    with pytest.raises(ValueError):
+        FunctionSizing.for_timeout(memory_mb, timeout_seconds)
+
+
+def test_batching_window_extends_the_visibility_timeout():
+    sizing = FunctionSizing.for_timeout(memory_mb=256, timeout_seconds=10, batching_window_seconds=5)
+    profile = ThroughputProfile(target_records_per_second=100, record_latency_ms=50, function_timeout_seconds=10)
+
+    assert sizing.visibility_timeout_seconds == 65
+    sizing.validate_profile(profile)
+    with pytest.raises(ValueError, match='throughput profile'):
+        FunctionSizing.for_timeout(memory_mb=256, timeout_seconds=20).validate_profile(profile)
+
+
+def test_tuning_picks_a_tier_and_a_matching_timeout():
+    samples = {'cpu_ms': [400.0, 420.0], 'wall_ms': [500.0, 520.0]}  # CPU bound handler
+    estimates = estimate_tiers(samples, batch_size=100, tiers=[128, 1769, 3008])
+
+    assert estimates[0]['duration_p99_ms'] > estimates[1]['duration_p99_ms'] == estimates[2]['duration_p99_ms']
+    assert select_tier(estimates, 'speed')['memory_mb'] == 1769
+    assert select_tier(estimates, 'cost', max_duration_ms=1000)['memory_mb'] == 1769
+    with pytest.raises(ValueError):
+        select_tier(estimates, 'balanced', max_duration_ms=1)
+
+    sizing = recommend_sizing(estimates[0], batching_window_seconds=5)
+    assert sizing.timeout_seconds * 1000 >= 2 * estimates[0]['duration_p99_ms']
+    sizing.validate_event_source(batching_window_seconds=5)
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+from botocore.exceptions import EndpointConnectionError, ReadTimeoutError
+from pydantic import ValidationError
+
+from fakes.dynamodb import FakeDynamoDBClient
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.idempotency import DynamoDBIdempotencyStore, InMemoryIdempotencyStore
+from service.handlers.utils.runtime_context import CLIENT_MAX_ATTEMPTS, runtime_context
+from tests.unit.conftest import BUCKET_NAME
+
+
+def test_redelivered_batch_is_not_written_again(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('IDEMPOTENCY_STORE', 'memory')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'item': {'keyboard': 'classic'}}])
+
+    lambda_handler(event, generate_context())
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert s3_client.put_calls == 2
+
+
+def test_changed_content_is_written(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('IDEMPOTENCY_STORE', 'memory')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}])
+    lambda_handler(event, generate_context())
+
+    event['Records'][0]['body'] = '{"item": {"laptop": "intel"}}'
+    lambda_handler(event, generate_context())
+
+    assert s3_client.put_calls == 2
+    stored = s3_client.get_object(Bucket=BUCKET_NAME, Key=f'{event["Records"][0]["messageId"]}.json')
+    assert stored['Body'].read() == b'{"laptop": "intel"}'
+
+
+def test_failed_write_is_not_remembered(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('IDEMPOTENCY_STORE', 'memory')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'item': {'keyboard': 'classic'}}])
+    s3_client.failing_keys = {f'{event["Records"][0]["messageId"]}.json'}
+    lambda_handler(event, generate_context())
+
+    s3_client.failing_keys = set()
+    lambda_handler(event, generate_context())
+
+    assert s3_client.put_calls == 3
+
+
+def test_in_memory_store_evicts_expired_and_least_recently_used():
+    store = InMemoryIdempotencyStore(ttl_seconds=60, max_entries=2)
+    store.save('a', 'hash-a')
+    store.save('b', 'hash-b')
+    store.get('a')
+    store.save('c', 'hash-c')
+
+    assert store.get('b') is None
+    assert store.is_duplicate('a', 'hash-a')
+
+    expired_store = InMemoryIdempotencyStore(ttl_seconds=0)
+    expired_store.save('a', 'hash-a')
+    assert expired_store.get('a') is None
+
+
+def test_dynamodb_store_is_shared_between_execution_environments():
+    client = FakeDynamoDBClient()
+    DynamoDBIdempotencyStore('table', ttl_seconds=60, client=client).save('a', 'hash-a')
+
+    other_environment = DynamoDBIdempotencyStore('table', ttl_seconds=60, client=client)
+
+    assert other_environment.is_duplicate('a', 'hash-a')
+    assert other_environment.is_duplicate('a', 'hash-a')
+    assert client.calls['GetItem'] == 1  # second lookup served by the local cache
+
+
+def test_dynamodb_store_ignores_expired_items():
+    client = FakeDynamoDBClient()
+    client.put_item(
+        TableName='table',
+        Item={'pk': {'S': 'a'}, 'content_hash': {'S': 'hash-a'}, 'expiration': {'N': str(int(time.time()) - 1)}},
+    )
+
+    assert DynamoDBIdempotencyStore('table', ttl_seconds=60, client=client).get('a') is None
+
+
+def test_dynamodb_errors_fall_back_to_writing():
+    store = DynamoDBIdempotencyStore('table', ttl_seconds=60, client=FakeDynamoDBClient(failing=True))
+
+    store.save('a', 'hash-a')
+
+    assert not DynamoDBIdempotencyStore('table', ttl_seconds=60, client=store.client).is_duplicate('a', 'hash-a')
+
+
+def test_dynamodb_connection_errors_are_cache_misses(mocker):
+    client = FakeDynamoDBClient()
+    store = DynamoDBIdempotencyStore('table', ttl_seconds=60, client=client)
+    store.save('a', 'hash-a')
+    mocker.patch.object(client, 'get_item', side_effect=EndpointConnectionError(endpoint_url='https://dynamodb'))
+    mocker.patch.object(client, 'put_item', side_effect=ReadTimeoutError(endpoint_url='https://dynamodb'))
+    other_environment = DynamoDBIdempotencyStore('table', ttl_seconds=60, client=client)
+
+    assert not other_environment.is_duplicate('a', 'hash-a')
+    other_environment.save('b', 'hash-b')
+    assert other_environment.is_duplicate('b', 'hash-b')
+
+
+def test_dynamodb_store_uses_the_fail_fast_client_of_the_runtime_context():
+    client = DynamoDBIdempotencyStore('table', ttl_seconds=60).client
+
+    assert client is runtime_context.client('dynamodb')
+    assert client.meta.config.retries['total_max_attempts'] == CLIENT_MAX_ATTEMPTS
+
+
+def test_dynamodb_store_requires_table_name():
+    with pytest.raises(ValidationError):
+        MyHandlerEnvVars.model_validate(
+            {'POWERTOOLS_SERVICE_NAME': 'service', 'LOG_LEVEL': 'INFO', 'BUCKET_NAME': 'bucket', 'IDEMPOTENCY_STORE': 'dynamodb'}
+        )
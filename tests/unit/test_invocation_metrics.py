@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from aws_lambda_powertools.utilities.batch.exceptions import BatchProcessingError
+
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.utils.invocation_metrics import MAX_DATAPOINTS, InvocationMetrics
+
+
+def _emitted_blobs(output: str) -> list[dict]:
+    return [blob for blob in map(json.loads, filter(None, output.splitlines())) if '_aws' in blob]
+
+
+def test_large_batch_aggregates_counters_and_latencies(s3_client, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    monkeypatch.setenv('BATCH_CONCURRENCY', '10')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}] * 250)
+    s3_client.failing_keys = {f'{event["Records"][0]["messageId"]}.json'}
+
+    lambda_handler(event, generate_context())
+
+    blobs = _emitted_blobs(capsys.readouterr().out)
+    assert blobs[0]['RecordsProcessed'] == [250.0]
+    assert blobs[0]['FailedRecords'] == [1.0]
+    assert blobs[0]['BucketItems'] == [249.0]
+    assert blobs[0]['BytesWritten'] == [249.0 * len(b'{"laptop": "amd"}')]
+    assert 0 < len(blobs[0]['S3WriteLatency']) < MAX_DATAPOINTS
+    # histograms are published as a count per bucket, every written record is counted in the same blob
+    assert len(blobs) == 1
+    assert sum(blobs[0]['EndToEndLatency']['Counts']) == 249
+    assert len(blobs[0]['EndToEndLatency']['Values']) == len(blobs[0]['EndToEndLatency']['Counts']) <= MAX_DATAPOINTS
+
+
+def test_failed_batch_is_counted(s3_client, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    monkeypatch.setenv('METRICS_LATENCY_SAMPLE_RATE', '0')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}])
+    s3_client.failing_keys = {f'{event["Records"][0]["messageId"]}.json'}
+
+    with pytest.raises(BatchProcessingError):
+        lambda_handler(event, generate_context())
+
+    blob = _emitted_blobs(capsys.readouterr().out)[0]
+    assert blob['FailedRecords'] == [1.0]
+    assert 'S3WriteLatency' not in blob
+
+
+def test_metric_limit_is_respected():
+    invocation_metrics = InvocationMetrics()
+
+    for index in range(150):
+        invocation_metrics.add(f'Counter{index}', 'Count', 1)
+    invocation_metrics.observe_latency('Latency', 1.0)
+
+    assert len(invocation_metrics.counters) + len(invocation_metrics.latencies) < 100
+
+
+def test_histogram_reports_every_observation():
+    invocation_metrics = InvocationMetrics()
+    invocation_metrics.start(sample_rate=0.01)  # histograms are not sampled
+
+    for latency in range(1, 1_001):
+        invocation_metrics.observe_histogram('EndToEndLatency', latency)
+
+    buckets = invocation_metrics.histograms['EndToEndLatency'].buckets(max_buckets=1_000)
+    assert sum(count for _, count in buckets) == 1_000
+    assert [value for value, _ in buckets] == sorted(value for value, _ in buckets)
+    assert buckets[0] == (pytest.approx(1, rel=0.02), 1) and buckets[-1][0] == pytest.approx(1_000, rel=0.02)
+    median = next(value for position, (value, _) in enumerate(buckets) if sum(count for _, count in buckets[: position + 1]) >= 500)
+    assert median == pytest.approx(500, rel=0.02)
+
+
+def test_histogram_spread_beyond_the_datapoint_limit_is_merged():
+    invocation_metrics = InvocationMetrics()
+
+    for latency in range(1, 10_001):
+        invocation_metrics.observe_histogram('EndToEndLatency', latency)
+
+    buckets = invocation_metrics.histograms['EndToEndLatency'].buckets()
+    assert len(buckets) <= MAX_DATAPOINTS
+    assert sum(count for _, count in buckets) == 10_000
+    assert buckets[-1][0] == pytest.approx(10_000, rel=0.1)
+
+
+def test_record_latencies_are_split_by_delivery(s3_client, capsys: pytest.CaptureFixture):
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}] * 3)
+    event['Records'][0]['attributes']['ApproximateReceiveCount'] = '2'
+
+    lambda_handler(event, generate_context())
+
+    blob = _emitted_blobs(capsys.readouterr().out)[0]
+    # generate_sqs_record's message was sent 2ms before it was first received
+    assert blob['QueueWaitLatency'] == {'Values': [pytest.approx(2, rel=0.02)], 'Counts': [2]}
+    assert blob['RedeliveredQueueWaitLatency'] == {'Values': [pytest.approx(2, rel=0.02)], 'Counts': [1]}
+    assert sum(blob['EndToEndLatency']['Counts']) == 2 and blob['RedeliveredEndToEndLatency']['Counts'] == [1]
+    assert max(blob['EndToEndLatency']['Values']) >= max(blob['ProcessingLatency']['Values']) > 0
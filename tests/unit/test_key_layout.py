@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.utils.key_layout import FlatKeyBuilder, HashedKeyBuilder, HourPartitionedKeyBuilder, KeyBuilder
+from tests.unit.conftest import BUCKET_NAME
+
+MESSAGE_ID = '059f36b4-87a3-44ab-83d2-661975830a7d'
+SENT_AT = datetime(2024, 3, 9, 23, 59, 59, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    'key_builder, expected_key',
+    [
+        (FlatKeyBuilder(), f'{MESSAGE_ID}.json'),
+        (HashedKeyBuilder(prefix_length=2), f'5e/{MESSAGE_ID}.json'),
+        (HourPartitionedKeyBuilder(), f'dt=2024-03-09/hour=23/{MESSAGE_ID}.json'),
+        (HourPartitionedKeyBuilder(prefix_length=3), f'dt=2024-03-09/hour=23/5e8/{MESSAGE_ID}.json'),
+    ],
+)
+def test_key_layouts(key_builder: KeyBuilder, expected_key: str):
+    assert key_builder.build(MESSAGE_ID, SENT_AT) == expected_key
+    assert key_builder.build(MESSAGE_ID, SENT_AT.astimezone(timezone(timedelta(hours=2)))) == expected_key
+
+
+def test_hourly_prefixes_cover_the_time_range():
+    prefixes = list(HourPartitionedKeyBuilder().prefixes(SENT_AT - timedelta(minutes=90), SENT_AT + timedelta(seconds=1)))
+
+    assert prefixes == ['dt=2024-03-09/hour=22/', 'dt=2024-03-09/hour=23/', 'dt=2024-03-10/hour=00/']
+
+
+def test_records_are_written_to_their_sent_hour(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('KEY_LAYOUT', 'hourly_hashed')
+    monkeypatch.setenv('KEY_HASH_PREFIX_LENGTH', '1')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'item': {'keyboard': 'classic'}}])
+    event['Records'][1]['attributes']['SentTimestamp'] = str(int(SENT_AT.timestamp() * 1000))
+
+    assert lambda_handler(event, generate_context()) == {'batchItemFailures': []}
+
+    listed = s3_client.list_objects_v2(Bucket=BUCKET_NAME, Prefix='dt=2024-03-09/hour=23/')
+    assert [content['Key'].rsplit('/', 1)[-1] for content in listed['Contents']] == [f'{event["Records"][1]["messageId"]}.json']
+    assert len(s3_client.objects) == 2
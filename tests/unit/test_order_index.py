@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+from fakes.dynamodb import FakeDynamoDBClient
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.models.sqs_item import REDRIVE_ORIGIN_ATTRIBUTE
+from service.handlers.utils.invocation_metrics import invocation_metrics
+from service.handlers.utils.order_index import IndexEntry, OrderIndex
+from service.models.exceptions import DeadlineExceededException
+from tests.unit.conftest import BUCKET_NAME
+
+SENT_AT = datetime(2024, 3, 9, 22, 30, tzinfo=timezone.utc)
+
+
+def _entry(index: int, sent_at: datetime) -> IndexEntry:
+    return IndexEntry(f'message-{index:03d}', f'message-{index:03d}.json', 10, 'etag', sent_at, 5)
+
+
+def test_index_entries_are_written_in_batches_and_found_by_message_id():
+    client = FakeDynamoDBClient()
+    index = OrderIndex('index', client=client)
+    for position in range(60):
+        index.add(_entry(position, SENT_AT))
+
+    assert index.flush() == 0
+    assert client.calls['BatchWriteItem'] == 3
+    assert index.get('message-042') == _entry(42, SENT_AT)
+    assert index.get('missing') is None
+    assert index.flush() == 0 and client.calls['BatchWriteItem'] == 3  # nothing pending
+
+
+def test_throttled_index_writes_are_retried():
+    client = FakeDynamoDBClient(throttled_batches=2)
+    index = OrderIndex('index', client=client)
+    for position in range(20):
+        index.add(_entry(position, SENT_AT))
+
+    assert index.flush() == 0
+    assert len(client.tables['index']) == 20
+    assert client.calls['BatchWriteItem'] == 3
+
+
+def test_range_query_reads_the_hours_of_the_range_only():
+    client = FakeDynamoDBClient()
+    index = OrderIndex('index', shards=2, client=client)
+    for position in range(300):
+        index.add(_entry(position, SENT_AT + timedelta(minutes=position)))
+    index.flush()
+
+    found = list(index.query(SENT_AT + timedelta(minutes=30), SENT_AT + timedelta(minutes=149)))
+
+    assert sorted(entry.message_id for entry in found) == [f'message-{position:03d}' for position in range(30, 150)]
+    assert client.calls['Query'] == 2 * 2  # the hours 23:00 and 00:00, 2 shards each
+
+
+def test_handler_indexes_written_records(s3_client, mocker):
+    client = FakeDynamoDBClient()
+    index = OrderIndex('index', client=client)
+    mocker.patch('service.handlers.process_sqs_batch.get_order_index', return_value=index)
+    mocker.patch('service.handlers.logic.get_order_index', return_value=index)
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'item': {'keyboard': 'classic'}}])
+
+    lambda_handler(event, generate_context())
+
+    message_id = event['Records'][0]['messageId']
+    entry = index.get(message_id)
+    assert entry is not None and entry.object_key == f'{message_id}.json' and entry.size == len(b'{"laptop": "amd"}')
+    assert f'"{entry.etag}"' == s3_client.head_object(Bucket=BUCKET_NAME, Key=entry.object_key)['ETag']
+    assert entry.sent_at == datetime.fromtimestamp(1545082649.183, tz=timezone.utc)
+    assert len(client.tables['index']) == 2 and client.calls['BatchWriteItem'] == 1
+
+
+def test_index_connection_errors_fail_the_entries_only(s3_client, mocker):
+    client = FakeDynamoDBClient()
+    mocker.patch.object(client, 'batch_write_item', side_effect=EndpointConnectionError(endpoint_url='https://dynamodb'))
+    index = OrderIndex('index', client=client)
+    mocker.patch('service.handlers.process_sqs_batch.get_order_index', return_value=index)
+    mocker.patch('service.handlers.logic.get_order_index', return_value=index)
+    flush_metrics = mocker.spy(invocation_metrics, 'flush')
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}, {'item': {'keyboard': 'classic'}}])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    assert s3_client.put_calls == 2
+    flush_metrics.assert_called_once()
+
+
+def test_index_writes_stop_at_the_write_deadline(mocker):
+    client = FakeDynamoDBClient()
+    index = OrderIndex('index', client=client)
+    for position in range(30):
+        index.add(_entry(position, SENT_AT))
+    mocker.patch('service.handlers.utils.order_index.write_deadline.check', side_effect=[None, DeadlineExceededException('late')])
+
+    assert index.flush() == 5
+    assert len(client.tables['index']) == 25
+
+
+def test_redriven_record_keeps_the_key_and_index_entry_of_the_original_message(s3_client, mocker, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('KEY_LAYOUT', 'hourly')
+    index = OrderIndex('index', client=FakeDynamoDBClient())  # type: ignore[arg-type]
+    mocker.patch('service.handlers.process_sqs_batch.get_order_index', return_value=index)
+    mocker.patch('service.handlers.logic.get_order_index', return_value=index)
+    event = generate_sqs_event([{'item': {'laptop': 'amd'}}])
+    event['Records'][0]['messageAttributes'][REDRIVE_ORIGIN_ATTRIBUTE] = {
+        'stringValue': f'original-id:{int(SENT_AT.timestamp() * 1000)}',
+        'dataType': 'String',
+    }
+
+    assert lambda_handler(event, generate_context()) == {'batchItemFailures': []}
+
+    entry = index.get('original-id')
+    assert entry is not None and entry.sent_at == SENT_AT
+    assert entry.object_key == 'dt=2024-03-09/hour=22/original-id.json'
+    assert s3_client.head_object(Bucket=BUCKET_NAME, Key=entry.object_key)
+    assert index.get(event['Records'][0]['messageId']) is None
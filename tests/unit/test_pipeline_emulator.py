@@ -0,0 +1,76 @@
+import pytest
+
+from benchmarks.pipeline_emulator import INDEX_TABLE_NAME, Faults, PipelineEmulator, PipelineSettings
+from cdk.blueprint import constants
+
+
+def _settings(**overrides) -> PipelineSettings:
+    settings = {
+        'batch_size': 10,
+        'batching_window_seconds': 0,
+        'maximum_concurrency': 2,
+        'batch_concurrency': 2,
+        'function_timeout_seconds': 10,
+        'visibility_timeout_seconds': 60,
+    }
+    return PipelineSettings(**{**settings, **overrides})
+
+
+def test_settings_follow_the_construct_defaults():
+    settings = PipelineSettings.from_construct()
+
+    assert settings.visibility_timeout_seconds == constants.API_HANDLER_QUEUE_VISIBILITY_TIMEOUT
+    assert settings.function_timeout_seconds == constants.API_HANDLER_LAMBDA_TIMEOUT
+    assert settings.max_receive_count == constants.API_HANDLER_MAX_RECEIVE_COUNT
+    assert settings.batch_concurrency == constants.API_HANDLER_BATCH_CONCURRENCY
+
+
+def test_rejected_records_move_to_the_dlq_after_max_receive_count():
+    emulator = PipelineEmulator(_settings(), Faults(malformed_share=0.1, seed=1))
+    emulator.send(100)
+
+    report = emulator.run()
+
+    malformed = report.moved_to_dlq
+    assert 0 < malformed < 100
+    assert (report.written, report.duplicate_writes, report.remaining_in_queue) == (100 - malformed, 0, 0)
+    assert report.remaining_in_dlq == malformed
+    assert len(emulator.dynamodb.tables[INDEX_TABLE_NAME]) == report.written
+    # partial batch responses: only the rejected records were delivered again, 3 times each
+    assert report.deliveries == 100 + 2 * malformed
+    assert report.drain_seconds is not None and report.drain_seconds >= 2 * 60
+
+
+def test_triage_redrive_quarantines_poison_messages():
+    emulator = PipelineEmulator(_settings(redrive_every_seconds=600), Faults(malformed_share=0.1, seed=1))
+    emulator.send(100)
+
+    report = emulator.run()
+
+    assert report.redrive_invocations >= 1
+    assert report.quarantined == report.moved_to_dlq > 0
+    assert report.remaining_in_dlq == 0
+
+
+def test_crashed_batches_are_not_written_again_by_the_same_execution_environment():
+    emulator = PipelineEmulator(_settings(maximum_concurrency=1), Faults(crash_rate=1))
+    emulator.send(20)
+
+    report = emulator.run()
+
+    assert report.function_errors == report.invocations == 2 * constants.API_HANDLER_MAX_RECEIVE_COUNT
+    assert (report.written, report.duplicate_writes, report.moved_to_dlq) == (20, 0, 20)
+    assert report.cold_starts == 1
+
+
+@pytest.mark.parametrize('visibility_timeout_seconds, duplicated', [(60, False), (0.2, True)])
+def test_visibility_timeout_shorter_than_the_invocation_duplicates_writes(visibility_timeout_seconds: float, duplicated: bool):
+    settings = _settings(maximum_concurrency=3, batch_concurrency=1, visibility_timeout_seconds=visibility_timeout_seconds, max_receive_count=10)
+    emulator = PipelineEmulator(settings, Faults(s3_latency_ms=50))
+    emulator.send(20)
+
+    report = emulator.run()
+
+    # a batch takes 0.5 seconds, its messages are received again by the idle third execution environment meanwhile
+    assert report.written == 20
+    assert (report.duplicate_writes > 0) is duplicated
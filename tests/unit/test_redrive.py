@@ -0,0 +1,287 @@
+import json
+import time
+
+import pytest
+import redrive_lambda
+from aws_lambda_powertools.logging import Logger
+from aws_lambda_powertools.metrics import Metrics
+from botocore.exceptions import ClientError
+from redrive_engine import PAUSED_TAG, RedriveEngine, RedriveSettings, queue_url_from_arn
+from selective_redrive import (
+    DELIVERIES_ATTRIBUTE,
+    DRY_RUNS_TAG,
+    MALFORMED_BODY,
+    MAX_DELIVERIES_EXCEEDED,
+    RETRYABLE,
+    TOO_MANY_ATTRIBUTES,
+    S3QuarantineStore,
+    SelectiveRedrive,
+    TriageSettings,
+)
+
+from fakes.lambda_events import generate_context
+from fakes.s3 import FakeS3Client
+from fakes.sqs import FakeCloudWatchClient, FakeSQSClient
+from service.handlers.models.sqs_item import REDRIVE_ORIGIN_ATTRIBUTE
+
+DLQ_ARN = 'arn:aws:sqs:us-east-1:123456789012:queuedlq'
+SQS_ARN = 'arn:aws:sqs:us-east-1:123456789012:queuequeue'
+
+
+@pytest.fixture
+def sqs() -> FakeSQSClient:
+    client = FakeSQSClient()
+    client.add_messages(DLQ_ARN, [f'{{"item": {{"index": {index}}}}}' for index in range(1000)])
+    return client
+
+
+def _engine(sqs: FakeSQSClient, rates: dict[str, float] | None = None) -> RedriveEngine:
+    settings = RedriveSettings(consumer_capacity=100, capacity_share=0.5, max_queue_depth=100)
+    return RedriveEngine(sqs, FakeCloudWatchClient(rates), DLQ_ARN, SQS_ARN, settings, Logger(), Metrics(namespace='test'))
+
+
+def test_redrive_starts_at_a_share_of_spare_consumer_capacity(sqs: FakeSQSClient):
+    decision = _engine(sqs, {'NumberOfMessagesDeleted': 20, 'NumberOfMessagesSent': 30}).step('start')
+
+    assert decision == 'started'
+    assert sqs.tasks[0]['MaxNumberOfMessagesPerSecond'] == 35  # (100 - 30) * 0.5
+
+
+def test_saturated_consumers_get_the_minimum_rate(sqs: FakeSQSClient):
+    _engine(sqs, {'NumberOfMessagesDeleted': 150}).step('start')
+
+    assert sqs.tasks[0]['MaxNumberOfMessagesPerSecond'] == 1
+
+
+def test_backpressure_pauses_and_resumes_the_redrive(sqs: FakeSQSClient):
+    engine = _engine(sqs)
+    engine.step('start')
+    sqs.advance(seconds=3)  # 150 messages moved at 50/s, a backlog above the 100 message threshold
+
+    assert engine.step('supervise') == 'paused'
+    assert sqs.tasks[0]['Status'] == 'CANCELLED'
+    assert PAUSED_TAG in sqs.tags['queuedlq']
+    assert engine.step('supervise') == 'waiting'
+
+    sqs.queues['queuequeue'] = sqs.queues['queuequeue'][:40]  # consumers catch up below half the threshold
+    assert engine.step('supervise') == 'resumed'
+    assert sqs.tasks[0]['Status'] == 'RUNNING'
+    assert PAUSED_TAG not in sqs.tags['queuedlq']
+
+
+def test_supervision_never_starts_a_new_redrive(sqs: FakeSQSClient):
+    assert _engine(sqs).step('supervise') == 'idle'
+    assert not sqs.tasks
+
+
+def test_redrive_completes_when_the_dlq_is_empty(sqs: FakeSQSClient):
+    engine = _engine(sqs)
+    engine.step('start')
+    assert engine.step('supervise') == 'running'
+
+    for _ in range(20):
+        sqs.advance(seconds=1)
+        sqs.queues['queuequeue'].clear()  # consumed as fast as it's moved
+
+    assert sqs.tasks[0]['Status'] == 'COMPLETED'
+    assert engine.step('start') == 'idle'
+    assert len(sqs.tasks) == 1
+
+
+def test_handler_runs_the_scheduled_action(sqs: FakeSQSClient, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    monkeypatch.setenv('DLQ_ARN', DLQ_ARN)
+    monkeypatch.setenv('SQS_ARN', SQS_ARN)
+    clients = {'sqs': sqs, 'cloudwatch': FakeCloudWatchClient({'NumberOfMessagesDeleted': 10})}
+    monkeypatch.setattr(redrive_lambda.runtime_context, 'client', lambda service_name: clients[service_name])
+
+    redrive_lambda.redrive_handler({'action': 'supervise'}, generate_context())
+    assert not sqs.tasks
+    redrive_lambda.redrive_handler({'action': 'start'}, generate_context())
+
+    assert sqs.tasks[0]['MaxNumberOfMessagesPerSecond'] == 45
+    blob = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line][-1]
+    assert blob['RedriveRate'] == [45.0]
+    assert blob['DlqDepth'] == [1000.0]
+
+
+def _triage(sqs: FakeSQSClient, s3: FakeS3Client, max_deliveries: int = 10) -> SelectiveRedrive:
+    settings = TriageSettings(workers=4, max_deliveries=max_deliveries)
+    return SelectiveRedrive(sqs, queue_url_from_arn(DLQ_ARN), queue_url_from_arn(SQS_ARN), S3QuarantineStore('quarantine', s3), settings, Logger())
+
+
+def _poisoned_dlq() -> FakeSQSClient:
+    sqs = FakeSQSClient()
+    sqs.add_messages(DLQ_ARN, [json.dumps({'item': {'index': index, 'payload': 'x' * 40_000}}) for index in range(95)], receive_count=3)
+    sqs.add_messages(DLQ_ARN, ['not json', '{"order": {}}'], receive_count=3)
+    sqs.add_messages(DLQ_ARN, ['{"item": {}}'] * 3, receive_count=3, attributes={DELIVERIES_ATTRIBUTE: {'DataType': 'Number', 'StringValue': '9'}})
+    return sqs
+
+
+def test_triage_redrives_retryable_and_quarantines_poison_messages():
+    sqs, s3 = _poisoned_dlq(), FakeS3Client()
+
+    report = _triage(sqs, s3).run(budget_seconds=10)
+
+    assert (report.received, report.redriven, report.quarantined, report.failed) == (100, 95, 5, 0)
+    assert report.reasons == {RETRYABLE: 95, MALFORMED_BODY: 2, MAX_DELIVERIES_EXCEEDED: 3}
+    assert not sqs.queues['queuedlq']
+    assert len(sqs.queues['queuequeue']) == 95
+    # received once by the triage after 3 deliveries from the main queue
+    assert sqs.queues['queuequeue'][0]['MessageAttributes'][DELIVERIES_ATTRIBUTE] == {'DataType': 'Number', 'StringValue': '4'}
+    assert sorted({key.split('/')[2] for key in s3.objects}) == [MALFORMED_BODY, MAX_DELIVERIES_EXCEEDED]
+    assert sqs.calls['SendMessageBatch'] >= 95 * 40_000 // 262_144  # batches within the payload limit
+
+
+def test_redriven_messages_carry_their_origin_and_full_attribute_sets_are_quarantined():
+    sqs, s3 = FakeSQSClient(), FakeS3Client()
+    user_attributes = {f'attribute-{index}': {'DataType': 'String', 'StringValue': str(index)} for index in range(9)}
+    sqs.add_messages(DLQ_ARN, ['{"item": {"index": 0}}'], receive_count=3, attributes=dict(list(user_attributes.items())[:8]))
+    sqs.add_messages(DLQ_ARN, ['{"item": {"index": 1}}'], receive_count=3, attributes=user_attributes)
+    original = sqs.queues['queuedlq'][0]
+
+    report = _triage(sqs, s3).run(budget_seconds=10)
+
+    assert report.reasons == {RETRYABLE: 1, TOO_MANY_ATTRIBUTES: 1} and report.quarantined == 1
+    (redriven,) = sqs.queues['queuequeue']
+    origin = f'{original["MessageId"]}:{original["Attributes"]["SentTimestamp"]}'
+    assert redriven['MessageAttributes'][REDRIVE_ORIGIN_ATTRIBUTE] == {'DataType': 'String', 'StringValue': origin}
+    assert len(redriven['MessageAttributes']) == 10
+    # the origin of the first delivery is kept over every redrive cycle
+    sqs.queues['queuedlq'] = sqs.queues.pop('queuequeue')
+    _triage(sqs, s3).run(budget_seconds=10)
+    assert sqs.queues['queuequeue'][0]['MessageAttributes'][REDRIVE_ORIGIN_ATTRIBUTE]['StringValue'] == origin
+
+
+def test_dry_run_reports_without_changing_the_queues():
+    sqs, s3 = _poisoned_dlq(), FakeS3Client()
+
+    report = _triage(sqs, s3).run(budget_seconds=10, dry_run=True)
+
+    assert (report.received, report.redriven, report.quarantined) == (100, 0, 0)
+    assert report.reasons == {RETRYABLE: 95, MALFORMED_BODY: 2, MAX_DELIVERIES_EXCEEDED: 3}
+    assert len(report.samples[RETRYABLE]) == 5
+    assert not s3.objects and 'SendMessageBatch' not in sqs.calls
+    assert sqs.get_queue_attributes(DLQ_ARN, [])['Attributes']['ApproximateNumberOfMessages'] == '100'
+
+
+def test_dry_run_receives_are_not_counted_as_deliveries():
+    sqs, s3 = FakeSQSClient(), FakeS3Client()
+    sqs.add_messages(DLQ_ARN, ['{"item": {}}'], receive_count=8)
+    triage = _triage(sqs, s3)
+
+    assert triage.run(budget_seconds=10, dry_run=True).reasons == {RETRYABLE: 1}
+    assert triage.run(budget_seconds=10, dry_run=True).reasons == {RETRYABLE: 1}
+    report = triage.run(budget_seconds=10)
+
+    # received 11 times, 2 of them by dry runs
+    assert report.reasons == {RETRYABLE: 1} and not s3.objects
+    assert sqs.queues['queuequeue'][0]['MessageAttributes'][DELIVERIES_ATTRIBUTE] == {'DataType': 'Number', 'StringValue': '9'}
+    assert len(sqs.tags['queuedlq'][DRY_RUNS_TAG].split(',')) == 2
+
+
+def test_dry_run_is_not_started_when_it_cannot_be_recorded():
+    sqs, s3 = _poisoned_dlq(), FakeS3Client()
+    now = int(time.time())
+    sqs.tag_queue(queue_url_from_arn(DLQ_ARN), {DRY_RUNS_TAG: ','.join(str(now - index) for index in range(23, 0, -1))})
+
+    report = _triage(sqs, s3).run(budget_seconds=10, dry_run=True)
+
+    assert report.received == 0 and 'ReceiveMessage' not in sqs.calls
+
+
+def test_failed_deletes_leave_redriven_messages_in_the_dlq(monkeypatch: pytest.MonkeyPatch):
+    sqs, s3 = _poisoned_dlq(), FakeS3Client()
+
+    def delete_message_batch(**kwargs):
+        raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'unavailable'}}, 'DeleteMessageBatch')
+
+    monkeypatch.setattr(sqs, 'delete_message_batch', delete_message_batch)
+
+    report = _triage(sqs, s3).run(budget_seconds=10)
+
+    # visible again once the run's visibility timeout expires, their re-sent copies are duplicates the handler tolerates
+    assert (report.redriven, report.quarantined) == (95, 5)
+    assert len(sqs.queues['queuedlq']) == 100
+
+
+def test_messages_failing_every_cycle_are_quarantined():
+    sqs, s3 = FakeSQSClient(), FakeS3Client()
+    sqs.add_messages(DLQ_ARN, ['{"item": {}}'], receive_count=3)
+    triage = _triage(sqs, s3, max_deliveries=8)
+
+    for cycle in range(3):
+        assert triage.run(budget_seconds=10).redriven == int(cycle < 1)
+        for message in sqs.queues.pop('queuequeue', []):  # the consumer fails it 3 more times
+            sqs.add_messages(DLQ_ARN, [message['Body']], receive_count=3, attributes=message['MessageAttributes'])
+
+    assert len(s3.objects) == 1 and not sqs.queues['queuedlq']
+
+
+def test_failed_quarantine_leaves_the_message_in_the_dlq():
+    sqs = _poisoned_dlq()
+    malformed = sqs.queues['queuedlq'][95]['MessageId']
+
+    report = _triage(sqs, FakeS3Client(failing_keys={f'quarantine/{MALFORMED_BODY}/{malformed}.json'})).run(budget_seconds=10)
+
+    assert (report.quarantined, report.failed) == (4, 1)
+    assert [message['MessageId'] for message in sqs.queues['queuedlq']] == [malformed]
+    assert sqs.get_queue_attributes(DLQ_ARN, [])['Attributes']['ApproximateNumberOfMessages'] == '1'
+
+
+def test_fifo_triage_keeps_the_order_of_each_message_group():
+    sqs, dlq_arn, queue_arn = FakeSQSClient(), f'{DLQ_ARN}.fifo', f'{SQS_ARN}.fifo'
+    sqs.add_messages(dlq_arn, ['{"item": {"step": 0}}', 'not json', '{"item": {"step": 2}}'], receive_count=3, group_id='a')
+    sqs.add_messages(dlq_arn, [f'{{"item": {{"step": {step}}}}}' for step in range(3)], receive_count=3, group_id='b')
+    malformed = sqs.queues['queuedlq.fifo'][1]['MessageId']
+    expected_ids = {f'{message["MessageId"]}-4' for index, message in enumerate(sqs.queues['queuedlq.fifo']) if index in (0, 3, 4, 5)}
+    s3 = FakeS3Client(failing_keys={f'quarantine/{MALFORMED_BODY}/{malformed}.json'})
+    triage = SelectiveRedrive(
+        sqs,
+        queue_url_from_arn(dlq_arn),
+        queue_url_from_arn(queue_arn),
+        S3QuarantineStore('quarantine', s3),
+        TriageSettings(workers=4, max_deliveries=10),
+        Logger(),
+    )
+
+    report = triage.run(budget_seconds=10)
+
+    # the message after the one left in the DLQ would overtake it, it stays behind it
+    assert (report.redriven, report.failed) == (4, 2)
+    assert [message['Body'] for message in sqs.queues['queuedlq.fifo']] == ['not json', '{"item": {"step": 2}}']
+    redriven = sqs.queues['queuequeue.fifo']
+    assert [(message['Attributes']['MessageGroupId'], message['Body']) for message in redriven] == [
+        ('a', '{"item": {"step": 0}}'),
+        *[('b', f'{{"item": {{"step": {step}}}}}') for step in range(3)],
+    ]
+    # deduplication ids of their own, the DLQ message id and the delivery count
+    assert sqs.deduplication_ids['queuequeue.fifo'] == expected_ids
+
+
+def test_fifo_messages_without_deduplication_id_are_deduplicated_by_body():
+    sqs, queue_url = FakeSQSClient(), queue_url_from_arn(f'{SQS_ARN}.fifo')
+
+    for body in ('{"item": {"step": 0}}', '{"item": {"step": 0}}', '{"item": {"step": 1}}'):
+        sqs.send_message(QueueUrl=queue_url, MessageBody=body, MessageGroupId='a')
+
+    assert [message['Body'] for message in sqs.queues['queuequeue.fifo']] == ['{"item": {"step": 0}}', '{"item": {"step": 1}}']
+    with pytest.raises(ClientError, match='MessageGroupId'):
+        sqs.send_message(QueueUrl=queue_url, MessageBody='{}')
+
+
+def test_handler_triages_in_triage_mode(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('DLQ_ARN', DLQ_ARN)
+    monkeypatch.setenv('SQS_ARN', SQS_ARN)
+    monkeypatch.setenv('REDRIVE_MODE', 'triage')
+    monkeypatch.setenv('QUARANTINE_BUCKET_NAME', 'quarantine')
+    sqs, s3 = _poisoned_dlq(), FakeS3Client()
+    clients = {'sqs': sqs, 'cloudwatch': FakeCloudWatchClient(), 's3': s3}
+    monkeypatch.setattr(redrive_lambda.runtime_context, 'client', lambda service_name: clients[service_name])
+
+    dry_run = redrive_lambda.redrive_handler({'action': 'triage', 'dry_run': True}, generate_context(remaining_time_in_millis=15_000))
+    assert dry_run is not None and dry_run['reasons'][MALFORMED_BODY] == 2
+    assert len(sqs.queues['queuedlq']) == 100
+
+    report = redrive_lambda.redrive_handler({'action': 'start'}, generate_context(remaining_time_in_millis=15_000))
+    assert report is not None and (report['redriven'], report['quarantined']) == (95, 5)
+    assert redrive_lambda.redrive_handler({'action': 'supervise'}, generate_context()) is None
@@ -0,0 +1,46 @@
+import pytest
+
+from service.handlers.models.env_vars import MyHandlerEnvVars
+from service.handlers.utils.key_layout import HourPartitionedKeyBuilder, get_key_builder
+from service.handlers.utils.runtime_context import RuntimeContext
+from service.handlers.utils.runtime_context import runtime_context as shared_runtime_context
+
+
+def test_environment_and_clients_are_reused_until_refresh(monkeypatch: pytest.MonkeyPatch):
+    runtime_context = RuntimeContext()
+    built: list[str] = []
+
+    def build_client(service_name: str, config: object) -> object:
+        built.append(service_name)
+        return object()
+
+    monkeypatch.setattr('boto3.client', build_client)
+
+    env_vars = runtime_context.env_vars(MyHandlerEnvVars)
+    client = runtime_context.client('sqs')
+    monkeypatch.setenv('BUCKET_NAME', 'other-bucket')
+
+    assert runtime_context.env_vars(MyHandlerEnvVars) is env_vars
+    assert runtime_context.client('sqs') is client and built == ['sqs']
+    assert runtime_context.logger() is runtime_context.logger()
+
+    runtime_context.refresh()
+
+    assert runtime_context.env_vars(MyHandlerEnvVars).BUCKET_NAME == 'other-bucket'
+    assert runtime_context.client('sqs') is not client and built == ['sqs', 'sqs']
+
+
+def test_refresh_rebuilds_the_execution_environment_caches(monkeypatch: pytest.MonkeyPatch):
+    key_builder = get_key_builder()
+    monkeypatch.setenv('KEY_LAYOUT', 'hourly')
+
+    assert get_key_builder() is key_builder
+    shared_runtime_context.refresh()
+    assert isinstance(get_key_builder(), HourPartitionedKeyBuilder)
+
+
+def test_invalid_environment_is_rejected(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('BATCH_CONCURRENCY', '0')
+
+    with pytest.raises(ValueError):
+        RuntimeContext().env_vars(MyHandlerEnvVars)
@@ -0,0 +1,121 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from fakes.lambda_events import generate_context, generate_sqs_event
+from service.handlers.handle_sqs_batch import lambda_handler
+from service.handlers.models.sqs_item import OFFLOADED_PAYLOAD_MARKER
+from service.handlers.utils.streaming import MIB, extract_item_chunks, size_stream_buffers, stream_upload
+from tests.unit.conftest import BUCKET_NAME
+
+OFFLOAD_BUCKET = 'offload-bucket'
+ITEM = {'text': 'quote " backslash \\ braces {[}] unicode é', 'nested': {'list': [1, {'a': None}], 'empty': {}}}
+
+
+def _chunked(data: bytes, size: int) -> list[bytes]:
+    return [data[index : index + size] for index in range(0, len(data), size)]
+
+
+def _offload(s3_client, payload: bytes, key: str = 'payload') -> str:
+    s3_client.put_object(Bucket=OFFLOAD_BUCKET, Key=key, Body=payload)
+    return json.dumps([OFFLOADED_PAYLOAD_MARKER, {'s3BucketName': OFFLOAD_BUCKET, 's3Key': key}])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 4096])
+def test_item_is_extracted_from_any_chunking(chunk_size: int):
+    document = f'  {{ "item" :\n{json.dumps(ITEM)} }}\n'.encode()
+
+    extracted = b''.join(extract_item_chunks(_chunked(document, chunk_size)))
+
+    assert json.loads(extracted) == ITEM
+
+
+@pytest.mark.parametrize(
+    'document',
+    [b'{"item": {"a": 1}, "other": 2}', b'{"item": [1]}', b'{"other": {"a": 1}}', b'[1, 2]', b'{"item": {"a": 1}', b'{"item": {"a": "}"}}}'],
+)
+def test_documents_other_than_an_item_object_are_rejected(document: bytes):
+    with pytest.raises(ValueError):
+        b''.join(extract_item_chunks(_chunked(document, 3)))
+
+
+def test_small_stream_is_written_with_a_single_put(s3_client):
+    written = stream_upload(s3_client, BUCKET_NAME, 'small', [b'{"a":', b' 1}'], 'application/json', part_size=5 * MIB)
+
+    assert written.size == 8
+    assert written.etag == s3_client.head_object(Bucket=BUCKET_NAME, Key='small')['ETag']
+    assert s3_client.completed_uploads == 0
+    assert s3_client.get_object(Bucket=BUCKET_NAME, Key='small')['Body'].read() == b'{"a": 1}'
+
+
+def test_large_stream_is_uploaded_in_bounded_parts(s3_client):
+    chunks = [bytes([index]) * 256 * 1024 for index in range(50)]  # 12.5 MiB
+
+    written = stream_upload(s3_client, BUCKET_NAME, 'large', iter(chunks), 'application/json', part_size=5 * MIB)
+
+    assert written.size == 50 * 256 * 1024
+    assert written.etag.endswith('-3"')
+    assert s3_client.completed_uploads == 1
+    assert s3_client.max_part_size == 5 * MIB
+    assert s3_client.get_object(Bucket=BUCKET_NAME, Key='large')['Body'].read() == b''.join(chunks)
+
+
+def test_failed_multipart_upload_is_aborted(s3_client):
+    s3_client.failing_keys = {'large'}
+
+    with pytest.raises(ClientError):
+        stream_upload(s3_client, BUCKET_NAME, 'large', [b'x' * 6 * MIB], 'application/json', part_size=5 * MIB)
+
+    assert s3_client.aborted_uploads == 1
+    assert not s3_client.uploads
+
+
+def test_stream_buffers_fit_the_function_memory():
+    # parts shrink until the streams fit in half of the memory
+    assert size_stream_buffers(memory_mb=1024, concurrency=10, max_part_size=64 * MIB) == (25 * MIB, 10)
+    assert size_stream_buffers(memory_mb=1024, concurrency=1, max_part_size=8 * MIB) == (8 * MIB, 1)
+    # below the 5 MiB part minimum fewer streams run at once
+    assert size_stream_buffers(memory_mb=128, concurrency=10, max_part_size=8 * MIB) == (5 * MIB, 6)
+
+
+@pytest.mark.parametrize('parsing_mode', ['strict', 'fast'])
+def test_offloaded_payload_item_is_written(s3_client, monkeypatch: pytest.MonkeyPatch, parsing_mode: str):
+    monkeypatch.setenv('PARSING_MODE', parsing_mode)
+    event = generate_sqs_event([_offload(s3_client, json.dumps({'item': ITEM}).encode())])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    stored = s3_client.get_object(Bucket=BUCKET_NAME, Key=f'{event["Records"][0]["messageId"]}.json')['Body'].read()
+    assert json.loads(stored) == ITEM
+
+
+def test_offloaded_payloads_are_streamed_with_parts_sized_for_the_memory(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('BATCH_CONCURRENCY', '10')
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_MEMORY_SIZE', '128')
+    monkeypatch.setenv('MULTIPART_PART_SIZE_MB', '8')
+    payload = json.dumps({'item': {'blob': 'x' * 11 * MIB}}).encode()
+    event = generate_sqs_event([_offload(s3_client, payload)])
+
+    assert lambda_handler(event, generate_context()) == {'batchItemFailures': []}
+    assert s3_client.max_part_size == 5 * MIB
+
+
+def test_invalid_offloaded_payload_is_reported(s3_client):
+    event = generate_sqs_event([_offload(s3_client, b'{"order": {}}', key='invalid'), {'item': {'laptop': 'amd'}}])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': event['Records'][0]['messageId']}]}
+
+
+def test_offloaded_payload_is_aggregated(s3_client, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('AGGREGATION_MODE', 'true')
+    event = generate_sqs_event([_offload(s3_client, json.dumps({'item': ITEM}).encode()), {'item': {'laptop': 'amd'}}])
+
+    response = lambda_handler(event, generate_context())
+
+    assert response == {'batchItemFailures': []}
+    aggregated = next(stored['Body'] for key, stored in s3_client.objects.items() if key.endswith('.ndjson'))
+    assert [json.loads(line) for line in aggregated.splitlines()] == [ITEM, {'laptop': 'amd'}]
@@ -0,0 +1,64 @@
+import pytest
+
+from benchmarks.drain_simulator import simulate
+from cdk.blueprint.throughput_profile import MAX_INVOCATION_PAYLOAD_BYTES, ThroughputProfile
+
+
+def test_batch_fits_into_timeout_and_target_throughput():
+    profile = ThroughputProfile(target_records_per_second=1000, record_latency_ms=50, batch_concurrency=10, function_timeout_seconds=10)
+
+    assert profile.batch_size == 1000  # 100 rounds of 10 concurrent writes in 5 of the 10 seconds
+    assert profile.batching_window_seconds == 1
+    assert profile.maximum_concurrency * profile.batch_size / (profile.invocation_duration_ms / 1000) >= 1000
+
+
+def test_small_batches_need_no_batching_window():
+    profile = ThroughputProfile(target_records_per_second=1, record_latency_ms=50, max_wait_seconds=0)
+
+    assert profile.batch_size == 10
+    assert profile.batching_window_seconds == 0
+
+
+def test_large_records_are_limited_by_payload_size():
+    profile = ThroughputProfile(target_records_per_second=1000, record_latency_ms=1, record_size_bytes=256 * 1024)
+
+    assert profile.batch_size * 256 * 1024 <= MAX_INVOCATION_PAYLOAD_BYTES
+
+
+def test_latency_alarms_exceed_the_batching_window_and_invocation():
+    profile = ThroughputProfile(target_records_per_second=100, record_latency_ms=50, batch_concurrency=10, function_timeout_seconds=10)
+
+    assert profile.batching_window_seconds == 5 and profile.invocation_duration_ms == 2500
+    assert profile.end_to_end_latency_p50_alarm_ms == 15_000
+    assert profile.end_to_end_latency_p99_alarm_ms == 30_000
+
+
+@pytest.mark.parametrize(
+    'settings',
+    [
+        {'target_records_per_second': 1_000_000, 'record_latency_ms': 500},
+        {'target_records_per_second': 10, 'record_latency_ms': 60_000},
+        {'target_records_per_second': 10, 'record_latency_ms': 50, 'max_wait_seconds': 301},
+    ],
+)
+def test_impossible_profiles_are_rejected(settings: dict):
+    with pytest.raises(ValueError):
+        ThroughputProfile(**settings)
+
+
+def test_simulated_backlog_drains_unless_arrivals_outpace_the_profile():
+    profile = ThroughputProfile(target_records_per_second=100, record_latency_ms=50)
+
+    drained = simulate(profile, backlog=10_000, arrival_rate=10, memory_mb=128)
+    overloaded = simulate(profile, backlog=10_000, arrival_rate=1000, memory_mb=128, max_seconds=600)
+
+    assert drained.drain_seconds is not None and drained.processed_records >= 10_000
+    assert drained.cost_usd['total'] > 0
+    assert overloaded.drain_seconds is None and overloaded.remaining_records > 10_000
+
+
+def test_fifo_batches_are_capped_at_ten_records():
+    profile = ThroughputProfile(target_records_per_second=1000, record_latency_ms=50, batch_concurrency=10, fifo=True)
+
+    assert (profile.batch_size, profile.batching_window_seconds) == (10, 0)
+    assert profile.invocation_duration_ms == 50  # one record of each of 10 message groups at once